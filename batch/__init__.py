@@ -0,0 +1,13 @@
+"""
+AI Tutor - Batch Answering
+==========================
+
+Offline answering of question files straight through the agent tree, without
+the HTTP server.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Modules:
+- runner: Resumable JSONL batch runner (python -m batch)
+"""
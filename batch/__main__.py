@@ -0,0 +1,17 @@
+"""
+AI Tutor - Batch Answering Entry Point
+======================================
+
+Usage:
+    python -m batch questions.jsonl answers.jsonl
+    python -m batch questions.jsonl answers.jsonl --concurrency 64 --rpm 1000
+    python -m batch questions.jsonl answers.jsonl --restart
+
+Author: AI Tutor Team
+Version: 1.0.0
+"""
+
+from .runner import main
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,533 @@
+"""
+AI Tutor - Batch Runner
+=======================
+
+Answers a JSONL file of questions with the agent tree and writes the answers
+to a JSONL file, for nightly jobs over thousands of practice questions. Runs
+on an ADK Runner over root_agent directly, so it gets the same middleware as
+the server (rate limiting, retries, circuit breakers, credential pool,
+bounded context) without an HTTP round trip per question.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Input:
+One JSON object per line, the same shape as the backlog files: the id is
+taken from 'request_id' or 'id' (else 'line-<n>'), the question from 'text'
+or 'question', else 'title' and 'body' joined. The file is streamed, never
+loaded whole.
+
+Output:
+One result per line, written and flushed as each question finishes (so in
+completion order, with the input line number for sorting):
+    {"request_id": "...", "line": 12, "status": "ok", "response": "...",
+     "agents": ["multiagent", "maths_agent"], "ms": 2310.4, "cached": false}
+Failed questions have "status": "error" and an "error" message.
+
+Resuming:
+The output file is the checkpoint. On start, the questions already answered
+in it are skipped (a line torn by a crash is cut off), so a crashed or
+interrupted run is restarted with the same command. Questions are keyed on
+their request id and input line, so two lines reusing an id are both
+answered. Failed questions are retried on resume, their error records
+removed so the retry replaces them, unless --keep-failed is given;
+--restart starts from scratch.
+
+Throughput:
+- Up to --concurrency questions run at once on one event loop; upstream
+  rate limits (--rpm / --tpm, per model and, with a credential pool, per
+  credential) are enforced by the model-call middleware, and questions wait
+  for capacity instead of failing
+- Repeated questions (same normalized text) are answered once: later copies
+  reuse the answer in flight or from the response cache
+- Questions rejected by the upstream (quota, open circuit) or over their
+  deadline are retried up to --retries times after the advised delay
+
+Progress (answered, failed, questions per second, ETA) is reported every
+--progress-every seconds and at the end.
+
+Usage:
+    python -m batch questions.jsonl answers.jsonl --concurrency 64
+    python -m batch questions.jsonl answers.jsonl --fake-latency-ms 400   # dry run, no quota
+
+Exit status: 0 all answered, 1 some questions failed, 2 bad arguments or no
+credentials.
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, TextIO
+
+# Third-party imports
+from dotenv import load_dotenv
+
+APP_NAME = 'aitutor-batch'
+USER_ID = 'batch'
+
+# Longest wait for upstream capacity before a call is rejected; batch jobs
+# would rather queue than fail (overridable with AITUTOR_THROTTLE_MAX_WAIT)
+THROTTLE_MAX_WAIT = 120.0
+
+# Delay before retrying a question the upstream rejected without advice
+RETRY_DELAY = 5.0
+
+
+# Input and Checkpoint
+# ====================
+
+@dataclass
+class BatchItem:
+    """
+    One question of the input file.
+
+    Attributes:
+        id (str): Request id written with the answer
+        line (int): Line number in the input file (1-based)
+        text (str): The question ('' if the line could not be read)
+        error (str, optional): Why the line could not be read
+    """
+    id: str
+    line: int
+    text: str = ''
+    error: Optional[str] = None
+
+
+def parse_item(line: str, number: int) -> BatchItem:
+    """
+    Read one input line.
+
+    Args:
+        line (str): JSON object
+        number (int): Line number (1-based)
+
+    Returns:
+        BatchItem: The question, or an item carrying the parse error
+    """
+    try:
+        data = json.loads(line)
+        if not isinstance(data, dict):
+            raise ValueError('not a JSON object')
+    except ValueError as e:
+        return BatchItem(id=f'line-{number}', line=number, error=f'invalid input line: {e}')
+    item_id = str(data.get('request_id') or data.get('id') or f'line-{number}')
+    text = data.get('text') or data.get('question') or '\n\n'.join(
+        str(data[key]) for key in ('title', 'body') if data.get(key)
+    )
+    if not str(text).strip():
+        return BatchItem(id=item_id, line=number, error='no question text')
+    return BatchItem(id=item_id, line=number, text=str(text).strip())
+
+
+def read_items(stream: TextIO, skip: set[tuple[str, int]]) -> Iterator[BatchItem]:
+    """
+    Stream the questions of an input file, leaving out those already done.
+
+    Args:
+        stream (TextIO): Input JSONL
+        skip (set[tuple[str, int]]): (request id, line) of questions already answered
+
+    Yields:
+        BatchItem: Questions to answer, in file order
+    """
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        item = parse_item(line, number)
+        if (item.id, item.line) not in skip:
+            yield item
+
+
+def count_lines(path: str) -> int:
+    """Number of non-empty lines in a file (for the ETA)."""
+    with open(path, 'rb') as stream:
+        return sum(1 for line in stream if line.strip())
+
+
+def _checkpoint_key(result: dict) -> tuple[str, int]:
+    """(request id, input line) of an output record."""
+    return str(result.get('request_id')), result.get('line')
+
+
+def load_checkpoint(path: str, keep_failed: bool = False) -> set[tuple[str, int]]:
+    """
+    Collect the questions already written to an output file.
+
+    A trailing line without a newline (torn by a crash mid-write) is cut off
+    so the run appends after the last complete result. Unless keep_failed is
+    set, error records are removed from the file too, so the retried
+    questions replace them instead of adding a second record.
+
+    Args:
+        path (str): Output JSONL of an earlier run
+        keep_failed (bool): Also count failed questions as done
+
+    Returns:
+        set[tuple[str, int]]: (request id, line) of questions not to answer again
+    """
+    done: set[tuple[str, int]] = set()
+    if not os.path.exists(path):
+        return done
+    complete = 0
+    retried = 0
+    with open(path, 'rb') as stream:
+        for line in stream:
+            if not line.endswith(b'\n'):
+                break
+            complete += len(line)
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if result.get('status') == 'ok' or keep_failed:
+                done.add(_checkpoint_key(result))
+            else:
+                retried += 1
+
+    if retried:
+        # Rewrite without the records about to be retried (and any torn tail)
+        with open(path, 'rb') as stream, open(path + '.tmp', 'wb') as rewritten:
+            for line in stream:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    failed = json.loads(line).get('status') != 'ok'
+                except ValueError:
+                    failed = False
+                if not failed:
+                    rewritten.write(line)
+            rewritten.flush()
+            os.fsync(rewritten.fileno())
+        os.replace(path + '.tmp', path)
+    elif complete < os.path.getsize(path):
+        with open(path, 'r+b') as stream:
+            stream.truncate(complete)
+    return done
+
+
+# Progress
+# ========
+
+@dataclass
+class Progress:
+    """
+    Counts of a batch run and its throughput.
+
+    Attributes:
+        total (int, optional): Questions to answer in this run (None if unknown)
+        answered (int): Questions answered
+        failed (int): Questions that failed
+        cached (int): Answers reused from a repeated question
+        started (float): Start of the run (time.monotonic())
+    """
+    total: Optional[int] = None
+    answered: int = 0
+    failed: int = 0
+    cached: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def finished(self) -> int:
+        return self.answered + self.failed
+
+    def rate(self) -> float:
+        """Questions finished per second so far."""
+        elapsed = time.monotonic() - self.started
+        return self.finished / elapsed if elapsed > 0 else 0.0
+
+    def eta(self) -> Optional[float]:
+        """Seconds left at the current rate (None if unknown)."""
+        rate = self.rate()
+        if self.total is None or rate == 0:
+            return None
+        return max(0, self.total - self.finished) / rate
+
+    def line(self) -> str:
+        """One-line progress report."""
+        done = f'{self.finished}/{self.total} ({100 * self.finished / max(1, self.total):.1f}%)' if self.total is not None else str(self.finished)
+        eta = self.eta()
+        return (f'⏳ {done} answered={self.answered} failed={self.failed} cached={self.cached} '
+                f'{self.rate():.1f} q/s ETA {_duration(eta) if eta is not None else "?"}')
+
+
+def _duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h{minutes:02d}m{seconds:02d}s' if hours else f'{minutes}m{seconds:02d}s'
+
+
+# Batch Runner
+# ============
+
+class BatchRunner:
+    """
+    Answers batch items on an ADK Runner with bounded concurrency.
+    """
+
+    def __init__(self, runner, session_service, output: TextIO, progress: Progress,
+                 concurrency: int = 32, timeout: float = 300.0, retries: int = 2):
+        """
+        Args:
+            runner (Runner): ADK runner of the agent tree
+            session_service (BaseSessionService): The runner's session service
+            output (TextIO): Output JSONL, opened for appending
+            progress (Progress): Counts updated as questions finish
+            concurrency (int): Questions answered at once
+            timeout (float): Time budget per attempt in seconds
+            retries (int): Further attempts after an upstream rejection or timeout
+        """
+        self.runner = runner
+        self.session_service = session_service
+        self.output = output
+        self.progress = progress
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def run(self, items: Iterator[BatchItem]) -> None:
+        """
+        Answer every item, reading the input only as fast as workers free up.
+
+        Args:
+            items (Iterator[BatchItem]): Questions to answer
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2 * self.concurrency)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        try:
+            for item in items:
+                await queue.put(item)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            self._write(await self.answer(item))
+
+    def _write(self, result: dict) -> None:
+        self.output.write(json.dumps(result, ensure_ascii=False) + '\n')
+        self.output.flush()
+        if result['status'] == 'ok':
+            self.progress.answered += 1
+            self.progress.cached += bool(result.get('cached'))
+        else:
+            self.progress.failed += 1
+
+    async def answer(self, item: BatchItem) -> dict:
+        """
+        Answer one item, reusing the answer of an identical question.
+
+        Args:
+            item (BatchItem): The question
+
+        Returns:
+            dict: The output record
+        """
+        from multiagent.runtime import response_cache
+
+        result = {'request_id': item.id, 'line': item.line}
+        if item.error:
+            return {**result, 'status': 'error', 'error': item.error}
+        started = time.monotonic()
+
+        key = response_cache.normalize(item.text)
+        cached = response_cache.CACHE.get(item.text)
+        if cached is not None:
+            return {**result, 'status': 'ok', 'response': cached.text, 'agents': cached.hops, 'ms': 0.0, 'cached': True}
+        shared = self._inflight.get(key)
+        if shared is not None:
+            answer = await asyncio.shield(shared)
+            return {**result, **answer, 'ms': round(1000 * (time.monotonic() - started), 1), 'cached': True}
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            answer = await self._attempts(item.text)
+        except Exception as e:
+            answer = {'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+        finally:
+            del self._inflight[key]
+        future.set_result(answer)
+        return {**result, **answer, 'ms': round(1000 * (time.monotonic() - started), 1), 'cached': False}
+
+    async def _attempts(self, text: str) -> dict:
+        from multiagent.runtime import deadline, resilience
+
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._ask(text)
+            except (resilience.UpstreamUnavailable, deadline.DeadlineExceeded, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(getattr(e, 'retry_after', 0.0) or RETRY_DELAY)
+
+    async def _ask(self, text: str) -> dict:
+        """Run the agents on one question in a throwaway session."""
+        from google.genai import types
+        from multiagent.runtime import deadline, response_cache
+        from multiagent.runtime.activity import ActivityTrace
+
+        session = self.session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+        activity = ActivityTrace()
+        async def consume() -> str:
+            response_text = ''
+            events = self.runner.run_async(
+                user_id=USER_ID, session_id=session.id,
+                new_message=types.Content(role='user', parts=[types.Part(text=text)]),
+            )
+            async with contextlib.aclosing(events):
+                async for event in events:
+                    activity.record(event)
+                    if not response_text and event.is_final_response() and event.content and event.content.parts:
+                        response_text = event.content.parts[0].text or ''
+            return response_text
+
+        try:
+            with deadline.scope(self.timeout):
+                response_text = await asyncio.wait_for(consume(), self.timeout)
+        finally:
+            self.session_service.delete_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+        if not response_text:
+            return {'status': 'error', 'error': 'no answer produced'}
+        trace = activity.to_dict()
+        response_cache.CACHE.put(text, response_text, trace)
+        return {'status': 'ok', 'response': response_text, 'agents': trace['hops']}
+
+
+# Command Line
+# ============
+
+def configure_credentials() -> bool:
+    """
+    Make the configured API key visible to the ADK (as main.setup_authentication does).
+
+    Returns:
+        bool: True if an API key or Vertex AI project is configured
+    """
+    pooled_keys = [key.strip() for key in os.getenv('AITUTOR_GEMINI_API_KEYS', '').split(',') if key.strip()]
+    api_key = os.getenv('GOOGLE_AI_API_KEY') or (pooled_keys[0] if pooled_keys else None)
+    if api_key:
+        for var in ('GOOGLE_AI_API_KEY', 'GEMINI_API_KEY', 'GOOGLE_API_KEY'):
+            os.environ[var] = api_key
+        return True
+    return bool(os.getenv('GOOGLE_CLOUD_PROJECT'))
+
+
+async def run_batch(args: argparse.Namespace, done: set[tuple[str, int]], output: TextIO) -> Progress:
+    """
+    Build the agent tree and answer the input file.
+
+    Args:
+        args (argparse.Namespace): Command-line options
+        done (set[tuple[str, int]]): (request id, line) of questions answered by an earlier run
+        output (TextIO): Output JSONL, opened for appending
+
+    Returns:
+        Progress: Final counts
+    """
+    # Imported here so the rate-limit settings above apply to the middleware
+    from google.adk.runners import Runner
+    from multiagent.agent import root_agent
+    from multiagent.runtime import executor, session_store
+
+    if args.fake_latency_ms is not None:
+        from benchmarks import fake_gemini
+        fake_gemini.install(fake_gemini.FakeModelConfig(latency_ms=args.fake_latency_ms))
+
+    session_service = session_store.create_session_service()
+    runner = Runner(agent=root_agent, app_name=APP_NAME, session_service=session_service)
+    if executor.uses_processes():
+        await asyncio.to_thread(executor.warm)
+
+    total = None if args.input == '-' else max(0, count_lines(args.input) - len(done))
+    progress = Progress(total=total)
+    batch = BatchRunner(runner, session_service, output, progress, args.concurrency, args.timeout, args.retries)
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(args.progress_every)
+            os.fsync(output.fileno())
+            print(progress.line(), file=sys.stderr, flush=True)
+
+    reporter = asyncio.create_task(report())
+    stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    try:
+        await batch.run(read_items(stream, done))
+    finally:
+        reporter.cancel()
+        if stream is not sys.stdin:
+            stream.close()
+        executor.shutdown()
+    return progress
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Command-line entry point of the batch runner.
+
+    Returns:
+        int: 0 if every question was answered, 1 if some failed, 2 on bad
+        arguments or missing credentials
+    """
+    parser = argparse.ArgumentParser(description='Answer a JSONL file of questions with the AI Tutor agents.')
+    parser.add_argument('input', help="Questions JSONL ('-' for stdin)")
+    parser.add_argument('output', help='Answers JSONL; also the checkpoint a rerun resumes from')
+    parser.add_argument('--concurrency', type=int, default=32, help='Questions answered at once (32)')
+    parser.add_argument('--rpm', type=float, help='Model requests per minute per model (sets AITUTOR_GEMINI_RPM)')
+    parser.add_argument('--tpm', type=float, help='Model tokens per minute per model (sets AITUTOR_GEMINI_TPM)')
+    parser.add_argument('--timeout', type=float, default=300.0, help='Seconds per attempt at a question (300)')
+    parser.add_argument('--retries', type=int, default=2, help='Retries after an upstream rejection or timeout (2)')
+    parser.add_argument('--progress-every', type=float, default=10.0, help='Seconds between progress reports (10)')
+    parser.add_argument('--restart', action='store_true', help='Ignore and overwrite an existing output file')
+    parser.add_argument('--keep-failed', action='store_true', help='Do not retry questions that failed in an earlier run')
+    parser.add_argument('--fake-latency-ms', type=float, default=None,
+                        help='Dry run against the offline fake backend (benchmarks/fake_gemini.py) with this latency')
+    args = parser.parse_args(argv)
+
+    if args.concurrency < 1 or (args.input != '-' and not os.path.exists(args.input)):
+        print(f"❌ {'--concurrency must be at least 1' if args.concurrency < 1 else f'No such input file: {args.input}'}")
+        return 2
+    load_dotenv()
+    if args.fake_latency_ms is not None:
+        os.environ.setdefault('GOOGLE_API_KEY', 'fake-key-for-dry-runs')
+    elif not configure_credentials():
+        print("❌ No credentials: set GOOGLE_AI_API_KEY or GOOGLE_CLOUD_PROJECT (see README)")
+        return 2
+    if args.rpm is not None:
+        os.environ['AITUTOR_GEMINI_RPM'] = str(args.rpm)
+    if args.tpm is not None:
+        os.environ['AITUTOR_GEMINI_TPM'] = str(args.tpm)
+    os.environ.setdefault('AITUTOR_THROTTLE_MAX_WAIT', str(THROTTLE_MAX_WAIT))
+
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    done = load_checkpoint(args.output, keep_failed=args.keep_failed)
+    if done:
+        print(f"↩️  Resuming: {len(done)} questions already in {args.output}")
+
+    print(f"🚀 Answering {args.input} -> {args.output} (concurrency {args.concurrency})")
+    with open(args.output, 'a', encoding='utf-8') as output:
+        try:
+            progress = asyncio.run(run_batch(args, done, output))
+        except KeyboardInterrupt:
+            print(f"\n⏹️  Interrupted; rerun the same command to resume from {args.output}")
+            return 1
+
+    elapsed = time.monotonic() - progress.started
+    print(f"✅ {progress.answered} answered, {progress.failed} failed, {progress.cached} reused "
+          f"in {_duration(elapsed)} ({progress.rate():.1f} q/s)")
+    return 1 if progress.failed else 0
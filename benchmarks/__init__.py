@@ -0,0 +1,16 @@
+"""
+AI Tutor - Benchmarks
+=====================
+
+Offline performance benchmarks. Nothing here calls the Gemini API: model
+calls are served by a fake backend plugged into the model-call pipeline.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Modules:
+- fake_gemini: Fake Gemini backend with configurable latency, routing and errors
+- load: Open-loop load generator for the FastAPI app (python -m benchmarks.load)
+- startup: Import-time and time-to-first-byte profiler (python -m benchmarks.startup)
+- hops: Transfers, model calls, tool calls and tokens per labeled query against a baseline (python -m benchmarks.hops)
+"""
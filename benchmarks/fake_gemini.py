@@ -0,0 +1,224 @@
+"""
+AI Tutor - Fake Gemini Backend
+==============================
+
+An offline stand-in for the Gemini API, installed as the transport of the
+model-call pipeline (multiagent.runtime.model.set_transport). The real agent
+tree, ADK flows, tools and FastAPI app all run unchanged; only the network
+call to Gemini is replaced, so benchmarks cost no quota and are repeatable.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Emulated behaviour:
+- Latency: log-normally jittered time to first token plus output tokens
+  divided by a token rate
+- Routing: the orchestrator transfers to a specialist, calls the news
+  analyst tool, or answers directly, with configurable ratios
+- Tools: specialists call their real tool with valid arguments before answering
+- Errors: injected API errors (google.genai.errors) at a configurable rate
+- Usage: token counts reported like the real API, so metrics and traces work
+"""
+
+# Standard library imports
+import asyncio
+import random
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+# Google AI and ADK imports
+from google.adk.models import LlmResponse
+from google.genai import errors, types
+
+# AI Tutor imports
+from multiagent.agent import root_agent
+from multiagent.prompts import count_tokens
+from multiagent.runtime import hooks, model
+from multiagent.runtime.context import content_tokens, split_turns
+from multiagent.runtime.model import ModelCall
+
+ROOT_AGENT = 'multiagent'
+NEWS_TOOL = 'news_analyst'
+
+# Valid arguments for each tool the specialists may call
+SAMPLE_ARGS = {
+    'calculator': {'operation': 'multiply', 'num1': 11, 'num2': 3.6},
+    'lookup_physics_constant': {'constant_name': 'speed_of_light'},
+    'elements_lookup': {'element_name': 'carbon'},
+}
+
+# Approximate size of a function-call response
+FUNCTION_CALL_TOKENS = 20
+
+
+@dataclass
+class FakeModelConfig:
+    """
+    Behaviour of the fake backend.
+
+    Attributes:
+        latency_ms (float): Median time to first token
+        jitter (float): Sigma of the log-normal latency multiplier (0 = fixed)
+        token_rate (float): Output tokens per second after the first token
+        answer_tokens (int): Length of text answers
+        transfer_ratio (float): Share of turns the orchestrator delegates to a specialist
+        news_ratio (float): Share of turns the orchestrator calls the news analyst tool
+        tool_ratio (float): Share of specialist turns that call their tool first
+        error_rate (float): Share of model calls failing with an injected API error
+        error_code (int): HTTP status of injected errors (429 or 5xx)
+        straggler_rate (float): Share of model calls that are abnormally slow
+        straggler_factor (float): Latency multiplier of those calls
+        seed (int, optional): Random seed for reproducible runs
+    """
+    latency_ms: float = 400.0
+    jitter: float = 0.25
+    token_rate: float = 150.0
+    answer_tokens: int = 120
+    transfer_ratio: float = 0.8
+    news_ratio: float = 0.05
+    tool_ratio: float = 0.9
+    error_rate: float = 0.0
+    error_code: int = 503
+    straggler_rate: float = 0.0
+    straggler_factor: float = 10.0
+    seed: Optional[int] = None
+
+
+class FakeGemini:
+    """
+    Model-call transport that emulates Gemini responses for the AI Tutor tree.
+    """
+
+    def __init__(self, config: Optional[FakeModelConfig] = None):
+        """
+        Args:
+            config (FakeModelConfig, optional): Behaviour; defaults to FakeModelConfig()
+        """
+        self.config = config or FakeModelConfig()
+        self.random = random.Random(self.config.seed)
+        self.calls = Counter()
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    async def __call__(self, call: ModelCall) -> LlmResponse:
+        callback_context = hooks.current_context()
+        agent = callback_context.agent_name if callback_context else ROOT_AGENT
+        self.calls[agent] += 1
+
+        if self.random.random() < self.config.error_rate:
+            await self._sleep(0)
+            self.errors += 1
+            raise self._error()
+
+        part, output_tokens = self._respond(agent, call)
+        await self._sleep(output_tokens)
+
+        input_tokens = sum(content_tokens(content) for content in call.request.contents)
+        if call.request.config and isinstance(call.request.config.system_instruction, str):
+            input_tokens += count_tokens(call.request.config.system_instruction)
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        call.usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=input_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=input_tokens + output_tokens,
+        )
+        return LlmResponse(content=types.Content(role='model', parts=[part]))
+
+    def _respond(self, agent: str, call: ModelCall) -> tuple[types.Part, int]:
+        """Decide the next step for an agent given the current turn."""
+        turns = split_turns(call.request.contents)
+        turn = turns[-1] if turns else []
+        answered = {
+            part.function_response.name
+            for content in turn for part in content.parts or [] if part.function_response
+        }
+        tools = [name for name in (call.request.tools_dict or {}) if name != 'transfer_to_agent']
+
+        if agent == ROOT_AGENT:
+            if NEWS_TOOL in answered:
+                return self._answer(agent)
+            roll = self.random.random()
+            if roll < self.config.news_ratio and NEWS_TOOL in tools:
+                return self._function_call(NEWS_TOOL, {'request': self._question(turn)})
+            specialists = [specialist.name for specialist in root_agent.sub_agents]
+            if roll < self.config.news_ratio + self.config.transfer_ratio and specialists:
+                return self._function_call('transfer_to_agent', {'agent_name': self.random.choice(specialists)})
+            return self._answer(agent)
+
+        pending = [name for name in tools if name not in answered]
+        if pending and not answered and self.random.random() < self.config.tool_ratio:
+            name = pending[0]
+            return self._function_call(name, SAMPLE_ARGS.get(name, {}))
+        return self._answer(agent)
+
+    @staticmethod
+    def _question(turn: list[types.Content]) -> str:
+        """Text of the student message that opened the turn."""
+        if not turn:
+            return ''
+        return ' '.join(part.text or '' for part in turn[0].parts or [])
+
+    def _answer(self, agent: str) -> tuple[types.Part, int]:
+        """A text answer of the configured length."""
+        words = ['This', 'is', 'a', 'simulated', 'answer', 'from', agent + '.']
+        text = ' '.join(words[index % len(words)] for index in range(self.config.answer_tokens))
+        return types.Part(text=text), self.config.answer_tokens
+
+    @staticmethod
+    def _function_call(name: str, args: dict) -> tuple[types.Part, int]:
+        """A function-call response."""
+        return types.Part(function_call=types.FunctionCall(name=name, args=args)), FUNCTION_CALL_TOKENS
+
+    def _error(self) -> errors.APIError:
+        """An API error shaped like the ones google-genai raises."""
+        code = self.config.error_code
+        status = 'RESOURCE_EXHAUSTED' if code == 429 else 'UNAVAILABLE'
+        body = {'error': {'code': code, 'message': 'Injected by the fake Gemini backend', 'status': status}}
+        return errors.ClientError(code, body) if code < 500 else errors.ServerError(code, body)
+
+    async def _sleep(self, output_tokens: int) -> None:
+        """Wait for the emulated time to first token plus generation time."""
+        config = self.config
+        first_token = config.latency_ms / 1000 * self.random.lognormvariate(0, config.jitter) if config.jitter else config.latency_ms / 1000
+        if config.straggler_rate and self.random.random() < config.straggler_rate:
+            first_token *= config.straggler_factor
+        await asyncio.sleep(first_token + output_tokens / config.token_rate)
+
+    def stats(self) -> dict:
+        """
+        Summarize what the fake backend served.
+
+        Returns:
+            dict: Calls per agent, injected errors and token totals
+        """
+        return {
+            'config': asdict(self.config),
+            'model_calls': sum(self.calls.values()),
+            'calls_by_agent': dict(self.calls),
+            'injected_errors': self.errors,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+        }
+
+
+def install(config: Optional[FakeModelConfig] = None) -> FakeGemini:
+    """
+    Route every model call of the agent tree to a new fake backend.
+
+    Args:
+        config (FakeModelConfig, optional): Behaviour of the fake
+
+    Returns:
+        FakeGemini: The installed backend (for its stats)
+    """
+    fake = FakeGemini(config)
+    model.set_transport(fake)
+    return fake
+
+
+def uninstall() -> None:
+    """Restore the real Gemini transport."""
+    model.set_transport(None)
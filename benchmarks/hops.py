@@ -0,0 +1,484 @@
+"""
+AI Tutor - Hop and Token Benchmark
+==================================
+
+Counts what each kind of tutoring question costs: agent transfers, model
+calls, tool calls, input and output tokens and simulated latency, per query
+of a labeled corpus, compared with a stored baseline. A prompt or routing
+change that makes questions take more hops fails the run.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+How it works:
+The real agent tree from multiagent/agent.py runs on an ADK Runner, with
+every model call served by RecordingGemini, a scripted stand-in installed as
+the transport of the model-call pipeline. For each question the stand-in
+follows the query's labeled plan (which specialists, in which order, with
+which tool calls), so the tools, middleware, prompts and session handling
+are the real ones and only the decisions of the model are fixed. Tokens are
+estimated from the requests the pipeline actually sends (system instruction,
+tool declarations and replayed contents).
+
+Corpus:
+benchmarks/corpus/queries-<version>.json. Queries are never edited in place:
+changing the corpus means a new version, and a baseline only compares with
+runs of its own version.
+
+Usage:
+    python -m benchmarks.hops                               # compare with the stored baseline
+    python -m benchmarks.hops --update-baseline             # accept the current numbers
+    python -m benchmarks.hops --category cross-domain --verbose
+    python -m benchmarks.hops --token-tolerance 0.05        # also fail on >5% more tokens
+
+Exit status: 0 ok, 1 hop regression (or tokens beyond the tolerance), 2 no
+usable baseline or corpus mismatch.
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+# Google AI and ADK imports
+from google.adk.models import LlmResponse
+from google.adk.runners import Runner
+from google.genai import types
+
+# AI Tutor imports
+from multiagent.agent import root_agent
+from multiagent.prompts import active_variant, count_tokens
+from multiagent.runtime import hooks, model, session_store
+from multiagent.runtime.context import content_tokens, split_turns
+
+# Shared benchmark helpers
+from .load import RESULTS_DIR, git_revision
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(BENCHMARK_DIR, 'corpus', 'queries-v1.json')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baselines', 'hops-v1.json')
+
+ROOT_AGENT = 'multiagent'
+NEWS_TOOL = 'news_analyst'
+TRANSFER = 'transfer_to_agent'
+
+# Counts that must not grow against the baseline
+HOP_METRICS = ('transfers', 'model_calls', 'tool_calls')
+
+# Counts reported (and optionally bounded) against the baseline
+TOKEN_METRICS = ('input_tokens', 'output_tokens')
+
+# Approximate size of a function-call response
+FUNCTION_CALL_TOKENS = 20
+
+
+@dataclass
+class LatencyModel:
+    """
+    Simulated model latency.
+
+    Attributes:
+        first_token_ms (float): Fixed time to first token
+        prefill_tokens_per_s (float): Input tokens processed per second
+        token_rate (float): Output tokens generated per second
+        answer_tokens (int): Length of text answers
+        time_scale (float): Share of the simulated time actually slept
+    """
+    first_token_ms: float = 350.0
+    prefill_tokens_per_s: float = 20000.0
+    token_rate: float = 150.0
+    answer_tokens: int = 120
+    time_scale: float = 0.1
+
+    def call_ms(self, input_tokens: int, output_tokens: int) -> float:
+        """Simulated duration of one model call in milliseconds."""
+        return (
+            self.first_token_ms
+            + input_tokens / self.prefill_tokens_per_s * 1000
+            + output_tokens / self.token_rate * 1000
+        )
+
+
+@dataclass
+class CallRecord:
+    """One model call served by the recording stand-in."""
+    agent: str
+    input_tokens: int
+    output_tokens: int
+    simulated_ms: float
+    speculative: bool = False
+
+
+@dataclass
+class QueryRecord:
+    """What one corpus query cost."""
+    id: str
+    category: str
+    transfers: int = 0
+    model_calls: int = 0
+    tool_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    model_ms: float = 0.0
+    latency_ms: float = 0.0
+    agents: list = field(default_factory=list)
+    answered: bool = False
+
+
+# Recording Model Stand-In
+# ========================
+
+class RecordingGemini:
+    """
+    Model-call transport that follows each query's plan and records the calls.
+    """
+
+    def __init__(self, queries: list[dict], latency: Optional[LatencyModel] = None):
+        """
+        Args:
+            queries (list[dict]): Corpus queries (text and plan)
+            latency (LatencyModel, optional): Simulated latency; defaults to LatencyModel()
+        """
+        self.plans = {query['text']: query['plan'] for query in queries}
+        self.latency = latency or LatencyModel()
+        self.calls: list[CallRecord] = []
+
+    async def __call__(self, call):
+        callback_context = hooks.current_context()
+        agent = callback_context.agent_name if callback_context else ROOT_AGENT
+        turns = split_turns(call.request.contents)
+        turn = turns[-1] if turns else []
+        part, output_tokens = self._respond(agent, call.request, turn)
+
+        config = call.request.config
+        input_tokens = sum(content_tokens(content) for content in call.request.contents)
+        if config is not None:
+            if isinstance(config.system_instruction, str):
+                input_tokens += count_tokens(config.system_instruction)
+            for tool in config.tools or []:
+                input_tokens += count_tokens(tool.model_dump_json(exclude_none=True))
+        simulated_ms = self.latency.call_ms(input_tokens, output_tokens)
+        self.calls.append(CallRecord(
+            agent=agent, input_tokens=input_tokens, output_tokens=output_tokens,
+            simulated_ms=simulated_ms, speculative=bool(call.metadata.get('speculative')),
+        ))
+        await asyncio.sleep(simulated_ms / 1000 * self.latency.time_scale)
+
+        call.usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=input_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=input_tokens + output_tokens,
+        )
+        return LlmResponse(content=types.Content(role='model', parts=[part]))
+
+    def _respond(self, agent: str, request, turn: list):
+        """Next step of the plan for an agent given the current turn."""
+        question = ' '.join(part.text or '' for part in turn[0].parts or []) if turn else ''
+        answered = [
+            part.function_response.name
+            for content in turn for part in content.parts or [] if part.function_response
+        ]
+
+        def function_call(name, args):
+            return types.Part(function_call=types.FunctionCall(name=name, args=args)), FUNCTION_CALL_TOKENS
+
+        plan = self.plans.get(question, [])
+        if agent == ROOT_AGENT:
+            if not plan or NEWS_TOOL in answered:
+                return self._answer(agent)
+            first = plan[0]['agent']
+            if first == NEWS_TOOL:
+                return function_call(NEWS_TOOL, {'request': question})
+            return function_call(TRANSFER, {'agent_name': first})
+
+        step = next((index for index, entry in enumerate(plan) if entry['agent'] == agent), None)
+        if step is None:
+            return self._answer(agent)
+        remaining = list(answered)
+        for tool in plan[step]['tools']:
+            if tool['name'] in remaining:
+                remaining.remove(tool['name'])
+            elif tool['name'] in (request.tools_dict or {}):
+                return function_call(tool['name'], tool['args'])
+        if step + 1 < len(plan):
+            return function_call(TRANSFER, {'agent_name': plan[step + 1]['agent']})
+        return self._answer(agent)
+
+    def _answer(self, agent: str):
+        """A text answer of the configured length."""
+        words = ['This', 'is', 'a', 'recorded', 'answer', 'from', agent + '.']
+        tokens = self.latency.answer_tokens
+        return types.Part(text=' '.join(words[index % len(words)] for index in range(tokens))), tokens
+
+
+# Corpus Runner
+# =============
+
+async def run_query(runner, session_service, stand_in: RecordingGemini, query: dict) -> QueryRecord:
+    """
+    Ask one corpus question in a new session and record what it cost.
+
+    Args:
+        runner (Runner): ADK runner of the real agent tree
+        session_service: Session service of the runner
+        stand_in (RecordingGemini): The installed model stand-in
+        query (dict): Corpus query
+
+    Returns:
+        QueryRecord: Counts, tokens and latency of the query
+    """
+    record = QueryRecord(id=query['id'], category=query['category'])
+    session = session_service.create_session(app_name='aitutor-bench', user_id='bench')
+    first_call = len(stand_in.calls)
+    started = time.monotonic()
+
+    events = runner.run_async(
+        user_id='bench', session_id=session.id,
+        new_message=types.Content(role='user', parts=[types.Part(text=query['text'])]),
+    )
+    async with contextlib.aclosing(events):
+        async for event in events:
+            if event.author not in record.agents and event.author != 'user':
+                record.agents.append(event.author)
+            for function_call in event.get_function_calls():
+                if function_call.name == TRANSFER:
+                    record.transfers += 1
+                else:
+                    record.tool_calls += 1
+            if event.is_final_response() and event.content and any(part.text for part in event.content.parts or []):
+                record.answered = True
+
+    record.latency_ms = round((time.monotonic() - started) * 1000 / stand_in.latency.time_scale, 1)
+    calls = stand_in.calls[first_call:]
+    record.model_calls = len(calls)
+    record.input_tokens = sum(call.input_tokens for call in calls)
+    record.output_tokens = sum(call.output_tokens for call in calls)
+    record.model_ms = round(sum(call.simulated_ms for call in calls), 1)
+    return record
+
+
+async def run_corpus(queries: list[dict], latency: LatencyModel) -> list[QueryRecord]:
+    """
+    Run every query through the real agent tree with the recording stand-in.
+
+    Args:
+        queries (list[dict]): Corpus queries
+        latency (LatencyModel): Simulated latency of the stand-in
+
+    Returns:
+        list[QueryRecord]: One record per query, in corpus order
+    """
+    stand_in = RecordingGemini(queries, latency)
+    model.set_transport(stand_in)
+    try:
+        session_service = session_store.create_session_service()
+        runner = Runner(agent=root_agent, app_name='aitutor-bench', session_service=session_service)
+        return [await run_query(runner, session_service, stand_in, query) for query in queries]
+    finally:
+        model.set_transport(None)
+
+
+def summarize(records: list[QueryRecord]) -> dict:
+    """
+    Totals per category and overall.
+
+    Args:
+        records (list[QueryRecord]): Query records
+
+    Returns:
+        dict: category -> summed counts ('all' for the whole corpus)
+    """
+    totals: dict[str, dict] = defaultdict(lambda: defaultdict(float))
+    for record in records:
+        for group in (record.category, 'all'):
+            totals[group]['queries'] += 1
+            for name in HOP_METRICS + TOKEN_METRICS + ('model_ms', 'latency_ms'):
+                totals[group][name] += getattr(record, name)
+    return {
+        group: {name: round(value, 1) if isinstance(value, float) and not value.is_integer() else int(value)
+                for name, value in values.items()}
+        for group, values in totals.items()
+    }
+
+
+# Comparison
+# ==========
+
+def compare(baseline: dict, current: dict, token_tolerance: Optional[float] = None) -> dict:
+    """
+    Compare a run with the baseline, query by query.
+
+    Any increase in transfers, model calls or tool calls is a regression;
+    token growth is one only beyond `token_tolerance` (a fraction).
+
+    Args:
+        baseline (dict): Stored baseline document
+        current (dict): This run's document
+        token_tolerance (float, optional): Allowed relative token growth
+
+    Returns:
+        dict: 'rows' (per query and metric that changed), 'regressions',
+            'new' and 'missing' query ids
+    """
+    before = {record['id']: record for record in baseline['queries']}
+    after = {record['id']: record for record in current['queries']}
+    rows, regressions = [], []
+    for query_id, record in after.items():
+        old = before.get(query_id)
+        if old is None:
+            continue
+        for name in HOP_METRICS + TOKEN_METRICS:
+            if record[name] == old[name]:
+                continue
+            change = (record[name] - old[name]) / old[name] if old[name] else 1.0
+            if name in HOP_METRICS:
+                regressed = record[name] > old[name]
+            else:
+                regressed = token_tolerance is not None and change > token_tolerance
+            row = {'query': query_id, 'metric': name, 'baseline': old[name], 'current': record[name],
+                   'change': round(change, 4), 'regression': regressed}
+            rows.append(row)
+            if regressed:
+                regressions.append(row)
+    return {
+        'rows': rows,
+        'regressions': regressions,
+        'new': sorted(set(after) - set(before)),
+        'missing': sorted(set(before) - set(after)),
+    }
+
+
+def _print_results(document: dict, comparison: Optional[dict]) -> None:
+    """Print per-category totals and the baseline comparison."""
+    print(f"\n📊 {len(document['queries'])} queries from corpus {document['meta']['corpus_version']}")
+    print(f"   {'category':<14} {'queries':>7} {'transfers':>9} {'model':>6} {'tools':>6} "
+          f"{'tokens in':>10} {'out':>6} {'model ms':>9} {'latency ms':>11}")
+    for group, totals in sorted(document['summary'].items(), key=lambda item: (item[0] == 'all', item[0])):
+        print(f"   {group:<14} {totals['queries']:>7} {totals['transfers']:>9} {totals['model_calls']:>6} "
+              f"{totals['tool_calls']:>6} {totals['input_tokens']:>10} {totals['output_tokens']:>6} "
+              f"{totals['model_ms']:>9} {totals['latency_ms']:>11}")
+    unanswered = [record['id'] for record in document['queries'] if not record['answered']]
+    if unanswered:
+        print(f"   ⚠️  no final answer: {', '.join(unanswered)}")
+
+    if comparison is None:
+        return
+    print('\n📈 Compared with baseline:')
+    if not comparison['rows']:
+        print('   ✓ no changes in hops or tokens')
+    for row in comparison['rows']:
+        marker = '✗' if row['regression'] else ('✓' if row['current'] < row['baseline'] else ' ')
+        print(f"   {marker} {row['query']:<28} {row['metric']:<14} {row['baseline']:>7} → {row['current']:>7}  "
+              f"({row['change']:+.1%})")
+    for label in ('new', 'missing'):
+        if comparison[label]:
+            print(f"   {label} queries: {', '.join(comparison[label])}")
+
+
+# Command Line Interface
+# ======================
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Command-line entry point for the hop and token benchmark.
+
+    Returns:
+        int: 0 on success, 1 on regressions, 2 without a usable baseline
+    """
+    parser = argparse.ArgumentParser(description='Hop and token benchmark of the AI Tutor agent tree.')
+    parser.add_argument('--corpus', default=CORPUS_PATH, help='Labeled query corpus')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help='Write this run as the new baseline')
+    parser.add_argument('--category', action='append', help='Only run queries of this category (repeatable)')
+    parser.add_argument('--token-tolerance', type=float, help='Fail when a query needs this much more tokens (0.05 = 5%%)')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/hops-<time>-<commit>.json)')
+    parser.add_argument('--verbose', action='store_true', help='Show the application log during the run')
+    for name, default in asdict(LatencyModel()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args(argv)
+
+    with open(args.corpus, encoding='utf-8') as file:
+        corpus = json.load(file)
+    queries = [query for query in corpus['queries'] if not args.category or query['category'] in args.category]
+    latency = LatencyModel(**{name: getattr(args, name) for name in asdict(LatencyModel())})
+
+    # The agent tree only needs credentials to exist; the stand-in never uses them
+    os.environ.setdefault('GOOGLE_AI_API_KEY', 'offline-benchmark')
+    sys.path.insert(0, os.getcwd())
+
+    print(f"🚀 Running {len(queries)} queries of corpus {corpus['version']} through the agent tree")
+    with contextlib.ExitStack() as stack:
+        # The app logs every model call; keep the benchmark output readable
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+            stack.enter_context(contextlib.redirect_stderr(io.StringIO()))
+        records = asyncio.run(run_corpus(queries, latency))
+
+    document = {
+        'meta': {
+            'corpus_version': corpus['version'],
+            'commit': git_revision(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'prompt_variant': active_variant(),
+            'speculation': os.getenv('AITUTOR_SPECULATION', 'off'),
+        },
+        'latency_model': asdict(latency),
+        'summary': summarize(records),
+        'queries': [asdict(record) for record in records],
+    }
+
+    status, comparison = 0, None
+    if args.update_baseline:
+        if args.category:
+            print('❌ Refusing to write a baseline from a partial corpus (--category)')
+            return 2
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(document, file, indent=2)
+        print(f"💾 Baseline written to {args.baseline}")
+    elif not os.path.exists(args.baseline):
+        print(f"⚠️  No baseline at {args.baseline}; create one with --update-baseline")
+        status = 2
+    else:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline['meta']['corpus_version'] != corpus['version']:
+            print(f"❌ Baseline is for corpus {baseline['meta']['corpus_version']}, not {corpus['version']}")
+            return 2
+        for setting in ('prompt_variant', 'speculation'):
+            if baseline['meta'].get(setting) != document['meta'][setting]:
+                print(f"⚠️  Baseline was recorded with {setting}={baseline['meta'].get(setting)}, "
+                      f"this run uses {document['meta'][setting]}")
+        comparison = compare(baseline, document, args.token_tolerance)
+        document['baseline'] = {'file': args.baseline, 'comparison': comparison}
+        if comparison['regressions']:
+            status = 1
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"hops-{stamp}-{document['meta']['commit'] or 'local'}.json")
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(document, file, indent=2)
+
+    _print_results(document, comparison)
+    print(f"\n💾 Results saved to {output}")
+    if status == 1:
+        print(f"❌ {len(comparison['regressions'])} regression(s) against the baseline")
+    return status
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,438 @@
+"""
+AI Tutor - Offline Load Benchmark
+=================================
+
+Drives the FastAPI app in-process with open-loop load against the fake
+Gemini backend and reports throughput, latency percentiles, event-loop lag
+and memory growth. Results are written as JSON so runs can be compared
+across commits.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Open-loop load:
+Requests are sent on a fixed schedule (constant or Poisson arrivals at the
+target RPS) whether or not earlier requests have finished, and latency is
+measured from each request's scheduled start. A slow server therefore shows
+up as queueing delay instead of silently lowering the offered load.
+
+Usage:
+    python -m benchmarks.load --rps 20 --duration 30
+    python -m benchmarks.load --rps 50 --latency-ms 800 --error-rate 0.02
+    python -m benchmarks.load --baseline benchmarks/results/<earlier run>.json
+
+Run from the project root (the app serves ./static relative to it).
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+from dataclasses import asdict, dataclass, field, fields
+from typing import Optional
+
+# Third-party imports
+import httpx
+
+# Fake model backend
+from .fake_gemini import FakeModelConfig
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Questions sent by the load generator (routing is decided by the fake backend)
+QUESTIONS = [
+    'What is 11 times 3.6?',
+    'What is the speed of light in km/s?',
+    'What are the properties of carbon?',
+    'If a spacecraft travels at 11 km/s, what percentage of light speed is that?',
+    'What are the latest developments in AI?',
+    'Solve: 2x + 5 = 15',
+]
+
+
+@dataclass
+class LoadConfig:
+    """
+    Shape of the offered load.
+
+    Attributes:
+        rps (float): Target request rate
+        duration (float): Seconds of measured load
+        warmup (float): Seconds of load before measurement starts
+        arrival (str): 'constant' or 'poisson' inter-arrival times
+        conversation_turns (int): Questions per session (1 = new session per request)
+        timeout (float): Per-request client timeout in seconds
+        seed (int, optional): Random seed for arrivals and questions
+    """
+    rps: float = 10.0
+    duration: float = 30.0
+    warmup: float = 5.0
+    arrival: str = 'constant'
+    conversation_turns: int = 1
+    timeout: float = 60.0
+    seed: Optional[int] = None
+
+
+@dataclass
+class _Sample:
+    """Outcome of one request."""
+    scheduled: float
+    latency: float = 0.0
+    service_time: float = 0.0
+    status: int = 0
+    ok: bool = False
+    error: str = ''
+    measured: bool = True
+
+
+@dataclass
+class _Monitor:
+    """Event-loop lag and memory samples collected during a run."""
+    interval: float = 0.01
+    lags: list = field(default_factory=list)
+    rss: list = field(default_factory=list)
+
+
+# Measurement Helpers
+# ===================
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile.
+
+    Args:
+        values (list[float]): Observations
+        q (float): Percentile in [0, 100]
+
+    Returns:
+        float: The percentile (0.0 for no observations)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def distribution(values: list[float], scale: float = 1000.0) -> dict:
+    """Summarize observations (in seconds) as milliseconds."""
+    return {
+        'p50': round(percentile(values, 50) * scale, 2),
+        'p95': round(percentile(values, 95) * scale, 2),
+        'p99': round(percentile(values, 99) * scale, 2),
+        'max': round(max(values, default=0.0) * scale, 2),
+        'mean': round(sum(values) / len(values) * scale, 2) if values else 0.0,
+    }
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MiB."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        # No procfs (macOS): fall back to the peak RSS (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def git_revision() -> Optional[str]:
+    """Short commit hash of the working tree, if available."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _monitor_loop(monitor: _Monitor, stop: asyncio.Event) -> None:
+    """Sample event-loop lag every interval and RSS every 0.5 s."""
+    loop = asyncio.get_running_loop()
+    last_rss = 0.0
+    while not stop.is_set():
+        expected = loop.time() + monitor.interval
+        await asyncio.sleep(monitor.interval)
+        now = loop.time()
+        monitor.lags.append(max(0.0, now - expected))
+        if now - last_rss >= 0.5:
+            monitor.rss.append(rss_mb())
+            last_rss = now
+
+
+# Load Generator
+# ==============
+
+async def run_load(app, load: LoadConfig) -> dict:
+    """
+    Offer open-loop load to an ASGI app and measure it.
+
+    Args:
+        app: The ASGI application (main.app)
+        load (LoadConfig): Shape of the load
+
+    Returns:
+        dict: Request, latency, loop-lag and memory results
+    """
+    rng = random.Random(load.seed)
+    loop = asyncio.get_running_loop()
+    samples: list[_Sample] = []
+    sessions: list[dict] = []
+    tasks = []
+
+    async def one_request(client: httpx.AsyncClient, sample: _Sample) -> None:
+        # Continue an idle conversation that still has turns left, else start one
+        session = next((s for s in sessions if not s['busy'] and s['turns'] < load.conversation_turns), None)
+        if session is None:
+            session = {'id': None, 'turns': 0, 'busy': False}
+            sessions.append(session)
+        session['busy'] = True
+        started = loop.time()
+        try:
+            response = await client.post('/api/query', json={
+                'text': rng.choice(QUESTIONS), 'session_id': session['id'],
+            })
+            sample.status = response.status_code
+            body = response.json()
+            sample.ok = response.status_code == 200 and 'session_id' in body
+            if not sample.ok:
+                sample.error = body.get('response', '')[:80]
+            session['id'] = body.get('session_id', session['id'])
+        except Exception as e:
+            sample.error = type(e).__name__
+        finally:
+            finished = loop.time()
+            sample.latency = finished - sample.scheduled
+            sample.service_time = finished - started
+            session['turns'] += 1
+            session['busy'] = False
+
+    monitor, stop = _Monitor(), asyncio.Event()
+    monitor_task = asyncio.create_task(_monitor_loop(monitor, stop))
+    rss_start = rss_mb()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://aitutor.bench', timeout=load.timeout) as client:
+        start = loop.time()
+        total = load.warmup + load.duration
+        offset = 0.0
+        while offset < total:
+            scheduled = start + offset
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sample = _Sample(scheduled=scheduled, measured=offset >= load.warmup)
+            samples.append(sample)
+            tasks.append(asyncio.create_task(one_request(client, sample)))
+            offset += rng.expovariate(load.rps) if load.arrival == 'poisson' else 1.0 / load.rps
+        offered_until = loop.time()
+        await asyncio.gather(*tasks)
+        finished = loop.time()
+
+    stop.set()
+    await monitor_task
+    rss_end = rss_mb()
+
+    measured = [sample for sample in samples if sample.measured]
+    ok = [sample for sample in measured if sample.ok]
+    # Throughput: successful completions inside the measurement window
+    window_start, window_end = start + load.warmup, start + load.warmup + load.duration
+    completed_in_window = sum(
+        1 for sample in samples if sample.ok and window_start <= sample.scheduled + sample.latency < window_end
+    )
+    errors: dict[str, int] = {}
+    for sample in measured:
+        if not sample.ok:
+            key = sample.error or f'HTTP {sample.status}'
+            errors[key] = errors.get(key, 0) + 1
+
+    return {
+        'requests': {
+            'offered': len(measured),
+            'ok': len(ok),
+            'failed': len(measured) - len(ok),
+            'errors': errors,
+            'warmup_requests': len(samples) - len(measured),
+        },
+        'offered_rps': round(len(measured) / load.duration, 2),
+        'throughput_rps': round(completed_in_window / load.duration, 2),
+        'latency_ms': distribution([sample.latency for sample in ok]),
+        'service_time_ms': distribution([sample.service_time for sample in ok]),
+        'event_loop_lag_ms': distribution(monitor.lags),
+        'memory_mb': {
+            'rss_start': round(rss_start, 1),
+            'rss_end': round(rss_end, 1),
+            'rss_peak': round(max(monitor.rss, default=rss_end), 1),
+            'growth': round(rss_end - rss_start, 1),
+        },
+        'drain_seconds': round(finished - offered_until, 2),
+    }
+
+
+# Comparison
+# ==========
+
+# Result fields compared against a baseline: (path, higher is better)
+COMPARED = [
+    (('throughput_rps',), True),
+    (('latency_ms', 'p50'), False),
+    (('latency_ms', 'p95'), False),
+    (('latency_ms', 'p99'), False),
+    (('event_loop_lag_ms', 'p99'), False),
+    (('memory_mb', 'growth'), False),
+    (('requests', 'failed'), False),
+]
+
+
+def compare(baseline: dict, current: dict) -> list[dict]:
+    """
+    Compare the headline numbers of two result documents.
+
+    Args:
+        baseline (dict): Earlier result JSON
+        current (dict): This run's result JSON
+
+    Returns:
+        list[dict]: One row per metric with both values and the relative change
+    """
+    rows = []
+    for path, higher_is_better in COMPARED:
+        before, after = baseline['results'], current['results']
+        for key in path:
+            before, after = before.get(key, 0), after.get(key, 0)
+        change = (after - before) / before if before else 0.0
+        improved = change > 0 if higher_is_better else change < 0
+        rows.append({
+            'metric': '.'.join(path), 'baseline': before, 'current': after,
+            'change': round(change, 4), 'better': improved if change else None,
+        })
+    return rows
+
+
+def _print_results(document: dict, comparison: Optional[list[dict]]) -> None:
+    """Print a human-readable summary of a run."""
+    results = document['results']
+    requests = results['requests']
+    print(f"\n📊 {requests['ok']}/{requests['offered']} ok at {results['offered_rps']} rps offered "
+          f"→ {results['throughput_rps']} rps served")
+    for name in ('latency_ms', 'service_time_ms', 'event_loop_lag_ms'):
+        values = results[name]
+        print(f"   {name:<18} p50 {values['p50']:>9} | p95 {values['p95']:>9} | p99 {values['p99']:>9} | max {values['max']:>9}")
+    memory = results['memory_mb']
+    print(f"   memory (MiB)       start {memory['rss_start']} | end {memory['rss_end']} | "
+          f"peak {memory['rss_peak']} | growth {memory['growth']}")
+    if requests['errors']:
+        print(f"   errors             {requests['errors']}")
+    backend = document['fake_backend']
+    print(f"   model calls        {backend['model_calls']} ({backend['calls_by_agent']}), "
+          f"tokens in/out {backend['input_tokens']}/{backend['output_tokens']}")
+
+    if comparison:
+        print('\n📈 Compared with baseline:')
+        for row in comparison:
+            marker = {True: '✓', False: '✗', None: ' '}[row['better']]
+            print(f"   {marker} {row['metric']:<22} {row['baseline']:>10} → {row['current']:>10}  ({row['change']:+.1%})")
+
+
+# Command Line Interface
+# ======================
+
+def _build_parser() -> argparse.ArgumentParser:
+    """Command-line options: one flag per LoadConfig and FakeModelConfig field."""
+    parser = argparse.ArgumentParser(description='Offline load benchmark for the AI Tutor API.')
+    seen = set()
+    for group_name, config_cls in (('load', LoadConfig), ('fake model', FakeModelConfig)):
+        group = parser.add_argument_group(group_name)
+        for config_field in fields(config_cls):
+            # Fields present in both configs (seed) share one option
+            if config_field.name in seen:
+                continue
+            seen.add(config_field.name)
+            default = config_field.default
+            kind = type(default) if default is not None else int
+            group.add_argument(f"--{config_field.name.replace('_', '-')}", type=kind, default=default)
+    parser.add_argument('--label', default='', help='Free-form label stored with the results')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/<time>-<commit>.json)')
+    parser.add_argument('--baseline', help='Earlier result file to compare against')
+    parser.add_argument('--verbose', action='store_true', help='Show the application log during the run')
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Command-line entry point for the load benchmark.
+
+    Returns:
+        int: 0 on success, 1 if no request succeeded
+    """
+    args = _build_parser().parse_args(argv)
+    load = LoadConfig(**{f.name: getattr(args, f.name) for f in fields(LoadConfig)})
+    fake_config = FakeModelConfig(**{f.name: getattr(args, f.name) for f in fields(FakeModelConfig)})
+
+    # The app only builds its runner when credentials are configured; the
+    # fake backend never uses them
+    os.environ.setdefault('GOOGLE_AI_API_KEY', 'offline-benchmark')
+    sys.path.insert(0, os.getcwd())
+
+    def quiet():
+        # The app logs every request; keep the benchmark output readable
+        if args.verbose:
+            return contextlib.nullcontext()
+        stack = contextlib.ExitStack()
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        stack.enter_context(contextlib.redirect_stderr(io.StringIO()))
+        return stack
+
+    with quiet():
+        import main as app_module
+        from . import fake_gemini
+        fake = fake_gemini.install(fake_config)
+
+    print(f"🚀 Offering {load.rps} rps for {load.duration}s (+{load.warmup}s warmup), "
+          f"fake model {fake_config.latency_ms} ms ± {fake_config.jitter}")
+    with quiet():
+        results = asyncio.run(run_load(app_module.app, load))
+
+    document = {
+        'meta': {
+            'label': args.label,
+            'commit': git_revision(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'load': asdict(load),
+        'fake_backend': fake.stats(),
+        'results': results,
+    }
+
+    comparison = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            comparison = compare(json.load(file), document)
+        document['baseline'] = {'file': args.baseline, 'comparison': comparison}
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{document['meta']['commit'] or 'local'}.json")
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(document, file, indent=2)
+
+    _print_results(document, comparison)
+    print(f"\n💾 Results saved to {output}")
+    return 0 if results['requests']['ok'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,288 @@
+"""
+AI Tutor - Startup Profiler
+===========================
+
+Measures what a cold start costs: how long each module takes to import and
+how long a freshly started server takes to answer its first requests. Both
+are measured in child processes, so every run is a real cold start.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Reports:
+- Import time of the application module (`python -X importtime`), per module
+  and per top-level package, sorted by cost
+- Time to first byte of '/health', a static file, '/' and the first and
+  second '/api/query' after process start (model calls served by the fake
+  Gemini backend with no latency, so only startup work is measured)
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --top 40 --json startup.json
+    python -m benchmarks.startup --warmup eager
+    python -m benchmarks.startup --imports-only
+
+Run from the project root (the app serves ./static relative to it).
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Optional
+
+# Third-party imports
+import httpx
+
+# Child process that serves the app on a port with the fake backend
+# installed as soon as the agent services are built (installing it earlier
+# would import the agent stack at startup and defeat the measurement)
+_SERVER_SCRIPT = '''
+import sys
+import uvicorn
+import main
+
+initialize_services = main.initialize_services
+
+def initialize_with_fake_backend():
+    ready = initialize_services()
+    from benchmarks.fake_gemini import FakeModelConfig, install
+    install(FakeModelConfig(latency_ms=0, jitter=0, token_rate=1e9))
+    return ready
+
+main.initialize_services = initialize_with_fake_backend
+uvicorn.run(main.app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+'''
+
+# Requests timed after process start, in order
+PROBES = [
+    ('health', 'GET', '/health', None),
+    ('static', 'GET', '/static/script.js', None),
+    ('index', 'GET', '/', None),
+    ('first_query', 'POST', '/api/query', {'text': 'What is 11 times 3.6?'}),
+    ('second_query', 'POST', '/api/query', {'text': 'And 12 times 3.6?'}),
+]
+
+
+# Import Time
+# ===========
+
+def parse_importtime(output: str) -> list[dict]:
+    """
+    Parse the report printed by `python -X importtime`.
+
+    Args:
+        output (str): The interpreter's stderr
+
+    Returns:
+        list[dict]: One entry per module with its name, nesting depth and
+            self / cumulative import time in milliseconds
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            modules.append({
+                'module': name.strip(),
+                'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+            })
+        except ValueError:
+            continue
+    return modules
+
+
+def profile_imports(module: str = 'main') -> dict:
+    """
+    Import a module in a fresh interpreter and break down the import time.
+
+    Args:
+        module (str): Module to import
+
+    Returns:
+        dict: Wall time, total import time, per-module and per-package costs
+    """
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env=_child_env(),
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    modules = parse_importtime(completed.stderr)
+    packages: dict[str, float] = defaultdict(float)
+    for entry in modules:
+        packages[_package(entry['module'])] += entry['self_ms']
+
+    return {
+        'module': module,
+        'wall_ms': round(wall_ms, 1),
+        'import_ms': round(sum(entry['self_ms'] for entry in modules), 1),
+        'module_count': len(modules),
+        'agent_stack_loaded': any(entry['module'] == 'google.adk' for entry in modules),
+        'packages': sorted(
+            ({'package': name, 'self_ms': round(ms, 1)} for name, ms in packages.items()),
+            key=lambda entry: entry['self_ms'], reverse=True,
+        ),
+        'modules': sorted(modules, key=lambda entry: entry['cumulative_ms'], reverse=True),
+    }
+
+
+def _package(module: str) -> str:
+    """Group a module under its distribution-level package ('google.adk', 'fastapi', ...)."""
+    parts = module.split('.')
+    # Namespace packages: 'google' alone says nothing about the cost
+    if parts[0] in ('google', 'opentelemetry') and len(parts) > 1:
+        return '.'.join(parts[:2])
+    return parts[0]
+
+
+# Time to First Byte
+# ==================
+
+def _free_port() -> int:
+    """An unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _child_env(warmup: Optional[str] = None) -> dict:
+    """Environment for child processes: offline credentials and the project on the path."""
+    env = dict(os.environ)
+    env.setdefault('GOOGLE_AI_API_KEY', 'offline-benchmark')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.getcwd(), env.get('PYTHONPATH')]))
+    if warmup:
+        env['AITUTOR_WARMUP'] = warmup
+    return env
+
+
+def profile_first_bytes(warmup: Optional[str] = None, timeout: float = 120.0) -> dict:
+    """
+    Start the server in a new process and time its first responses.
+
+    Args:
+        warmup (str, optional): AITUTOR_WARMUP mode for the server
+        timeout (float): Seconds to wait for the server to come up
+
+    Returns:
+        dict: Milliseconds from process start to each probe's response, and
+            the service state reported by /health before and after the queries
+    """
+    port = _free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-c', _SERVER_SCRIPT, str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=_child_env(warmup),
+    )
+    results: dict = {'warmup': warmup or os.getenv('AITUTOR_WARMUP', 'lazy')}
+    try:
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            # Poll until the server accepts connections
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError('The server exited during startup')
+                if time.perf_counter() - started > timeout:
+                    raise RuntimeError(f'The server did not start within {timeout}s')
+                try:
+                    client.get('/health')
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.01)
+            results['listening_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            results['services_at_start'] = client.get('/health').json().get('services')
+
+            session_id = None
+            for name, method, path, body in PROBES:
+                if body is not None and session_id:
+                    body = {**body, 'session_id': session_id}
+                request_started = time.perf_counter()
+                response = client.request(method, path, json=body)
+                finished = time.perf_counter()
+                if body is not None:
+                    session_id = response.json().get('session_id') or session_id
+                results[name] = {
+                    'status': response.status_code,
+                    'since_start_ms': round((finished - started) * 1000, 1),
+                    'request_ms': round((finished - request_started) * 1000, 1),
+                }
+            results['services_after'] = client.get('/health').json().get('services')
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return results
+
+
+# Reporting
+# =========
+
+def _print_report(imports: dict, first_bytes: Optional[dict], top: int) -> None:
+    """Print the profile as tables."""
+    print(f"\n📦 import {imports['module']}: {imports['import_ms']} ms in {imports['module_count']} modules "
+          f"(interpreter wall time {imports['wall_ms']} ms)")
+    print(f"   agent stack (google.adk) loaded at import: {'yes' if imports['agent_stack_loaded'] else 'no'}")
+
+    print(f"\n   {'package':<32} {'self ms':>9}")
+    for entry in imports['packages'][:top]:
+        print(f"   {entry['package']:<32} {entry['self_ms']:>9.1f}")
+
+    print(f"\n   {'module':<48} {'cumulative ms':>13} {'self ms':>9}")
+    for entry in imports['modules'][:top]:
+        name = '  ' * min(entry['depth'], 6) + entry['module']
+        print(f"   {name[:48]:<48} {entry['cumulative_ms']:>13.1f} {entry['self_ms']:>9.1f}")
+
+    if first_bytes:
+        print(f"\n⏱️  Time to first byte after process start (AITUTOR_WARMUP={first_bytes['warmup']})")
+        print(f"   {'listening':<14} {first_bytes['listening_ms']:>9.1f} ms   (services: {first_bytes['services_at_start']})")
+        for name, *_ in PROBES:
+            probe = first_bytes[name]
+            print(f"   {name:<14} {probe['since_start_ms']:>9.1f} ms   "
+                  f"(request {probe['request_ms']} ms, HTTP {probe['status']})")
+        print(f"   services after queries: {first_bytes['services_after']}")
+
+
+# Command Line Interface
+# ======================
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Command-line entry point for the startup profiler.
+
+    Returns:
+        int: 0 on success, 1 if a probe failed
+    """
+    parser = argparse.ArgumentParser(description='Cold-start profiler for the AI Tutor API.')
+    parser.add_argument('--module', default='main', help='Module whose import is profiled')
+    parser.add_argument('--top', type=int, default=25, help='Rows shown per table')
+    parser.add_argument('--warmup', choices=['lazy', 'background', 'eager'], help='AITUTOR_WARMUP for the server')
+    parser.add_argument('--imports-only', action='store_true', help='Skip the time-to-first-byte probes')
+    parser.add_argument('--json', help='Also write the full profile to this file')
+    args = parser.parse_args(argv)
+
+    imports = profile_imports(args.module)
+    first_bytes = None if args.imports_only else profile_first_bytes(args.warmup)
+    _print_report(imports, first_bytes, args.top)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'imports': imports, 'first_bytes': first_bytes}, file, indent=2)
+        print(f"\n💾 Profile saved to {args.json}")
+
+    if first_bytes and any(first_bytes[name]['status'] != 200 for name, *_ in PROBES):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -17,22 +17,22 @@ Dependencies:
 """
 
 # Standard library imports
+import asyncio
+import contextlib
 import sys
 import os
+import threading
 import traceback
+from contextlib import asynccontextmanager
+from typing import Optional
 
 # Third-party imports
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
+from starlette.routing import Mount
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
-# Google AI and ADK imports
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
-
 # Load environment variables from .env file
 # This must be done before importing any modules that depend on environment variables
 load_dotenv()
@@ -41,8 +41,21 @@ load_dotenv()
 # This ensures that the multiagent module can be imported regardless of how the app is run
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import the root agent after setting up the path
-from multiagent.agent import root_agent
+# Lightweight runtime imports only: Google ADK, google-genai and the agent
+# tree are imported on first use by initialize_services(), so a cold start
+# can serve '/', '/static' and '/health' without paying for them
+from multiagent.runtime import client_state, connections, credentials, deadline, degradation, executor, log, metrics, resilience, response_cache, tracing
+from server import prefork, profiling
+from server.cache_warming import CacheWarmer
+from server.static_assets import StaticAssets
+
+# Request-path logging: JSON lines written by a background thread
+# (startup messages below stay on the console as before)
+log.configure()
+logger = log.get_logger("query")
+
+# Record ADK's agent, model and tool spans and derive /metrics from them
+tracing.configure()
 
 
 def setup_authentication() -> bool:
@@ -60,11 +73,20 @@ def setup_authentication() -> bool:
         GOOGLE_AI_API_KEY: API key from Google AI Studio
         GOOGLE_CLOUD_PROJECT: Google Cloud project ID for Vertex AI
         GOOGLE_CLOUD_LOCATION: Google Cloud region (defaults to 'us-central1')
+        AITUTOR_GEMINI_API_KEYS: Additional comma-separated API keys for the credential pool
+        AITUTOR_VERTEX_PROJECTS: Additional comma-separated Vertex AI projects for the pool
     """
     # Option 1: Google AI Studio API key (recommended for development)
-    api_key = os.getenv('GOOGLE_AI_API_KEY')
+    # Extra keys and projects (AITUTOR_GEMINI_API_KEYS, AITUTOR_VERTEX_PROJECTS)
+    # form a credential pool; the first key is also the default credential
+    pooled_keys = [key.strip() for key in os.getenv('AITUTOR_GEMINI_API_KEYS', '').split(',') if key.strip()]
+    pooled_projects = [entry for entry in os.getenv('AITUTOR_VERTEX_PROJECTS', '').split(',') if entry.strip()]
+    api_key = os.getenv('GOOGLE_AI_API_KEY') or (pooled_keys[0] if pooled_keys else None)
     if api_key:
         print("✓ Using Google AI Studio API key for authentication")
+        extra = len(set(pooled_keys) - {api_key}) + len(pooled_projects)
+        if extra:
+            print(f"✓ Credential pool: {extra + 1} credentials (multiagent/runtime/credentials.py)")
         
         # Set the API key in multiple environment variable formats
         # This ensures compatibility with different ADK versions and configurations
@@ -82,6 +104,8 @@ def setup_authentication() -> bool:
     
     if project:
         print(f"✓ Using Vertex AI with project: {project}, location: {location}")
+        if pooled_projects:
+            print(f"✓ Credential pool: {len(set(pooled_projects) - {project}) + 1} credentials (multiagent/runtime/credentials.py)")
         # The ADK will automatically use these environment variables
         return True
     
@@ -102,57 +126,350 @@ def setup_authentication() -> bool:
     return False
 
 
-# Initialize FastAPI application
-app = FastAPI(
-    title="AI Tutor API",
-    description="Multi-Agent Learning System powered by Google Gemini AI",
-    version="1.0.0",
-    docs_url="/docs",  # Swagger UI documentation
-    redoc_url="/redoc"  # ReDoc documentation
-)
-
 # Global variables for application state
 authentication_configured = False
 session_service = None
 runner = None
 APP_NAME = "aitutor"
 
-# Setup authentication and initialize services on startup
+# Lifecycle of the agent services: cold -> starting -> ready | failed
+services_state = "cold"
+_services_lock = threading.Lock()
+
+# When to build the agent services (lazy | background | eager)
+WARMUP_MODE = os.getenv("AITUTOR_WARMUP", "lazy").lower()
+
+# Replays frequent questions from AITUTOR_WARM_FILE into the response cache
+cache_warmer = CacheWarmer()
+
+# Reading credentials from the environment is cheap, so it stays at startup
 authentication_configured = setup_authentication()
 
-if authentication_configured:
+
+def initialize_services() -> bool:
+    """
+    Import the agent stack and build the session service and runner.
+
+    This is the expensive part of startup (Google ADK, google-genai and the
+    construction of every agent), so it runs on the first query or from a
+    warm-up hook rather than at import time. Safe to call from several
+    threads; only the first call does the work.
+
+    Returns:
+        bool: True if the services are ready to process queries
+    """
+    global session_service, runner, services_state
+
+    with _services_lock:
+        if services_state in ("ready", "failed"):
+            return services_state == "ready"
+        if not authentication_configured:
+            print("⚠️  AI Tutor services not initialized due to authentication issues")
+            services_state = "failed"
+            return False
+
+        services_state = "starting"
+        try:
+            print("🚀 Initializing AI Tutor services...")
+
+            from google.adk.runners import Runner
+            from multiagent.agent import root_agent
+            from multiagent.runtime import session_store
+
+            # Initialize session service for managing user conversations
+            # Sessions live in memory, with events kept in compact form
+            # (multiagent/runtime/session_store.py, AITUTOR_SESSION_STORE)
+            session_service = session_store.create_session_service()
+
+            # Debug: Print environment variable status (masked for security)
+            print("🔐 Environment variables status:")
+            env_vars = ['GOOGLE_AI_API_KEY', 'GEMINI_API_KEY', 'GOOGLE_API_KEY']
+            for var in env_vars:
+                status = '✓ Set' if os.getenv(var) else '✗ Not set'
+                print(f"   {var}: {status}")
+
+            # Initialize the ADK runner with the root agent
+            # The runner manages the execution of the multi-agent system
+            runner = Runner(
+                agent=root_agent,
+                app_name=APP_NAME,
+                session_service=session_service
+            )
+            tracing.instrument_models()
+
+            services_state = "ready"
+            print("✅ AI Tutor services initialized successfully")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error initializing AI Tutor services: {e}")
+            traceback.print_exc()
+            session_service = None
+            runner = None
+            services_state = "failed"
+            return False
+
+
+async def ensure_services() -> bool:
+    """
+    Make sure the agent services are initialized, building them if needed.
+
+    The build runs in a worker thread so the event loop keeps serving
+    '/health' and static files while the first query waits for it.
+
+    Returns:
+        bool: True if the services are ready to process queries
+    """
+    if services_state == "ready":
+        return True
+    return await asyncio.to_thread(initialize_services)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Run the warm-up hook selected by AITUTOR_WARMUP when the server starts.
+
+    - lazy (default): build the services on the first query
+    - background: start building them now without delaying startup
+    - eager: build them before accepting requests
+
+    With a query log configured (AITUTOR_WARM_FILE) the services are built
+    in the background and the response cache is warmed from it; /health
+    reports the instance ready once that has finished.
+
+    Connections to the Gemini endpoints are opened in the background as well
+    (AITUTOR_HTTP_WARM), so the first model call skips the TCP/TLS handshakes.
+
+    Startup fails if stateless mode is requested without a signing secret.
+    """
     try:
-        print("🚀 Initializing AI Tutor services...")
-        
-        # Initialize session service for managing user conversations
-        # InMemorySessionService stores sessions in memory (suitable for development)
-        session_service = InMemorySessionService()
-        
-        # Debug: Print environment variable status (masked for security)
-        print("🔐 Environment variables status:")
-        env_vars = ['GOOGLE_AI_API_KEY', 'GEMINI_API_KEY', 'GOOGLE_API_KEY']
-        for var in env_vars:
-            status = '✓ Set' if os.getenv(var) else '✗ Not set'
-            print(f"   {var}: {status}")
-        
-        # Initialize the ADK runner with the root agent
-        # The runner manages the execution of the multi-agent system
-        runner = Runner(
-            agent=root_agent, 
-            app_name=APP_NAME, 
-            session_service=session_service
+        client_state.validate()
+    except RuntimeError as e:
+        logger.error("stateless mode misconfigured", extra={"reason": str(e)})
+        raise
+    warmup = None
+    pre_connect = asyncio.create_task(connections.warm()) if connections.CONFIG.warm else None
+    if WARMUP_MODE == "eager":
+        await ensure_services()
+    elif WARMUP_MODE == "background":
+        warmup = asyncio.create_task(ensure_services())
+    cache_warming = asyncio.create_task(warm_cache()) if not cache_warmer.ready else None
+    # Tool process workers start with the agents (lazy mode: on first use)
+    tool_workers = asyncio.create_task(warm_tool_workers()) if WARMUP_MODE != "lazy" or services_state == "ready" else None
+    yield
+    if cache_warming is not None:
+        cache_warming.cancel()
+        await asyncio.gather(cache_warming, return_exceptions=True)
+    if warmup is not None and not warmup.done():
+        await warmup
+    if tool_workers is not None:
+        tool_workers.cancel()
+        await asyncio.gather(tool_workers, return_exceptions=True)
+    if pre_connect is not None:
+        pre_connect.cancel()
+        await asyncio.gather(pre_connect, return_exceptions=True)
+    await connections.TRANSPORT.close()
+    executor.shutdown()
+
+
+async def warm_tool_workers() -> None:
+    """Start the tool process workers once the agents (and their tool declarations) exist."""
+    if await ensure_services() and executor.uses_processes():
+        await asyncio.to_thread(executor.warm)
+
+
+async def warm_cache() -> None:
+    """Build the agent services, then replay the query log into the response cache."""
+    if await ensure_services():
+        await cache_warmer.run(warm_answer, is_cached=lambda query: query in response_cache.CACHE)
+    else:
+        cache_warmer.state = "failed"
+
+
+def warm_cache_before_fork() -> None:
+    """
+    Warm the response cache in the pre-fork master (server/prefork.py).
+
+    Workers, and the replacements forked later, inherit the warmed cache and
+    the finished warmer, so the query log is replayed once per server instead
+    of once per worker. The model connections opened on the way are closed
+    before forking.
+    """
+    async def warm() -> None:
+        try:
+            await warm_cache()
+        finally:
+            await connections.TRANSPORT.close()
+
+    if not cache_warmer.ready:
+        asyncio.run(warm())
+
+
+async def warm_answer(query: str) -> bool:
+    """
+    Answer one question through the agents and cache the answer.
+
+    Runs in a throwaway session that is deleted afterwards.
+
+    Args:
+        query (str): The question to warm
+
+    Returns:
+        bool: True if the answer was cached
+    """
+    from google.genai import types
+    from multiagent.runtime.activity import ActivityTrace
+
+    session = session_service.create_session(app_name=APP_NAME, user_id="cache_warmer")
+    try:
+        activity = ActivityTrace()
+        with deadline.scope(deadline.default_timeout()):
+            response_text = await run_agents(
+                session.id, types.Content(role="user", parts=[types.Part(text=query)]), activity, user_id="cache_warmer"
+            )
+        return response_cache.CACHE.put(query, response_text, activity.to_dict())
+    finally:
+        session_service.delete_session(app_name=APP_NAME, user_id="cache_warmer", session_id=session.id)
+
+
+def record_cached_turn(session, user_content, cached) -> None:
+    """
+    Add a turn answered from the response cache to the session.
+
+    The conversation then continues exactly as if the agents had answered:
+    the follow-up question sees this turn and goes to the same specialist.
+
+    Args:
+        session (Session): The conversation's session
+        user_content (types.Content): The user's question
+        cached (CachedAnswer): The cached answer
+    """
+    from google.adk.events import Event
+    from google.genai import types
+
+    invocation_id = "e-" + Event.new_id()
+    session_service.append_event(session, Event(invocation_id=invocation_id, author="user", content=user_content))
+    session_service.append_event(session, Event(
+        invocation_id=invocation_id,
+        author=cached.agent,
+        content=types.Content(role="model", parts=[types.Part(text=cached.text)]),
+    ))
+
+
+def degraded_response(session, user_content, answer, previous_state, reason: str) -> dict:
+    """
+    Answer a question without the agents, labeled as degraded.
+
+    The turn is recorded like a cached answer, so a follow-up question goes
+    to the specialist the answer stands in for.
+
+    Args:
+        session (Session): The conversation's session
+        user_content (types.Content): The user's question
+        answer (DegradedAnswer): Answer from the cache or the local tools
+        previous_state (ConversationState): State the session was restored from, if any
+        reason (str): The serving level, or why the agent run failed
+
+    Returns:
+        dict: The query response with a "degraded" object
+    """
+    record_cached_turn(session, user_content, answer)
+    logger.info("query answered in degraded mode", extra={
+        "session_id": session.id, "source": answer.source, "reason": reason
+    })
+    return {
+        "response": answer.text,
+        **conversation_ids(session, previous_state),
+        "degraded": {"reason": reason, "source": answer.source},
+        "trace": {
+            "trace_id": tracing.current_trace_id(),
+            "total_ms": 0.0,
+            "hops": answer.hops,
+            "degraded": True,
+            "steps": [{"agent": answer.agent, "kind": "degraded", "name": answer.source, "at_ms": 0.0, "ms": 0.0}],
+        },
+    }
+
+
+def conversation_ids(session, previous_state) -> dict:
+    """
+    How the client continues the conversation: the session id, or in
+    stateless mode a signed token holding the conversation itself.
+
+    Args:
+        session (Session): The conversation's session, after the answer
+        previous_state (ConversationState): State the session was restored from, if any
+
+    Returns:
+        dict: {"session_id": id} or {"session_id": None, "state": token}
+    """
+    if not client_state.enabled():
+        return {"session_id": session.id}
+    # Re-read the session: the runner appended this turn's events to its own copy
+    session = session_service.get_session(app_name=APP_NAME, user_id="web_user", session_id=session.id) or session
+    return {"session_id": None, "state": client_state.encode(client_state.capture(session, previous_state))}
+
+
+async def trace_http_requests(request: Request, call_next):
+    """
+    Open the root trace span for every HTTP request.
+
+    Agent, model and tool spans recorded while handling the request nest
+    under it; the trace id is returned in the X-Trace-Id response header.
+    Log records of the request carry its X-Request-Id (the client's, or the
+    trace id), which is echoed in the response.
+    """
+    with tracing.server_span(request.method, request.url.path) as span:
+        request_id = request.headers.get("x-request-id") or tracing.current_trace_id()
+        log_token = log.bind_request(request_id)
+        try:
+            # One header lookup unless an admin token is configured
+            if profiling.ADMIN_TOKEN and profiling.PROFILE_HEADER in request.headers:
+                response = await call_profiled(request, call_next, request_id or "request")
+            else:
+                response = await call_next(request)
+        finally:
+            log.unbind_request(log_token)
+
+        # Label by route template (not raw path) to keep metric cardinality bounded
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or next(
+            (mount.path for mount in request.app.routes
+             if isinstance(mount, Mount) and request.url.path.startswith(mount.path + "/")),
+            "unmatched"
         )
-        
-        print("✅ AI Tutor services initialized successfully")
-        
-    except Exception as e:
-        print(f"❌ Error initializing AI Tutor services: {e}")
-        traceback.print_exc()
-        authentication_configured = False
-        session_service = None
-        runner = None
-else:
-    print("⚠️  AI Tutor services not initialized due to authentication issues")
+        span.set_attribute("http.route", route_path)
+        span.set_attribute("http.response.status_code", response.status_code)
+        response.headers["X-Trace-Id"] = tracing.current_trace_id() or ""
+        response.headers["X-Request-Id"] = request_id or ""
+        return response
+
+
+async def call_profiled(request: Request, call_next, label: str) -> Response:
+    """
+    Handle a request under cProfile or the stack sampler (X-Profile header).
+
+    Requests without a valid X-Admin-Token are handled normally. The saved
+    profile is named in the X-Profile-File response header.
+
+    Args:
+        request (Request): The incoming request
+        call_next: The next handler in the middleware chain
+        label (str): Name for the profile file (the request id)
+
+    Returns:
+        Response: The response, with X-Profile (kind or 'busy') and X-Profile-File headers
+    """
+    kind = request.headers[profiling.PROFILE_HEADER].lower()
+    if kind not in profiling.PROFILE_KINDS or not profiling.is_admin(request.headers.get(profiling.ADMIN_HEADER)):
+        return await call_next(request)
+    with profiling.profile_request(kind, label) as result:
+        response = await call_next(request)
+    response.headers["X-Profile"] = "busy" if result.get("busy") else kind
+    if "file" in result:
+        response.headers["X-Profile-File"] = result["file"]
+    return response
 
 
 class QueryRequest(BaseModel):
@@ -163,8 +480,14 @@ class QueryRequest(BaseModel):
     
     Attributes:
         text (str): The user's question or query text
+        session_id (str, optional): Session returned by a previous query, to
+            continue the same conversation
+        state (str, optional): Conversation state token returned by a previous
+            query in stateless mode (AITUTOR_CLIENT_STATE=on)
     """
     text: str
+    session_id: Optional[str] = None
+    state: Optional[str] = None
     
     class Config:
         """Pydantic configuration for the QueryRequest model."""
@@ -175,19 +498,78 @@ class QueryRequest(BaseModel):
         }
 
 
-@app.post("/api/query")
-async def process_query_endpoint(request: QueryRequest) -> dict:
+async def wait_for_disconnect(http_request: Request) -> None:
+    """
+    Return once the HTTP client has gone away (closed tab, aborted fetch).
+
+    The request body has already been read, so the next ASGI message the
+    server delivers is the disconnect.
+
+    Args:
+        http_request (Request): The request to watch
+    """
+    while True:
+        message = await http_request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_agents(session_id: str, user_content, activity, user_id: str = "web_user") -> str:
+    """
+    Run the multi-agent system on one user message.
+
+    The event stream is consumed to the end (rather than stopping at the
+    final response) so every agent run finishes and closes its span. When the
+    task is cancelled the stream is closed right away, which unwinds every
+    agent hop and cancels the model call in flight.
+
+    Args:
+        session_id (str): Session the message belongs to
+        user_content (types.Content): The user's message
+        activity (ActivityTrace): Collects agents, tools and timings for the UI
+        user_id (str): Owner of the session
+
+    Returns:
+        str: The final response text ('' if the agents produced none)
+    """
+    response_text = ""
+    events = runner.run_async(
+        user_id=user_id,
+        session_id=session_id,
+        new_message=user_content
+    )
+    async with contextlib.aclosing(events):
+        async for event in events:
+            # Record which agent produced the event, tools and timing for the UI
+            activity.record(event)
+
+            # Collect the final response from the agent system
+            if not response_text and event.is_final_response() and event.content and event.content.parts:
+                response_text = event.content.parts[0].text
+    return response_text
+
+
+async def process_query_endpoint(request: QueryRequest, http_request: Request):
     """
     Process a user query through the multi-agent system.
     
     This endpoint receives user questions, routes them through the appropriate
     specialist agents, and returns formatted responses.
+
+    Each query runs under a deadline (AITUTOR_REQUEST_TIMEOUT, or less with an
+    X-Request-Timeout header) that every agent hop and model call observes.
+    The agents are cancelled as soon as the deadline passes or the client
+    disconnects, so abandoned questions stop using model quota.
     
     Args:
         request (QueryRequest): The user's query wrapped in a Pydantic model
+        http_request (Request): The HTTP request (headers and disconnect detection)
         
     Returns:
-        dict: JSON response containing the agent's answer
+        dict: JSON response containing the agent's answer, the session id (or
+            in stateless mode the conversation state token) and the activity
+            trace of the agents, tools and step timings involved (a 504
+            response if the deadline expires)
         
     Raises:
         HTTPException: If the service is not properly configured
@@ -200,11 +582,13 @@ async def process_query_endpoint(request: QueryRequest) -> dict:
         
         Response:
         {
-            "response": "To solve 2x + 5 = 15:\n1. Subtract 5 from both sides: 2x = 10\n2. Divide by 2: x = 5"
+            "response": "To solve 2x + 5 = 15:\n1. Subtract 5 from both sides: 2x = 10\n2. Divide by 2: x = 5",
+            "session_id": "3f6c...",
+            "trace": {"total_ms": 1834.2, "hops": ["multiagent", "maths_agent"], "steps": [...]}
         }
     """
-    # Check if the service is properly configured
-    if not authentication_configured or not runner:
+    # Build the agent services on first use (no-op once they are ready)
+    if not authentication_configured or not await ensure_services():
         return {
             "response": "🔧 Service not configured. Please set up Google AI API key or Vertex AI credentials in your .env file. Check the server console for setup instructions."
         }
@@ -217,116 +601,475 @@ async def process_query_endpoint(request: QueryRequest) -> dict:
             "response": "Please provide a valid question."
         }
     
-    print(f"📝 Processing query: {user_query}")
+    # Log the query's size, not its text
+    logger.info("query received", extra={"query_chars": len(user_query), "session_id": request.session_id})
     
+    # Already loaded by initialize_services(); imported here to keep startup light
+    from google.genai import types
+    from multiagent.runtime.activity import ActivityTrace
+
+    # Create the user message content in the format expected by Google AI
+    user_content = types.Content(
+        role='user', 
+        parts=[types.Part(text=user_query)]
+    )
+
+    timeout = deadline.request_timeout(http_request.headers.get(deadline.TIMEOUT_HEADER))
+    stateless = client_state.enabled()
+    previous_state = None
+    first_turn = False
     try:
-        # Create a new session for this query
-        # In a production environment, you might want to implement session persistence
-        session = session_service.create_session(
-            app_name=APP_NAME, 
-            user_id="web_user"  # In production, use actual user IDs
-        )
+        # Continue the client's conversation if it sent a known session id,
+        # otherwise start a new session. Long conversations stay cheap because
+        # the replayed history is bounded (see multiagent/runtime/context.py)
+        session = None
+        if stateless:
+            # The conversation travels in the client's token: rebuild it in a
+            # scratch session that is deleted once the answer is sent
+            if request.state:
+                try:
+                    previous_state = client_state.decode(request.state)
+                except client_state.InvalidState as e:
+                    logger.warning("conversation state rejected", extra={"reason": e.reason})
+            session = client_state.restore(session_service, APP_NAME, "web_user", previous_state)
+        elif request.session_id:
+            session = session_service.get_session(
+                app_name=APP_NAME,
+                user_id="web_user",
+                session_id=request.session_id
+            )
+        if session is None:
+            session = session_service.create_session(
+                app_name=APP_NAME, 
+                user_id="web_user"  # In production, use actual user IDs
+            )
         
-        # Create the user message content in the format expected by Google AI
-        user_content = types.Content(
-            role='user', 
-            parts=[types.Part(text=user_query)]
-        )
+        # The opening question of a conversation does not depend on history,
+        # so a cached answer to the same question can be served as is
+        first_turn = not session.events
+        cached = response_cache.CACHE.get(user_query) if first_turn else None
+        if cached is not None:
+            record_cached_turn(session, user_content, cached)
+            logger.info("query answered from cache", extra={"session_id": session.id, "agent": cached.agent})
+            return {"response": cached.text, **conversation_ids(session, previous_state), "trace": {
+                "trace_id": tracing.current_trace_id(),
+                "total_ms": 0.0,
+                "hops": cached.hops,
+                "cached": True,
+                "steps": [{"agent": cached.agent, "kind": "cached", "at_ms": 0.0, "ms": 0.0}],
+            }}
+
+        # While Gemini is slow or failing, answer an opening question from the
+        # cache (stale entries too), or any question from the specialists'
+        # tools where it allows it, and keep the time budget short
+        # (multiagent/runtime/degradation.py)
+        level = degradation.CONTROLLER.level()
+        degraded = degradation.degraded_answer(user_query, level, first_turn)
+        if degraded is not None:
+            return degraded_response(session, user_content, degraded, previous_state, degradation.LEVEL_NAMES[level])
+        timeout = degradation.CONTROLLER.timeout(timeout, level)
         
-        # Process the query through the multi-agent system
-        response_text = ""
-        async for event in runner.run_async(
-            user_id="web_user", 
-            session_id=session.id, 
-            new_message=user_content
-        ):
-            # Collect the final response from the agent system
-            if event.is_final_response() and event.content and event.content.parts:
-                response_text = event.content.parts[0].text
-                break
+        # Process the query through the multi-agent system, racing it against
+        # the deadline and the client going away. Tasks created inside the
+        # scope inherit the deadline (and the trace context)
+        activity = ActivityTrace(trace_id=tracing.current_trace_id())
+        with deadline.scope(timeout):
+            work = asyncio.ensure_future(run_agents(session.id, user_content, activity))
+            disconnect = asyncio.ensure_future(wait_for_disconnect(http_request))
+            try:
+                done, _ = await asyncio.wait(
+                    {work, disconnect}, timeout=deadline.remaining(), return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                # Cancel whatever is still running and wait for it to unwind
+                for task in (work, disconnect):
+                    task.cancel()
+                await asyncio.gather(work, disconnect, return_exceptions=True)
+
+        if work not in done:
+            if disconnect in done:
+                metrics.ABANDONED.inc(reason="disconnect")
+                logger.info("query cancelled: client disconnected", extra={"session_id": session.id})
+                # 499: client closed request (nobody is left to read it)
+                return Response(status_code=499)
+            raise deadline.DeadlineExceeded(f"Query exceeded its {timeout:g}s deadline")
+        response_text = work.result()
         
+        trace = activity.to_dict()
+        if first_turn and response_text:
+            response_cache.CACHE.put(user_query, response_text, trace)
+
         # Fallback response if no content was generated
         if not response_text:
             response_text = "I apologize, but I couldn't process your question right now. Please try rephrasing your question or try again later."
             
-        print(f"✅ Query processed successfully")
-        return {"response": response_text}
+        logger.info("query processed", extra={
+            "session_id": session.id, "hops": len(trace["hops"]), "duration_ms": trace["total_ms"]
+        })
+        return {"response": response_text, **conversation_ids(session, previous_state), "trace": trace}
         
     except Exception as e:
-        # Log the error for debugging
-        print(f"❌ Error processing query: {e}")
-        traceback.print_exc()
+        # Whatever the level, a failed run falls back to the cache and the
+        # specialists' tools before apologizing
+        degraded = None
+        if session is not None and degradation.CONTROLLER.enabled:
+            degraded = degradation.degraded_answer(user_query, degradation.NO_NEWS, first_turn)
+
+        if isinstance(e, deadline.DeadlineExceeded):
+            metrics.ABANDONED.inc(reason="deadline")
+            logger.warning("query cancelled: deadline exceeded", extra={"timeout_s": timeout, "reason": str(e)})
+            if degraded is not None:
+                return degraded_response(session, user_content, degraded, previous_state, "deadline")
+            return JSONResponse(status_code=504, content={
+                "response": "This question took too long to answer. Please try again or ask a shorter question.",
+                "session_id": session.id if session and not stateless else None,
+                **({"state": request.state} if stateless and previous_state else {}),
+            })
+
+        if isinstance(e, resilience.UpstreamUnavailable):
+            # Quota exhausted or Gemini failing: tell the user to retry shortly
+            logger.warning("query rejected: upstream unavailable", extra={"reason": str(e), "retry_after": e.retry_after})
+            if degraded is not None:
+                return degraded_response(session, user_content, degraded, previous_state, "upstream_unavailable")
+            return {
+                "response": "The tutor is handling a lot of questions right now. Please try again in a few seconds.",
+                "retry_after": round(e.retry_after, 1),
+            }
+
+        # Log the error (with traceback) for debugging
+        logger.exception("query failed")
+        if degraded is not None:
+            return degraded_response(session, user_content, degraded, previous_state, "error")
         
         # Return user-friendly error message
         return {
             "response": "I encountered an error while processing your question. Please try again later or contact support if the issue persists."
         }
 
+    finally:
+        if stateless and session is not None:
+            session_service.delete_session(app_name=APP_NAME, user_id="web_user", session_id=session.id)
 
-# Static file serving configuration
-# Mount the static directory to serve HTML, CSS, JavaScript, and other assets
-app.mount("/static", StaticFiles(directory="static"), name="static")
 
-
-@app.get("/", response_class=HTMLResponse)
-async def read_root() -> HTMLResponse:
+async def read_root(request: Request) -> Response:
     """
     Serve the main application interface.
     
     This endpoint serves the main HTML file that contains the AI Tutor frontend.
     The frontend provides a modern chat interface for interacting with the
-    multi-agent system.
+    multi-agent system. The page is served from memory, precompressed, with
+    fingerprinted asset URLs and an ETag (see server/static_assets.py).
+    
+    Args:
+        request (Request): The incoming request (for ETag and encoding negotiation)
     
     Returns:
-        HTMLResponse: The main HTML page with the AI Tutor interface
+        Response: The main HTML page, or 304 Not Modified
         
     Raises:
-        HTTPException: If the HTML file cannot be read
+        HTTPException: If static/index.html does not exist
     """
-    try:
-        # Read the main HTML file with explicit UTF-8 encoding
-        # This ensures proper handling of special characters and emojis
-        with open("static/index.html", "r", encoding="utf-8") as file:
-            html_content = file.read()
-        
-        return HTMLResponse(content=html_content)
-    
-    except FileNotFoundError:
+    response = request.app.state.static_assets.index_response(request)
+    if response is None:
         raise HTTPException(
             status_code=404, 
             detail="Frontend not found. Please ensure static/index.html exists."
         )
-    except Exception as e:
-        print(f"❌ Error serving frontend: {e}")
-        raise HTTPException(
-            status_code=500, 
-            detail="Internal server error while loading the application."
-        )
+    return response
 
 
 # Health check endpoint for monitoring and deployment
-@app.get("/health")
+def is_ready() -> bool:
+    """
+    Whether the instance should receive traffic.
+
+    Lazy instances are ready as soon as they are up (the first query builds
+    the agents); background and eager ones once the agents are built. With a
+    query log configured, cache warming must have finished too.
+
+    Returns:
+        bool: True if the instance is ready
+    """
+    if not authentication_configured or services_state == "failed" or not cache_warmer.ready:
+        return False
+    if client_state.requested() and not client_state.enabled():
+        return False
+    return services_state == "ready" or WARMUP_MODE == "lazy"
+
+
 async def health_check() -> dict:
     """
     Health check endpoint for monitoring service status.
     
+    Never triggers service initialization, so it answers immediately on a
+    cold start; "services" tells whether the agents are built yet and
+    "ready" whether the instance should receive traffic (see /health/ready).
+    
     Returns:
         dict: Service health status and configuration info
     """
-    return {
-        "status": "healthy" if authentication_configured else "degraded",
+    health = {
+        "status": "healthy" if authentication_configured and services_state != "failed" else "degraded",
         "service": "AI Tutor",
         "version": "1.0.0",
         "authentication": "configured" if authentication_configured else "not_configured",
-        "agents": ["mathematics", "physics", "chemistry", "news_analyst"] if runner else []
+        "services": services_state,
+        "ready": is_ready(),
+        "agents": ["mathematics", "physics", "chemistry", "news_analyst"] if runner else [],
+        "response_cache": {"entries": len(response_cache.CACHE), "warming": cache_warmer.status()},
     }
+    # Where each tool runs (inline, thread or process pool)
+    if runner:
+        health["tools"] = executor.status()
+    # Session memory accounting (compact session store only)
+    if hasattr(session_service, "stats"):
+        health["sessions"] = session_service.stats()
+    # Stateless mode: conversations are kept in client tokens
+    if client_state.requested():
+        health["client_state"] = client_state.status()
+        if not client_state.enabled():
+            health["status"] = "degraded"
+    # Usage and health per API key / project when calls are spread over a pool
+    if credentials.active():
+        health["credentials"] = credentials.status()
+    # Shared model-call connection pool
+    if connections.CONFIG.shared:
+        health["http_pool"] = connections.status()
+    # Degraded-mode level and the upstream signals behind it
+    if degradation.CONTROLLER.enabled:
+        health["degradation"] = degradation.CONTROLLER.status()
+        if health["degradation"]["level"] != "normal":
+            health["status"] = "degraded"
+    # Circuit breaker state per Gemini model used so far
+    upstream = resilience.status()
+    if upstream:
+        health["upstream"] = upstream
+        if any(model["state"] == "open" for model in upstream.values()):
+            health["status"] = "degraded"
+    # Under the pre-fork server (python -m server): this worker and all its peers
+    workers = prefork.worker_health()
+    if workers:
+        health.update(workers)
+    return health
+
+
+async def readiness_endpoint() -> JSONResponse:
+    """
+    Readiness probe for load balancers: 200 once the instance is ready
+    (agents built and response cache warmed, as configured), 503 before.
+
+    Returns:
+        JSONResponse: {"ready": bool, "services": state, "cache_warming": state}
+    """
+    ready = is_ready()
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "ready": ready,
+        "services": services_state,
+        "cache_warming": cache_warmer.state,
+    })
+
+
+async def warmup_endpoint() -> dict:
+    """
+    Warm-up hook: build the agent services now instead of on the first query.
+
+    Meant for deployment platforms that can ping an instance after a cold
+    start (e.g. a scheduled request on Vercel).
+
+    Returns:
+        dict: The same payload as /health, after initialization
+    """
+    await ensure_services()
+    return await health_check()
+
+
+# Admin profiling endpoints
+# =========================
+# Not found unless AITUTOR_ADMIN_TOKEN is set; every call must send it in
+# X-Admin-Token. Under the pre-fork server a call reaches one worker, named
+# by "pid" in the response (see server/profiling.py).
+
+def require_admin(request: Request) -> None:
+    """
+    Reject requests without the admin token.
+
+    Raises:
+        HTTPException: 404 when profiling is disabled, 403 for a missing or wrong token
+    """
+    if profiling.ADMIN_TOKEN is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.is_admin(request.headers.get(profiling.ADMIN_HEADER)):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+async def profile_status_endpoint(request: Request) -> dict:
+    """
+    Window sampling and tracemalloc state, and the saved profiles.
+
+    Returns:
+        dict: {"pid", "window", "memory", "profiles"}
+    """
+    require_admin(request)
+    return {
+        "pid": os.getpid(),
+        "window": profiling.window_status(),
+        "memory": profiling.memory_status(),
+        "profiles": profiling.list_profiles(),
+    }
+
+
+async def profile_start_endpoint(request: Request, interval_ms: Optional[float] = None,
+                                 seconds: Optional[float] = None) -> JSONResponse:
+    """
+    Start sampling the event loop until /admin/profile/stop or `seconds`.
+
+    Args:
+        interval_ms (float, optional): Sampling interval (AITUTOR_PROFILE_INTERVAL_MS)
+        seconds (float, optional): Longest window (AITUTOR_PROFILE_MAX_SECONDS)
+
+    Returns:
+        JSONResponse: 200 when started, 409 if a profile is already running
+    """
+    require_admin(request)
+    # Endpoints run on the event-loop thread, which is the one to sample
+    result = profiling.start_window(
+        threading.get_ident(),
+        interval=interval_ms / 1000.0 if interval_ms else None,
+        max_seconds=seconds,
+    )
+    return JSONResponse(status_code=409 if result["state"] == "busy" else 200, content=result)
+
+
+async def profile_stop_endpoint(request: Request) -> dict:
+    """
+    Stop window sampling and save the collapsed stacks.
+
+    Returns:
+        dict: The profile file, duration, sample count and top functions
+    """
+    require_admin(request)
+    return await asyncio.to_thread(profiling.stop_window)
+
+
+async def profile_download_endpoint(request: Request, name: str) -> FileResponse:
+    """
+    Download a saved profile.
+
+    Args:
+        name (str): File name from /admin/profile or X-Profile-File
+
+    Returns:
+        FileResponse: The profile file
+    """
+    require_admin(request)
+    path = profiling.profile_file(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=name, media_type="application/octet-stream")
+
+
+async def memory_snapshot_endpoint(request: Request, compare_to: Optional[int] = None,
+                                   group_by: str = "lineno", limit: int = 20) -> dict:
+    """
+    Take a tracemalloc snapshot, diffed against the previous one (or `compare_to`).
+
+    The first call starts tracemalloc; allocations before it are not traced.
+
+    Args:
+        compare_to (int, optional): Snapshot id to compare with
+        group_by (str): 'lineno', 'filename' or 'traceback'
+        limit (int): Entries returned
+
+    Returns:
+        dict: Snapshot id, traced memory and top allocations or growth
+    """
+    require_admin(request)
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=422, detail="group_by must be lineno, filename or traceback")
+    try:
+        # Snapshots of a large heap take a while: keep the event loop serving
+        return await asyncio.to_thread(profiling.take_snapshot, compare_to, group_by, limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Snapshot {compare_to} not found")
+
+
+async def memory_stop_endpoint(request: Request) -> dict:
+    """
+    Stop tracemalloc and drop the snapshots.
+
+    Returns:
+        dict: {"tracemalloc": "stopped" | "off"}
+    """
+    require_admin(request)
+    return profiling.stop_tracing()
+
+
+# Prometheus metrics endpoint
+async def metrics_endpoint() -> Response:
+    """
+    Expose request, agent, model and tool metrics for Prometheus.
+
+    Returns:
+        Response: Metrics in the Prometheus text exposition format
+    """
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def create_app() -> FastAPI:
+    """
+    Build the FastAPI application.
+
+    Only the web layer is set up here; the agent services are built by
+    ensure_services() on the first query or by the AITUTOR_WARMUP hook.
+
+    Returns:
+        FastAPI: The configured application
+    """
+    application = FastAPI(
+        title="AI Tutor API",
+        description="Multi-Agent Learning System powered by Google Gemini AI",
+        version="1.0.0",
+        docs_url="/docs",  # Swagger UI documentation
+        redoc_url="/redoc",  # ReDoc documentation
+        lifespan=lifespan
+    )
+    application.middleware("http")(trace_http_requests)
+
+    # API endpoints
+    application.post("/api/query")(process_query_endpoint)
+    application.post("/api/warmup")(warmup_endpoint)
+
+    # Static file serving configuration
+    # HTML, CSS and JavaScript are loaded into memory and precompressed once
+    static_assets = StaticAssets("static", prefix="/static")
+    application.state.static_assets = static_assets
+    application.mount("/static", static_assets, name="static")
+    application.get("/", response_class=HTMLResponse)(read_root)
+
+    # Monitoring endpoints
+    application.get("/health")(health_check)
+    application.get("/health/ready")(readiness_endpoint)
+    application.get("/metrics")(metrics_endpoint)
+
+    # Admin profiling endpoints (not found unless AITUTOR_ADMIN_TOKEN is set)
+    application.get("/admin/profile", include_in_schema=False)(profile_status_endpoint)
+    application.post("/admin/profile/start", include_in_schema=False)(profile_start_endpoint)
+    application.post("/admin/profile/stop", include_in_schema=False)(profile_stop_endpoint)
+    application.get("/admin/profile/{name}", include_in_schema=False)(profile_download_endpoint)
+    application.post("/admin/memory/snapshot", include_in_schema=False)(memory_snapshot_endpoint)
+    application.delete("/admin/memory", include_in_schema=False)(memory_stop_endpoint)
+    return application
+
+
+# Application instance used by uvicorn and the Vercel deployment
+app = create_app()
 
 
 if __name__ == "__main__":
     import uvicorn
     
     # Run the application if this file is executed directly
-    # For production, use a proper WSGI server like Gunicorn
+    # For production, use the pre-fork multi-worker server: python -m server
     print("🚀 Starting AI Tutor development server...")
     uvicorn.run(
         "main:app",
@@ -1 +1,25 @@
-from . import agent
+"""
+AI Tutor - Multi-Agent Package
+==============================
+
+The agent tree is built on first access to `multiagent.agent` (or
+`multiagent.root_agent`) rather than on package import, so lightweight
+submodules such as multiagent.runtime.metrics can be imported without
+loading google.adk. ADK tooling that resolves `multiagent.agent.root_agent`
+keeps working unchanged.
+
+Author: AI Tutor Team
+Version: 1.0.0
+"""
+
+# Standard library imports
+import importlib
+
+
+def __getattr__(name: str):
+    """Import the agent tree lazily on first attribute access."""
+    if name == 'agent':
+        return importlib.import_module('.agent', __name__)
+    if name == 'root_agent':
+        return importlib.import_module('.agent', __name__).root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -34,6 +34,11 @@ from .subagents.physics.agent import physics_agent
 from .subagents.chemistry.agent import chemistry_agent
 from .subagents.ai_news.agent import news_analyst
 
+# Import the instruction pipeline and model runtime
+from .prompts import context_cache, select_instruction
+from .runtime import context, credentials, deadline, degradation, hedging, hooks, resilience, speculation
+from .runtime.model import register_models
+
 # Load environment variables
 # This ensures API keys and configuration are available
 load_dotenv()
@@ -42,23 +47,28 @@ load_dotenv()
 # Used by the ADK for Google AI/Gemini access
 api_key = os.getenv('GOOGLE_AI_API_KEY')
 
-# Root Agent Configuration
-# ======================
-# The root agent serves as the central orchestrator for the multi-agent system.
-# It analyzes user queries and determines the optimal routing strategy:
-# 1. Single agent delegation for straightforward domain-specific questions
-# 2. Multi-step orchestration for complex cross-domain problems
-# 3. Sequential coordination when multiple agents need to work together
-
-root_agent = LlmAgent(
-    # Model Configuration
-    model='gemini-2.0-flash-001',  # Latest Gemini model for optimal performance
-    name='multiagent',  # Identifier for the agent system
-    description='An intelligent tutoring orchestrator that routes queries to specialist agents.',
-    
-    # Core Agent Instructions
-    # These instructions define the agent's behavior and capabilities
-    instruction="""
+# Model Runtime
+# =============
+# Route 'gemini-*' model names through the AI Tutor model-call pipeline and
+# install prompt-prefix context caching (see multiagent/prompts/context_cache.py),
+# context trimming, request deadlines, upstream health monitoring for degraded
+# mode, opt-in hedging of slow calls and the upstream rate limit / retry /
+# circuit breaker layer, spread over a pool of API keys and projects when
+# several are configured (see multiagent/runtime/).
+# All must happen before the first model call.
+register_models()
+context_cache.enable()
+context.enable()
+deadline.enable()
+degradation.enable()
+hedging.enable()
+credentials.enable()
+resilience.enable()
+
+# Agent Instructions
+# ==================
+
+FULL_INSTRUCTION = """
     You are a highly intelligent Tutor Agent Orchestrator. Your primary role is to understand a student's question thoroughly and manage the process of getting a complete answer, even if it requires multiple steps and different specialist agents.
 
     **🔍 QUERY ANALYSIS PHASE:**
@@ -125,7 +135,42 @@ root_agent = LlmAgent(
     - If an agent cannot provide the needed information, try alternative approaches
     - For ambiguous questions, ask clarifying questions
     - Always provide educational value even when direct answers aren't possible
-    """,
+    """
+
+COMPACT_INSTRUCTION = """
+    You are the AI Tutor orchestrator. Understand the student's question and get it fully answered by the right specialist(s).
+
+    Routing:
+    - maths_agent: arithmetic, algebra, calculus, equations, statistics, geometry.
+    - physics_agent: physical constants, mechanics, energy, thermodynamics, electromagnetism.
+    - chemistry_agent: elements, periodic table, reactions, compounds, stoichiometry.
+    - news_analyst tool: latest AI news, research and industry developments.
+
+    Single-domain question: transfer to that specialist immediately.
+    Cross-domain question: break it into steps, get foundational facts first (e.g. a constant from physics_agent), pass the results to the next specialist (e.g. maths_agent for the calculation), then combine everything into one answer.
+
+    Explain reasoning step by step in an encouraging tone. Ask a clarifying question if the domain is ambiguous, and try another approach if a specialist cannot help.
+    """
+
+# Root Agent Configuration
+# ======================
+# The root agent serves as the central orchestrator for the multi-agent system.
+# It analyzes user queries and determines the optimal routing strategy:
+# 1. Single agent delegation for straightforward domain-specific questions
+# 2. Multi-step orchestration for complex cross-domain problems
+# 3. Sequential coordination when multiple agents need to work together
+
+root_agent = LlmAgent(
+    # Model Configuration
+    model='gemini-2.0-flash-001',  # Latest Gemini model for optimal performance
+    name='multiagent',  # Identifier for the agent system
+    description='An intelligent tutoring orchestrator that routes queries to specialist agents.',
+    
+    # Core Agent Instructions
+    # These instructions define the agent's behavior and capabilities
+    instruction=select_instruction(
+        'multiagent', full=FULL_INSTRUCTION, compact=COMPACT_INSTRUCTION
+    ),
     
     # Specialist Agents Configuration
     # These are the domain experts that the root agent can delegate to
@@ -141,3 +186,11 @@ root_agent = LlmAgent(
         AgentTool(news_analyst)  # AI news search and analysis capabilities
     ]
 )
+
+# Install the runtime callback hooks on every agent in the tree
+# (binds each model call to its agent and session for the context window)
+hooks.install(root_agent)
+
+# Opt-in: start the likely specialist while the orchestrator is still routing
+# (see multiagent/runtime/speculation.py, AITUTOR_SPECULATION)
+speculation.enable(root_agent)
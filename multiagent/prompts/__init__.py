@@ -0,0 +1,311 @@
+"""
+AI Tutor - Instruction Pipeline
+===============================
+
+Every agent's system instruction is resent on every model call of every hop,
+so instruction size is the dominant share of input tokens per request. This
+package keeps a full and a compact variant of each agent's instruction and
+tool descriptions, picks the active one at agent-construction time and reports
+per-agent token budgets.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Components:
+- count_tokens: Fast local token estimate (no network)
+- count_tokens_exact: Exact count through the Gemini count_tokens API
+- select_instruction: Registers both variants and returns the active one
+- select_tool: Same for a tool function's description (its docstring is sent
+  verbatim as the function declaration on every call)
+- budget_report: Per-agent instruction and tool-declaration token budgets
+- context_cache: Cached prompt-prefix handles for providers with context caching
+
+Configuration:
+    AITUTOR_PROMPT_VARIANT: 'compact' (default) or 'full'
+
+Usage:
+    python -m multiagent.prompts            # budget table for the agent tree
+    python -m multiagent.prompts --exact    # use the Gemini tokenizer
+"""
+
+# Standard library imports
+import functools
+import inspect
+import os
+import re
+import textwrap
+from dataclasses import dataclass
+from typing import Optional
+
+
+# Prompt Variant Configuration
+# ============================
+# Each agent module defines FULL_INSTRUCTION, the reference text, and
+# COMPACT_INSTRUCTION, which carries the same rules with the decoration,
+# duplicated guidance and long example dialogues removed, in a fraction of the
+# tokens. select_instruction() registers both; the compact one is sent by default.
+
+VARIANT_FULL = 'full'
+VARIANT_COMPACT = 'compact'
+DEFAULT_VARIANT = VARIANT_COMPACT
+
+# Per-agent token budget for the system prompt (instruction + tool declarations)
+DEFAULT_BUDGET = 450
+PROMPT_BUDGETS = {
+    'multiagent': 600,  # The orchestrator also carries routing rules
+}
+
+# Registry of instruction variants, keyed by agent name
+_INSTRUCTIONS: dict[str, dict[str, str]] = {}
+
+# Word pieces, single digits, punctuation/symbols and indentation runs
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d|\n[ \t]+|[^\sA-Za-z\d]")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in a piece of text.
+
+    The estimate mirrors how SentencePiece-style tokenizers split text: long
+    words break into several pieces, every digit and symbol is its own token,
+    indentation runs cost a token, and non-ASCII characters such as emoji cost
+    roughly one token per two UTF-8 bytes. It runs in microseconds and is meant
+    for budgets and comparisons; use count_tokens_exact for billing figures.
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        piece = match.group()
+        if piece.isascii() and piece.isalpha():
+            # Common words are one token; long words split every ~6 characters
+            tokens += 1 + (len(piece) - 1) // 6
+        elif not piece.isascii():
+            tokens += max(1, len(piece.encode('utf-8')) // 2)
+        else:
+            tokens += 1
+    return tokens
+
+
+def count_tokens_exact(text: str, model: str = 'gemini-2.0-flash-001') -> int:
+    """
+    Count tokens with the Gemini tokenizer through the count_tokens API.
+
+    Args:
+        text (str): The text to measure
+        model (str): Model whose tokenizer should be used
+
+    Returns:
+        int: Exact token count reported by the API
+
+    Raises:
+        Exception: Propagates API/authentication errors from google-genai
+    """
+    from google.genai import Client
+
+    response = Client().models.count_tokens(model=model, contents=text)
+    return response.total_tokens or 0
+
+
+def normalize_instruction(text: str) -> str:
+    """
+    Strip the source-code indentation and surrounding blank lines from a prompt.
+
+    Instructions are written as indented triple-quoted strings; the leading
+    whitespace is pure token overhead on every call.
+
+    Args:
+        text (str): Raw instruction text
+
+    Returns:
+        str: Dedented, stripped instruction
+    """
+    return textwrap.dedent(text).strip()
+
+
+def active_variant() -> str:
+    """
+    Return the instruction variant selected for this process.
+
+    Returns:
+        str: 'compact' or 'full'
+    """
+    variant = os.getenv('AITUTOR_PROMPT_VARIANT', DEFAULT_VARIANT).strip().lower()
+    return variant if variant in (VARIANT_FULL, VARIANT_COMPACT) else DEFAULT_VARIANT
+
+
+def select_instruction(agent_name: str, full: str, compact: str) -> str:
+    """
+    Register both instruction variants for an agent and return the active one.
+
+    Args:
+        agent_name (str): The agent's name (must match LlmAgent.name)
+        full (str): The complete, human-oriented instruction
+        compact (str): The token-efficient instruction with the same rules
+
+    Returns:
+        str: The normalized instruction for the active variant
+    """
+    _INSTRUCTIONS[agent_name] = {
+        VARIANT_FULL: normalize_instruction(full),
+        VARIANT_COMPACT: normalize_instruction(compact),
+    }
+    return _INSTRUCTIONS[agent_name][active_variant()]
+
+
+def get_instruction(agent_name: str, variant: Optional[str] = None) -> Optional[str]:
+    """
+    Look up a registered instruction variant.
+
+    Args:
+        agent_name (str): The agent's name
+        variant (str, optional): 'full' or 'compact'; defaults to the active variant
+
+    Returns:
+        str | None: The instruction text, or None if the agent is not registered
+    """
+    variants = _INSTRUCTIONS.get(agent_name)
+    if not variants:
+        return None
+    return variants.get(variant or active_variant())
+
+
+def select_tool(func, compact: str):
+    """
+    Return a tool function whose description matches the active prompt variant.
+
+    ADK sends a function tool's full docstring as its declaration description
+    on every call. In compact mode the function is wrapped with a short
+    description; the signature (and therefore the parameter schema) and the
+    name are preserved through functools.wraps.
+
+    Args:
+        func: The tool function
+        compact (str): Short description used in compact mode
+
+    Returns:
+        Callable: The original function (full mode) or a compact wrapper
+    """
+    if active_variant() == VARIANT_FULL:
+        return func
+
+    if inspect.iscoroutinefunction(func):
+        # Pooled tools (runtime.executor) are coroutine functions; ADK awaits
+        # a tool only if the function it is given is one
+        @functools.wraps(func)
+        async def tool(*args, **kwargs):
+            return await func(*args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def tool(*args, **kwargs):
+            return func(*args, **kwargs)
+
+    tool.__doc__ = normalize_instruction(compact)
+    return tool
+
+
+@dataclass
+class PromptBudget:
+    """
+    Token accounting for one agent's system prompt.
+
+    Attributes:
+        agent (str): Agent name
+        variant (str): Active instruction variant
+        full_tokens (int): Tokens in the full instruction
+        compact_tokens (int): Tokens in the compact instruction
+        instruction_tokens (int): Tokens in the active instruction
+        tool_tokens (int): Tokens in the agent's tool declarations
+        budget (int): Allowed tokens for instruction + tools
+    """
+    agent: str
+    variant: str
+    full_tokens: int
+    compact_tokens: int
+    instruction_tokens: int
+    tool_tokens: int
+    budget: int
+
+    @property
+    def total_tokens(self) -> int:
+        """Tokens sent as system prompt on every call of this agent."""
+        return self.instruction_tokens + self.tool_tokens
+
+    @property
+    def within_budget(self) -> bool:
+        """Whether the active prompt fits the agent's budget."""
+        return self.total_tokens <= self.budget
+
+    @property
+    def savings(self) -> float:
+        """Fraction of instruction tokens saved by the compact variant."""
+        if not self.full_tokens:
+            return 0.0
+        return 1.0 - self.compact_tokens / self.full_tokens
+
+
+def _iter_llm_agents(agent):
+    """Yield every LlmAgent in the tree, including agents wrapped as AgentTools."""
+    from google.adk.agents import LlmAgent
+    from google.adk.tools.agent_tool import AgentTool
+
+    seen = set()
+    pending = [agent]
+    while pending:
+        current = pending.pop(0)
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, LlmAgent):
+            yield current
+            pending.extend(
+                tool.agent for tool in current.tools if isinstance(tool, AgentTool)
+            )
+        pending.extend(current.sub_agents)
+
+
+def _tool_declaration_text(agent) -> str:
+    """Serialize the function declarations an agent sends with every call."""
+    declarations = []
+    for tool in agent.canonical_tools:
+        declaration = tool._get_declaration()
+        if declaration is not None:
+            declarations.append(declaration.model_dump_json(exclude_none=True))
+    return '\n'.join(declarations)
+
+
+def budget_report(root_agent=None, exact: bool = False) -> list[PromptBudget]:
+    """
+    Build the per-agent prompt budget report for an agent tree.
+
+    Args:
+        root_agent: Root of the agent tree (defaults to multiagent.agent.root_agent)
+        exact (bool): Use the Gemini tokenizer instead of the local estimate
+
+    Returns:
+        list[PromptBudget]: One entry per LlmAgent in the tree
+    """
+    if root_agent is None:
+        from ..agent import root_agent
+
+    counter = count_tokens_exact if exact else count_tokens
+    report = []
+    for agent in _iter_llm_agents(root_agent):
+        active = agent.instruction if isinstance(agent.instruction, str) else ''
+        variants = _INSTRUCTIONS.get(agent.name, {})
+        full = variants.get(VARIANT_FULL, active)
+        compact = variants.get(VARIANT_COMPACT, active)
+        report.append(PromptBudget(
+            agent=agent.name,
+            variant=active_variant() if variants else 'inline',
+            full_tokens=counter(full),
+            compact_tokens=counter(compact),
+            instruction_tokens=counter(active),
+            tool_tokens=counter(_tool_declaration_text(agent)),
+            budget=PROMPT_BUDGETS.get(agent.name, DEFAULT_BUDGET),
+        ))
+    return report
@@ -0,0 +1,66 @@
+"""
+AI Tutor - Prompt Budget Report
+===============================
+
+Prints the per-agent system prompt budget for the live agent tree: tokens in
+the full and compact instruction variants, tool declarations, and whether each
+agent fits its budget.
+
+Usage:
+    python -m multiagent.prompts            # local token estimate
+    python -m multiagent.prompts --exact    # Gemini tokenizer (needs credentials)
+    python -m multiagent.prompts --json     # machine-readable output
+
+Exit status is 1 when any agent is over budget, so the report can gate CI.
+"""
+
+# Standard library imports
+import argparse
+import json
+from dataclasses import asdict
+from typing import Optional
+
+# Instruction pipeline
+from . import PromptBudget, budget_report
+
+
+def _print_report(report: list[PromptBudget]) -> None:
+    """Print the budget report as an aligned table."""
+    header = f"{'agent':<18}{'variant':<9}{'full':>7}{'compact':>9}{'saved':>8}{'tools':>7}{'total':>7}{'budget':>8}  status"
+    print(header)
+    print('-' * len(header))
+    for row in report:
+        status = '✓ ok' if row.within_budget else '✗ over'
+        print(
+            f"{row.agent:<18}{row.variant:<9}{row.full_tokens:>7}{row.compact_tokens:>9}"
+            f"{row.savings:>7.0%} {row.tool_tokens:>7}{row.total_tokens:>7}{row.budget:>8}  {status}"
+        )
+    print('-' * len(header))
+    print(f"System prompt tokens across all agents: {sum(row.total_tokens for row in report)}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Command-line entry point for the prompt budget report.
+
+    Returns:
+        int: 0 if every agent is within budget, 1 otherwise
+    """
+    parser = argparse.ArgumentParser(description='Per-agent system prompt token budgets.')
+    parser.add_argument('--exact', action='store_true', help='Count with the Gemini tokenizer (needs credentials)')
+    parser.add_argument('--json', action='store_true', help='Emit the report as JSON')
+    args = parser.parse_args(argv)
+
+    report = budget_report(exact=args.exact)
+    if args.json:
+        print(json.dumps(
+            [dict(asdict(row), total_tokens=row.total_tokens, within_budget=row.within_budget) for row in report],
+            indent=2,
+        ))
+    else:
+        _print_report(report)
+    return 0 if all(row.within_budget for row in report) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,335 @@
+"""
+AI Tutor - Prompt Prefix Context Cache
+======================================
+
+Gemini supports explicit context caching: a stable request prefix (system
+instruction + tool declarations) is uploaded once and later calls reference it
+by name, paying the cached-token rate instead of resending it. This module
+keeps one cache handle per distinct prefix and rewrites model calls to use it.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Stores:
+- GeminiContextCache: Creates handles with the Gemini caches API
+- LocalContextCache: In-process stand-in for tests (tests/test_context_cache.py)
+  and offline runs; handles can be resolved back to their prefix by a fake
+  transport
+
+Providers only accept caches above a minimum size (thousands of tokens for
+the Flash models), so prefixes below `min_tokens` are passed through untouched.
+Any failure to create a cache falls back to the uncached request.
+
+Configuration:
+    AITUTOR_CONTEXT_CACHE: 'gemini' (default), 'local' or 'off'
+    AITUTOR_CONTEXT_CACHE_MIN_TOKENS: Smallest prefix worth caching (default 4096)
+    AITUTOR_CONTEXT_CACHE_TTL: Handle lifetime in seconds (default 3600)
+"""
+
+# Standard library imports
+import abc
+import asyncio
+import hashlib
+import os
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+# Google AI imports
+from google.genai import types
+
+# Instruction pipeline
+from . import count_tokens
+from ..runtime import log
+
+logger = log.get_logger('context_cache')
+
+
+@dataclass
+class PromptPrefix:
+    """
+    The cacheable, call-invariant part of a model request.
+
+    Attributes:
+        model (str): Model the prefix is valid for
+        system_instruction (str): System instruction text
+        tools (list): Tool declarations sent with the request
+        key (str): Content hash identifying the prefix
+        tokens (int): Estimated token count of the prefix
+    """
+    model: str
+    system_instruction: str
+    tools: list = field(default_factory=list)
+    key: str = ''
+    tokens: int = 0
+
+    @classmethod
+    def from_config(cls, model: str, config: types.GenerateContentConfig) -> Optional['PromptPrefix']:
+        """
+        Extract the prefix from a request config.
+
+        Args:
+            model (str): Model name of the request
+            config (GenerateContentConfig): The request's generation config
+
+        Returns:
+            PromptPrefix | None: The prefix, or None if there is nothing to cache
+        """
+        instruction = config.system_instruction
+        if not isinstance(instruction, str) or not instruction:
+            return None
+        tools = list(config.tools or [])
+        tools_json = '\n'.join(tool.model_dump_json(exclude_none=True) for tool in tools)
+        digest = hashlib.sha256(f'{model}\0{instruction}\0{tools_json}'.encode('utf-8')).hexdigest()
+        return cls(
+            model=model,
+            system_instruction=instruction,
+            tools=tools,
+            key=digest,
+            tokens=count_tokens(instruction) + count_tokens(tools_json),
+        )
+
+
+@dataclass
+class CacheHandle:
+    """
+    A provider-side cached prefix that requests can reference by name.
+
+    Attributes:
+        name (str): Provider resource name (e.g. 'cachedContents/abc123')
+        key (str): PromptPrefix key the handle was created for
+        tokens (int): Tokens covered by the cache
+        expires_at (float): Wall-clock expiry time (epoch seconds)
+        hits (int): Number of requests that used the handle
+    """
+    name: str
+    key: str
+    tokens: int
+    expires_at: float
+    hits: int = 0
+
+
+# Live stores, so a forked process can drop locks bound to the parent's event loop
+_stores: 'weakref.WeakSet[ContextCacheStore]' = weakref.WeakSet()
+
+
+def _reset_after_fork() -> None:
+    """A forked server worker starts with fresh creation locks (handles stay valid)."""
+    for store in list(_stores):
+        store._locks.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class ContextCacheStore(abc.ABC):
+    """
+    Base store: one live handle per prefix, created once under a per-key lock.
+
+    Subclasses implement `_create` for a specific provider.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600, refresh_margin: int = 60, retry_after: int = 300):
+        """
+        Args:
+            ttl_seconds (int): Lifetime requested for new handles
+            refresh_margin (int): Recreate handles this close to expiry
+            retry_after (int): Back-off after a failed creation for the same prefix
+        """
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self._handles: dict[str, CacheHandle] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._failed_until: dict[str, float] = {}
+        self.created = 0
+        self.failures = 0
+        _stores.add(self)
+
+    async def get_or_create(self, prefix: PromptPrefix, call: Any = None) -> Optional[CacheHandle]:
+        """
+        Return a live handle for the prefix, creating it if needed.
+
+        Args:
+            prefix (PromptPrefix): The prefix to cache
+            call (ModelCall, optional): The triggering call (gives access to the client)
+
+        Returns:
+            CacheHandle | None: A usable handle, or None to send the call uncached
+        """
+        handle = self._live_handle(prefix.key)
+        if handle:
+            return handle
+        if self._failed_until.get(prefix.key, 0.0) > time.time():
+            return None
+
+        lock = self._locks.setdefault(prefix.key, asyncio.Lock())
+        async with lock:
+            handle = self._live_handle(prefix.key)
+            if handle:
+                return handle
+            try:
+                handle = await self._create(prefix, call)
+            except Exception as e:
+                logger.warning('context cache creation failed, sending uncached',
+                               extra={'prefix': prefix.key[:16], 'reason': str(e)})
+                self.failures += 1
+                self._failed_until[prefix.key] = time.time() + self.retry_after
+                return None
+            self._handles[prefix.key] = handle
+            self.created += 1
+            return handle
+
+    def _live_handle(self, key: str) -> Optional[CacheHandle]:
+        """Return the handle for a key if it is not about to expire."""
+        handle = self._handles.get(key)
+        if handle and handle.expires_at - self.refresh_margin > time.time():
+            return handle
+        return None
+
+    @abc.abstractmethod
+    async def _create(self, prefix: PromptPrefix, call: Any) -> CacheHandle:
+        """Create a provider-side handle for the prefix."""
+
+    def stats(self) -> dict:
+        """
+        Summarize store activity.
+
+        Returns:
+            dict: Live handles, cached tokens, hits, creations and failures
+        """
+        live = [handle for handle in self._handles.values() if handle.expires_at > time.time()]
+        return {
+            'handles': len(live),
+            'cached_tokens': sum(handle.tokens for handle in live),
+            'hits': sum(handle.hits for handle in self._handles.values()),
+            'created': self.created,
+            'failures': self.failures,
+        }
+
+
+class GeminiContextCache(ContextCacheStore):
+    """Creates handles through the Gemini caches API of the calling model's client."""
+
+    async def _create(self, prefix: PromptPrefix, call: Any) -> CacheHandle:
+        client = call.llm.api_client
+        cached = await client.aio.caches.create(
+            model=prefix.model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=prefix.system_instruction,
+                tools=prefix.tools or None,
+                ttl=f'{self.ttl_seconds}s',
+                display_name=f'aitutor-{prefix.key[:16]}',
+            ),
+        )
+        expires_at = cached.expire_time.timestamp() if cached.expire_time else time.time() + self.ttl_seconds
+        return CacheHandle(name=cached.name, key=prefix.key, tokens=prefix.tokens, expires_at=expires_at)
+
+
+class LocalContextCache(ContextCacheStore):
+    """
+    In-process stand-in that mints handles without any network call.
+
+    Fake transports can call `resolve` to recover the prefix a request refers to.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prefixes: dict[str, PromptPrefix] = {}
+
+    async def _create(self, prefix: PromptPrefix, call: Any) -> CacheHandle:
+        name = f'cachedContents/local-{prefix.key[:16]}'
+        self._prefixes[name] = prefix
+        return CacheHandle(name=name, key=prefix.key, tokens=prefix.tokens, expires_at=time.time() + self.ttl_seconds)
+
+    def resolve(self, name: str) -> Optional[PromptPrefix]:
+        """Return the prefix behind a locally minted handle name."""
+        return self._prefixes.get(name)
+
+
+class ContextCacheMiddleware:
+    """
+    Model-call middleware that swaps a cacheable prefix for its cache handle.
+
+    The system instruction and tool declarations are removed from the request
+    and replaced by `cached_content`; ADK keeps executing tools from its own
+    tools_dict, so function calling is unaffected.
+    """
+
+    def __init__(self, store: ContextCacheStore, min_tokens: int = 4096):
+        """
+        Args:
+            store (ContextCacheStore): Where handles are created and kept
+            min_tokens (int): Smallest prefix worth caching
+        """
+        self.store = store
+        self.min_tokens = min_tokens
+
+    async def __call__(self, call, call_next):
+        config = call.request.config
+        if config is None or config.cached_content:
+            return await call_next(call)
+
+        prefix = PromptPrefix.from_config(call.model, config)
+        if prefix is None or prefix.tokens < self.min_tokens:
+            return await call_next(call)
+
+        handle = await self.store.get_or_create(prefix, call)
+        if handle is None:
+            return await call_next(call)
+
+        handle.hits += 1
+        call.request.config = config.model_copy(update={
+            'cached_content': handle.name,
+            'system_instruction': None,
+            'tools': None,
+            'tool_config': None,
+        })
+        call.metadata['cached_content'] = handle.name
+        call.metadata['cached_tokens'] = handle.tokens
+        return await call_next(call)
+
+
+def build_store(mode: Optional[str] = None) -> Optional[ContextCacheStore]:
+    """
+    Create the store selected by configuration.
+
+    Args:
+        mode (str, optional): 'gemini', 'local' or 'off'; defaults to AITUTOR_CONTEXT_CACHE
+
+    Returns:
+        ContextCacheStore | None: The store, or None when caching is off
+    """
+    mode = (mode or os.getenv('AITUTOR_CONTEXT_CACHE', 'gemini')).strip().lower()
+    ttl = int(os.getenv('AITUTOR_CONTEXT_CACHE_TTL', '3600'))
+    if mode == 'gemini':
+        return GeminiContextCache(ttl_seconds=ttl)
+    if mode == 'local':
+        return LocalContextCache(ttl_seconds=ttl)
+    return None
+
+
+def enable(store: Optional[ContextCacheStore] = None, min_tokens: Optional[int] = None) -> Optional[ContextCacheMiddleware]:
+    """
+    Install the context cache middleware in the model call pipeline.
+
+    Args:
+        store (ContextCacheStore, optional): Store to use; defaults to build_store()
+        min_tokens (int, optional): Threshold; defaults to AITUTOR_CONTEXT_CACHE_MIN_TOKENS
+
+    Returns:
+        ContextCacheMiddleware | None: The installed middleware, or None when off
+    """
+    from ..runtime import model
+
+    store = store or build_store()
+    if store is None:
+        model.remove('context_cache')
+        return None
+    if min_tokens is None:
+        min_tokens = int(os.getenv('AITUTOR_CONTEXT_CACHE_MIN_TOKENS', '4096'))
+    middleware = ContextCacheMiddleware(store, min_tokens=min_tokens)
+    model.use('context_cache', middleware, order=80)
+    return middleware
@@ -0,0 +1,32 @@
+"""
+AI Tutor - Curriculum Retrieval
+===============================
+
+Local retrieval over course notes and reference material, so the subject
+tutors ground their explanations in the course's own definitions, notation
+and worked examples instead of long in-model recall. A lookup is a BM25
+search over a memory-mapped inverted index, optionally blended with
+memory-mapped dense vectors, and takes a few milliseconds.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Components:
+- ingest: Chunks markdown and text notes into passages (offline)
+- index: Builds and searches the memory-mapped BM25 + dense index (NumPy)
+- tools: The `retrieve_notes` tool given to the maths, physics and chemistry
+  agents when an index with notes for their subject exists
+
+Usage:
+    python -m multiagent.retrieval build notes/              # notes/<subject>/*.md
+    python -m multiagent.retrieval query "ideal gas law" --subject chemistry
+
+Configuration:
+    AITUTOR_NOTES_INDEX: Notes index directory (data/notes_index)
+    AITUTOR_NOTES_TOP_K: Passages returned per lookup (3)
+"""
+
+# Retrieval tool (NumPy is imported only once an index exists)
+from .tools import COMPACT_TOOL_DESCRIPTION, get_index, index_path, notes_tool
+
+__all__ = ['COMPACT_TOOL_DESCRIPTION', 'get_index', 'index_path', 'notes_tool']
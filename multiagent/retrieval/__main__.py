@@ -0,0 +1,88 @@
+"""
+AI Tutor - Notes Index Builder
+==============================
+
+Builds the notes index from a directory of course notes and runs test
+queries against it.
+
+Usage:
+    python -m multiagent.retrieval build notes/                    # subject = first directory
+    python -m multiagent.retrieval build physics.md --subject physics --no-dense
+    python -m multiagent.retrieval query "ideal gas law" --subject chemistry -k 5
+
+Both commands write to / read from AITUTOR_NOTES_INDEX (data/notes_index)
+unless --index is given.
+"""
+
+# Standard library imports
+import argparse
+import time
+from typing import Optional
+
+# Notes index
+from .index import NotesIndex, build_index
+from .ingest import collect_passages
+from .tools import index_path
+
+
+def _build(args: argparse.Namespace) -> int:
+    """Chunk the notes and write the index."""
+    started = time.perf_counter()
+    passages = collect_passages(args.notes, subject=args.subject)
+    if not passages:
+        print(f"❌ No notes found under {args.notes}")
+        return 1
+    meta = build_index(passages, args.index, dense=not args.no_dense, dimensions=args.dimensions)
+    print(f"✅ Indexed {meta['passages']} passages, {meta['terms']} terms "
+          f"in {time.perf_counter() - started:.1f}s -> {args.index}")
+    for subject in meta['subjects']:
+        print(f"   {subject}: {sum(passage.subject == subject for passage in passages)} passages")
+    if meta['embedder']:
+        print(f"   dense vectors: {meta['embedder']['name']} ({meta['embedder']['dimensions']} dimensions)")
+    return 0
+
+
+def _query(args: argparse.Namespace) -> int:
+    """Run one query and print the passages with the lookup latency."""
+    started = time.perf_counter()
+    index = NotesIndex(args.index)
+    opened = time.perf_counter()
+    hits = index.search(args.text, k=args.k, subject=args.subject)
+    finished = time.perf_counter()
+    print(f"📚 {len(hits)} passages (open {1000 * (opened - started):.1f} ms, "
+          f"search {1000 * (finished - opened):.2f} ms)")
+    for rank, hit in enumerate(hits, 1):
+        print(f"\n{rank}. [{hit.subject}] {hit.source}  (score {hit.score})")
+        print(f"   {hit.text[:300]}{' ...' if len(hit.text) > 300 else ''}")
+    return 0 if hits else 1
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Command-line entry point for building and querying the notes index.
+
+    Returns:
+        int: 0 on success, 1 if nothing was indexed or found
+    """
+    parser = argparse.ArgumentParser(description='Build and query the local course-notes index.')
+    parser.add_argument('--index', default=None, help='Index directory (default: AITUTOR_NOTES_INDEX or data/notes_index)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Index a directory (or file) of .md/.txt notes')
+    build.add_argument('notes', help='Notes directory; its first-level subdirectories name the subjects')
+    build.add_argument('--subject', help='Subject for every file instead of the directory name')
+    build.add_argument('--no-dense', action='store_true', help='Skip the dense-vector index (BM25 only)')
+    build.add_argument('--dimensions', type=int, default=256, help='Dense vector size (256)')
+
+    query = commands.add_parser('query', help='Search the index')
+    query.add_argument('text', help='The query')
+    query.add_argument('--subject', help='Only search this subject')
+    query.add_argument('-k', type=int, default=3, help='Passages returned (3)')
+
+    args = parser.parse_args(argv)
+    args.index = args.index or index_path()
+    return _build(args) if args.command == 'build' else _query(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
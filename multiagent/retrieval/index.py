@@ -0,0 +1,391 @@
+"""
+AI Tutor - Notes Index
+======================
+
+On-disk passage store with a BM25 inverted index and an optional dense-vector
+index. Every array is a NumPy .npy file opened with mmap_mode='r', so loading
+an index costs a few file opens regardless of its size, pages are shared
+between pre-fork workers through the page cache, and a lookup touches only
+the postings of the query terms.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Index directory layout:
+    meta.json                 Format version, counts, BM25 parameters, subjects, sources
+    vocab.json                Term -> term id
+    passages.bin              UTF-8 passage texts, concatenated
+    passage_offsets.npy       int64[n + 1] byte offsets into passages.bin
+    passage_subject.npy       uint8[n] subject id per passage
+    passage_source.npy        int32[n] source id per passage
+    doc_len.npy               int32[n] passage length in terms
+    postings_offsets.npy      int64[V + 1] slice of each term's postings
+    postings_docs.npy         int32[P] passage ids, grouped by term
+    postings_tf.npy           uint16[P] term frequency per posting
+    idf.npy                   float32[V] BM25 idf per term
+    dense.npy (optional)      float32[n, d] L2-normalized passage vectors
+
+Scoring:
+BM25 (k1=1.2, b=0.75) over the postings of the query terms. With a dense
+index, the BM25 scores (scaled to [0, 1]) are blended with cosine similarity
+so near-miss wordings ("thermodynamic" / "thermodynamics") still match.
+"""
+
+# Standard library imports
+import json
+import mmap
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+# Third-party imports
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Weight of the dense similarity in hybrid scores
+DENSE_WEIGHT = 0.3
+
+# Words too common to help ranking
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in into is it its of on or
+so than that the their then there these this to was what when where which who why
+will with you your
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+(?:['’][a-z]+)?")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into index terms: lower-cased words without stopwords, with
+    a light plural stemming so 'forces' matches 'force'.
+
+    Args:
+        text (str): Passage or query text
+
+    Returns:
+        list[str]: Terms in order of appearance
+    """
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        word = word.replace('’', "'").split("'")[0]
+        if word in STOPWORDS or not word:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+# Dense Vectors
+# =============
+
+class HashingEmbedder:
+    """
+    Local dense embedding by feature hashing of words and character trigrams.
+
+    Needs no model or network, so queries embed in microseconds; it captures
+    spelling and morphology overlap rather than meaning, which is what short
+    tutoring questions against course notes mostly need.
+    """
+
+    name = 'hashing-v1'
+
+    def __init__(self, dimensions: int = 256):
+        """
+        Args:
+            dimensions (int): Vector size
+        """
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> Iterable[str]:
+        for term in tokenize(text):
+            yield term
+            padded = f' {term} '
+            for start in range(len(padded) - 2):
+                yield padded[start:start + 3]
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """
+        Embed texts as L2-normalized vectors.
+
+        Args:
+            texts (list[str]): Texts to embed
+
+        Returns:
+            np.ndarray: float32[len(texts), dimensions]
+        """
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hash_feature(feature)
+                vectors[row, digest % self.dimensions] += 1.0 if digest & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-9)
+
+
+def hash_feature(feature: str) -> int:
+    """Stable 32-bit hash of a feature (Python's hash() is salted per process)."""
+    value = 2166136261
+    for byte in feature.encode('utf-8'):
+        value = ((value ^ byte) * 16777619) & 0xFFFFFFFF
+    return value
+
+
+EMBEDDERS = {HashingEmbedder.name: HashingEmbedder}
+
+
+# Building
+# ========
+
+@dataclass
+class Passage:
+    """
+    One chunk of course material.
+
+    Attributes:
+        text (str): Passage text
+        subject (str): Subject it belongs to ('physics', 'maths', ...)
+        source (str): File (and heading) it came from
+    """
+    text: str
+    subject: str
+    source: str
+
+
+def build_index(passages: list[Passage], directory: str, dense: bool = True, dimensions: int = 256) -> dict:
+    """
+    Write a notes index for a list of passages.
+
+    Args:
+        passages (list[Passage]): The chunked material
+        directory (str): Output directory (created if missing)
+        dense (bool): Also build the dense-vector index
+        dimensions (int): Dense vector size
+
+    Returns:
+        dict: The index metadata written to meta.json
+    """
+    os.makedirs(directory, exist_ok=True)
+    subjects = sorted({passage.subject for passage in passages})
+    sources = sorted({passage.source for passage in passages})
+    subject_ids = {subject: index for index, subject in enumerate(subjects)}
+    source_ids = {source: index for index, source in enumerate(sources)}
+
+    # Passage store
+    encoded = [passage.text.encode('utf-8') for passage in passages]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(body) for body in encoded], out=offsets[1:])
+    with open(os.path.join(directory, 'passages.bin'), 'wb') as file:
+        file.write(b''.join(encoded))
+    np.save(os.path.join(directory, 'passage_offsets.npy'), offsets)
+    np.save(os.path.join(directory, 'passage_subject.npy'),
+            np.array([subject_ids[passage.subject] for passage in passages], dtype=np.uint8))
+    np.save(os.path.join(directory, 'passage_source.npy'),
+            np.array([source_ids[passage.source] for passage in passages], dtype=np.int32))
+
+    # Inverted index
+    vocab: dict[str, int] = {}
+    postings: list[list[tuple[int, int]]] = []
+    doc_len = np.zeros(len(passages), dtype=np.int32)
+    for doc_id, passage in enumerate(passages):
+        terms = Counter(tokenize(passage.text))
+        doc_len[doc_id] = sum(terms.values())
+        for term, tf in terms.items():
+            term_id = vocab.setdefault(term, len(vocab))
+            if term_id == len(postings):
+                postings.append([])
+            postings[term_id].append((doc_id, min(tf, 65535)))
+
+    postings_offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+    np.cumsum([len(entries) for entries in postings], out=postings_offsets[1:])
+    postings_docs = np.fromiter((doc for entries in postings for doc, _ in entries), dtype=np.int32, count=int(postings_offsets[-1]))
+    postings_tf = np.fromiter((tf for entries in postings for _, tf in entries), dtype=np.uint16, count=int(postings_offsets[-1]))
+    document_frequency = np.diff(postings_offsets).astype(np.float64)
+    idf = np.log(1.0 + (len(passages) - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+
+    np.save(os.path.join(directory, 'doc_len.npy'), doc_len)
+    np.save(os.path.join(directory, 'postings_offsets.npy'), postings_offsets)
+    np.save(os.path.join(directory, 'postings_docs.npy'), postings_docs)
+    np.save(os.path.join(directory, 'postings_tf.npy'), postings_tf)
+    np.save(os.path.join(directory, 'idf.npy'), idf)
+    with open(os.path.join(directory, 'vocab.json'), 'w', encoding='utf-8') as file:
+        json.dump(vocab, file, ensure_ascii=False)
+
+    # Dense vectors
+    embedder = None
+    dense_path = os.path.join(directory, 'dense.npy')
+    if dense and passages:
+        embedder = HashingEmbedder(dimensions)
+        np.save(dense_path, embedder.embed([passage.text for passage in passages]))
+    elif os.path.exists(dense_path):
+        os.remove(dense_path)
+
+    meta = {
+        'format': FORMAT_VERSION,
+        'passages': len(passages),
+        'terms': len(vocab),
+        'avg_doc_len': float(doc_len.mean()) if len(passages) else 0.0,
+        'k1': K1,
+        'b': B,
+        'subjects': subjects,
+        'sources': sources,
+        'embedder': {'name': embedder.name, 'dimensions': dimensions} if embedder else None,
+    }
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as file:
+        json.dump(meta, file, ensure_ascii=False, indent=2)
+    return meta
+
+
+# Searching
+# =========
+
+@dataclass
+class Hit:
+    """
+    One retrieved passage.
+
+    Attributes:
+        text (str): Passage text
+        subject (str): Subject of the passage
+        source (str): File (and heading) it came from
+        score (float): Relevance score (higher is better)
+    """
+    text: str
+    subject: str
+    source: str
+    score: float
+
+
+class NotesIndex:
+    """
+    A memory-mapped notes index opened for searching.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): Index directory written by build_index
+
+        Raises:
+            FileNotFoundError: If the directory holds no index
+            ValueError: If the index was written by an incompatible version
+        """
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as file:
+            self.meta = json.load(file)
+        if self.meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported notes index format {self.meta.get('format')} in {directory}")
+        with open(os.path.join(directory, 'vocab.json'), encoding='utf-8') as file:
+            self.vocab: dict[str, int] = json.load(file)
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, name), mmap_mode='r')
+
+        self.passage_offsets = load('passage_offsets.npy')
+        self.passage_subject = load('passage_subject.npy')
+        self.passage_source = load('passage_source.npy')
+        self.doc_len = load('doc_len.npy')
+        self.postings_offsets = load('postings_offsets.npy')
+        self.postings_docs = load('postings_docs.npy')
+        self.postings_tf = load('postings_tf.npy')
+        self.idf = load('idf.npy')
+
+        with open(os.path.join(directory, 'passages.bin'), 'rb') as file:
+            self._text = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b''
+
+        self.embedder = None
+        self.dense = None
+        embedder = self.meta.get('embedder')
+        if embedder and embedder['name'] in EMBEDDERS:
+            self.embedder = EMBEDDERS[embedder['name']](embedder['dimensions'])
+            self.dense = load('dense.npy')
+
+        self.subjects: list[str] = self.meta['subjects']
+        self.sources: list[str] = self.meta['sources']
+        self.avg_doc_len = max(self.meta['avg_doc_len'], 1e-9)
+
+    def __len__(self) -> int:
+        return self.meta['passages']
+
+    def passage(self, doc_id: int) -> str:
+        """Text of one passage."""
+        start, end = int(self.passage_offsets[doc_id]), int(self.passage_offsets[doc_id + 1])
+        return self._text[start:end].decode('utf-8')
+
+    def bm25(self, query: str) -> np.ndarray:
+        """
+        BM25 score of every passage for a query.
+
+        Args:
+            query (str): The query text
+
+        Returns:
+            np.ndarray: float32[n] scores (0 for passages without query terms)
+        """
+        scores = np.zeros(len(self), dtype=np.float32)
+        k1, b = self.meta['k1'], self.meta['b']
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self.postings_offsets[term_id]), int(self.postings_offsets[term_id + 1])
+            docs = self.postings_docs[start:end]
+            tf = self.postings_tf[start:end].astype(np.float32)
+            norm = k1 * (1.0 - b + b * self.doc_len[docs] / self.avg_doc_len)
+            scores[docs] += self.idf[term_id] * tf * (k1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int = 3, subject: Optional[str] = None) -> list[Hit]:
+        """
+        Find the passages most relevant to a query.
+
+        Args:
+            query (str): The query text
+            k (int): Number of passages to return
+            subject (str, optional): Only search this subject's passages
+
+        Returns:
+            list[Hit]: Up to k passages, best first (none without any match)
+        """
+        if not len(self):
+            return []
+        scores = self.bm25(query)
+        lexical_match = scores > 0
+        if self.dense is not None:
+            top = float(scores.max())
+            if top > 0:
+                scores /= top
+            # float32 on purpose: NumPy has no BLAS path for float16 products
+            similarity = self.dense @ self.embedder.embed([query])[0]
+            scores = (1.0 - DENSE_WEIGHT) * scores + DENSE_WEIGHT * np.maximum(similarity, 0.0)
+            # Dense-only matches must be clearly similar to count
+            scores[~lexical_match & (similarity < 0.35)] = 0.0
+
+        if subject is not None:
+            if subject not in self.subjects:
+                return []
+            scores[self.passage_subject != self.subjects.index(subject)] = 0.0
+
+        candidates = np.flatnonzero(scores > 0)
+        if not len(candidates):
+            return []
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [
+            Hit(
+                text=self.passage(int(doc_id)),
+                subject=self.subjects[int(self.passage_subject[doc_id])],
+                source=self.sources[int(self.passage_source[doc_id])],
+                score=round(float(scores[doc_id]), 4),
+            )
+            for doc_id in ranked
+        ]
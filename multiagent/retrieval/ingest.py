@@ -0,0 +1,130 @@
+"""
+AI Tutor - Notes Ingestion
+==========================
+
+Turns course notes and reference material into passages for the notes
+index. Markdown and plain-text files are split at headings and blank lines,
+then packed into passages of roughly PASSAGE_WORDS words; each passage keeps
+the heading it sits under, so a retrieved chunk still says what it is about.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Subjects:
+A file's subject is the first directory under the notes root
+(notes/physics/optics.md -> 'physics'), or the subject given explicitly.
+The agents search only their own subject's passages.
+"""
+
+# Standard library imports
+import os
+import re
+from typing import Iterator, Optional
+
+# Notes index
+from .index import Passage
+
+# Files ingested
+NOTE_EXTENSIONS = ('.md', '.markdown', '.txt')
+
+# Target passage size in words; paragraphs are never split below it
+PASSAGE_WORDS = 180
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*\S)\s*$')
+
+
+def _blocks(text: str) -> Iterator[tuple[str, str]]:
+    """Yield (heading path, paragraph) pairs of a markdown or text document."""
+    headings: list[str] = []
+    paragraph: list[str] = []
+
+    def flush():
+        if paragraph:
+            block = ' '.join(' '.join(paragraph).split())
+            paragraph.clear()
+            if block:
+                return ' > '.join(headings), block
+        return None
+
+    for line in text.splitlines():
+        match = _HEADING.match(line)
+        if match or not line.strip():
+            block = flush()
+            if block:
+                yield block
+            if match:
+                level = len(match.group(1))
+                headings[level - 1:] = [match.group(2)]
+            continue
+        paragraph.append(line.strip())
+    block = flush()
+    if block:
+        yield block
+
+
+def chunk_document(text: str, subject: str, source: str, passage_words: int = PASSAGE_WORDS) -> list[Passage]:
+    """
+    Split one document into passages.
+
+    Consecutive paragraphs under the same heading are packed together up
+    to `passage_words` words.
+
+    Args:
+        text (str): Document text (markdown or plain)
+        subject (str): Subject of the document
+        source (str): Name the passages are attributed to
+        passage_words (int): Target passage size in words
+
+    Returns:
+        list[Passage]: The passages in document order
+    """
+    passages = []
+    current_heading, current, words = None, [], 0
+
+    def emit():
+        if current:
+            prefix = f'{current_heading}: ' if current_heading else ''
+            label = f'{source} > {current_heading}' if current_heading else source
+            passages.append(Passage(text=prefix + ' '.join(current), subject=subject, source=label))
+
+    for heading, block in _blocks(text):
+        size = len(block.split())
+        if current and (heading != current_heading or words + size > passage_words):
+            emit()
+            current, words = [], 0
+        current_heading = heading
+        current.append(block)
+        words += size
+    emit()
+    return passages
+
+
+def collect_passages(root: str, subject: Optional[str] = None) -> list[Passage]:
+    """
+    Chunk every note file under a directory (or a single file).
+
+    Args:
+        root (str): Notes directory or file
+        subject (str, optional): Subject for every file; defaults to the
+            first directory under root
+
+    Returns:
+        list[Passage]: All passages, files in sorted order
+    """
+    if os.path.isfile(root):
+        files = [(os.path.dirname(root), root)]
+    else:
+        files = [
+            (root, os.path.join(directory, name))
+            for directory, _, names in os.walk(root)
+            for name in names
+            if name.lower().endswith(NOTE_EXTENSIONS)
+        ]
+
+    passages = []
+    for base, path in sorted(files, key=lambda item: item[1]):
+        relative = os.path.relpath(path, base).replace(os.sep, '/')
+        file_subject = subject or (relative.split('/')[0] if '/' in relative else 'general')
+        with open(path, encoding='utf-8') as file:
+            passages.extend(chunk_document(file.read(), file_subject, relative))
+    return passages
@@ -0,0 +1,124 @@
+"""
+AI Tutor - Notes Retrieval Tool
+===============================
+
+The `retrieve_notes` tool of the maths, physics and chemistry agents. Each
+agent gets its own instance, bound to its subject, searching the shared
+notes index at AITUTOR_NOTES_INDEX.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+The index is opened once per process, at import time, before the pre-fork
+server forks its workers, so all workers share its pages. When no index has
+been built the agents simply get no retrieval tool.
+
+Configuration:
+    AITUTOR_NOTES_INDEX: Notes index directory (data/notes_index)
+    AITUTOR_NOTES_TOP_K: Passages returned per lookup (3)
+"""
+
+# Standard library imports
+import os
+import threading
+from typing import Callable, Optional
+
+# Runtime imports
+from ..runtime import log, metrics
+
+# Longest passage text handed to the model, in characters
+MAX_PASSAGE_CHARS = 700
+
+DEFAULT_INDEX_PATH = os.path.join('data', 'notes_index')
+
+logger = log.get_logger('retrieval')
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def index_path() -> str:
+    """Directory of the notes index (AITUTOR_NOTES_INDEX)."""
+    return os.getenv('AITUTOR_NOTES_INDEX') or DEFAULT_INDEX_PATH
+
+
+def get_index():
+    """
+    Open the notes index once per process.
+
+    Returns:
+        NotesIndex | None: The index, or None if none has been built (or it
+            cannot be opened)
+    """
+    global _index, _index_loaded
+    with _index_lock:
+        if not _index_loaded:
+            _index_loaded = True
+            path = index_path()
+            if os.path.exists(os.path.join(path, 'meta.json')):
+                try:
+                    # NumPy is only needed once an index exists
+                    from .index import NotesIndex
+                    _index = NotesIndex(path)
+                    logger.info('notes index opened', extra={'path': path, 'passages': len(_index)})
+                except (ImportError, OSError, ValueError, KeyError) as e:
+                    logger.warning('notes index unavailable', extra={'path': path, 'reason': str(e)})
+    return _index
+
+
+def notes_tool(subject: str) -> Optional[Callable[[str], dict]]:
+    """
+    Create the `retrieve_notes` tool for one subject.
+
+    Args:
+        subject (str): Subject the tool searches ('maths', 'physics', 'chemistry')
+
+    Returns:
+        Callable | None: The tool function, or None if the index holds no
+            notes for the subject
+    """
+    index = get_index()
+    if index is None or subject not in index.subjects:
+        return None
+    top_k = int(os.getenv('AITUTOR_NOTES_TOP_K', '3'))
+
+    def retrieve_notes(query: str) -> dict:
+        """
+        Search the course notes for passages relevant to a question.
+
+        Use this before answering questions about topics the course covers,
+        so explanations, definitions, notation and worked examples match the
+        course material. Cite the source of any passage you rely on.
+
+        Args:
+            query (str): What to look up, e.g. "conservation of momentum in collisions"
+
+        Returns:
+            dict: status ('success' or 'not_found') and passages, each with
+                source, text and score (higher is more relevant)
+        """
+        hits = index.search(query, k=top_k, subject=subject)
+        metrics.NOTES_RETRIEVALS.inc(subject=subject, outcome='hit' if hits else 'empty')
+        if not hits:
+            return {'status': 'not_found', 'passages': [], 'info': 'No course notes match; answer from general knowledge.'}
+        return {
+            'status': 'success',
+            'passages': [
+                {
+                    'source': hit.source,
+                    'text': hit.text if len(hit.text) <= MAX_PASSAGE_CHARS else hit.text[:MAX_PASSAGE_CHARS].rsplit(' ', 1)[0] + ' ...',
+                    'score': hit.score,
+                }
+                for hit in hits
+            ],
+        }
+
+    return retrieve_notes
+
+
+COMPACT_TOOL_DESCRIPTION = """
+    Search the course notes for passages relevant to a question (query: the topic
+    or question). Use before explaining course topics; cite passage sources.
+    Returns status and passages (source, text, score).
+    """
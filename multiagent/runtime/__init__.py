@@ -0,0 +1,31 @@
+"""
+AI Tutor - Agent Runtime
+========================
+
+Plumbing shared by every model call the agent tree makes. Agents keep being
+declared with plain model names; this package supplies what happens between
+the ADK flow and the Gemini API.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Modules:
+- model: TutorGemini and the model-call middleware pipeline
+- hooks: Composite ADK callbacks installed on every agent in the tree
+- context: Bounded conversation context with a rolling summary
+- deadline: Per-request time budget seen by every agent hop and model call
+- hedging: Duplicates of slow model calls to cut tail latency (opt-in)
+- speculation: Specialist calls started alongside the routing decision (opt-in)
+- resilience: Upstream rate limits, retries and per-model circuit breakers
+- degradation: Cheaper serving levels (cache, local tools, no news) while Gemini is slow or down
+- credentials: Least-loaded selection over a pool of API keys and projects
+- connections: One pooled (HTTP/2 when available) client for every model call
+- tracing: OpenTelemetry spans per request, agent hop, model and tool call
+- metrics: Prometheus registry fed by the finished spans
+- response_cache: Cached answers to the opening question of a conversation
+- session_store: Session service keeping conversation events in compact form
+- client_state: Signed conversation tokens for stateless (serverless) deployments
+- executor: Inline, thread-pool or process-pool execution of tool functions
+- log: Asynchronous, sampled JSON logging with request-id correlation
+- activity: Per-request agent activity trace returned to the UI
+"""
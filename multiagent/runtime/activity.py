@@ -0,0 +1,115 @@
+"""
+AI Tutor - Agent Activity Trace
+===============================
+
+Builds the compact per-request activity trace returned to the frontend with
+each answer: which agent produced each event, which tools ran, where control
+was transferred and how long every step took.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Timing:
+Each step's duration is the time between receiving the previous event from
+`runner.run_async` and receiving this one. For a tool call that is the model
+latency that produced it; for a tool result it is the tool's execution time.
+
+Trace format:
+    {
+        "trace_id": "5a8f...",          # matches the X-Trace-Id header and span export
+        "total_ms": 1834.2,
+        "hops": ["multiagent", "physics_agent"],
+        "steps": [
+            {"agent": "multiagent", "kind": "transfer", "name": "physics_agent", "at_ms": 812.4, "ms": 812.4},
+            {"agent": "physics_agent", "kind": "tool_call", "name": "lookup_physics_constant", ...},
+            {"agent": "physics_agent", "kind": "tool_result", "name": "lookup_physics_constant", "status": "success", ...},
+            {"agent": "physics_agent", "kind": "answer", ...}
+        ]
+    }
+"""
+
+# Standard library imports
+import time
+from typing import Optional
+
+# Google ADK imports
+from google.adk.events import Event
+
+
+class ActivityTrace:
+    """
+    Records the event stream of one runner invocation as a compact trace.
+    """
+
+    def __init__(self, trace_id: Optional[str] = None):
+        """
+        Args:
+            trace_id (str, optional): Trace id to correlate with exported spans
+        """
+        self.trace_id = trace_id
+        self.steps: list[dict] = []
+        self.hops: list[str] = []
+        self._started = time.perf_counter()
+        self._last = self._started
+
+    def record(self, event: Event) -> None:
+        """
+        Add the steps described by one runner event.
+
+        Args:
+            event (Event): An event yielded by `runner.run_async`
+        """
+        if event.partial or not event.author or event.author == 'user':
+            return
+
+        steps = []
+        for part in (event.content.parts if event.content and event.content.parts else []):
+            if part.function_call:
+                call = part.function_call
+                if call.name == 'transfer_to_agent':
+                    steps.append({'kind': 'transfer', 'name': (call.args or {}).get('agent_name', '')})
+                else:
+                    steps.append({'kind': 'tool_call', 'name': call.name})
+            elif part.function_response:
+                if part.function_response.name == 'transfer_to_agent':
+                    # Already shown as the transfer step
+                    continue
+                response = part.function_response.response or {}
+                step = {'kind': 'tool_result', 'name': part.function_response.name}
+                if isinstance(response, dict) and isinstance(response.get('status'), str):
+                    step['status'] = response['status']
+                steps.append(step)
+            elif part.text and not part.thought:
+                steps.append({'kind': 'answer' if event.is_final_response() else 'message'})
+                break
+        if not steps:
+            return
+
+        now = time.perf_counter()
+        elapsed, at = self._ms(now - self._last), self._ms(now - self._started)
+        self._last = now
+        if not self.hops or self.hops[-1] != event.author:
+            self.hops.append(event.author)
+
+        # Parts of one event arrive together: the first step carries the elapsed time
+        for index, step in enumerate(steps):
+            self.steps.append({'agent': event.author, **step, 'at_ms': at, 'ms': elapsed if index == 0 else 0.0})
+
+    @staticmethod
+    def _ms(seconds: float) -> float:
+        """Convert seconds to milliseconds rounded for display."""
+        return round(seconds * 1000, 1)
+
+    def to_dict(self) -> dict:
+        """
+        Return the trace in its JSON form.
+
+        Returns:
+            dict: trace_id, total_ms, hops and steps
+        """
+        return {
+            'trace_id': self.trace_id,
+            'total_ms': self._ms(time.perf_counter() - self._started),
+            'hops': list(self.hops),
+            'steps': list(self.steps),
+        }
@@ -0,0 +1,436 @@
+"""
+AI Tutor - Client-Held Conversation State
+=========================================
+
+Stateless mode for serverless deployments. On Vercel each invocation may land
+on a fresh instance, so a conversation kept in the instance's session store
+is lost between turns, and a shared store would add a network hop to every
+request. With this mode on, the conversation travels with the client instead:
+every answer returns a signed state token and the next question sends it back.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Token:
+- The conversation is reduced to the agent that answered last, a rolling
+  summary of older turns and the most recent turns verbatim (question,
+  answering agent and answer text; tool calls and payloads are not kept)
+- Serialized as compact JSON, zlib-compressed and base64url-encoded, then
+  signed with HMAC-SHA256: 'v1.<payload>.<signature>'
+- Turns beyond AITUTOR_CLIENT_STATE_TURNS, and further turns while the token
+  is larger than AITUTOR_CLIENT_STATE_MAX_BYTES, are folded into the summary
+- Tokens with another version, a bad signature, an expired issue time or an
+  oversized body (before or after decompression) are rejected and the
+  question starts a new conversation, as an unknown session id does
+
+Each request rebuilds a scratch session from the token, runs the agents on
+it, captures the new state and deletes the session, so nothing outlives the
+request on the instance.
+
+Metrics: aitutor_client_state_tokens_total (issued, restored, or the reason a
+token was rejected) and aitutor_client_state_token_bytes (see metrics.py).
+
+Configuration:
+    AITUTOR_CLIENT_STATE: 'on' to keep conversations in client tokens ('off' by default)
+    AITUTOR_CLIENT_STATE_SECRET: Signing secret; a comma-separated list verifies with
+        every entry and signs with the first (key rotation). Must be the same on
+        every instance; required when AITUTOR_CLIENT_STATE is on (the server
+        refuses to start without it)
+    AITUTOR_CLIENT_STATE_TURNS: Recent turns kept verbatim (default 3; with the summary
+        message this fills the default context window of AITUTOR_CONTEXT_TURNS=4)
+    AITUTOR_CLIENT_STATE_MAX_BYTES: Largest token issued or accepted (default 16384)
+    AITUTOR_CLIENT_STATE_TTL: Seconds a token stays valid (default 86400)
+"""
+
+# Standard library imports
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+# Runtime imports
+from . import metrics
+
+# Token format version; bump when the payload layout changes
+VERSION = 1
+_PREFIX = f'v{VERSION}.'
+
+# Decompressed payloads are never expanded past this multiple of the token size
+MAX_EXPANSION = 16
+
+# Per-field limits of the turns kept verbatim
+QUESTION_CHARS = 500
+ANSWER_CHARS = 1500
+
+# Upper bound for the summary of folded turns
+SUMMARY_CHARS = 1200
+
+# Leading line of the summary when it is replayed to the agents
+SUMMARY_HEADER = 'Summary of the earlier conversation:'
+
+
+class InvalidState(ValueError):
+    """
+    A client state token that cannot be used.
+
+    Attributes:
+        reason (str): malformed, version, signature, expired or too_large
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(f'Invalid conversation state token ({reason})')
+        self.reason = reason
+
+
+# Configuration
+# =============
+
+@dataclass
+class ClientStateConfig:
+    """
+    Settings of the client-held conversation state.
+
+    Attributes:
+        enabled (bool): Whether conversations are kept in client tokens
+        secrets (list[bytes]): Signing secrets; the first one signs
+        keep_turns (int): Recent turns kept verbatim
+        max_bytes (int): Largest token issued or accepted
+        ttl (float): Seconds a token stays valid
+        error (str): Why the mode cannot be turned on ('' if it can)
+    """
+    enabled: bool = False
+    secrets: list[bytes] = field(default_factory=list)
+    keep_turns: int = 3
+    max_bytes: int = 16384
+    ttl: float = 86400.0
+    error: str = ''
+
+    @classmethod
+    def from_env(cls) -> 'ClientStateConfig':
+        """
+        Build the settings from the environment.
+
+        Returns:
+            ClientStateConfig: Defaults overridden by the environment
+        """
+        enabled = os.getenv('AITUTOR_CLIENT_STATE', 'off').lower() in ('on', '1', 'true')
+        keys = [key.strip().encode('utf-8') for key in os.getenv('AITUTOR_CLIENT_STATE_SECRET', '').split(',') if key.strip()]
+        # A per-process secret would make every other instance (and every
+        # restart) reject the tokens, which is all this mode exists to avoid
+        error = 'AITUTOR_CLIENT_STATE_SECRET is not set' if enabled and not keys else ''
+        return cls(
+            enabled=enabled,
+            secrets=keys,
+            keep_turns=max(1, int(os.getenv('AITUTOR_CLIENT_STATE_TURNS', '3'))),
+            max_bytes=int(os.getenv('AITUTOR_CLIENT_STATE_MAX_BYTES', '16384')),
+            ttl=float(os.getenv('AITUTOR_CLIENT_STATE_TTL', '86400')),
+            error=error,
+        )
+
+
+CONFIG = ClientStateConfig.from_env()
+
+
+def enabled() -> bool:
+    """Whether conversations are kept in client tokens."""
+    return CONFIG.enabled and not CONFIG.error
+
+
+def requested() -> bool:
+    """Whether AITUTOR_CLIENT_STATE asks for the mode, configured or not."""
+    return CONFIG.enabled
+
+
+def validate() -> None:
+    """
+    Refuse to serve with the mode requested but not usable.
+
+    Raises:
+        RuntimeError: AITUTOR_CLIENT_STATE is on without a signing secret
+    """
+    if CONFIG.enabled and CONFIG.error:
+        raise RuntimeError(f'AITUTOR_CLIENT_STATE=on but {CONFIG.error}')
+
+
+def status() -> dict:
+    """Settings reported by /health."""
+    if CONFIG.error:
+        return {'error': CONFIG.error}
+    return {'turns': CONFIG.keep_turns, 'max_bytes': CONFIG.max_bytes, 'ttl_s': CONFIG.ttl}
+
+
+# Conversation State
+# ==================
+
+@dataclass
+class Turn:
+    """
+    One exchange kept verbatim.
+
+    Attributes:
+        question (str): The student's message
+        agent (str): Agent that gave the answer ('' if none did)
+        answer (str): The final answer text
+    """
+    question: str
+    agent: str = ''
+    answer: str = ''
+
+
+@dataclass
+class ConversationState:
+    """
+    What a conversation needs to continue on any instance.
+
+    Attributes:
+        summary (str): One line per folded turn, oldest first
+        turns (list[Turn]): Most recent turns, oldest first
+        issued_at (float): When the token was issued (epoch seconds)
+    """
+    summary: str = ''
+    turns: list[Turn] = field(default_factory=list)
+    issued_at: float = 0.0
+
+    @property
+    def agent(self) -> str:
+        """Agent that answered last, which a follow-up question returns to."""
+        for turn in reversed(self.turns):
+            if turn.agent:
+                return turn.agent
+        return ''
+
+    def fold(self, count: int = 1) -> None:
+        """
+        Move the oldest turns into the summary.
+
+        Args:
+            count (int): Number of turns to fold
+        """
+        lines = self.summary.splitlines() if self.summary else []
+        for turn in self.turns[:count]:
+            line = f'- Student asked: {_clip(turn.question, 160)}'
+            if turn.answer:
+                line += f' → Answer: {_clip(turn.answer, 240)}'
+            lines.append(line)
+        del self.turns[:count]
+        self.summary = _clip_summary(lines, SUMMARY_CHARS)
+
+
+def _clip(text: str, limit: int) -> str:
+    """Collapse whitespace and cut text to a character limit."""
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit].rstrip() + '…'
+
+
+def _clip_summary(lines: list[str], limit: int) -> str:
+    """Keep the newest summary lines that fit a character limit."""
+    while lines and sum(len(line) + 1 for line in lines) > limit:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+# Session Conversion
+# ==================
+
+def _text(content) -> str:
+    return ''.join(part.text or '' for part in content.parts or [] if not part.thought)
+
+
+def capture(session, previous: Optional[ConversationState] = None) -> ConversationState:
+    """
+    Reduce a session to its conversation state.
+
+    The session is one rebuilt by restore(), so the previous summary carries
+    over; the restored summary message itself is not captured as a turn.
+
+    Args:
+        session (Session): Session after the agents have answered
+        previous (ConversationState, optional): State the session was restored from
+
+    Returns:
+        ConversationState: The state to hand back to the client
+    """
+    state = ConversationState(summary=previous.summary if previous else '')
+    for event in session.events:
+        content = event.content
+        if content is None or not content.parts:
+            continue
+        if event.author == 'user':
+            if any(part.function_response for part in content.parts):
+                continue
+            text = _text(content)
+            if text and not text.startswith(SUMMARY_HEADER):
+                state.turns.append(Turn(question=_clip(text, QUESTION_CHARS)))
+        elif state.turns and not event.partial and not event.get_function_calls():
+            text = _text(content).strip()
+            if text:
+                state.turns[-1].agent = event.author
+                state.turns[-1].answer = text[:ANSWER_CHARS]
+    if len(state.turns) > CONFIG.keep_turns:
+        state.fold(len(state.turns) - CONFIG.keep_turns)
+    return state
+
+
+def restore(session_service, app_name: str, user_id: str, state: Optional[ConversationState] = None):
+    """
+    Create a scratch session holding a conversation state.
+
+    Each turn becomes a student message and an answer authored by the agent
+    that gave it, so a follow-up question goes to the same specialist; the
+    summary is replayed as a student message ahead of the turns.
+
+    Args:
+        session_service (BaseSessionService): Session service to create the session in
+        app_name (str): Application name
+        user_id (str): Owner of the session
+        state (ConversationState, optional): Conversation to restore (None for a new one)
+
+    Returns:
+        Session: The new session (delete it once the request is done)
+    """
+    from google.adk.events import Event
+    from google.genai import types
+
+    session = session_service.create_session(app_name=app_name, user_id=user_id)
+    if state is None:
+        return session
+    if state.summary:
+        session_service.append_event(session, Event(
+            invocation_id='e-' + Event.new_id(), author='user',
+            content=types.Content(role='user', parts=[types.Part(text=f'{SUMMARY_HEADER}\n{state.summary}')]),
+        ))
+    for turn in state.turns:
+        invocation_id = 'e-' + Event.new_id()
+        session_service.append_event(session, Event(
+            invocation_id=invocation_id, author='user',
+            content=types.Content(role='user', parts=[types.Part(text=turn.question)]),
+        ))
+        if turn.agent and turn.answer:
+            session_service.append_event(session, Event(
+                invocation_id=invocation_id, author=turn.agent,
+                content=types.Content(role='model', parts=[types.Part(text=turn.answer)]),
+            ))
+    return session
+
+
+# Token Encoding
+# ==============
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(key: bytes, message: str) -> str:
+    return _b64encode(hmac.new(key, message.encode('ascii'), hashlib.sha256).digest())
+
+
+def _serialize(state: ConversationState) -> str:
+    payload = {
+        'v': VERSION,
+        'iat': int(state.issued_at),
+        's': state.summary,
+        't': [[turn.question, turn.agent, turn.answer] for turn in state.turns],
+    }
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    body = _PREFIX + _b64encode(zlib.compress(raw, 9))
+    return f'{body}.{_sign(CONFIG.secrets[0], body)}'
+
+
+def encode(state: ConversationState) -> str:
+    """
+    Serialize, compress and sign a conversation state.
+
+    While the token is larger than the limit, the oldest turns are folded
+    into the summary, then the summary and finally the last answer are cut.
+
+    Args:
+        state (ConversationState): The state to hand to the client
+
+    Returns:
+        str: The signed token
+    """
+    state.issued_at = time.time()
+    token = _serialize(state)
+    while len(token) > CONFIG.max_bytes:
+        if len(state.turns) > 1:
+            state.fold()
+        elif state.summary:
+            lines = state.summary.splitlines()
+            state.summary = '\n'.join(lines[1:])
+        elif state.turns and len(state.turns[0].answer) > 80:
+            state.turns[0].answer = state.turns[0].answer[:len(state.turns[0].answer) // 2]
+        else:
+            state.turns.clear()
+        token = _serialize(state)
+    metrics.CLIENT_STATE_TOKENS.inc(outcome='issued')
+    metrics.CLIENT_STATE_BYTES.observe(len(token))
+    return token
+
+
+def decode(token: str) -> ConversationState:
+    """
+    Verify and deserialize a token issued by encode().
+
+    Args:
+        token (str): Token sent back by the client
+
+    Returns:
+        ConversationState: The conversation to continue
+
+    Raises:
+        InvalidState: If the token cannot be used (reason in .reason)
+    """
+    try:
+        state = _decode(token)
+    except InvalidState as e:
+        metrics.CLIENT_STATE_TOKENS.inc(outcome=e.reason)
+        raise
+    metrics.CLIENT_STATE_TOKENS.inc(outcome='restored')
+    return state
+
+
+def _decode(token: str) -> ConversationState:
+    if len(token) > CONFIG.max_bytes:
+        raise InvalidState('too_large')
+    if not token.startswith('v') or token.count('.') != 2:
+        raise InvalidState('malformed')
+    version, payload, signature = token.split('.')
+    if version != _PREFIX[:-1]:
+        raise InvalidState('version')
+    body = f'{version}.{payload}'
+    try:
+        signed = any(hmac.compare_digest(_sign(key, body), signature) for key in CONFIG.secrets)
+    except (TypeError, UnicodeEncodeError):
+        signed = False
+    if not signed:
+        raise InvalidState('signature')
+
+    try:
+        inflater = zlib.decompressobj()
+        raw = inflater.decompress(_b64decode(payload), CONFIG.max_bytes * MAX_EXPANSION)
+        if inflater.unconsumed_tail:
+            raise InvalidState('too_large')
+        data: dict[str, Any] = json.loads(raw)
+        if data.get('v') != VERSION:
+            raise InvalidState('version')
+        state = ConversationState(
+            summary=str(data.get('s', '')),
+            turns=[Turn(str(question), str(agent), str(answer)) for question, agent, answer in data.get('t', [])],
+            issued_at=float(data['iat']),
+        )
+    except InvalidState:
+        raise
+    except (ValueError, TypeError, KeyError, zlib.error):
+        raise InvalidState('malformed')
+    if CONFIG.ttl and time.time() - state.issued_at > CONFIG.ttl:
+        raise InvalidState('expired')
+    return state
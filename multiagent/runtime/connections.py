@@ -0,0 +1,416 @@
+"""
+AI Tutor - Shared Model Connections
+===================================
+
+One explicitly configured HTTP client for every model call in the process.
+Without it, each agent hop resolves a fresh Gemini model instance (ADK looks
+the model name up on every call), which builds its own google-genai client,
+its own httpx connection pool and its own SSL context: every hop pays DNS,
+TCP and TLS setup before the first byte of the prompt is sent.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+How it works:
+- One httpx transport per worker process holds the connection pool: HTTP/2
+  when the optional h2 package is installed (concurrent calls from all
+  agents multiplex over a few connections), HTTP/1.1 keep-alive otherwise.
+- Every google-genai client (the models' own, and the per-credential ones in
+  credentials.py) is built with HttpOptions pointing at that transport and
+  one shared SSL context; the models' default client is itself shared.
+- The pool is rebuilt in a forked worker or under a new event loop, since
+  connections cannot cross either.
+- warm() opens connections to every configured Gemini endpoint at startup,
+  so the first query does not pay for the handshakes either.
+- Connect, pool-wait, read and write timeouts apply to every model call
+  (google-genai sends calls without any timeout by default).
+
+Metrics: aitutor_http_connections (active, idle), aitutor_http_requests_inflight,
+aitutor_http_connections_opened_total and aitutor_http_connect_seconds (TCP
+plus TLS setup; see metrics.py); /health shows the pool.
+
+Configuration:
+    AITUTOR_HTTP_POOL: 'shared' (default) or 'off' (one client per model, as before)
+    AITUTOR_HTTP2: 'auto' (default: on when h2 is installed), 'on' or 'off'
+    AITUTOR_HTTP_MAX_CONNECTIONS: Connections per worker process (20)
+    AITUTOR_HTTP_MAX_KEEPALIVE: Idle connections kept open (20)
+    AITUTOR_HTTP_KEEPALIVE_EXPIRY: Seconds an idle connection is kept (120)
+    AITUTOR_HTTP_CONNECT_TIMEOUT: Seconds to open a connection (10)
+    AITUTOR_HTTP_POOL_TIMEOUT: Seconds to wait for a free connection (10)
+    AITUTOR_HTTP_READ_TIMEOUT: Seconds without response data before a call fails (120)
+    AITUTOR_HTTP_WARM: 'on' (default) or 'off', open connections at startup
+"""
+
+# Standard library imports
+import asyncio
+import importlib.util
+import os
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+# Third-party imports
+import certifi
+import httpx
+
+# Runtime imports
+from . import log, metrics
+
+GEMINI_API_URL = 'https://generativelanguage.googleapis.com/'
+VERTEX_API_URL = 'https://{location}-aiplatform.googleapis.com/'
+
+logger = log.get_logger('connections')
+
+
+@dataclass
+class HttpPoolConfig:
+    """
+    Settings of the shared model-call connection pool.
+
+    Attributes:
+        shared (bool): Whether model calls share one pool at all
+        http2 (bool): Whether to negotiate HTTP/2 (needs the h2 package)
+        max_connections (int): Connections per worker process
+        max_keepalive (int): Idle connections kept open
+        keepalive_expiry (float): Seconds an idle connection is kept
+        connect_timeout (float): Seconds to open a connection
+        pool_timeout (float): Seconds to wait for a free connection
+        read_timeout (float): Seconds without response data before a call fails
+        warm (bool): Whether to open connections at startup
+    """
+    shared: bool = True
+    http2: bool = True
+    max_connections: int = 20
+    max_keepalive: int = 20
+    keepalive_expiry: float = 120.0
+    connect_timeout: float = 10.0
+    pool_timeout: float = 10.0
+    read_timeout: float = 120.0
+    warm: bool = True
+
+    @classmethod
+    def from_env(cls) -> 'HttpPoolConfig':
+        """
+        Build the settings from the environment.
+
+        Returns:
+            HttpPoolConfig: Defaults overridden by the environment
+        """
+        have_h2 = importlib.util.find_spec('h2') is not None
+        http2 = os.getenv('AITUTOR_HTTP2', 'auto').lower()
+        if http2 == 'on' and not have_h2:
+            logger.warning('h2 package not installed, using http/1.1 keep-alive', extra={'setting': 'AITUTOR_HTTP2=on'})
+        return cls(
+            shared=os.getenv('AITUTOR_HTTP_POOL', 'shared').lower() != 'off',
+            http2=have_h2 and http2 != 'off',
+            max_connections=int(os.getenv('AITUTOR_HTTP_MAX_CONNECTIONS', '20')),
+            max_keepalive=int(os.getenv('AITUTOR_HTTP_MAX_KEEPALIVE', '20')),
+            keepalive_expiry=float(os.getenv('AITUTOR_HTTP_KEEPALIVE_EXPIRY', '120')),
+            connect_timeout=float(os.getenv('AITUTOR_HTTP_CONNECT_TIMEOUT', '10')),
+            pool_timeout=float(os.getenv('AITUTOR_HTTP_POOL_TIMEOUT', '10')),
+            read_timeout=float(os.getenv('AITUTOR_HTTP_READ_TIMEOUT', '120')),
+            warm=os.getenv('AITUTOR_HTTP_WARM', 'on').lower() != 'off',
+        )
+
+
+CONFIG = HttpPoolConfig.from_env()
+
+
+def _ssl_context() -> ssl.SSLContext:
+    """The SSL context google-genai would build for each client, built once."""
+    return ssl.create_default_context(
+        cafile=os.environ.get('SSL_CERT_FILE', certifi.where()),
+        capath=os.environ.get('SSL_CERT_DIR'),
+    )
+
+
+# Shared transport
+# ================
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """
+    The process-wide connection pool behind every google-genai async client.
+
+    Clients come and go (google-genai closes its httpx client when a Client is
+    garbage collected), so closing is a no-op here: the pool outlives them.
+    """
+
+    def __init__(self, config: HttpPoolConfig):
+        """
+        Args:
+            config (HttpPoolConfig): Pool size, protocol and timeouts
+        """
+        self.config = config
+        self.ssl_context = _ssl_context()
+        self.inflight = 0
+        self.opened = 0
+        self._pool: Optional[httpx.AsyncHTTPTransport] = None
+        self._owner: tuple = ()
+        self._lock = threading.Lock()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        """The pool for this process and event loop, built on first use."""
+        owner = (os.getpid(), id(asyncio.get_running_loop()))
+        with self._lock:
+            if self._pool is None or self._owner != owner:
+                # Connections of a parent process or a finished loop are unusable; drop them unclosed
+                self._pool = httpx.AsyncHTTPTransport(
+                    verify=self.ssl_context,
+                    http2=self.config.http2,
+                    limits=httpx.Limits(
+                        max_connections=self.config.max_connections,
+                        max_keepalive_connections=self.config.max_keepalive,
+                        keepalive_expiry=self.config.keepalive_expiry,
+                    ),
+                )
+                self._owner = owner
+            return self._pool
+
+    def _apply_timeouts(self, request: httpx.Request) -> None:
+        """Fill in the timeouts the caller left unset (google-genai sets none by default)."""
+        timeout = dict(request.extensions.get('timeout') or {})
+        defaults = {
+            'connect': self.config.connect_timeout,
+            'pool': self.config.pool_timeout,
+            'read': self.config.read_timeout,
+            'write': self.config.read_timeout,
+        }
+        for name, value in defaults.items():
+            if timeout.get(name) is None and value > 0:
+                timeout[name] = value
+        request.extensions['timeout'] = timeout
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """
+        Send one request over the shared pool.
+
+        Args:
+            request (httpx.Request): The request built by a google-genai client
+
+        Returns:
+            httpx.Response: The response; the request counts as in flight
+                until its body has been read or closed
+        """
+        transport = self._transport()
+        self._apply_timeouts(request)
+        request.extensions['trace'] = _ConnectTimer(self).trace
+        self._started(transport)
+        try:
+            response = await transport.handle_async_request(request)
+        except BaseException:
+            self._finished(transport)
+            raise
+        response.stream = _CountedStream(response.stream, lambda: self._finished(transport))
+        return response
+
+    def _started(self, transport: httpx.AsyncHTTPTransport) -> None:
+        """Count a request entering the pool."""
+        self.inflight += 1
+        metrics.HTTP_INFLIGHT.set(self.inflight)
+
+    def _finished(self, transport: httpx.AsyncHTTPTransport) -> None:
+        """Count a request leaving the pool and export the connection counts."""
+        self.inflight -= 1
+        metrics.HTTP_INFLIGHT.set(self.inflight)
+        self._record_pool(transport)
+
+    def _record_pool(self, transport: httpx.AsyncHTTPTransport) -> None:
+        """Export how many pool connections are serving requests and how many are idle."""
+        counts = self.connections(transport)
+        metrics.HTTP_CONNECTIONS.set(counts['active'], state='active')
+        metrics.HTTP_CONNECTIONS.set(counts['idle'], state='idle')
+
+    def connections(self, transport: Optional[httpx.AsyncHTTPTransport] = None) -> dict:
+        """
+        Count the pool's open connections.
+
+        Args:
+            transport (httpx.AsyncHTTPTransport, optional): Pool to inspect;
+                defaults to the current one
+
+        Returns:
+            dict: 'active' and 'idle' connection counts
+        """
+        transport = transport or self._pool
+        pool = getattr(transport, '_pool', None)
+        connections = list(getattr(pool, 'connections', ()))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {'active': len(connections) - idle, 'idle': idle}
+
+    async def aclose(self) -> None:
+        """Ignore closes from individual clients; see close()."""
+
+    async def close(self) -> None:
+        """Close the pool's connections (server shutdown)."""
+        pool, self._pool = self._pool, None
+        if pool is not None and self._owner == (os.getpid(), id(asyncio.get_running_loop())):
+            await pool.aclose()
+
+
+class _CountedStream(httpx.AsyncByteStream):
+    """Response body that reports back once it has been read or closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self.stream = stream
+        self.on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self.stream.aclose()
+        finally:
+            if self.on_close is not None:
+                self.on_close, on_close = None, self.on_close
+                on_close()
+
+
+class _ConnectTimer:
+    """
+    Per-request httpcore trace callback timing a new connection's setup.
+
+    Only requests that open a connection see the connect events, so requests
+    served by a pooled connection cost nothing here.
+    """
+
+    def __init__(self, transport: SharedTransport):
+        self.transport = transport
+        self.started = 0.0
+
+    async def trace(self, event: str, info: dict) -> None:
+        """
+        Args:
+            event (str): httpcore event name, e.g. 'connection.connect_tcp.started'
+            info (dict): Event details (unused)
+        """
+        if event == 'connection.connect_tcp.started':
+            self.started = time.perf_counter()
+        elif event == 'connection.connect_tcp.complete':
+            self.transport.opened += 1
+            metrics.HTTP_CONNECTIONS_OPENED.inc()
+        elif event == 'connection.start_tls.complete' and self.started:
+            metrics.HTTP_CONNECT_SECONDS.observe(time.perf_counter() - self.started)
+            self.started = 0.0
+
+
+TRANSPORT = SharedTransport(CONFIG)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# Client construction
+# ===================
+
+def http_options(headers: Optional[dict] = None, **options) -> Any:
+    """
+    google-genai HttpOptions that send calls over the shared pool.
+
+    Args:
+        headers (dict, optional): Request headers (copied, google-genai adds to them)
+        **options: Other HttpOptions fields (e.g. api_version)
+
+    Returns:
+        google.genai.types.HttpOptions: Options for a genai.Client
+    """
+    from google.genai import types
+
+    if not CONFIG.shared:
+        return types.HttpOptions(headers=dict(headers or {}), **options)
+    return types.HttpOptions(
+        headers=dict(headers or {}),
+        client_args={'verify': TRANSPORT.ssl_context},
+        async_client_args={'verify': TRANSPORT.ssl_context, 'transport': TRANSPORT},
+        **options,
+    )
+
+
+def genai_client(headers: Optional[dict] = None) -> Any:
+    """
+    The process-wide google-genai client for the environment's credential.
+
+    Every model instance uses it, so the client (and its sync httpx client)
+    is built once instead of once per model call.
+
+    Args:
+        headers (dict, optional): Tracking headers, used on first build
+
+    Returns:
+        google.genai.Client: The shared client
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google import genai
+
+            _client = genai.Client(http_options=http_options(headers))
+        return _client
+
+
+# Warm-up
+# =======
+
+def endpoints() -> list[str]:
+    """
+    Base URLs of the Gemini endpoints the configured credentials call.
+
+    Returns:
+        list[str]: Gemini API and/or Vertex AI regional URLs, without duplicates
+    """
+    from .credentials import credentials_from_env
+
+    urls = []
+    for credential in credentials_from_env():
+        url = GEMINI_API_URL if credential.api_key else VERTEX_API_URL.format(location=credential.location)
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+
+async def warm(urls: Optional[list[str]] = None) -> int:
+    """
+    Open a pooled connection to each Gemini endpoint ahead of the first query.
+
+    A bare HEAD request is enough: the answer does not matter, the TCP and TLS
+    (and HTTP/2) handshakes do. Failures are reported and otherwise ignored.
+
+    Args:
+        urls (list[str], optional): Endpoints to warm; defaults to endpoints()
+
+    Returns:
+        int: Number of endpoints reached
+    """
+    if not CONFIG.shared:
+        return 0
+    urls = endpoints() if urls is None else urls
+    reached = 0
+    async with httpx.AsyncClient(transport=TRANSPORT, timeout=CONFIG.connect_timeout) as client:
+        for url in urls:
+            try:
+                await client.head(url)
+                reached += 1
+            except httpx.HTTPError as error:
+                logger.warning('pre-connect failed', extra={'url': url, 'reason': repr(error)})
+    if reached:
+        logger.info('pre-connected', extra={'endpoints': reached, 'protocol': 'http/2' if CONFIG.http2 else 'http/1.1'})
+    return reached
+
+
+def status() -> dict:
+    """
+    Pool settings and usage for /health.
+
+    Returns:
+        dict: Protocol, limits, open connections and requests in flight
+    """
+    return {
+        'protocol': 'h2' if CONFIG.http2 else 'http/1.1',
+        'max_connections': CONFIG.max_connections,
+        'connections': TRANSPORT.connections(),
+        'opened': TRANSPORT.opened,
+        'inflight': TRANSPORT.inflight,
+    }
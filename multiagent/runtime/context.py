@@ -0,0 +1,424 @@
+"""
+AI Tutor - Bounded Conversation Context
+=======================================
+
+ADK replays a session's whole event history into every model call, so with
+sessions that persist across turns the input size (and cost and latency) of
+each turn grows with the length of the conversation. This middleware keeps
+the replayed context bounded.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+For each model call it:
+- Splits the replayed contents into conversation turns (a turn starts at a
+  student message)
+- Keeps the current turn untouched and the most recent N earlier turns verbatim
+- Folds older turns into a rolling summary that is extended incrementally and
+  stored per agent in session state, so each turn only summarizes what is new
+- Folds further turns while the kept context exceeds the agent's token budget
+- Drops bulky tool payloads (e.g. the `available_elements` list returned by
+  elements_lookup) from earlier turns
+
+Configuration:
+    AITUTOR_CONTEXT_TURNS: Earlier turns kept verbatim (default 4)
+    AITUTOR_CONTEXT_BUDGET: Default per-agent context budget in tokens (default 2000)
+    AITUTOR_CONTEXT_SUMMARIZER: 'extractive' (default, no model call) or 'model'
+"""
+
+# Standard library imports
+import hashlib
+import json
+import os
+import re
+from typing import Any, Awaitable, Callable, Optional
+
+# Google AI imports
+from google.genai import types
+
+# Google ADK imports
+from google.adk.models import LlmRequest
+
+# Runtime imports
+from . import hooks, log
+from .model import ModelCall, call_model
+from ..prompts import count_tokens
+
+
+logger = log.get_logger('context')
+
+
+# Context Budget Configuration
+# ============================
+
+DEFAULT_TURNS = 4
+DEFAULT_CONTEXT_BUDGET = 2000
+
+# Per-agent overrides; the orchestrator sees every specialist's output
+CONTEXT_BUDGETS = {
+    'multiagent': 3000,
+}
+
+# Upper bound for the rolling summary itself
+SUMMARY_BUDGET = 400
+
+# Tool result keys that are never worth replaying in later turns
+BULKY_KEYS = {'available_elements'}
+
+# Limits applied to the remaining tool payloads of earlier turns
+MAX_LIST_ITEMS = 8
+MAX_PAYLOAD_CHARS = 400
+
+# Session state key holding the rolling summaries, one entry per agent
+STATE_KEY = 'aitutor_context'
+
+# Model used by the 'model' summarizer
+SUMMARY_MODEL = 'gemini-2.0-flash-001'
+
+# ModelCall.metadata['purpose'] of summarization calls (not an agent step)
+SUMMARY_PURPOSE = 'context_summary'
+
+_FOREIGN_PREFIX = 'For context:'
+_TOOL_RESULT = re.compile(r'^(\[[^\]]+\] `[^`]+` tool returned result: )(.*)$', re.DOTALL)
+
+
+def context_budget(agent_name: str) -> int:
+    """
+    Return the replayed-context token budget for an agent.
+
+    Args:
+        agent_name (str): Name of the agent making the call
+
+    Returns:
+        int: Token budget for the contents sent with each call
+    """
+    return CONTEXT_BUDGETS.get(agent_name, int(os.getenv('AITUTOR_CONTEXT_BUDGET', DEFAULT_CONTEXT_BUDGET)))
+
+
+# Content Helpers
+# ===============
+
+def content_tokens(content: types.Content) -> int:
+    """
+    Estimate the tokens of one content entry, including function parts.
+
+    Args:
+        content (Content): A request content entry
+
+    Returns:
+        int: Estimated token count
+    """
+    total = 0
+    for part in content.parts or []:
+        if part.text:
+            total += count_tokens(part.text)
+        elif part.function_call:
+            total += count_tokens(json.dumps(part.function_call.args, default=str))
+        elif part.function_response:
+            total += count_tokens(json.dumps(part.function_response.response, default=str))
+    return total
+
+
+def compact_payload(value: Any) -> Any:
+    """
+    Shrink a tool result for replay: drop bulky keys, cap lists and strings.
+
+    Args:
+        value (Any): A tool response (usually a dict)
+
+    Returns:
+        Any: The compacted value
+    """
+    if isinstance(value, dict):
+        return {
+            key: (f'<{len(item)} items omitted>' if key in BULKY_KEYS and hasattr(item, '__len__') else compact_payload(item))
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        items = [compact_payload(item) for item in value[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            items.append(f'<{len(value) - MAX_LIST_ITEMS} more omitted>')
+        return items
+    if isinstance(value, str) and len(value) > MAX_PAYLOAD_CHARS:
+        return value[:MAX_PAYLOAD_CHARS] + '…'
+    return value
+
+
+def compact_content(content: types.Content) -> types.Content:
+    """
+    Return a copy of a content entry with its tool payloads compacted.
+
+    Handles both native function responses and the text form ADK uses when
+    replaying another agent's tool results ("... tool returned result: {...}").
+
+    Args:
+        content (Content): A content entry from an earlier turn
+
+    Returns:
+        Content: The compacted entry (the original is not modified)
+    """
+    parts, changed = [], False
+    for part in content.parts or []:
+        if part.function_response and part.function_response.response:
+            response = compact_payload(part.function_response.response)
+            part = part.model_copy(update={
+                'function_response': part.function_response.model_copy(update={'response': response}),
+            })
+            changed = True
+        elif part.text and len(part.text) > MAX_PAYLOAD_CHARS and (match := _TOOL_RESULT.match(part.text)):
+            part = types.Part(text=f'{match.group(1)}{match.group(2)[:MAX_PAYLOAD_CHARS]}… (truncated)')
+            changed = True
+        parts.append(part)
+    return content.model_copy(update={'parts': parts}) if changed else content
+
+
+def _is_turn_start(content: types.Content) -> bool:
+    """Whether a content entry is a student message (and so starts a turn)."""
+    if content.role != 'user' or not content.parts:
+        return False
+    if any(part.function_response for part in content.parts):
+        return False
+    first = content.parts[0].text
+    return bool(first) and first != _FOREIGN_PREFIX
+
+
+def split_turns(contents: list[types.Content]) -> list[list[types.Content]]:
+    """
+    Group request contents into conversation turns.
+
+    Args:
+        contents (list[Content]): Contents replayed by ADK for one call
+
+    Returns:
+        list[list[Content]]: Turns in order; anything before the first student
+        message is attached to the first turn
+    """
+    turns: list[list[types.Content]] = []
+    for content in contents:
+        if not turns or _is_turn_start(content):
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+def _turn_digest(turn: list[types.Content]) -> str:
+    """Identify a turn by its opening message."""
+    text = ''.join(part.text or '' for part in turn[0].parts or [])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _clip(text: str, limit: int) -> str:
+    """Collapse whitespace and cut text to a character limit."""
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit].rstrip() + '…'
+
+
+# Summarizers
+# ===========
+# A summarizer extends the previous summary with newly folded turns:
+# async (previous_summary, turns, call) -> new_summary
+
+Summarizer = Callable[[str, list[list[types.Content]], ModelCall], Awaitable[str]]
+
+
+def _clip_summary(summary: str, budget: int = SUMMARY_BUDGET) -> str:
+    """Keep the newest summary lines that fit the summary budget."""
+    lines = summary.splitlines()
+    while len(lines) > 1 and count_tokens('\n'.join(lines)) > budget:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+async def extractive_summarizer(previous: str, turns: list[list[types.Content]], call: ModelCall) -> str:
+    """
+    Summarize turns as one 'question → answer' line each, without a model call.
+
+    Args:
+        previous (str): Summary of the turns folded so far
+        turns (list[list[Content]]): Newly folded turns
+        call (ModelCall): The call being prepared (unused)
+
+    Returns:
+        str: The extended summary, clipped to SUMMARY_BUDGET
+    """
+    lines = previous.splitlines() if previous else []
+    for turn in turns:
+        question = ' '.join(part.text or '' for part in turn[0].parts or [])
+        answer = ''
+        for content in turn[1:]:
+            for part in content.parts or []:
+                if part.text and part.text != _FOREIGN_PREFIX and not _TOOL_RESULT.match(part.text):
+                    answer = part.text
+        line = f'- Student asked: {_clip(question, 160)}'
+        if answer:
+            line += f' → Answer: {_clip(answer, 240)}'
+        lines.append(line)
+    return _clip_summary('\n'.join(lines))
+
+
+async def model_summarizer(previous: str, turns: list[list[types.Content]], call: ModelCall) -> str:
+    """
+    Fold turns into the summary with a short Gemini call.
+
+    The call goes through the model-call pipeline like any agent step, so it
+    is traced, rate limited, circuit broken, spread over the credential pool
+    and bounded by the request's deadline. Falls back to the extractive
+    summarizer if the call fails.
+
+    Args:
+        previous (str): Summary of the turns folded so far
+        turns (list[list[Content]]): Newly folded turns
+        call (ModelCall): The call being prepared (its model instance is reused)
+
+    Returns:
+        str: The extended summary
+    """
+    transcript = await extractive_summarizer('', turns, call)
+    prompt = (
+        'Update the running summary of a tutoring conversation with the new exchanges. '
+        'Keep facts, numbers and results the student may refer back to. '
+        f'Answer with the updated summary only, at most {SUMMARY_BUDGET // 2} words.\n\n'
+        f'Running summary:\n{previous or "(empty)"}\n\nNew exchanges:\n{transcript}'
+    )
+    summary_call = ModelCall(
+        request=LlmRequest(
+            model=SUMMARY_MODEL,
+            contents=[types.Content(role='user', parts=[types.Part(text=prompt)])],
+            config=types.GenerateContentConfig(max_output_tokens=SUMMARY_BUDGET),
+        ),
+        model=SUMMARY_MODEL,
+        llm=call.llm,
+        metadata={'purpose': SUMMARY_PURPOSE},
+    )
+    try:
+        response = await call_model(summary_call)
+        parts = response.content.parts if response.content else []
+        text = ''.join(part.text or '' for part in parts or []).strip()
+        if text:
+            return _clip_summary(text)
+    except Exception as e:
+        logger.warning('context summarization failed, using extractive summary', extra={'reason': str(e)})
+    return await extractive_summarizer(previous, turns, call)
+
+
+SUMMARIZERS: dict[str, Summarizer] = {
+    'extractive': extractive_summarizer,
+    'model': model_summarizer,
+}
+
+
+# Context Window Middleware
+# =========================
+
+class ContextWindowMiddleware:
+    """
+    Model-call middleware that bounds the replayed conversation context.
+    """
+
+    def __init__(self, keep_turns: int = DEFAULT_TURNS, summarizer: Summarizer = extractive_summarizer):
+        """
+        Args:
+            keep_turns (int): Earlier turns kept verbatim before folding
+            summarizer (Summarizer): How folded turns are added to the summary
+        """
+        self.keep_turns = keep_turns
+        self.summarizer = summarizer
+
+    async def __call__(self, call: ModelCall, call_next):
+        turns = split_turns(call.request.contents)
+        if len(turns) <= 1:
+            return await call_next(call)
+
+        callback_context = hooks.current_context()
+        agent_name = callback_context.agent_name if callback_context else call.model
+        budget = context_budget(agent_name)
+
+        current = turns[-1]
+        history = [[compact_content(content) for content in turn] for turn in turns[:-1]]
+        tokens = [sum(content_tokens(content) for content in turn) for turn in history]
+        current_tokens = sum(content_tokens(content) for content in current)
+
+        # Fold the turns beyond the verbatim window, then more while over budget
+        folded = max(0, len(history) - self.keep_turns)
+        while folded < len(history) and sum(tokens[folded:]) + current_tokens + SUMMARY_BUDGET > budget:
+            folded += 1
+
+        summary = ''
+        if folded:
+            summary, folded = await self._summary(call, callback_context, agent_name, history, folded)
+
+        contents = [content for turn in history[folded:] for content in turn] + current
+        if summary:
+            contents.insert(0, types.Content(role='user', parts=[
+                types.Part(text=_FOREIGN_PREFIX),
+                types.Part(text=f'Summary of the earlier conversation:\n{summary}'),
+            ]))
+
+        call.metadata['context'] = {
+            'turns': len(turns),
+            'folded_turns': folded,
+            'tokens_before': sum(content_tokens(content) for turn in turns for content in turn),
+            'tokens_after': sum(content_tokens(content) for content in contents),
+        }
+        call.request.contents = contents
+        return await call_next(call)
+
+    async def _summary(self, call, callback_context, agent_name, history, folded) -> tuple[str, int]:
+        """
+        Return the rolling summary covering at least `folded` turns.
+
+        Reuses the summary stored in session state and only summarizes the
+        turns folded since; without an agent context it is rebuilt each call.
+
+        Returns:
+            tuple[str, int]: The summary and the number of turns it covers
+        """
+        stored = {}
+        if callback_context is not None:
+            stored = (callback_context.state.get(STATE_KEY) or {}).get(agent_name) or {}
+
+        start, previous = 0, ''
+        covered = stored.get('turns', 0)
+        if 0 < covered <= len(history) and stored.get('digest') == _turn_digest(history[covered - 1]):
+            start, previous = covered, stored.get('summary', '')
+            folded = max(folded, covered)
+
+        if start == folded:
+            return previous, folded
+
+        summarizer = self.summarizer if callback_context is not None else extractive_summarizer
+        summary = await summarizer(previous, history[start:folded], call)
+
+        if callback_context is not None:
+            summaries = dict(callback_context.state.get(STATE_KEY) or {})
+            summaries[agent_name] = {
+                'turns': folded,
+                'digest': _turn_digest(history[folded - 1]),
+                'summary': summary,
+            }
+            callback_context.state[STATE_KEY] = summaries
+        return summary, folded
+
+
+def enable(keep_turns: Optional[int] = None, summarizer: Optional[str] = None) -> ContextWindowMiddleware:
+    """
+    Install the context window middleware in the model call pipeline.
+
+    Args:
+        keep_turns (int, optional): Defaults to AITUTOR_CONTEXT_TURNS
+        summarizer (str, optional): 'extractive' or 'model'; defaults to AITUTOR_CONTEXT_SUMMARIZER
+
+    Returns:
+        ContextWindowMiddleware: The installed middleware
+    """
+    from . import model
+
+    if keep_turns is None:
+        keep_turns = int(os.getenv('AITUTOR_CONTEXT_TURNS', DEFAULT_TURNS))
+    summarizer = summarizer or os.getenv('AITUTOR_CONTEXT_SUMMARIZER', 'extractive')
+    middleware = ContextWindowMiddleware(
+        keep_turns=keep_turns,
+        summarizer=SUMMARIZERS.get(summarizer.strip().lower(), extractive_summarizer),
+    )
+    model.use('context_window', middleware, order=60)
+    return middleware
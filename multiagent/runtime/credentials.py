@@ -0,0 +1,426 @@
+"""
+AI Tutor - Upstream Credential Pool
+===================================
+
+Spreads model calls over several Gemini API keys and Vertex AI projects, so
+aggregate throughput grows with the number of credentials provisioned
+instead of being capped by one key's quota.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Selection:
+Every attempt of a model call (retries included) goes to the least-loaded
+credential: the one with the most rate-limit headroom for the model, scaled
+down by its recent error rate and by the calls it already has in flight.
+When no credential has capacity right now, the call waits for the first one
+that will (up to AITUTOR_THROTTLE_MAX_WAIT and never past the request
+deadline) or is rejected as Throttled.
+
+Taking credentials out:
+A 429 from a credential takes it out of rotation for the server's retry
+delay (at least AITUTOR_CREDENTIAL_COOLDOWN); a 401/403 (revoked key,
+missing permission) takes it out for AITUTOR_CREDENTIAL_REJECT_COOLDOWN. The
+resilience layer's retry then lands on another credential.
+
+Quotas:
+With a pool, AITUTOR_GEMINI_RPM and AITUTOR_GEMINI_TPM describe one
+credential's quota per model and are enforced here, per credential; the
+resilience layer keeps retries and circuit breaking but leaves rate limiting
+to the pool. A call cancelled while waiting for capacity gives its
+reservation back; a sent call keeps its request slot and replaces its token
+estimate with the reported usage (none when it failed or was cancelled). Calls that use a Gemini context cache stay on the default
+credential, which created the cache.
+
+Metrics: aitutor_upstream_credential_calls_total (outcome ok / throttled /
+rejected / error), aitutor_upstream_credential_tokens_total and
+aitutor_upstream_credential_available (see metrics.py); /health lists each
+credential's in-flight calls, error rate and cool-down.
+
+Configuration (the pool is used when more than one credential is configured):
+    GOOGLE_AI_API_KEY / GOOGLE_CLOUD_PROJECT: The default credential
+    AITUTOR_GEMINI_API_KEYS: Comma-separated additional API keys
+    AITUTOR_VERTEX_PROJECTS: Comma-separated additional Vertex AI projects
+        ('project' or 'project:location'; default location GOOGLE_CLOUD_LOCATION)
+    AITUTOR_CREDENTIAL_COOLDOWN: Seconds a throttled credential rests (10)
+    AITUTOR_CREDENTIAL_REJECT_COOLDOWN: Seconds a rejected credential rests (300)
+"""
+
+# Standard library imports
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+
+# Runtime imports
+from . import connections, deadline, log, metrics
+from .resilience import (
+    RETRYABLE_CODES, ResilienceConfig, Throttled, TokenBucket,
+    error_code, estimate_tokens, server_retry_delay,
+)
+
+if TYPE_CHECKING:
+    from .model import ModelCall
+
+# Weight of the latest outcome in a credential's error rate
+ERROR_RATE_WEIGHT = 0.1
+
+# Statuses meaning the credential itself is not accepted
+REJECTED_CODES = {401, 403}
+
+logger = log.get_logger('credentials')
+
+
+@dataclass
+class PoolConfig:
+    """
+    Settings of the credential pool.
+
+    Attributes:
+        requests_per_minute (float): Request quota per credential and model (0 = unlimited)
+        tokens_per_minute (float): Token quota per credential and model (0 = unlimited)
+        max_wait (float): Longest wait for a credential with capacity in seconds
+        cooldown (float): Shortest rest of a throttled credential in seconds
+        reject_cooldown (float): Rest of a credential rejected with 401/403 in seconds
+    """
+    requests_per_minute: float = 0.0
+    tokens_per_minute: float = 0.0
+    max_wait: float = 10.0
+    cooldown: float = 10.0
+    reject_cooldown: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> 'PoolConfig':
+        """
+        Build the settings from the environment (quotas as in ResilienceConfig).
+
+        Returns:
+            PoolConfig: Defaults overridden by the environment
+        """
+        limits = ResilienceConfig.from_env()
+        return cls(
+            requests_per_minute=limits.requests_per_minute,
+            tokens_per_minute=limits.tokens_per_minute,
+            max_wait=limits.max_wait,
+            cooldown=float(os.getenv('AITUTOR_CREDENTIAL_COOLDOWN', '10')),
+            reject_cooldown=float(os.getenv('AITUTOR_CREDENTIAL_REJECT_COOLDOWN', '300')),
+        )
+
+
+class Credential:
+    """
+    One API key or Vertex AI project, with its quota and health.
+    """
+
+    def __init__(self, name: str, api_key: Optional[str] = None, project: Optional[str] = None,
+                 location: Optional[str] = None, default: bool = False):
+        """
+        Args:
+            name (str): Label used in metrics and /health (never the key itself)
+            api_key (str, optional): Gemini API key
+            project (str, optional): Vertex AI project
+            location (str, optional): Vertex AI location
+            default (bool): Whether this is the environment's credential, used
+                through the model's own client
+        """
+        self.name = name
+        self.api_key = api_key
+        self.project = project
+        self.location = location
+        self.default = default
+        self.inflight = 0
+        self.error_rate = 0.0
+        self.resting_until = 0.0
+        self.calls = 0
+        self.tokens = 0
+        self.buckets: dict[str, list[tuple[TokenBucket, str]]] = {}
+        self._client = None
+
+    def client(self, llm) -> Any:
+        """
+        The google-genai client that sends calls with this credential.
+
+        Args:
+            llm (TutorGemini): The model receiving the call
+
+        Returns:
+            google.genai.Client: The model's own client for the default
+                credential, otherwise one built (once) for this credential
+        """
+        if self.default:
+            return llm.api_client
+        if self._client is None:
+            from google import genai
+
+            http_options = connections.http_options(llm._tracking_headers)
+            if self.api_key:
+                self._client = genai.Client(api_key=self.api_key, http_options=http_options)
+            else:
+                self._client = genai.Client(
+                    vertexai=True, project=self.project, location=self.location, http_options=http_options)
+        return self._client
+
+    def resting_for(self) -> float:
+        """Seconds until the credential is back in rotation."""
+        return max(0.0, self.resting_until - time.monotonic())
+
+    def record(self, failed: bool) -> None:
+        """Fold one call outcome into the error rate."""
+        self.error_rate += ERROR_RATE_WEIGHT * ((1.0 if failed else 0.0) - self.error_rate)
+
+
+def credentials_from_env() -> list[Credential]:
+    """
+    Build the credentials configured in the environment.
+
+    The default credential (GOOGLE_AI_API_KEY, or GOOGLE_CLOUD_PROJECT) comes
+    first; keys and projects listed in AITUTOR_GEMINI_API_KEYS and
+    AITUTOR_VERTEX_PROJECTS follow, without duplicates.
+
+    Returns:
+        list[Credential]: The credentials (empty if none is configured)
+    """
+    location = os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1')
+    keys = [key.strip() for key in os.getenv('AITUTOR_GEMINI_API_KEYS', '').split(',') if key.strip()]
+    projects = [entry.strip() for entry in os.getenv('AITUTOR_VERTEX_PROJECTS', '').split(',') if entry.strip()]
+
+    credentials = []
+    default_key = os.getenv('GOOGLE_AI_API_KEY')
+    default_project = os.getenv('GOOGLE_CLOUD_PROJECT')
+    if default_key:
+        credentials.append(Credential('key-1', api_key=default_key, default=True))
+    elif default_project:
+        credentials.append(Credential(f'project-{default_project}', project=default_project, location=location, default=True))
+
+    for key in keys:
+        if all(key != credential.api_key for credential in credentials):
+            number = sum(1 for credential in credentials if credential.api_key) + 1
+            credentials.append(Credential(f'key-{number}', api_key=key))
+    for entry in projects:
+        project, _, project_location = entry.partition(':')
+        if not any(project == credential.project for credential in credentials):
+            credentials.append(Credential(f'project-{project}', project=project, location=project_location or location))
+    return credentials
+
+
+class CredentialPool:
+    """
+    Model-call middleware that sends each attempt with the least-loaded credential.
+    """
+
+    def __init__(self, credentials: list[Credential], config: Optional[PoolConfig] = None):
+        """
+        Args:
+            credentials (list[Credential]): The credentials to spread calls over
+            config (PoolConfig, optional): Settings; defaults to the environment
+        """
+        self.credentials = credentials
+        self.config = config or PoolConfig.from_env()
+        for credential in credentials:
+            metrics.UPSTREAM_CREDENTIAL_AVAILABLE.set(1, credential=credential.name)
+
+    def _limits(self, credential: Credential, model: str) -> list[tuple[TokenBucket, str]]:
+        """The request and token buckets of a credential for a model."""
+        if model not in credential.buckets:
+            limits = []
+            if self.config.requests_per_minute > 0:
+                limits.append((TokenBucket(self.config.requests_per_minute), 'requests'))
+            if self.config.tokens_per_minute > 0:
+                limits.append((TokenBucket(self.config.tokens_per_minute), 'tokens'))
+            credential.buckets[model] = limits
+        return credential.buckets[model]
+
+    def _wait(self, credential: Credential, model: str, tokens: int) -> float:
+        """Seconds until a credential can take the call."""
+        waits = [credential.resting_for()]
+        for bucket, limit in self._limits(credential, model):
+            waits.append(bucket.seconds_until(1 if limit == 'requests' else tokens))
+        return max(waits)
+
+    def _score(self, credential: Credential, model: str) -> float:
+        """Load score of a ready credential: headroom, discounted by errors and calls in flight."""
+        headroom = min((bucket.level / bucket.capacity for bucket, _ in self._limits(credential, model)), default=1.0)
+        return max(headroom, 0.0) * (1.0 - credential.error_rate) / (1 + credential.inflight)
+
+    def select(self, call: 'ModelCall', model: str, tokens: int) -> tuple[Credential, float]:
+        """
+        Pick the credential for one attempt and reserve its quota.
+
+        Args:
+            call (ModelCall): The call about to be sent
+            model (str): Model the call is addressed to
+            tokens (int): Estimated tokens of the call
+
+        Returns:
+            tuple[Credential, float]: The credential and the seconds to wait before sending
+
+        Raises:
+            Throttled: No credential can take the call within the allowed wait
+        """
+        config = call.request.config
+        candidates = self.credentials
+        if config is not None and config.cached_content:
+            # Context caches belong to the credential that created them
+            candidates = [credential for credential in candidates if credential.default] or candidates
+
+        waits = {credential.name: self._wait(credential, model, tokens) for credential in candidates}
+        for credential in candidates:
+            metrics.UPSTREAM_CREDENTIAL_AVAILABLE.set(0 if credential.resting_for() else 1, credential=credential.name)
+        ready = [credential for credential in candidates if waits[credential.name] == 0]
+        if ready:
+            chosen = max(ready, key=lambda credential: self._score(credential, model))
+        else:
+            chosen = min(candidates, key=lambda credential: waits[credential.name])
+
+        wait = waits[chosen.name]
+        left = deadline.remaining()
+        max_wait = self.config.max_wait if left is None else min(self.config.max_wait, left)
+        if wait > max_wait:
+            metrics.UPSTREAM_THROTTLED.inc(model=model, limit='credentials', outcome='rejected')
+            raise Throttled(f'{model}: every credential is throttled or out of quota', model, wait)
+        if wait > 0:
+            metrics.UPSTREAM_THROTTLED.inc(model=model, limit='credentials', outcome='delayed')
+        for bucket, limit in self._limits(chosen, model):
+            bucket.reserve(1 if limit == 'requests' else tokens, float('inf'))
+        return chosen, wait
+
+    def _settle(self, credential: Credential, model: str, tokens: int, used: int,
+                requests: bool = False) -> None:
+        """
+        Correct a credential's reservation for one attempt.
+
+        Args:
+            credential (Credential): The credential the attempt was reserved on
+            model (str): Model the call was addressed to
+            tokens (int): Tokens reserved (the estimate)
+            used (int): Tokens actually used (0 if the call failed or never went out)
+            requests (bool): Whether to give back the request slot as well
+        """
+        for bucket, limit in self._limits(credential, model):
+            if limit == 'tokens':
+                bucket.settle(used - min(tokens, bucket.capacity))
+            elif requests:
+                bucket.settle(-1)
+
+    async def __call__(self, call: 'ModelCall', call_next):
+        model = call.request.model or call.model
+        tokens = estimate_tokens(call)
+        credential, wait = self.select(call, model, tokens)
+        if wait > 0:
+            call.metadata['throttle_wait'] = call.metadata.get('throttle_wait', 0.0) + wait
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Never sent: the credential's quota was not used
+                self._settle(credential, model, tokens, 0, requests=True)
+                raise
+
+        call.api_client = credential.client(call.llm) if call.llm is not None else None
+        call.metadata['credential'] = credential.name
+        credential.inflight += 1
+        try:
+            response = await call_next(call)
+        except asyncio.CancelledError:
+            # Abandoned (e.g. a hedged duplicate lost): no usage is reported
+            self._settle(credential, model, tokens, 0)
+            raise
+        except Exception as e:
+            self._settle(credential, model, tokens, 0)
+            self._record_failure(credential, e)
+            raise
+        finally:
+            credential.inflight -= 1
+
+        credential.record(failed=False)
+        credential.calls += 1
+        total = getattr(call.usage, 'total_token_count', None) if call.usage is not None else None
+        if total:
+            credential.tokens += total
+            metrics.UPSTREAM_CREDENTIAL_TOKENS.inc(total, credential=credential.name)
+            self._settle(credential, model, tokens, total)
+        metrics.UPSTREAM_CREDENTIAL_CALLS.inc(credential=credential.name, outcome='ok')
+        return response
+
+    def _record_failure(self, credential: Credential, error: BaseException) -> None:
+        """Account a failed call and rest the credential if the failure was its own."""
+        code = error_code(error)
+        credential.calls += 1
+        if code == 429:
+            outcome, rest = 'throttled', max(self.config.cooldown, server_retry_delay(error))
+        elif code in REJECTED_CODES:
+            outcome, rest = 'rejected', self.config.reject_cooldown
+        else:
+            outcome, rest = 'error', 0.0
+        if rest:
+            credential.resting_until = max(credential.resting_until, time.monotonic() + rest)
+            metrics.UPSTREAM_CREDENTIAL_AVAILABLE.set(0, credential=credential.name)
+            logger.warning('credential resting', extra={'credential': credential.name, 'outcome': outcome, 'rest_s': rest})
+        credential.record(failed=code in RETRYABLE_CODES or code in REJECTED_CODES)
+        metrics.UPSTREAM_CREDENTIAL_CALLS.inc(credential=credential.name, outcome=outcome)
+
+    def status(self) -> list[dict]:
+        """
+        Describe every credential, for health reporting.
+
+        Returns:
+            list[dict]: name, in-flight calls, error rate, remaining rest,
+                calls and tokens per credential
+        """
+        return [
+            {
+                'name': credential.name,
+                'inflight': credential.inflight,
+                'error_rate': round(credential.error_rate, 3),
+                'resting_for': round(credential.resting_for(), 1),
+                'calls': credential.calls,
+                'tokens': credential.tokens,
+            }
+            for credential in self.credentials
+        ]
+
+
+# The installed pool (None with a single credential)
+_pool: Optional[CredentialPool] = None
+
+
+def active() -> bool:
+    """Whether calls are spread over a credential pool."""
+    return _pool is not None
+
+
+def status() -> list[dict]:
+    """
+    Per-credential usage and health, for /health.
+
+    Returns:
+        list[dict]: One entry per credential (empty without a pool)
+    """
+    return _pool.status() if _pool is not None else []
+
+
+def enable(credentials: Optional[list[Credential]] = None, config: Optional[PoolConfig] = None) -> Optional[CredentialPool]:
+    """
+    Install the credential pool if more than one credential is configured.
+
+    It sits innermost, inside the resilience layer, so every retry picks a
+    credential afresh and a throttled key is not retried.
+
+    Args:
+        credentials (list[Credential], optional): Credentials; defaults to the environment
+        config (PoolConfig, optional): Settings; defaults to the environment
+
+    Returns:
+        CredentialPool | None: The installed pool, or None with a single credential
+    """
+    global _pool
+    from . import model
+
+    credentials = credentials if credentials is not None else credentials_from_env()
+    if len(credentials) < 2:
+        model.remove('credentials')
+        _pool = None
+        return None
+    _pool = CredentialPool(credentials, config)
+    model.use('credentials', _pool, order=95)
+    return _pool
@@ -0,0 +1,148 @@
+"""
+AI Tutor - Request Deadlines
+============================
+
+A per-request time budget carried in a context variable, so every agent hop,
+model call and tool call made on behalf of a request sees how much time is
+left without any parameter threading. The ADK runner executes agent hops
+(including AgentTool sub-agents) in the request's task, so the deadline
+set by the endpoint reaches all of them.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Enforcement:
+- The endpoint runs the agents under `scope()` and cancels them (including
+  any tool call in progress) when the deadline passes or the client
+  disconnects
+- DeadlineMiddleware refuses model calls once the budget is spent and bounds
+  each call by the time remaining
+- resilience.py never waits for rate-limit capacity or a retry backoff past it
+
+Configuration:
+    AITUTOR_REQUEST_TIMEOUT: Default and maximum budget per query in seconds (60);
+        clients may ask for less with the X-Request-Timeout header
+"""
+
+# Standard library imports
+import asyncio
+import contextlib
+import contextvars
+import os
+import time
+from typing import TYPE_CHECKING, Iterator, Optional
+
+if TYPE_CHECKING:
+    from .model import ModelCall
+
+# Header a client can send to shorten its budget (seconds)
+TIMEOUT_HEADER = 'x-request-timeout'
+
+# Absolute deadline (time.monotonic()) of the current request, if any
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('aitutor_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of its time budget."""
+
+
+def default_timeout() -> float:
+    """Budget per query from AITUTOR_REQUEST_TIMEOUT, in seconds."""
+    return float(os.getenv('AITUTOR_REQUEST_TIMEOUT', '60'))
+
+
+def request_timeout(header: Optional[str]) -> float:
+    """
+    Budget for one request: the client's X-Request-Timeout, capped by the default.
+
+    Args:
+        header (str | None): Value of the X-Request-Timeout header
+
+    Returns:
+        float: Seconds
+    """
+    limit = default_timeout()
+    try:
+        requested = float(header) if header else limit
+    except ValueError:
+        return limit
+    return min(limit, requested) if requested > 0 else limit
+
+
+@contextlib.contextmanager
+def scope(seconds: float) -> Iterator[float]:
+    """
+    Run the enclosed work under a deadline `seconds` from now.
+
+    A deadline already in effect is never extended.
+
+    Args:
+        seconds (float): Time budget
+
+    Yields:
+        float: The absolute deadline (time.monotonic() based)
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left before the current deadline.
+
+    Returns:
+        float | None: Time left (0 once expired), or None without a deadline
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def check(what: str = 'request') -> None:
+    """
+    Raise DeadlineExceeded if the current deadline has passed.
+
+    Args:
+        what (str): What was about to start (for the error message)
+    """
+    if remaining() == 0:
+        raise DeadlineExceeded(f'Deadline exceeded before {what}')
+
+
+# Enforcement
+# ===========
+
+class DeadlineMiddleware:
+    """
+    Model-call middleware that bounds every call by the request's deadline.
+    """
+
+    async def __call__(self, call: 'ModelCall', call_next):
+        left = remaining()
+        if left is None:
+            return await call_next(call)
+        check(f'calling {call.model}')
+        try:
+            return await asyncio.wait_for(call_next(call), timeout=left)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f'Deadline exceeded while calling {call.model}') from None
+
+
+def enable() -> None:
+    """
+    Install deadline enforcement for model calls.
+
+    The middleware sits just inside tracing, so a call cut short by the
+    deadline is recorded as an error on its span.
+    """
+    from . import model
+
+    model.use('deadline', DeadlineMiddleware(), order=20)
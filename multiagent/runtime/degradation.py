@@ -0,0 +1,504 @@
+"""
+AI Tutor - Degraded-Mode Serving
+================================
+
+Keeps /api/query useful and fast while Gemini is slow or unavailable. A
+controller watches the outcome and latency of every model call (after
+retries) and the circuit breakers; past configurable thresholds it moves the
+service to a cheaper mode, one level at a time:
+
+1. cache: answer the opening question of a conversation from the response
+   cache before running the agents, stale entries included
+   (stale-while-revalidate: the agents still refresh the entry whenever they
+   get to answer). The cache only holds opening-question answers, so a
+   follow-up with the same text is never answered from it
+2. local: answer questions whose shape allows it without a model call, with
+   the specialists' own tools: arithmetic on two numbers (calculator), a
+   physical constant (lookup_physics_constant) or an element
+   (elements_lookup)
+3. no_news: the news analyst tool is skipped, so news questions cost one
+   model call instead of a search-grounded sub-agent run
+
+While degraded, a request's time budget is capped at AITUTOR_DEGRADED_TIMEOUT
+so latency stays bounded during an incident. Whatever the level, a question
+whose agent run fails (upstream unavailable, deadline, error) falls back to
+the cache and the local tools before the apology. Every answer served this
+way is labeled: a note in the text and a "degraded" object in the response.
+
+Levels go up as soon as a threshold is crossed and come down one at a time
+once the signals have stayed below the current level for
+AITUTOR_DEGRADE_RECOVERY seconds. An open circuit breaker means the highest
+level. Signals with no model call for that long count as healthy.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Metrics: aitutor_degradation_level and aitutor_degraded_responses_total
+(source cache, stale_cache, calculator, physics_constants, elements; see
+metrics.py); /health shows the level, the reason and the signals.
+
+Configuration:
+    AITUTOR_DEGRADE: 'auto' (default), 'off', or a level to force ('cache', 'local', 'no_news')
+    AITUTOR_DEGRADE_LATENCY: Model-call latency (seconds, moving average) entering
+        each level (default '10,20,30')
+    AITUTOR_DEGRADE_ERRORS: Model-call failure rate entering each level (default '0.2,0.5,0.8')
+    AITUTOR_DEGRADE_RECOVERY: Seconds below a level before stepping down (30)
+    AITUTOR_DEGRADED_TIMEOUT: Request time budget while degraded, in seconds (20)
+"""
+
+# Standard library imports
+import asyncio
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+# Runtime imports
+from . import log, metrics, resilience
+
+if TYPE_CHECKING:
+    from .model import ModelCall
+
+NORMAL, CACHE, LOCAL, NO_NEWS = range(4)
+LEVEL_NAMES = ('normal', 'cache', 'local', 'no_news')
+
+# Weight of the latest model call in the moving averages
+SIGNAL_WEIGHT = 0.2
+
+# Tool skipped at the no_news level
+NEWS_TOOL = 'news_analyst'
+
+# Symbols and aliases shorter than this only count after a keyword
+# ('atomic mass of he', 'value of c'): on their own they are ordinary words
+MIN_BARE_NAME = 3
+
+logger = log.get_logger('degradation')
+
+
+def _thresholds(value: str, default: tuple) -> tuple:
+    try:
+        levels = tuple(float(part) for part in value.split(','))
+    except ValueError:
+        return default
+    return levels if len(levels) == len(default) else default
+
+
+@dataclass
+class DegradationConfig:
+    """
+    Settings of the degradation controller.
+
+    Attributes:
+        mode (str): 'auto', 'off', or the name of a level to force
+        latency (tuple[float, ...]): Average call latency entering cache, local, no_news
+        errors (tuple[float, ...]): Call failure rate entering cache, local, no_news
+        recovery (float): Seconds below a level before stepping down
+        timeout (float): Request time budget while degraded, in seconds
+    """
+    mode: str = 'auto'
+    latency: tuple = (10.0, 20.0, 30.0)
+    errors: tuple = (0.2, 0.5, 0.8)
+    recovery: float = 30.0
+    timeout: float = 20.0
+
+    @classmethod
+    def from_env(cls) -> 'DegradationConfig':
+        """
+        Build the settings from the environment.
+
+        Returns:
+            DegradationConfig: Defaults overridden by the environment
+        """
+        return cls(
+            mode=os.getenv('AITUTOR_DEGRADE', 'auto').lower(),
+            latency=_thresholds(os.getenv('AITUTOR_DEGRADE_LATENCY', ''), cls.latency),
+            errors=_thresholds(os.getenv('AITUTOR_DEGRADE_ERRORS', ''), cls.errors),
+            recovery=float(os.getenv('AITUTOR_DEGRADE_RECOVERY', '30')),
+            timeout=float(os.getenv('AITUTOR_DEGRADED_TIMEOUT', '20')),
+        )
+
+
+# Controller
+# ==========
+
+class DegradationController:
+    """
+    Tracks upstream health and decides the serving level.
+    """
+
+    def __init__(self, config: Optional[DegradationConfig] = None):
+        """
+        Args:
+            config (DegradationConfig, optional): Settings; defaults to the environment
+        """
+        self.config = config or DegradationConfig.from_env()
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.calls = 0
+        self.reason = ''
+        self._level = NORMAL
+        self._last_call = 0.0
+        self._pressure_at = 0.0
+        self._changed_at = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether degraded serving (and the failure fallback) is on at all."""
+        return self.config.mode != 'off'
+
+    def observe(self, seconds: float, ok: bool) -> None:
+        """
+        Record the outcome of one model call.
+
+        Args:
+            seconds (float): Time the call took, retries included
+            ok (bool): Whether it returned a response
+        """
+        weight = 1.0 if self.calls == 0 else SIGNAL_WEIGHT
+        self.latency += weight * (seconds - self.latency)
+        self.error_rate += weight * ((0.0 if ok else 1.0) - self.error_rate)
+        self.calls += 1
+        self._last_call = time.monotonic()
+
+    def _target(self, now: float) -> tuple[int, str]:
+        """Level the current signals call for, with the reason."""
+        if any(breaker['state'] == 'open' for breaker in resilience.status().values()):
+            return NO_NEWS, 'circuit open'
+        if not self.calls or now - self._last_call > self.config.recovery:
+            return NORMAL, ''
+        level, reason = NORMAL, ''
+        for index, (latency, errors) in enumerate(zip(self.config.latency, self.config.errors), 1):
+            if self.latency >= latency:
+                level, reason = index, f'model latency {self.latency:.1f}s'
+            elif self.error_rate >= errors:
+                level, reason = index, f'model failure rate {self.error_rate:.0%}'
+        return level, reason
+
+    def level(self) -> int:
+        """
+        The serving level for a request starting now.
+
+        Returns:
+            int: NORMAL, CACHE, LOCAL or NO_NEWS
+        """
+        mode = self.config.mode
+        if mode in LEVEL_NAMES:
+            return LEVEL_NAMES.index(mode)
+        if mode != 'auto':
+            return NORMAL
+        now = time.monotonic()
+        target, reason = self._target(now)
+        if target >= self._level:
+            self._pressure_at = now
+            if target > self._level:
+                self._set(target, reason, now)
+        elif now - self._pressure_at >= self.config.recovery:
+            # One level down per quiet recovery window
+            self._pressure_at = now
+            self._set(self._level - 1, 'recovering' if self._level > 1 else '', now)
+        return self._level
+
+    def _set(self, level: int, reason: str, now: float) -> None:
+        if level > self._level:
+            logger.warning('degraded mode entered', extra={'level': LEVEL_NAMES[level], 'reason': reason})
+        elif level == NORMAL:
+            logger.info('degraded mode cleared')
+        self._level = level
+        self.reason = reason
+        self._changed_at = now
+        metrics.DEGRADATION_LEVEL.set(level)
+
+    def timeout(self, timeout: float, level: int) -> float:
+        """
+        Cap a request's time budget while degraded.
+
+        Args:
+            timeout (float): The request's budget in seconds
+            level (int): Current level
+
+        Returns:
+            float: The budget to use
+        """
+        return min(timeout, self.config.timeout) if level > NORMAL else timeout
+
+    def status(self) -> dict:
+        """Level, reason and signals for /health."""
+        level = self.level()
+        return {
+            'mode': self.config.mode,
+            'level': LEVEL_NAMES[level],
+            'reason': self.reason,
+            'since_s': round(time.monotonic() - self._changed_at, 1),
+            'model_latency_s': round(self.latency, 2),
+            'model_failure_rate': round(self.error_rate, 3),
+        }
+
+
+CONTROLLER = DegradationController()
+
+
+# Local Answers
+# =============
+
+@dataclass
+class DegradedAnswer:
+    """
+    An answer produced without the agents.
+
+    Attributes:
+        text (str): The answer, with the degraded-mode note
+        agent (str): Specialist the answer stands in for (follow-ups go there)
+        source (str): cache, stale_cache, calculator, physics_constants or elements
+        hops (list[str]): Agents shown in the activity trace
+    """
+    text: str
+    agent: str
+    source: str
+    hops: list
+
+
+NOTES = {
+    'cache': 'an earlier answer to the same question',
+    'stale_cache': 'an earlier answer to the same question, which may be out of date',
+    'calculator': 'the built-in calculator',
+    'physics_constants': 'the built-in table of physical constants',
+    'elements': 'the built-in periodic table',
+}
+
+_NUMBER = r'(-?\d+(?:\.\d+)?)'
+_PREFIX = re.compile(
+    r"^(?:please\s+)?(?:(?:what|whats|what's)\s+(?:is|are)?\s*|calculate\s+|compute\s+|evaluate\s+|"
+    r"tell me(?: about)?\s+|give me\s+)?(?:the\s+)?"
+)
+_OPERATORS = {
+    '+': 'add', 'plus': 'add', '-': 'subtract', 'minus': 'subtract',
+    '*': 'multiply', 'x': 'multiply', '×': 'multiply', 'times': 'multiply', 'multiplied by': 'multiply',
+    '/': 'divide', '÷': 'divide', 'divided by': 'divide', 'over': 'divide',
+}
+_INFIX = re.compile(
+    rf"^{_NUMBER}\s*(\+|-|\*|x|×|/|÷|plus|minus|times|multiplied by|divided by|over)\s*{_NUMBER}$"
+)
+_VERBS = [
+    (re.compile(rf'^(?:add|sum of)\s+{_NUMBER}\s+and\s+{_NUMBER}$'), 'add', False),
+    (re.compile(rf'^subtract\s+{_NUMBER}\s+from\s+{_NUMBER}$'), 'subtract', True),
+    (re.compile(rf'^multiply\s+{_NUMBER}\s+(?:by|and)\s+{_NUMBER}$'), 'multiply', False),
+    (re.compile(rf'^divide\s+{_NUMBER}\s+by\s+{_NUMBER}$'), 'divide', False),
+    (re.compile(rf'^product of\s+{_NUMBER}\s+and\s+{_NUMBER}$'), 'multiply', False),
+]
+_SYMBOLS = {'add': '+', 'subtract': '−', 'multiply': '×', 'divide': '÷'}
+
+# Common names of the constants beyond their table keys
+_CONSTANT_ALIASES = {
+    'speed of light in vacuum': 'speed_of_light', 'c': 'speed_of_light',
+    "planck's constant": 'planck_constant', 'h': 'planck_constant',
+    'big g': 'gravitational_constant', 'g': 'earth_gravity',
+    'acceleration due to gravity': 'earth_gravity', 'gravity on earth': 'earth_gravity',
+    'standard gravity': 'earth_gravity',
+    'charge of an electron': 'elementary_charge', 'electron charge': 'elementary_charge',
+    "avogadro's number": 'avogadro_number', 'avogadro constant': 'avogadro_number',
+    "avogadro's constant": 'avogadro_number',
+    "boltzmann's constant": 'boltzmann_constant', 'ideal gas constant': 'gas_constant',
+    'universal gas constant': 'gas_constant', 'mass of an electron': 'electron_mass',
+    'mass of a proton': 'proton_mass',
+}
+_CONSTANT_PREFIX = re.compile(r'^(?:value of\s+(?:the\s+)?|(?:physical\s+)?constant\s+)')
+_ELEMENT_PREFIX = re.compile(
+    r'^(?:(?:atomic (?:mass|number|weight)|symbol|properties|facts)\s+(?:of|for)\s+(?:the element\s+)?|element\s+)'
+)
+
+
+def _shape(query: str) -> str:
+    """Lower-case the question and strip the question wording around it."""
+    text = ' '.join(query.lower().split()).rstrip('?!. ')
+    return _PREFIX.sub('', text, count=1).strip()
+
+
+def _number(value: float) -> str:
+    return f'{value:g}' if abs(value) < 1e15 else f'{value:.6g}'
+
+
+def _labeled(text: str, source: str) -> str:
+    return (f'{text}\n\n---\n*⚠️ Reduced mode: the AI tutor is temporarily unavailable, '
+            f'so this answer comes from {NOTES[source]}.*')
+
+
+def _arithmetic(shape: str) -> Optional[DegradedAnswer]:
+    from ..subagents.maths.tools import calculator
+
+    match = _INFIX.match(shape)
+    if match:
+        num1, operation, num2 = float(match.group(1)), _OPERATORS[match.group(2)], float(match.group(3))
+    else:
+        for pattern, operation, reverse in _VERBS:
+            match = pattern.match(shape)
+            if match:
+                num1, num2 = float(match.group(1)), float(match.group(2))
+                if reverse:
+                    num1, num2 = num2, num1
+                break
+        else:
+            return None
+    result = calculator(operation, num1, num2)
+    if result['status'] != 'success':
+        text = f"**{_number(num1)} {_SYMBOLS[operation]} {_number(num2)}**: {result['result']}"
+    else:
+        text = f"**{_number(num1)} {_SYMBOLS[operation]} {_number(num2)} = {_number(result['result'])}**"
+    return DegradedAnswer(_labeled(text, 'calculator'), 'maths_agent', 'calculator', ['maths_agent'])
+
+
+def _constant(shape: str) -> Optional[DegradedAnswer]:
+    from ..subagents.physics.tools import PHYSICS_CONSTANTS, lookup_physics_constant
+
+    name = _CONSTANT_PREFIX.sub('', shape).strip()
+    if len(name) < MIN_BARE_NAME and name == shape:
+        return None
+    key = _CONSTANT_ALIASES.get(name) or name.replace("'s", '').replace(' ', '_')
+    if key not in PHYSICS_CONSTANTS:
+        return None
+    result = lookup_physics_constant(key)
+    value = result['value']
+    shown = f'{value:,}' if isinstance(value, int) else f'{value:.10g}'
+    text = f"**{key.replace('_', ' ').capitalize()}** = {shown}\n\n{result['info']}"
+    return DegradedAnswer(_labeled(text, 'physics_constants'), 'physics_agent', 'physics_constants', ['physics_agent'])
+
+
+def _element(shape: str) -> Optional[DegradedAnswer]:
+    from ..subagents.chemistry.tools import ELEMENT_DATA, elements_lookup
+
+    name = _ELEMENT_PREFIX.sub('', shape).strip()
+    if name not in ELEMENT_DATA:
+        if len(name) < MIN_BARE_NAME and name == shape:
+            return None
+        name = next((element for element, data in ELEMENT_DATA.items() if data['symbol'].lower() == name), '')
+        if not name:
+            return None
+    result = elements_lookup(name)
+    text = (
+        f"**{result['element']} ({result['symbol']})**\n\n"
+        f"- Atomic number: {result['atomic_number']}\n"
+        f"- Atomic mass: {result['atomic_mass']} u\n"
+        f"- Group {result['group']}, period {result['period']}\n\n"
+        f"{result['description']}"
+    )
+    return DegradedAnswer(_labeled(text, 'elements'), 'chemistry_agent', 'elements', ['chemistry_agent'])
+
+
+def answer_locally(query: str) -> Optional[DegradedAnswer]:
+    """
+    Answer a question with the specialists' tools if its shape allows.
+
+    Only questions that are nothing but a two-number calculation, the name
+    of a physical constant or of an element (with the usual question wording
+    around it) qualify; anything else needs the agents. One- and two-letter
+    symbols ('he', 'c') only count after a keyword such as 'atomic mass of',
+    'element' or 'value of'.
+
+    Args:
+        query (str): The user's question
+
+    Returns:
+        DegradedAnswer | None: The labeled answer, or None
+    """
+    shape = _shape(query)
+    if not shape:
+        return None
+    return _arithmetic(shape) or _constant(shape) or _element(shape)
+
+
+def answer_from_cache(query: str) -> Optional[DegradedAnswer]:
+    """
+    Answer a question from the response cache, stale entries included.
+
+    Args:
+        query (str): The user's question
+
+    Returns:
+        DegradedAnswer | None: The labeled answer, or None
+    """
+    from .response_cache import CACHE
+
+    cached = CACHE.get(query, allow_stale=True)
+    if cached is None:
+        return None
+    source = 'cache' if cached.age() < CACHE.ttl else 'stale_cache'
+    return DegradedAnswer(_labeled(cached.text, source), cached.agent, source, cached.hops)
+
+
+def degraded_answer(query: str, level: int, first_turn: bool) -> Optional[DegradedAnswer]:
+    """
+    Answer a question without the agents, as far as the level allows.
+
+    Args:
+        query (str): The user's question
+        level (int): Serving level (NO_NEWS for the fallback after a failed run)
+        first_turn (bool): Whether the question opens its conversation; only
+            then can a cached answer (given to another conversation) fit
+
+    Returns:
+        DegradedAnswer | None: The labeled answer, or None if the agents are needed
+    """
+    answer = None
+    if level >= CACHE and first_turn:
+        answer = answer_from_cache(query)
+    if answer is None and level >= LOCAL:
+        answer = answer_locally(query)
+    if answer is not None:
+        metrics.DEGRADED_RESPONSES.inc(source=answer.source)
+    return answer
+
+
+# Model-Call Monitoring
+# =====================
+
+class DegradationMiddleware:
+    """
+    Model-call middleware feeding call outcomes and latency to the controller.
+    """
+
+    def __init__(self, controller: DegradationController):
+        self.controller = controller
+
+    async def __call__(self, call: 'ModelCall', call_next):
+        started = time.monotonic()
+        try:
+            response = await call_next(call)
+        except asyncio.CancelledError:
+            # The client went away: says nothing about the upstream
+            raise
+        except Exception:
+            self.controller.observe(time.monotonic() - started, ok=False)
+            raise
+        self.controller.observe(time.monotonic() - started, ok=True)
+        return response
+
+
+def _skip_news(tool, args, tool_context):
+    """before_tool hook: at the no_news level the news analyst is not run."""
+    if tool.name == NEWS_TOOL and CONTROLLER.level() >= NO_NEWS:
+        return {
+            'status': 'unavailable',
+            'result': 'News analysis is paused while the tutor runs in reduced mode. '
+                      'Tell the student recent news cannot be looked up right now.',
+        }
+    return None
+
+
+def enable() -> Optional[DegradationMiddleware]:
+    """
+    Install call monitoring and the news-analyst skip.
+
+    The middleware sits just outside the deadline, so it sees each call's
+    final outcome after retries and rate-limit waits, as the request does.
+
+    Returns:
+        DegradationMiddleware | None: The installed middleware (None with AITUTOR_DEGRADE=off)
+    """
+    if not CONTROLLER.enabled:
+        return None
+    from . import hooks, model
+
+    middleware = DegradationMiddleware(CONTROLLER)
+    model.use('degradation', middleware, order=15)
+    hooks.add('before_tool', 'degradation', _skip_news)
+    return middleware
@@ -0,0 +1,367 @@
+"""
+AI Tutor - Tool Executor
+========================
+
+Where tool functions run. ADK calls a synchronous tool directly on the event
+loop, so a tool that computes for 200 ms delays every other request on the
+worker by 200 ms. Each tool is declared with an execution mode:
+
+- inline: called on the event loop (the function itself is handed to ADK;
+  zero overhead, for lookups that take microseconds)
+- thread: run in a shared thread pool (I/O, or NumPy and other code that
+  releases the GIL)
+- process: run in a pool of warm worker processes (pure-Python CPU work),
+  under per-call CPU-time and per-worker memory limits
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Usage:
+    from multiagent.runtime import executor
+    tools=[select_tool(executor.tool(calculator, 'process'), compact=...)]
+
+Per-call limits:
+- Timeout: the model gets an error result once AITUTOR_TOOL_TIMEOUT seconds
+  (or the request deadline) pass; the call itself cannot be interrupted in a
+  thread and finishes in the background
+- CPU: a process call that uses AITUTOR_TOOL_CPU_SECONDS of CPU time is
+  stopped by RLIMIT_CPU inside the worker, which survives for the next call
+- Memory: process workers run under RLIMIT_AS of AITUTOR_TOOL_MEMORY_MB, so
+  a runaway allocation fails with MemoryError in the worker only
+- A worker that dies is replaced by a fresh pool
+
+Process workers are started lazily per server worker (after the pre-fork
+server has forked) with the 'forkserver' start method, or ahead of traffic
+with warm(). Tool functions for process mode must be module-level functions
+(they are sent to workers by reference) taking JSON-like arguments.
+
+Metrics: aitutor_tool_queue_wait_seconds, aitutor_tool_run_seconds,
+aitutor_tool_pending and aitutor_tool_failures_total, per tool and mode
+(see metrics.py).
+
+Configuration:
+    AITUTOR_TOOL_EXECUTION: Mode overrides, e.g. 'calculator=process,elements_lookup=thread'
+    AITUTOR_TOOL_TIMEOUT: Seconds before a pooled call returns an error (10)
+    AITUTOR_TOOL_THREADS: Thread pool size (4)
+    AITUTOR_TOOL_PROCESSES: Process pool size (2)
+    AITUTOR_TOOL_CPU_SECONDS: CPU time per process call (5)
+    AITUTOR_TOOL_MEMORY_MB: Address-space limit per process worker (1024, 0 = none)
+"""
+
+# Standard library imports
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+# Runtime imports
+from . import deadline, log, metrics
+
+INLINE, THREAD, PROCESS = 'inline', 'thread', 'process'
+MODES = (INLINE, THREAD, PROCESS)
+
+logger = log.get_logger('executor')
+
+
+class CpuLimitExceeded(Exception):
+    """A process-mode tool call used up its CPU-time allowance."""
+
+
+@dataclass
+class ExecutorConfig:
+    """
+    Pool sizes and per-call limits.
+
+    Attributes:
+        timeout (float): Seconds before a pooled call returns an error
+        threads (int): Thread pool size
+        processes (int): Process pool size
+        cpu_seconds (float): CPU time per process call
+        memory_mb (int): Address-space limit per process worker (0 = none)
+        overrides (dict[str, str]): Execution mode per tool name, overriding the declaration
+    """
+    timeout: float = 10.0
+    threads: int = 4
+    processes: int = 2
+    cpu_seconds: float = 5.0
+    memory_mb: int = 1024
+    overrides: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls) -> 'ExecutorConfig':
+        """
+        Build the settings from the AITUTOR_TOOL_* environment variables.
+
+        Returns:
+            ExecutorConfig: Defaults overridden by the environment
+        """
+        overrides = {}
+        for item in os.getenv('AITUTOR_TOOL_EXECUTION', '').split(','):
+            name, _, mode = item.partition('=')
+            if mode.strip() in MODES:
+                overrides[name.strip()] = mode.strip()
+        return cls(
+            timeout=float(os.getenv('AITUTOR_TOOL_TIMEOUT', '10')),
+            threads=max(1, int(os.getenv('AITUTOR_TOOL_THREADS', '4'))),
+            processes=max(1, int(os.getenv('AITUTOR_TOOL_PROCESSES', '2'))),
+            cpu_seconds=float(os.getenv('AITUTOR_TOOL_CPU_SECONDS', '5')),
+            memory_mb=int(os.getenv('AITUTOR_TOOL_MEMORY_MB', '1024')),
+            overrides=overrides,
+        )
+
+
+CONFIG = ExecutorConfig.from_env()
+
+
+# Process Workers
+# ===============
+# These functions run inside the worker processes.
+
+def _worker_init(memory_mb: int) -> None:
+    """Set up a fresh worker: memory limit, CPU-limit signal handler."""
+    import resource
+
+    if memory_mb > 0:
+        limit = memory_mb * 2 ** 20
+        resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+
+    def on_cpu_limit(signum, frame):
+        raise CpuLimitExceeded()
+
+    signal.signal(signal.SIGXCPU, on_cpu_limit)
+    # Ctrl-C goes to the server, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _worker_ready() -> int:
+    """No-op used to start workers ahead of traffic."""
+    return os.getpid()
+
+
+def _run_in_worker(func: Callable, kwargs: dict, cpu_seconds: float) -> tuple[float, float, Any]:
+    """
+    Call a tool under a CPU-time allowance.
+
+    Returns:
+        tuple: (wall-clock start, run seconds, result)
+    """
+    import resource
+
+    started = time.time()
+    clock = time.perf_counter()
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if cpu_seconds > 0:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        allowance = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (allowance if hard == resource.RLIM_INFINITY else min(allowance, hard), hard))
+    try:
+        result = func(**kwargs)
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    return started, time.perf_counter() - clock, result
+
+
+def _run_in_thread(func: Callable, kwargs: dict) -> tuple[float, float, Any]:
+    """Call a tool on a pool thread, timing the call."""
+    started = time.time()
+    clock = time.perf_counter()
+    result = func(**kwargs)
+    return started, time.perf_counter() - clock, result
+
+
+# Pools
+# =====
+
+_lock = threading.Lock()
+_threads: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_processes: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+
+def _thread_pool() -> concurrent.futures.ThreadPoolExecutor:
+    global _threads
+    with _lock:
+        if _threads is None:
+            _threads = concurrent.futures.ThreadPoolExecutor(CONFIG.threads, thread_name_prefix='aitutor-tool')
+        return _threads
+
+
+def _process_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _processes
+    with _lock:
+        if _processes is None:
+            # forkserver: workers do not inherit the server's threads and sockets
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _processes = concurrent.futures.ProcessPoolExecutor(
+                CONFIG.processes,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_worker_init,
+                initargs=(CONFIG.memory_mb,),
+            )
+        return _processes
+
+
+def _replace_process_pool(broken: concurrent.futures.ProcessPoolExecutor) -> None:
+    """Drop a pool whose worker died; the next call starts a new one."""
+    global _processes
+    with _lock:
+        if _processes is broken:
+            _processes = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def warm() -> None:
+    """
+    Start the process workers now instead of on the first process-mode call.
+
+    Blocking (workers import the tool modules); call it from a thread.
+    """
+    pool = _process_pool()
+    futures = [pool.submit(_worker_ready) for _ in range(CONFIG.processes)]
+    concurrent.futures.wait(futures)
+    logger.info('tool process workers ready', extra={'workers': len({future.result() for future in futures})})
+
+
+def shutdown() -> None:
+    """Stop the pools (server shutdown)."""
+    global _threads, _processes
+    with _lock:
+        threads, processes = _threads, _processes
+        _threads = _processes = None
+    if threads is not None:
+        threads.shutdown(wait=False, cancel_futures=True)
+    if processes is not None:
+        processes.shutdown(wait=False, cancel_futures=True)
+
+
+def _reset_after_fork() -> None:
+    """A forked server worker starts its own pools (the parent's are not usable)."""
+    global _threads, _processes, _lock
+    _lock = threading.Lock()
+    _threads = _processes = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def uses_processes() -> bool:
+    """Whether any declared tool runs in the process pool."""
+    return PROCESS in _declared.values()
+
+
+# Tool Declaration
+# ================
+
+# Execution mode per declared tool name
+_declared: dict[str, str] = {}
+
+
+def _error(message: str) -> dict:
+    """Tool result reporting an execution failure to the model."""
+    return {'status': 'error', 'result': message}
+
+
+def tool(func: Callable, mode: str = INLINE, timeout: Optional[float] = None,
+         cpu_seconds: Optional[float] = None) -> Callable:
+    """
+    Declare how a tool function is executed.
+
+    Args:
+        func: The tool function (module-level for process mode)
+        mode (str): 'inline', 'thread' or 'process'; AITUTOR_TOOL_EXECUTION
+            overrides it per tool name
+        timeout (float, optional): Seconds before the call returns an error
+            (AITUTOR_TOOL_TIMEOUT)
+        cpu_seconds (float, optional): CPU time per process call
+            (AITUTOR_TOOL_CPU_SECONDS)
+
+    Returns:
+        Callable: The function itself (inline) or a coroutine function with
+            the same name, docstring and signature that runs it in a pool
+
+    Raises:
+        ValueError: For an unknown mode, or a pooled tool that takes tool_context
+    """
+    name = func.__name__
+    mode = CONFIG.overrides.get(name, mode)
+    if mode not in MODES:
+        raise ValueError(f"Unknown execution mode '{mode}' for tool {name}")
+    if mode != INLINE and 'tool_context' in inspect.signature(func).parameters:
+        raise ValueError(f"Tool {name} takes tool_context and must run inline")
+    if mode == PROCESS and '<locals>' in func.__qualname__:
+        # Closures cannot be sent to a worker process by reference
+        logger.warning('tool cannot run in a process; using a thread', extra={'tool': name})
+        mode = THREAD
+    _declared[name] = mode
+    if mode == INLINE:
+        return func
+
+    @functools.wraps(func)
+    async def pooled(**kwargs):
+        limit = timeout if timeout is not None else CONFIG.timeout
+        remaining = deadline.remaining()
+        if remaining is not None:
+            limit = min(limit, max(remaining, 0.0))
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+
+        metrics.TOOL_PENDING.inc(tool=name, mode=mode)
+        if mode == THREAD:
+            pool = _thread_pool()
+            future = loop.run_in_executor(pool, _run_in_thread, func, kwargs)
+        else:
+            pool = _process_pool()
+            allowance = cpu_seconds if cpu_seconds is not None else CONFIG.cpu_seconds
+            try:
+                future = asyncio.wrap_future(pool.submit(_run_in_worker, func, kwargs, allowance))
+            except concurrent.futures.BrokenExecutor:
+                metrics.TOOL_PENDING.dec(tool=name, mode=mode)
+                _replace_process_pool(pool)
+                metrics.TOOL_FAILURES.inc(tool=name, mode=mode, reason='crashed')
+                return _error('The tool worker restarted; please try again.')
+        try:
+            started, run_seconds, result = await asyncio.wait_for(asyncio.shield(future), limit)
+        except asyncio.TimeoutError:
+            metrics.TOOL_FAILURES.inc(tool=name, mode=mode, reason='timeout')
+            logger.warning('tool call timed out', extra={'tool': name, 'mode': mode, 'timeout': limit})
+            return _error(f'The {name} tool did not finish within {limit:.1f} seconds.')
+        except CpuLimitExceeded:
+            metrics.TOOL_FAILURES.inc(tool=name, mode=mode, reason='cpu_limit')
+            return _error(f'The {name} computation exceeded its CPU-time limit.')
+        except MemoryError:
+            metrics.TOOL_FAILURES.inc(tool=name, mode=mode, reason='memory_limit')
+            return _error(f'The {name} computation exceeded its memory limit.')
+        except concurrent.futures.BrokenExecutor:
+            _replace_process_pool(pool)
+            metrics.TOOL_FAILURES.inc(tool=name, mode=mode, reason='crashed')
+            logger.warning('tool worker died', extra={'tool': name})
+            return _error('The tool worker crashed while computing; please try again.')
+        finally:
+            # The pool job may outlive a timeout; it stays pending until it ends
+            future.add_done_callback(lambda _: metrics.TOOL_PENDING.dec(tool=name, mode=mode))
+        metrics.TOOL_QUEUE_WAIT.observe(max(0.0, started - submitted), tool=name, mode=mode)
+        metrics.TOOL_RUN.observe(run_seconds, tool=name, mode=mode)
+        return result
+
+    return pooled
+
+
+def status() -> dict:
+    """
+    Declared tools and pool state, for /health.
+
+    Returns:
+        dict: Execution mode per tool and whether each pool is running
+    """
+    return {
+        'tools': dict(_declared),
+        'thread_pool': _threads is not None,
+        'process_pool': _processes is not None,
+    }
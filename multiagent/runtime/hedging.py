@@ -0,0 +1,245 @@
+"""
+AI Tutor - Hedged Model Calls
+=============================
+
+Cuts the tail latency of /api/query by hedging slow model calls. When a call
+has not returned within a high percentile of recent latency for its agent
+and model, an identical duplicate is sent; the first successful response is
+used and the other call is cancelled.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Model calls are safe to duplicate: generation has no side effects, and tool
+calls requested by the response only run once, after the winner is chosen.
+
+Load amplification is bounded by a hedge budget: every call adds
+AITUTOR_HEDGE_MAX_RATE to it and every hedge spends one, so hedges never
+exceed that share of model calls (plus a small burst). A call whose duplicate
+is not covered by the budget simply keeps waiting for the original.
+
+Metrics: aitutor_model_hedge_calls_total, aitutor_model_hedges_total
+(outcome won / lost / failed / over_budget) and
+aitutor_model_hedge_delay_seconds (see metrics.py). Hedge rate is
+hedges / calls; win rate is won / (won + lost).
+
+Configuration (hedging is opt-in):
+    AITUTOR_HEDGE: Set to 'on' to hedge model calls (default 'off')
+    AITUTOR_HEDGE_PERCENTILE: Latency percentile that triggers a hedge (95)
+    AITUTOR_HEDGE_MAX_RATE: Largest share of calls that may be hedged (0.05)
+    AITUTOR_HEDGE_MIN_SAMPLES: Latencies observed before hedging starts (20)
+    AITUTOR_HEDGE_MIN_DELAY: Shortest hedge delay in seconds (0.2)
+    AITUTOR_HEDGE_AGENTS: Comma-separated agents to hedge (default: all)
+"""
+
+# Standard library imports
+import asyncio
+import dataclasses
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+# Runtime imports
+from . import metrics
+
+if TYPE_CHECKING:
+    from .model import ModelCall
+
+# Recent latencies kept per agent and model
+LATENCY_WINDOW = 200
+
+# Hedges that may be spent at once after a quiet period
+HEDGE_BURST = 5.0
+
+
+@dataclass
+class HedgeConfig:
+    """
+    Settings of the hedging middleware.
+
+    Attributes:
+        enabled (bool): Whether calls are hedged at all
+        percentile (float): Latency percentile after which a duplicate is sent
+        max_rate (float): Largest share of calls that may be hedged
+        min_samples (int): Latencies needed for an agent/model before hedging
+        min_delay (float): Shortest hedge delay in seconds
+        agents (frozenset[str]): Agents to hedge (empty = all)
+    """
+    enabled: bool = False
+    percentile: float = 95.0
+    max_rate: float = 0.05
+    min_samples: int = 20
+    min_delay: float = 0.2
+    agents: frozenset = frozenset()
+
+    @classmethod
+    def from_env(cls) -> 'HedgeConfig':
+        """
+        Build the settings from the AITUTOR_HEDGE* environment variables.
+
+        Returns:
+            HedgeConfig: Defaults overridden by the environment
+        """
+        agents = os.getenv('AITUTOR_HEDGE_AGENTS', '')
+        return cls(
+            enabled=os.getenv('AITUTOR_HEDGE', 'off').lower() in ('on', '1', 'true'),
+            percentile=float(os.getenv('AITUTOR_HEDGE_PERCENTILE', '95')),
+            max_rate=float(os.getenv('AITUTOR_HEDGE_MAX_RATE', '0.05')),
+            min_samples=int(os.getenv('AITUTOR_HEDGE_MIN_SAMPLES', '20')),
+            min_delay=float(os.getenv('AITUTOR_HEDGE_MIN_DELAY', '0.2')),
+            agents=frozenset(name.strip() for name in agents.split(',') if name.strip()),
+        )
+
+
+class LatencyWindow:
+    """
+    Sliding window of recent call latencies with percentile lookup.
+    """
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        """Record one call latency."""
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        """
+        Latency below which `q` percent of the recorded calls finished.
+
+        Args:
+            q (float): Percentile between 0 and 100
+
+        Returns:
+            float: Seconds (nearest-rank)
+        """
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class HedgingMiddleware:
+    """
+    Model-call middleware that duplicates calls running slower than usual.
+    """
+
+    def __init__(self, config: Optional[HedgeConfig] = None):
+        """
+        Args:
+            config (HedgeConfig, optional): Settings; defaults to the environment
+        """
+        self.config = config or HedgeConfig.from_env()
+        self.latencies: dict[tuple[str, str], LatencyWindow] = {}
+        self.budget = HEDGE_BURST
+
+    def hedge_delay(self, agent: str, model: str) -> Optional[float]:
+        """
+        Time after which a call for this agent and model gets a duplicate.
+
+        Args:
+            agent (str): Agent making the call
+            model (str): Model the call is addressed to
+
+        Returns:
+            float | None: Seconds, or None while too few latencies are known
+        """
+        window = self.latencies.get((agent, model))
+        if window is None or len(window.samples) < self.config.min_samples:
+            return None
+        delay = max(self.config.min_delay, window.percentile(self.config.percentile))
+        metrics.MODEL_HEDGE_DELAY.set(delay, agent=agent, model=model)
+        return delay
+
+    def _record(self, agent: str, model: str, seconds: float) -> None:
+        self.latencies.setdefault((agent, model), LatencyWindow()).add(seconds)
+
+    async def __call__(self, call: 'ModelCall', call_next):
+        from . import hooks
+
+        callback_context = hooks.current_context()
+        agent = callback_context.agent_name if callback_context else ''
+        model = call.request.model or call.model
+        config = self.config
+        if config.agents and agent not in config.agents:
+            return await call_next(call)
+
+        metrics.MODEL_HEDGE_CALLS.inc(agent=agent, model=model)
+        self.budget = min(HEDGE_BURST, self.budget + config.max_rate)
+        delay = self.hedge_delay(agent, model)
+        started = time.monotonic()
+
+        if delay is None:
+            response = await call_next(call)
+            self._record(agent, model, time.monotonic() - started)
+            return response
+
+        primary = asyncio.ensure_future(call_next(call))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if self.budget < 1:
+                    metrics.MODEL_HEDGES.inc(agent=agent, model=model, outcome='over_budget')
+                else:
+                    self.budget -= 1
+                    return await self._hedge(call, call_next, primary, tasks, agent, model, started)
+            response = await primary
+            self._record(agent, model, time.monotonic() - started)
+            return response
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _hedge(self, call, call_next, primary, tasks, agent, model, started):
+        """Send the duplicate and return the first successful response."""
+        # The duplicate gets its own call so usage and metadata do not collide
+        duplicate = dataclasses.replace(call, usage=None, metadata=dict(call.metadata, hedge=True))
+        hedge = asyncio.ensure_future(call_next(duplicate))
+        tasks.add(hedge)
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    continue
+                if task is hedge:
+                    metrics.MODEL_HEDGES.inc(agent=agent, model=model, outcome='won')
+                    call.usage = duplicate.usage
+                    call.metadata.update(duplicate.metadata)
+                else:
+                    metrics.MODEL_HEDGES.inc(agent=agent, model=model, outcome='lost')
+                # A lower bound of the original call's latency, so hedge wins
+                # do not drag the percentile down
+                self._record(agent, model, time.monotonic() - started)
+                return task.result()
+
+        # Both failed: report the original call's error
+        metrics.MODEL_HEDGES.inc(agent=agent, model=model, outcome='failed')
+        return primary.result()
+
+
+def enable(config: Optional[HedgeConfig] = None) -> Optional[HedgingMiddleware]:
+    """
+    Install the hedging middleware if hedging is switched on.
+
+    It sits just outside the resilience layer, so each copy of a call is
+    rate limited, retried and circuit-broken on its own.
+
+    Args:
+        config (HedgeConfig, optional): Settings; defaults to the environment
+
+    Returns:
+        HedgingMiddleware | None: The installed middleware, or None if disabled
+    """
+    from . import model
+
+    config = config or HedgeConfig.from_env()
+    if not config.enabled:
+        model.remove('hedging')
+        return None
+    middleware = HedgingMiddleware(config)
+    model.use('hedging', middleware, order=85)
+    return middleware
@@ -0,0 +1,154 @@
+"""
+AI Tutor - Agent Callback Hooks
+===============================
+
+ADK agents accept a single callback per lifecycle point. This module installs
+one composite callback on every LlmAgent in the tree (sub-agents and agents
+wrapped in AgentTool alike) and fans it out to named hooks, so runtime
+features can observe or adjust model and tool calls without editing the agent
+definitions.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+It also binds the current CallbackContext to a context variable right before
+each model call. ADK invokes the model in the same task, so model-call
+middleware can use `current_context()` to read the agent name and session
+state of the call it is handling.
+"""
+
+# Standard library imports
+import contextvars
+from typing import Any, Callable, Optional
+
+# Google ADK imports
+from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools.agent_tool import AgentTool
+
+# Callback context of the model call currently in flight
+_current_context: contextvars.ContextVar[Optional[CallbackContext]] = contextvars.ContextVar(
+    'aitutor_callback_context', default=None
+)
+
+# Registered hooks per lifecycle point: name -> hook
+_hooks: dict[str, dict[str, Callable]] = {
+    'before_model': {},
+    'after_model': {},
+    'before_tool': {},
+    'after_tool': {},
+}
+
+
+def current_context() -> Optional[CallbackContext]:
+    """
+    Return the CallbackContext of the model call in flight.
+
+    Returns:
+        CallbackContext | None: None outside an agent-driven model call
+    """
+    return _current_context.get()
+
+
+def add(point: str, name: str, hook: Callable) -> None:
+    """
+    Register (or replace) a hook.
+
+    Hooks receive the same keyword arguments as the ADK callback for their
+    point; the first hook returning a non-None value short-circuits the rest,
+    exactly like a single ADK callback would.
+
+    Args:
+        point (str): 'before_model', 'after_model', 'before_tool' or 'after_tool'
+        name (str): Unique hook name; re-registering replaces it
+        hook (Callable): The hook function
+    """
+    _hooks[point][name] = hook
+
+
+def remove(point: str, name: str) -> None:
+    """Unregister a hook by name (no-op if absent)."""
+    _hooks[point].pop(name, None)
+
+
+def _run(point: str, original: Optional[Callable], **kwargs) -> Any:
+    """Run the agent's own callback, then the registered hooks, until one returns a value."""
+    for hook in ([original] if original else []) + list(_hooks[point].values()):
+        result = hook(**kwargs)
+        if result is not None:
+            return result
+    return None
+
+
+def _composite_callbacks(agent: LlmAgent) -> dict[str, Callable]:
+    """Build the composite callbacks for one agent, preserving any it already had."""
+    own = {
+        'before_model': agent.before_model_callback,
+        'after_model': agent.after_model_callback,
+        'before_tool': agent.before_tool_callback,
+        'after_tool': agent.after_tool_callback,
+    }
+
+    def before_model(callback_context, llm_request):
+        _current_context.set(callback_context)
+        return _run('before_model', own['before_model'], callback_context=callback_context, llm_request=llm_request)
+
+    def after_model(callback_context, llm_response):
+        return _run('after_model', own['after_model'], callback_context=callback_context, llm_response=llm_response)
+
+    def before_tool(tool, args, tool_context):
+        return _run('before_tool', own['before_tool'], tool=tool, args=args, tool_context=tool_context)
+
+    def after_tool(tool, args, tool_context, tool_response):
+        return _run(
+            'after_tool', own['after_tool'],
+            tool=tool, args=args, tool_context=tool_context, tool_response=tool_response,
+        )
+
+    for callback in (before_model, after_model, before_tool, after_tool):
+        callback._aitutor_hooks = True
+    return {
+        'before_model_callback': before_model,
+        'after_model_callback': after_model,
+        'before_tool_callback': before_tool,
+        'after_tool_callback': after_tool,
+    }
+
+
+def iter_agents(root_agent) -> list[LlmAgent]:
+    """
+    List every LlmAgent reachable from the root, including AgentTool agents.
+
+    Args:
+        root_agent: Root of the agent tree
+
+    Returns:
+        list[LlmAgent]: Agents in depth-first order, each listed once
+    """
+    found, seen, stack = [], set(), [root_agent]
+    while stack:
+        agent = stack.pop()
+        if not isinstance(agent, LlmAgent) or id(agent) in seen:
+            continue
+        seen.add(id(agent))
+        found.append(agent)
+        stack.extend(reversed(agent.sub_agents))
+        stack.extend(tool.agent for tool in agent.tools if isinstance(tool, AgentTool))
+    return found
+
+
+def install(root_agent) -> None:
+    """
+    Install the composite callbacks on every LlmAgent in the tree.
+
+    Safe to call more than once; agents that already carry the composite
+    callbacks are skipped.
+
+    Args:
+        root_agent: Root of the agent tree
+    """
+    for agent in iter_agents(root_agent):
+        if getattr(agent.before_model_callback, '_aitutor_hooks', False):
+            continue
+        for attribute, callback in _composite_callbacks(agent).items():
+            setattr(agent, attribute, callback)
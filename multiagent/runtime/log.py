@@ -0,0 +1,276 @@
+"""
+AI Tutor - Structured Logging
+=============================
+
+JSON-lines logging for the request path that stays off the event loop.
+A log call only builds a LogRecord and puts it on a bounded in-memory queue;
+a background thread formats and writes it, so a slow or blocked stdout never
+stalls request handling.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Features:
+- Request correlation: records carry the request id of the HTTP request they
+  were logged for (set by the HTTP middleware with `bind_request`)
+- Sampling: per-level keep rates for high-volume events; the decision is
+  made per request id, so a sampled request keeps all of its lines and
+  warnings and errors are always kept
+- Bounded memory: when the queue is full new records are dropped (never
+  blocking the caller) and counted in aitutor_log_records_dropped_total
+- Fork-safe: the pre-fork server's workers get their own queue and writer
+  thread
+
+Usage:
+    from multiagent.runtime import log
+    logger = log.get_logger('query')
+    logger.info('query processed', extra={'duration_ms': 812.4})
+
+Configuration:
+    AITUTOR_LOG_LEVEL: Lowest level written (INFO)
+    AITUTOR_LOG_SAMPLE: Keep rates per level, e.g. 'DEBUG=0.01,INFO=0.25' (all kept)
+    AITUTOR_LOG_QUEUE: Records buffered before dropping (10000)
+"""
+
+# Standard library imports
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import zlib
+from typing import Optional
+
+# Runtime imports
+from . import metrics
+
+# Parent of every AI Tutor logger
+ROOT_LOGGER = 'aitutor'
+
+# Request id of the HTTP request being handled, if any
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('aitutor_request_id', default=None)
+
+# Attributes every LogRecord has; anything else was passed with `extra=`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+_handler: Optional['AsyncQueueHandler'] = None
+_configure_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Return a logger under the 'aitutor' hierarchy.
+
+    Args:
+        name (str): Component name ('query', 'resilience', ...)
+
+    Returns:
+        logging.Logger: The 'aitutor.<name>' logger
+    """
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+def bind_request(request_id: Optional[str]) -> contextvars.Token:
+    """
+    Attach a request id to every record logged in the current context.
+
+    Args:
+        request_id (str | None): The id (None to unbind)
+
+    Returns:
+        contextvars.Token: Token for `unbind_request`
+    """
+    return _request_id.set(request_id)
+
+
+def unbind_request(token: contextvars.Token) -> None:
+    """Restore the request id that was bound before `bind_request`."""
+    _request_id.reset(token)
+
+
+def current_request_id() -> Optional[str]:
+    """Request id bound to the current context, if any."""
+    return _request_id.get()
+
+
+# Formatting
+# ==========
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, message, request id,
+    the fields passed with `extra=` and the exception, if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+# Sampling
+# ========
+
+def parse_sample_rates(spec: str) -> dict[int, float]:
+    """
+    Parse 'DEBUG=0.01,INFO=0.25' into {level number: keep rate}.
+
+    Args:
+        spec (str): Comma-separated LEVEL=rate pairs
+
+    Returns:
+        dict[int, float]: Keep rate per level (levels not listed keep everything)
+    """
+    rates = {}
+    for item in spec.split(','):
+        name, _, rate = item.partition('=')
+        level = logging.getLevelName(name.strip().upper())
+        if isinstance(level, int) and rate.strip():
+            rates[level] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a share of the records at each sampled level.
+
+    Records logged for a request are kept or dropped together (the decision
+    hashes the request id); records outside a request are sampled by a
+    counter. WARNING and above are never sampled.
+    """
+
+    def __init__(self, rates: dict[int, float]):
+        super().__init__()
+        self.rates = {level: rate for level, rate in rates.items() if level < logging.WARNING and rate < 1.0}
+        self._counter = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        if rate is None:
+            return True
+        request_id = _request_id.get()
+        if request_id:
+            bucket = zlib.crc32(request_id.encode()) % 10000
+        else:
+            self._counter += 1
+            bucket = (self._counter * 7919) % 10000
+        if bucket < rate * 10000:
+            return True
+        metrics.LOG_DROPPED.inc(reason='sampled')
+        return False
+
+
+# Asynchronous Output
+# ===================
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks: records are handed to a writer thread
+    through a bounded queue and dropped (and counted) when it is full.
+    """
+
+    def __init__(self, target: logging.Handler, maxsize: int):
+        """
+        Args:
+            target (logging.Handler): Handler the writer thread emits to
+            maxsize (int): Records buffered before dropping
+        """
+        super().__init__(queue.Queue(maxsize))
+        self.target = target
+        self.maxsize = maxsize
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        self.listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Flush what is queued and stop the writer thread."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_after_fork(self) -> None:
+        """Give a forked child a fresh queue and writer thread (threads do not survive fork)."""
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = None
+        self.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the writer thread; only capture what lives in
+        # the caller's context
+        record.request_id = _request_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_DROPPED.inc(reason='queue_full')
+
+
+def configure(level: Optional[str] = None, stream=None) -> logging.Logger:
+    """
+    Route the 'aitutor' loggers through the asynchronous JSON handler.
+
+    Idempotent. Cheap enough for application startup.
+
+    Args:
+        level (str, optional): Lowest level written; defaults to AITUTOR_LOG_LEVEL
+        stream (optional): Output stream; defaults to stdout
+
+    Returns:
+        logging.Logger: The 'aitutor' root logger
+    """
+    global _handler
+
+    root = logging.getLogger(ROOT_LOGGER)
+    with _configure_lock:
+        if _handler is not None:
+            return root
+
+        target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(JsonFormatter())
+        _handler = AsyncQueueHandler(target, int(os.getenv('AITUTOR_LOG_QUEUE', '10000')))
+        rates = parse_sample_rates(os.getenv('AITUTOR_LOG_SAMPLE', ''))
+        if rates:
+            _handler.addFilter(SamplingFilter(rates))
+        _handler.start()
+
+        root.addHandler(_handler)
+        root.setLevel((level or os.getenv('AITUTOR_LOG_LEVEL', 'INFO')).upper())
+        root.propagate = False
+
+        atexit.register(_handler.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_handler.restart_after_fork)
+    return root
+
+
+def shutdown() -> None:
+    """
+    Write out everything still queued and stop the writer thread.
+
+    Runs at interpreter exit; processes leaving through os._exit (pre-fork
+    workers) call it themselves.
+    """
+    if _handler is not None:
+        _handler.stop()
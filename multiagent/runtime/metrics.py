@@ -0,0 +1,343 @@
+"""
+AI Tutor - Prometheus Metrics
+=============================
+
+A small in-process metrics registry rendered in the Prometheus text
+exposition format (served by the `/metrics` endpoint). The AI Tutor's request,
+agent, model and tool metrics are fed from finished trace spans by
+tracing.SpanMetricsProcessor.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Metric types:
+- Counter: Monotonic totals (tokens, calls, errors)
+- Gauge: Point-in-time values (in-flight work)
+- Histogram: Latency distributions with cumulative buckets
+
+All metrics are labelled and thread-safe; recording is a dict update under
+a lock, so instrumentation stays cheap on the request path. The module only
+uses the standard library, so serving /metrics never loads the agent stack.
+"""
+
+# Standard library imports
+import bisect
+import threading
+from typing import Iterable
+
+# Latency buckets in seconds: tool calls are milliseconds, model calls seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    """Escape a label value for the exposition format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = '') -> str:
+    """Render a label set as {a="x",b="y"}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value (integers without a trailing .0)."""
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """Shared state of a labelled metric."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        """Order label values by the declared label names."""
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self) -> list[str]:
+        """Return the exposition lines for every label set."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the metric with its HELP and TYPE header."""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing total."""
+
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Add a non-negative amount to the counter for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """Current total for a label set."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    kind = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Increase the gauge for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        """Decrease the gauge for a label set."""
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        """Set the gauge for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        """Current value for a label set."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Histogram(_Metric):
+    """A distribution of observations in cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one observation for a label set."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels) -> int:
+        """Number of observations for a label set."""
+        return sum(self._counts.get(self._key(labels), []))
+
+    def samples(self) -> list[str]:
+        lines = []
+        with self._lock:
+            items = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """A named collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_add(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """Return the counter with this name, creating it on first use."""
+        return self._get_or_add(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """Return the gauge with this name, creating it on first use."""
+        return self._get_or_add(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Return the histogram with this name, creating it on first use."""
+        return self._get_or_add(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition document (content type text/plain; version=0.0.4)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+# Default registry served by /metrics
+REGISTRY = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# AI Tutor Metrics
+# ================
+
+HTTP_DURATION = REGISTRY.histogram(
+    'aitutor_http_request_duration_seconds', 'HTTP request latency.', ('method', 'route', 'status'))
+AGENT_DURATION = REGISTRY.histogram(
+    'aitutor_agent_duration_seconds', 'Time spent in one agent run (one hop), including nested hops.', ('agent',))
+MODEL_DURATION = REGISTRY.histogram(
+    'aitutor_model_call_duration_seconds', 'Model call latency.', ('agent', 'model'))
+TOOL_DURATION = REGISTRY.histogram(
+    'aitutor_tool_duration_seconds', 'Tool invocation latency.', ('tool',))
+MODEL_TOKENS = REGISTRY.counter(
+    'aitutor_model_tokens_total', 'Model tokens by kind (input, output, cached).', ('agent', 'model', 'kind'))
+ERRORS = REGISTRY.counter(
+    'aitutor_errors_total', 'Spans that ended with an error status.', ('kind', 'name'))
+IN_FLIGHT = REGISTRY.gauge(
+    'aitutor_in_flight', 'Requests, agent runs, model calls and tool calls currently executing.', ('kind',))
+
+# Upstream resilience (fed by resilience.ResilienceMiddleware)
+UPSTREAM_THROTTLED = REGISTRY.counter(
+    'aitutor_upstream_throttled_total', 'Model calls held back by the client-side rate limits.', ('model', 'limit', 'outcome'))
+UPSTREAM_THROTTLE_WAIT = REGISTRY.histogram(
+    'aitutor_upstream_throttle_wait_seconds', 'Time model calls waited for rate-limit capacity.', ('model',))
+UPSTREAM_RETRIES = REGISTRY.counter(
+    'aitutor_upstream_retries_total', 'Model call retries by the status that caused them.', ('model', 'reason'))
+UPSTREAM_SHORT_CIRCUITED = REGISTRY.counter(
+    'aitutor_upstream_short_circuited_total', 'Model calls rejected by an open circuit breaker.', ('model',))
+UPSTREAM_CIRCUIT_STATE = REGISTRY.gauge(
+    'aitutor_upstream_circuit_state', 'Circuit breaker state per model (0 closed, 1 half-open, 2 open).', ('model',))
+
+# Credential pool (fed by credentials.CredentialPool)
+UPSTREAM_CREDENTIAL_CALLS = REGISTRY.counter(
+    'aitutor_upstream_credential_calls_total', 'Model calls per credential by outcome (ok, throttled, rejected, error).', ('credential', 'outcome'))
+UPSTREAM_CREDENTIAL_TOKENS = REGISTRY.counter(
+    'aitutor_upstream_credential_tokens_total', 'Tokens reported by the API per credential.', ('credential',))
+UPSTREAM_CREDENTIAL_AVAILABLE = REGISTRY.gauge(
+    'aitutor_upstream_credential_available', 'Whether a credential is in rotation (1) or resting after a 429/401/403 (0).', ('credential',))
+
+# Hedged model calls (fed by hedging.HedgingMiddleware)
+MODEL_HEDGE_CALLS = REGISTRY.counter(
+    'aitutor_model_hedge_calls_total', 'Model calls eligible for hedging.', ('agent', 'model'))
+MODEL_HEDGES = REGISTRY.counter(
+    'aitutor_model_hedges_total', 'Slow model calls by hedge outcome (won, lost, failed, over_budget).', ('agent', 'model', 'outcome'))
+MODEL_HEDGE_DELAY = REGISTRY.gauge(
+    'aitutor_model_hedge_delay_seconds', 'Current latency after which a model call is hedged.', ('agent', 'model'))
+
+# Queries cancelled before completion (see main.process_query_endpoint)
+ABANDONED = REGISTRY.counter(
+    'aitutor_queries_abandoned_total', 'Queries cancelled by their deadline or a client disconnect.', ('reason',))
+
+# Structured logging (fed by log.AsyncQueueHandler)
+LOG_DROPPED = REGISTRY.counter(
+    'aitutor_log_records_dropped_total', 'Log records not written, by reason (sampled, queue_full).', ('reason',))
+
+# First-turn response cache (fed by response_cache.ResponseCache)
+RESPONSE_CACHE_LOOKUPS = REGISTRY.counter(
+    'aitutor_response_cache_lookups_total', 'First-turn answer cache lookups by outcome (hit, stale, miss).', ('outcome',))
+RESPONSE_CACHE_ENTRIES = REGISTRY.gauge(
+    'aitutor_response_cache_entries', 'Answers held in the first-turn response cache.', ())
+
+# Local notes retrieval (fed by the retrieve_notes tools, see multiagent/retrieval/)
+NOTES_RETRIEVALS = REGISTRY.counter(
+    'aitutor_notes_retrievals_total', 'Notes index lookups by subject and outcome (hit, empty).', ('subject', 'outcome'))
+
+# Compact session storage (fed by session_store.CompactSessionService)
+SESSION_STORE_SESSIONS = REGISTRY.gauge(
+    'aitutor_session_store_sessions', 'Conversation sessions held in memory.', ())
+SESSION_STORE_BYTES = REGISTRY.gauge(
+    'aitutor_session_store_bytes', 'Bytes held by session event records (events) and shared function responses (blobs).', ('kind',))
+SESSION_STORE_LARGEST = REGISTRY.gauge(
+    'aitutor_session_store_largest_session_bytes', 'Bytes held by the largest session\'s event records.', ())
+SESSION_STORE_BLOBS = REGISTRY.counter(
+    'aitutor_session_store_blobs_total', 'Large function responses stored, by outcome (new, shared with an identical one).', ('outcome',))
+SESSION_STORE_REHYDRATIONS = REGISTRY.counter(
+    'aitutor_session_store_rehydrations_total', 'Stored events rebuilt into ADK events for a run.', ())
+
+# On-demand profiling (fed by server/profiling.py)
+PROFILES = REGISTRY.counter(
+    'aitutor_profiles_total', 'Profiles taken by kind (cprofile, sample, window, memory).', ('kind',))
+
+# Pooled tool execution (fed by executor.tool)
+TOOL_PENDING = REGISTRY.gauge(
+    'aitutor_tool_pending', 'Tool calls submitted to a thread or process pool and not finished.', ('tool', 'mode'))
+TOOL_QUEUE_WAIT = REGISTRY.histogram(
+    'aitutor_tool_queue_wait_seconds', 'Time pooled tool calls waited for a free worker.', ('tool', 'mode'))
+TOOL_RUN = REGISTRY.histogram(
+    'aitutor_tool_run_seconds', 'Time pooled tool calls ran in their worker.', ('tool', 'mode'))
+TOOL_FAILURES = REGISTRY.counter(
+    'aitutor_tool_failures_total', 'Pooled tool calls cut short (timeout, cpu_limit, memory_limit, crashed).', ('tool', 'mode', 'reason'))
+
+# Speculative specialist calls (fed by speculation.SpeculationMiddleware)
+SPECULATIONS = REGISTRY.counter(
+    'aitutor_speculations_total', 'Specialist calls speculated on the routing decision, by outcome (committed, discarded, failed, over_budget, low_confidence).', ('agent', 'outcome'))
+SPECULATION_WASTED_TOKENS = REGISTRY.counter(
+    'aitutor_speculation_wasted_tokens_total', 'Tokens spent on discarded speculative calls.', ('agent',))
+SPECULATION_SAVED = REGISTRY.counter(
+    'aitutor_speculation_saved_seconds_total', 'Specialist call time overlapped with routing by committed speculations.', ('agent',))
+
+# Client-held conversation state (fed by client_state.encode / decode)
+CLIENT_STATE_TOKENS = REGISTRY.counter(
+    'aitutor_client_state_tokens_total', 'Conversation state tokens issued, restored or rejected (malformed, version, signature, expired, too_large).', ('outcome',))
+CLIENT_STATE_BYTES = REGISTRY.histogram(
+    'aitutor_client_state_token_bytes', 'Size of issued conversation state tokens.', (),
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768))
+
+# Degraded-mode serving (fed by degradation.DegradationController)
+DEGRADATION_LEVEL = REGISTRY.gauge(
+    'aitutor_degradation_level', 'Serving level: 0 normal, 1 cache, 2 local tools, 3 no news analyst.', ())
+DEGRADED_RESPONSES = REGISTRY.counter(
+    'aitutor_degraded_responses_total', 'Answers served without the agents, by source (cache, stale_cache, calculator, physics_constants, elements).', ('source',))
+
+# Shared model-call connection pool (fed by connections.SharedTransport)
+HTTP_CONNECTIONS = REGISTRY.gauge(
+    'aitutor_http_connections', 'Open connections of the shared model-call pool, by state (active, idle).', ('state',))
+HTTP_INFLIGHT = REGISTRY.gauge(
+    'aitutor_http_requests_inflight', 'Model-call HTTP requests sent over the shared pool and not finished.', ())
+HTTP_CONNECTIONS_OPENED = REGISTRY.counter(
+    'aitutor_http_connections_opened_total', 'Connections opened by the shared model-call pool.', ())
+HTTP_CONNECT_SECONDS = REGISTRY.histogram(
+    'aitutor_http_connect_seconds', 'TCP and TLS setup time of new model-call connections.', (),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
@@ -0,0 +1,191 @@
+"""
+AI Tutor - Model Call Pipeline
+==============================
+
+Every Gemini call made by the agent tree goes through a small middleware chain
+so cross-cutting concerns (prompt caching, context trimming, tracing, rate
+limiting, ...) can be layered on without touching the agent definitions.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+How it works:
+- TutorGemini subclasses ADK's Gemini model and is registered for the same
+  model-name patterns, so agents keep declaring models by string name
+  (e.g. 'gemini-2.0-flash-001') and transparently get the pipeline.
+- Middleware are async callables `(call, call_next) -> LlmResponse` registered
+  with `use(name, middleware, order)`; lower order runs further out.
+- The innermost handler is the transport: the real Gemini API by default, or
+  any handler installed with `set_transport` (fakes and recorders in tests and
+  benchmarks).
+
+Streaming (SSE) calls bypass the chain and go straight to the SDK.
+
+Every TutorGemini instance sends its calls with one shared google-genai
+client over the shared connection pool (see connections.py), so the model
+instance ADK resolves for each call brings no client or connections of its own.
+"""
+
+# Standard library imports
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional
+
+# Google AI and ADK imports
+from google.adk.models import Gemini, LLMRegistry, LlmRequest, LlmResponse
+
+# Runtime imports
+from . import connections
+
+
+@dataclass
+class ModelCall:
+    """
+    One model call travelling through the middleware chain.
+
+    Attributes:
+        request (LlmRequest): The request built by the ADK flow (mutable)
+        model (str): Model name the call is addressed to
+        llm (TutorGemini): The model instance that received the call
+        usage (Any): usage_metadata reported by the transport, if any
+        metadata (dict): Free-form annotations shared between middleware
+        api_client (Any): google-genai client to send the call with (None:
+            the model's own, see credentials.py)
+    """
+    request: LlmRequest
+    model: str
+    llm: Optional['TutorGemini'] = None
+    usage: Any = None
+    metadata: dict = field(default_factory=dict)
+    api_client: Any = None
+
+
+ModelHandler = Callable[[ModelCall], Awaitable[LlmResponse]]
+Middleware = Callable[[ModelCall, ModelHandler], Awaitable[LlmResponse]]
+
+# Registered middleware: name -> (order, middleware)
+_middleware: dict[str, tuple[int, Middleware]] = {}
+
+# Optional replacement for the Gemini transport
+_transport: Optional[ModelHandler] = None
+
+
+def use(name: str, middleware: Middleware, order: int = 100) -> None:
+    """
+    Register (or replace) a middleware in the model call chain.
+
+    Args:
+        name (str): Unique middleware name; re-registering replaces it
+        middleware (Middleware): Async callable `(call, call_next) -> LlmResponse`
+        order (int): Position in the chain; lower values wrap higher ones
+    """
+    _middleware[name] = (order, middleware)
+
+
+def remove(name: str) -> None:
+    """Unregister a middleware by name (no-op if absent)."""
+    _middleware.pop(name, None)
+
+
+def middleware_names() -> list[str]:
+    """Return the registered middleware names from outermost to innermost."""
+    return [name for name, _ in sorted(_middleware.items(), key=lambda item: item[1][0])]
+
+
+def set_transport(transport: Optional[ModelHandler]) -> None:
+    """
+    Replace the innermost Gemini call, e.g. with a fake backend.
+
+    Args:
+        transport (ModelHandler | None): Handler to use; None restores Gemini
+    """
+    global _transport
+    _transport = transport
+
+
+async def gemini_transport(call: ModelCall) -> LlmResponse:
+    """
+    Send the call to the Gemini API through the google-genai SDK.
+
+    Args:
+        call (ModelCall): The call to send
+
+    Returns:
+        LlmResponse: The first candidate (or error) from the API response
+    """
+    llm = call.llm
+    llm._maybe_append_user_content(call.request)
+    client = call.api_client or llm.api_client
+    response = await client.aio.models.generate_content(
+        model=call.request.model or call.model,
+        contents=call.request.contents,
+        config=call.request.config,
+    )
+    call.usage = response.usage_metadata
+    return LlmResponse.create(response)
+
+
+def _build_chain(transport: ModelHandler) -> ModelHandler:
+    """Compose the registered middleware around the transport."""
+    handler = transport
+    for _, (_, middleware) in sorted(_middleware.items(), key=lambda item: -item[1][0]):
+        handler = (lambda mw, nxt: lambda call: mw(call, nxt))(middleware, handler)
+    return handler
+
+
+async def call_model(call: ModelCall) -> LlmResponse:
+    """
+    Run a model call through the full middleware chain.
+
+    Args:
+        call (ModelCall): The call to run
+
+    Returns:
+        LlmResponse: The response produced by the chain
+    """
+    return await _build_chain(_transport or gemini_transport)(call)
+
+
+class TutorGemini(Gemini):
+    """
+    Gemini model that routes non-streaming calls through the middleware chain.
+
+    Registered for the same model-name patterns as ADK's Gemini class, so every
+    LlmAgent declared with a 'gemini-*' model name resolves to this class.
+    """
+
+    @property
+    def api_client(self):
+        """The process-wide google-genai client (a new one per instance with AITUTOR_HTTP_POOL=off)."""
+        if not connections.CONFIG.shared:
+            return super().api_client
+        return connections.genai_client(self._tracking_headers)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        """
+        Generate content for an ADK flow step.
+
+        Args:
+            llm_request (LlmRequest): The request built by the ADK flow
+            stream (bool): Whether an SSE streaming call was requested
+
+        Yields:
+            LlmResponse: One response (non-streaming) or the SDK stream
+        """
+        if stream:
+            async for response in super().generate_content_async(llm_request, stream=True):
+                yield response
+            return
+
+        call = ModelCall(request=llm_request, model=llm_request.model or self.model, llm=self)
+        yield await call_model(call)
+
+
+def register_models() -> None:
+    """
+    Make 'gemini-*' model names resolve to TutorGemini.
+
+    Must run before the first model call (ADK caches name resolution).
+    """
+    LLMRegistry.register(TutorGemini)
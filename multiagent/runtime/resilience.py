@@ -0,0 +1,565 @@
+"""
+AI Tutor - Upstream Resilience
+==============================
+
+Model-call middleware that keeps the agents' Gemini traffic inside the
+project's quota and degrades gracefully when the API is saturated or failing,
+instead of letting every concurrent request hammer it until all of them fail.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Layers (per model, outermost first):
+- Circuit breaker: after consecutive upstream failures the model is marked
+  open and calls fail fast for a cool-down period; then a single half-open
+  probe decides whether to close it again or keep it open (with a longer
+  cool-down)
+- Retry: 429, 5xx and connection errors are retried with decorrelated
+  jitter backoff, honouring the server's RetryInfo delay, and limited by a
+  retry budget (retries may add at most a fixed share of traffic) so retries
+  never multiply an overload
+- Token buckets: client-side requests-per-minute and tokens-per-minute limits
+  sized to the quota; calls wait for capacity up to a maximum delay (and never
+  past the request deadline, see deadline.py) and are rejected beyond it.
+  Token use is estimated before the call and corrected with the reported
+  usage afterwards; a call cancelled while waiting gives its reservation
+  back, and one that fails or is abandoned after sending gives back its
+  token estimate
+
+Metrics: aitutor_upstream_* counters, wait histogram and circuit state gauge
+(see metrics.py).
+
+Configuration (limits are per process; divide the quota by the worker count
+when running several workers):
+    AITUTOR_GEMINI_RPM: Requests per minute per model (0 = unlimited)
+    AITUTOR_GEMINI_TPM: Tokens per minute per model (0 = unlimited)
+    AITUTOR_THROTTLE_MAX_WAIT: Longest wait for rate-limit capacity in seconds (10)
+    AITUTOR_RETRY_ATTEMPTS: Attempts per call including the first (3)
+    AITUTOR_RETRY_BASE / AITUTOR_RETRY_CAP: Backoff base and cap in seconds (0.5 / 8)
+    AITUTOR_RETRY_BUDGET: Retries allowed per call made, as a ratio (0.2)
+    AITUTOR_BREAKER_FAILURES: Consecutive failures that open the circuit (5)
+    AITUTOR_BREAKER_RESET: Seconds before an open circuit allows a probe (30)
+"""
+
+# Standard library imports
+import asyncio
+import dataclasses
+import os
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+# Runtime imports
+from . import deadline, log, metrics
+
+if TYPE_CHECKING:
+    from .model import ModelCall
+
+# HTTP statuses worth retrying: quota exhaustion and server-side failures
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+# Expected output tokens added to the input estimate before a call
+OUTPUT_TOKEN_ESTIMATE = 256
+
+# Circuit states (values of the aitutor_upstream_circuit_state gauge)
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+STATE_NAMES = {CLOSED: 'closed', HALF_OPEN: 'half_open', OPEN: 'open'}
+
+logger = log.get_logger('resilience')
+
+class UpstreamUnavailable(Exception):
+    """
+    A model call was not sent because the upstream is overloaded or failing.
+
+    Attributes:
+        model (str): The model the call was addressed to
+        retry_after (float): Seconds after which trying again makes sense
+    """
+
+    def __init__(self, message: str, model: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.model = model
+        self.retry_after = retry_after
+
+
+class Throttled(UpstreamUnavailable):
+    """The client-side rate limit would delay the call longer than allowed."""
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """The model's circuit breaker is open."""
+
+
+@dataclass
+class ResilienceConfig:
+    """
+    Settings of the resilience layer.
+
+    Attributes:
+        requests_per_minute (float): Request quota per model (0 = unlimited)
+        tokens_per_minute (float): Token quota per model (0 = unlimited)
+        max_wait (float): Longest wait for rate-limit capacity in seconds
+        attempts (int): Attempts per call including the first
+        backoff_base (float): Smallest retry delay in seconds
+        backoff_cap (float): Largest retry delay in seconds
+        retry_budget (float): Retries allowed per call made (0.2 = 20% extra traffic)
+        breaker_failures (int): Consecutive failures that open the circuit
+        breaker_reset (float): Seconds an open circuit waits before a probe
+        breaker_reset_cap (float): Longest cool-down after repeated failed probes
+    """
+    requests_per_minute: float = 0.0
+    tokens_per_minute: float = 0.0
+    max_wait: float = 10.0
+    attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_cap: float = 8.0
+    retry_budget: float = 0.2
+    breaker_failures: int = 5
+    breaker_reset: float = 30.0
+    breaker_reset_cap: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> 'ResilienceConfig':
+        """
+        Build the settings from the AITUTOR_* environment variables.
+
+        Returns:
+            ResilienceConfig: Defaults overridden by the environment
+        """
+        return cls(
+            requests_per_minute=float(os.getenv('AITUTOR_GEMINI_RPM', '0')),
+            tokens_per_minute=float(os.getenv('AITUTOR_GEMINI_TPM', '0')),
+            max_wait=float(os.getenv('AITUTOR_THROTTLE_MAX_WAIT', '10')),
+            attempts=max(1, int(os.getenv('AITUTOR_RETRY_ATTEMPTS', '3'))),
+            backoff_base=float(os.getenv('AITUTOR_RETRY_BASE', '0.5')),
+            backoff_cap=float(os.getenv('AITUTOR_RETRY_CAP', '8')),
+            retry_budget=float(os.getenv('AITUTOR_RETRY_BUDGET', '0.2')),
+            breaker_failures=max(1, int(os.getenv('AITUTOR_BREAKER_FAILURES', '5'))),
+            breaker_reset=float(os.getenv('AITUTOR_BREAKER_RESET', '30')),
+        )
+
+
+# Rate Limiting
+# =============
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate.
+
+    Waiting callers reserve their tokens up front (the level may go
+    negative), so callers are served in arrival order without a lock and a
+    burst cannot overtake calls already waiting.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            per_minute (float): Refill rate
+            capacity (float, optional): Bucket size; defaults to one minute of quota
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, max_wait: float) -> Optional[float]:
+        """
+        Take tokens, possibly from the future.
+
+        Args:
+            amount (float): Tokens to take (capped at the bucket capacity)
+            max_wait (float): Longest acceptable delay in seconds
+
+        Returns:
+            float | None: Seconds to wait before proceeding, or None if that
+                would exceed max_wait (nothing is taken then)
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        wait = max(0.0, (amount - self.level) / self.rate)
+        if wait > max_wait:
+            return None
+        self.level -= amount
+        return wait
+
+    def settle(self, amount: float) -> None:
+        """
+        Correct an earlier reservation.
+
+        Args:
+            amount (float): Tokens to take (positive) or give back (negative)
+        """
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+    def seconds_until(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available."""
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+
+def _refund(reserved: list[tuple[TokenBucket, float]]) -> None:
+    """Give back reservations of a call that was never sent."""
+    for bucket, amount in reserved:
+        bucket.settle(-amount)
+
+
+# Circuit Breaking
+# ================
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with a single half-open probe.
+    """
+
+    def __init__(self, model: str, failures: int, reset: float, reset_cap: float):
+        """
+        Args:
+            model (str): Model the breaker protects (metrics label)
+            failures (int): Consecutive failures that open the circuit
+            reset (float): Initial cool-down of an open circuit in seconds
+            reset_cap (float): Longest cool-down after repeated failed probes
+        """
+        self.model = model
+        self.failure_threshold = failures
+        self.base_reset = reset
+        self.reset_cap = reset_cap
+        self.reset = reset
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        metrics.UPSTREAM_CIRCUIT_STATE.set(CLOSED, model=model)
+
+    def _set_state(self, state: int) -> None:
+        if state != self.state:
+            logger.warning('circuit state changed', extra={
+                'model': self.model, 'from': STATE_NAMES[self.state], 'to': STATE_NAMES[state]})
+        self.state = state
+        metrics.UPSTREAM_CIRCUIT_STATE.set(state, model=self.model)
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        return max(0.0, self.opened_at + self.reset - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Decide whether a call may be sent.
+
+        Returns:
+            bool: True if the call may proceed (possibly as the half-open probe)
+        """
+        if self.state == OPEN and self.retry_after() == 0:
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+        return self.state == CLOSED
+
+    def record_success(self) -> None:
+        """A call reached the model successfully."""
+        self.failures = 0
+        self.probing = False
+        self.reset = self.base_reset
+        self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        """A call failed with an upstream (retryable) error."""
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            # Failed probe: back off longer before the next one
+            self.probing = False
+            self.reset = min(self.reset_cap, self.reset * 2)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def record_neutral(self) -> None:
+        """A call ended without telling anything about upstream health."""
+        self.probing = False
+
+    def _open(self) -> None:
+        self.opened_at = time.monotonic()
+        self._set_state(OPEN)
+
+
+# Error Classification
+# ====================
+
+def error_code(error: BaseException) -> Optional[int]:
+    """
+    HTTP status of an upstream error, or None if it is not one.
+
+    Connection-level failures count as 503.
+    """
+    from google.genai import errors
+    import httpx
+
+    if isinstance(error, errors.APIError):
+        return error.code
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ConnectionError)):
+        return 503
+    return None
+
+
+def server_retry_delay(error: BaseException) -> float:
+    """
+    Delay requested by the server, from a google.rpc.RetryInfo detail or a
+    Retry-After header.
+
+    Returns:
+        float: Seconds (0 if none was given)
+    """
+    details = getattr(error, 'details', None)
+    if isinstance(details, dict):
+        for detail in details.get('error', {}).get('details', []) or []:
+            delay = isinstance(detail, dict) and detail.get('retryDelay')
+            if delay:
+                match = re.match(r'([0-9.]+)s', str(delay))
+                if match:
+                    return float(match.group(1))
+    response = getattr(error, 'response', None)
+    retry_after = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+    try:
+        return float(retry_after) if retry_after else 0.0
+    except ValueError:
+        return 0.0
+
+
+def estimate_tokens(call: 'ModelCall') -> int:
+    """
+    Tokens a call is expected to use (input plus typical output).
+
+    Args:
+        call (ModelCall): The call about to be sent
+
+    Returns:
+        int: Estimated tokens, corrected with the reported usage afterwards
+    """
+    from .context import content_tokens
+    from ..prompts import count_tokens
+
+    tokens = sum(content_tokens(content) for content in call.request.contents or [])
+    config = call.request.config
+    if config is not None and isinstance(config.system_instruction, str):
+        tokens += count_tokens(config.system_instruction)
+    return tokens + OUTPUT_TOKEN_ESTIMATE
+
+
+# Middleware
+# ==========
+
+class ResilienceMiddleware:
+    """
+    Model-call middleware combining per-model rate limits, retries and a
+    circuit breaker.
+    """
+
+    def __init__(self, config: Optional[ResilienceConfig] = None):
+        """
+        Args:
+            config (ResilienceConfig, optional): Settings; defaults to the environment
+        """
+        self.config = config or ResilienceConfig.from_env()
+        self.random = random.Random()
+        self._request_buckets: dict[str, TokenBucket] = {}
+        self._token_buckets: dict[str, TokenBucket] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        # Retry budget: every call deposits `retry_budget`, every retry spends 1
+        self._retry_tokens = 10.0
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        """The circuit breaker of a model (created on first use)."""
+        if model not in self._breakers:
+            config = self.config
+            self._breakers[model] = CircuitBreaker(
+                model, config.breaker_failures, config.breaker_reset, config.breaker_reset_cap)
+        return self._breakers[model]
+
+    def status(self) -> dict:
+        """
+        Describe the circuit of every model used so far.
+
+        Returns:
+            dict: {model: {'state', 'retry_after'}}
+        """
+        return {
+            model: {'state': STATE_NAMES[breaker.state], 'retry_after': round(breaker.retry_after(), 1)}
+            for model, breaker in self._breakers.items()
+        }
+
+    async def _acquire(self, call: 'ModelCall', model: str, tokens: int) -> list[tuple[TokenBucket, float]]:
+        """
+        Wait for request and token capacity, or raise Throttled.
+
+        Returns:
+            list[tuple[TokenBucket, float]]: The reservations taken, (bucket, amount)
+        """
+        config = self.config
+        limits = []
+        if config.requests_per_minute > 0:
+            bucket = self._request_buckets.setdefault(model, TokenBucket(config.requests_per_minute))
+            limits.append(('requests', bucket, 1))
+        if config.tokens_per_minute > 0:
+            bucket = self._token_buckets.setdefault(model, TokenBucket(config.tokens_per_minute))
+            limits.append(('tokens', bucket, tokens))
+
+        # Never wait for capacity past the request's deadline
+        left = deadline.remaining()
+        max_wait = config.max_wait if left is None else min(config.max_wait, left)
+        waits = []
+        reserved = []
+        for limit, bucket, amount in limits:
+            wait = bucket.reserve(amount, max_wait)
+            if wait is None:
+                # Give back what the other limits already reserved
+                _refund(reserved)
+                metrics.UPSTREAM_THROTTLED.inc(model=model, limit=limit, outcome='rejected')
+                raise Throttled(
+                    f'{model} {limit}-per-minute limit reached', model, bucket.seconds_until(amount))
+            if wait > 0:
+                metrics.UPSTREAM_THROTTLED.inc(model=model, limit=limit, outcome='delayed')
+            waits.append(wait)
+            reserved.append((bucket, min(amount, bucket.capacity)))
+
+        wait = max(waits, default=0.0)
+        if limits:
+            metrics.UPSTREAM_THROTTLE_WAIT.observe(wait, model=model)
+        if wait > 0:
+            call.metadata['throttle_wait'] = call.metadata.get('throttle_wait', 0.0) + wait
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Never sent: nothing of the quota was used
+                _refund(reserved)
+                raise
+        return reserved
+
+    def _settle_tokens(self, call: 'ModelCall', model: str, reserved: list[tuple[TokenBucket, float]],
+                       failed: bool = False) -> None:
+        """
+        Replace the token estimate with the usage the API reported.
+
+        Args:
+            call (ModelCall): The call that was sent
+            model (str): Model the call was addressed to
+            reserved (list): Reservations returned by _acquire
+            failed (bool): Whether the call failed or was abandoned (no usage: the estimate is given back)
+        """
+        bucket = self._token_buckets.get(model)
+        estimate = next((amount for taken, amount in reserved if taken is bucket), None)
+        if bucket is None or estimate is None:
+            return
+        usage = call.usage
+        total = getattr(usage, 'total_token_count', None) if usage is not None and not failed else None
+        if failed:
+            bucket.settle(-estimate)
+        elif total:
+            bucket.settle(total - estimate)
+
+    def _backoff(self, previous: float, error: BaseException) -> float:
+        """Decorrelated jitter: random between base and 3x the previous delay, capped."""
+        config = self.config
+        delay = min(config.backoff_cap, self.random.uniform(config.backoff_base, max(config.backoff_base, previous * 3)))
+        return max(delay, min(server_retry_delay(error), config.backoff_cap))
+
+    async def __call__(self, call: 'ModelCall', call_next):
+        model = call.request.model or call.model
+        breaker = self.breaker(model)
+        config = self.config
+        estimate = estimate_tokens(call) if config.tokens_per_minute > 0 else 0
+        self._retry_tokens = min(10.0, self._retry_tokens + config.retry_budget)
+
+        delay = config.backoff_base
+        for attempt in range(1, config.attempts + 1):
+            if not breaker.allow():
+                metrics.UPSTREAM_SHORT_CIRCUITED.inc(model=model)
+                raise CircuitOpen(f'{model} circuit is open', model, breaker.retry_after())
+
+            try:
+                reserved = await self._acquire(call, model, estimate)
+            except BaseException:
+                # Throttled or cancelled before sending: free a half-open probe
+                # slot, or the circuit would never close again
+                breaker.record_neutral()
+                raise
+            try:
+                response = await call_next(call)
+            except asyncio.CancelledError:
+                # Abandoned (e.g. a hedged duplicate lost): says nothing about health
+                breaker.record_neutral()
+                self._settle_tokens(call, model, reserved, failed=True)
+                raise
+            except Exception as e:
+                self._settle_tokens(call, model, reserved, failed=True)
+                code = error_code(e)
+                if code not in RETRYABLE_CODES:
+                    breaker.record_neutral()
+                    raise
+                breaker.record_failure()
+                if attempt == config.attempts or self._retry_tokens < 1 or breaker.state == OPEN:
+                    raise
+                delay = self._backoff(delay, e)
+                left = deadline.remaining()
+                if left is not None and delay >= left:
+                    # The retry could not finish within the request's deadline
+                    raise
+                self._retry_tokens -= 1
+                metrics.UPSTREAM_RETRIES.inc(model=model, reason=str(code))
+                call.metadata['retries'] = attempt
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            self._settle_tokens(call, model, reserved)
+            return response
+
+
+# The installed middleware (for status reporting)
+_middleware: Optional[ResilienceMiddleware] = None
+
+
+def status() -> dict:
+    """
+    Circuit state of every model, for health reporting.
+
+    Returns:
+        dict: {model: {'state', 'retry_after'}} (empty before enable())
+    """
+    return _middleware.status() if _middleware is not None else {}
+
+
+def enable(config: Optional[ResilienceConfig] = None) -> ResilienceMiddleware:
+    """
+    Install the resilience middleware in the model call pipeline.
+
+    It sits next to the transport (only the credential pool is further in),
+    so a retry re-sends the already prepared request without redoing context
+    trimming or caching. With a credential pool the per-model rate limits are
+    left to the pool, which enforces them per credential.
+
+    Args:
+        config (ResilienceConfig, optional): Settings; defaults to the environment
+
+    Returns:
+        ResilienceMiddleware: The installed middleware
+    """
+    global _middleware
+    from . import credentials, model
+
+    config = config or ResilienceConfig.from_env()
+    if credentials.active():
+        # Quotas are per credential and enforced by the credential pool
+        config = dataclasses.replace(config, requests_per_minute=0.0, tokens_per_minute=0.0)
+    _middleware = ResilienceMiddleware(config)
+    model.use('resilience', _middleware, order=90)
+    return _middleware
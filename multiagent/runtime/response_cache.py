@@ -0,0 +1,199 @@
+"""
+AI Tutor - Response Cache
+=========================
+
+Answers to the opening question of a conversation, kept in memory and keyed
+by the normalized question text. Classroom traffic repeats the same opening
+questions ("What is Newton's second law?") many times, and the first turn of
+a conversation has no history, so its answer does not depend on who asks.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Rules:
+- Only first turns are cached and served; follow-up questions always run
+  the agents
+- Answers that used live data (the news analyst, web search) are not cached
+- Entries are fresh for AITUTOR_RESPONSE_CACHE_TTL seconds; after that they
+  are kept for a further stale window, served only when explicitly allowed
+  (e.g. while the model API is unavailable)
+- Least recently used entries are evicted beyond the size limit
+
+The cache is per process: under the pre-fork server each worker has its own.
+
+Metrics: aitutor_response_cache_lookups_total (outcome hit / stale / miss)
+and aitutor_response_cache_entries (see metrics.py).
+
+Configuration:
+    AITUTOR_RESPONSE_CACHE: Set to 'off' to disable (default 'on')
+    AITUTOR_RESPONSE_CACHE_SIZE: Most answers kept (2048)
+    AITUTOR_RESPONSE_CACHE_TTL: Seconds an answer stays fresh (21600)
+    AITUTOR_RESPONSE_CACHE_STALE: Further seconds a stale answer is kept (86400)
+"""
+
+# Standard library imports
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Runtime imports
+from . import metrics
+
+# Agents and tools whose answers depend on live data
+UNCACHEABLE = frozenset({'news_analyst', 'google_search'})
+
+
+def normalize(query: str) -> str:
+    """
+    Cache key of a question: case, spacing and trailing punctuation ignored.
+
+    Args:
+        query (str): The user's question
+
+    Returns:
+        str: Normalized question text
+    """
+    return re.sub(r'\s+', ' ', query).strip().rstrip('?!. ').lower()
+
+
+@dataclass
+class CachedAnswer:
+    """
+    One cached first-turn answer.
+
+    Attributes:
+        text (str): The answer
+        agent (str): Agent that produced the answer
+        hops (list[str]): Agents the original request went through
+        stored_at (float): time.time() when the answer was stored
+        hits (int): Times the answer was served from the cache
+    """
+    text: str
+    agent: str
+    hops: list[str] = field(default_factory=list)
+    stored_at: float = 0.0
+    hits: int = 0
+
+    def age(self) -> float:
+        """Seconds since the answer was stored."""
+        return time.time() - self.stored_at
+
+
+def is_cacheable(trace: dict) -> bool:
+    """
+    Whether an answer can be reused for other users.
+
+    Args:
+        trace (dict): The activity trace of the request (ActivityTrace.to_dict())
+
+    Returns:
+        bool: False if the agents used live data or produced no answer
+    """
+    if not trace.get('hops'):
+        return False
+    if UNCACHEABLE.intersection(trace['hops']):
+        return False
+    return not any(step.get('name') in UNCACHEABLE for step in trace.get('steps', []))
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of first-turn answers with a TTL and a stale window.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 21600.0, stale: float = 86400.0, enabled: bool = True):
+        """
+        Args:
+            max_entries (int): Most answers kept
+            ttl (float): Seconds an answer stays fresh
+            stale (float): Further seconds a stale answer is kept
+            enabled (bool): Whether answers are stored and served at all
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale = stale
+        self.enabled = enabled
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCache':
+        """
+        Build the cache from the AITUTOR_RESPONSE_CACHE* environment variables.
+
+        Returns:
+            ResponseCache: Configured cache
+        """
+        return cls(
+            max_entries=int(os.getenv('AITUTOR_RESPONSE_CACHE_SIZE', '2048')),
+            ttl=float(os.getenv('AITUTOR_RESPONSE_CACHE_TTL', '21600')),
+            stale=float(os.getenv('AITUTOR_RESPONSE_CACHE_STALE', '86400')),
+            enabled=os.getenv('AITUTOR_RESPONSE_CACHE', 'on').lower() not in ('off', '0', 'false'),
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, query: str) -> bool:
+        entry = self._entries.get(normalize(query))
+        return entry is not None and entry.age() < self.ttl
+
+    def get(self, query: str, allow_stale: bool = False) -> Optional[CachedAnswer]:
+        """
+        Look up the answer to a first-turn question.
+
+        Args:
+            query (str): The user's question
+            allow_stale (bool): Also return answers past their TTL (within the stale window)
+
+        Returns:
+            CachedAnswer | None: The answer, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        key = normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.age() >= self.ttl + self.stale:
+                del self._entries[key]
+                metrics.RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+                entry = None
+            if entry is None or (entry.age() >= self.ttl and not allow_stale):
+                metrics.RESPONSE_CACHE_LOOKUPS.inc(outcome='miss')
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+        metrics.RESPONSE_CACHE_LOOKUPS.inc(outcome='hit' if entry.age() < self.ttl else 'stale')
+        return entry
+
+    def put(self, query: str, text: str, trace: dict) -> bool:
+        """
+        Store the answer to a first-turn question if it is reusable.
+
+        Args:
+            query (str): The user's question
+            text (str): The answer
+            trace (dict): The request's activity trace (ActivityTrace.to_dict())
+
+        Returns:
+            bool: True if the answer was stored
+        """
+        if not self.enabled or not text or not is_cacheable(trace):
+            return False
+        hops = list(trace['hops'])
+        entry = CachedAnswer(text=text, agent=hops[-1], hops=hops, stored_at=time.time())
+        with self._lock:
+            self._entries[normalize(query)] = entry
+            self._entries.move_to_end(normalize(query))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            metrics.RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+        return True
+
+
+# Process-wide cache used by the query endpoint
+CACHE = ResponseCache.from_env()
@@ -0,0 +1,436 @@
+"""
+AI Tutor - Compact Session Store
+================================
+
+An ADK session service that keeps conversation history in a compact form.
+InMemorySessionService holds every event as a tree of pydantic objects for
+the life of the process: model text, function calls and function responses,
+including large repeated payloads such as the full `available_elements` and
+`available_constants` lists returned on lookup errors. Here each stored event
+is one small record and the ADK Event is only rebuilt when a run replays it.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Representation:
+- StoredEvent: a __slots__ record with the interned author, invocation id
+  and branch, the timestamp and the rest of the event as compact JSON bytes
+  (zlib-compressed above COMPRESS_MIN_BYTES)
+- Function responses of AITUTOR_SESSION_BLOB_MIN bytes or more are stored
+  once per distinct content in a reference-counted BlobStore, keyed by
+  content hash, and referenced from the event; the same error payload repeated across
+  thousands of sessions costs its bytes once
+- get_session returns a Session whose events list rebuilds each Event on
+  first access, so checking a session's length or finding the last agent
+  does not rebuild the whole history
+
+Accounting: bytes held per session (event records plus payloads) and in
+shared blobs are tracked on every append and exported as
+aitutor_session_store_sessions, aitutor_session_store_bytes,
+aitutor_session_store_largest_session_bytes and
+aitutor_session_store_blobs_total (see metrics.py); /health shows the
+totals and the largest sessions.
+
+Configuration:
+    AITUTOR_SESSION_STORE: 'compact' (default) or 'memory' (ADK InMemorySessionService)
+    AITUTOR_SESSION_BLOB_MIN: Function responses at least this many bytes are deduplicated (256)
+"""
+
+# Standard library imports
+import copy
+import hashlib
+import heapq
+import json
+import os
+import sys
+import time
+import uuid
+import zlib
+from typing import Any, Optional
+
+# Google ADK imports
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session, State
+from google.adk.sessions.base_session_service import GetSessionConfig, ListEventsResponse, ListSessionsResponse
+
+# Runtime imports
+from . import metrics
+
+# Payloads above this size are zlib-compressed
+COMPRESS_MIN_BYTES = 512
+
+# Event fields kept as record attributes instead of in the payload
+_HEADER_FIELDS = {'author', 'invocation_id', 'branch', 'timestamp'}
+
+_BLOB_PREFIX = b'{"$blob":"'
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else value
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+# Shared Payloads
+# ===============
+
+class BlobStore:
+    """
+    Reference-counted store of large function-response payloads, keyed by
+    content hash and shared by every session.
+    """
+
+    def __init__(self):
+        self._blobs: dict[bytes, bytes] = {}
+        self._refs: dict[bytes, int] = {}
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def add(self, payload: bytes) -> bytes:
+        """
+        Store a payload (or take another reference to an identical one).
+
+        Args:
+            payload (bytes): JSON of a function response
+
+        Returns:
+            bytes: The payload's key
+        """
+        key = hashlib.blake2b(payload, digest_size=16).digest()
+        if key in self._blobs:
+            self._refs[key] += 1
+            metrics.SESSION_STORE_BLOBS.inc(outcome='shared')
+        else:
+            self._blobs[key] = payload
+            self._refs[key] = 1
+            self.bytes += len(payload)
+            metrics.SESSION_STORE_BLOBS.inc(outcome='new')
+        return key
+
+    def get(self, key: bytes) -> bytes:
+        """Payload stored under a key."""
+        return self._blobs[key]
+
+    def release(self, key: bytes) -> None:
+        """Drop one reference; the payload is freed with the last one."""
+        self._refs[key] -= 1
+        if not self._refs[key]:
+            del self._refs[key]
+            self.bytes -= len(self._blobs.pop(key))
+
+
+# Event Records
+# =============
+
+class StoredEvent:
+    """
+    One session event in compact form.
+
+    Attributes:
+        author (str): Interned author ('user' or the agent name)
+        invocation_id (str): Interned id of the run that produced the event
+        branch (str | None): Interned agent branch
+        timestamp (float): Event time
+        payload (bytes): The remaining event fields as JSON, large function
+            responses replaced by blob references
+        compressed (bool): Whether payload is zlib-compressed
+        blobs (tuple[bytes, ...]): Keys of the blobs the payload references
+    """
+    __slots__ = ('author', 'invocation_id', 'branch', 'timestamp', 'payload', 'compressed', 'blobs')
+
+    def __init__(self, author, invocation_id, branch, timestamp, payload, compressed, blobs):
+        self.author = author
+        self.invocation_id = invocation_id
+        self.branch = branch
+        self.timestamp = timestamp
+        self.payload = payload
+        self.compressed = compressed
+        self.blobs = blobs
+
+    @classmethod
+    def pack(cls, event: Event, blobs: BlobStore, blob_min_bytes: int) -> 'StoredEvent':
+        """
+        Build the compact record of an ADK event.
+
+        Args:
+            event (Event): The event
+            blobs (BlobStore): Store for large function responses
+            blob_min_bytes (int): Size from which a function response is shared
+
+        Returns:
+            StoredEvent: The record
+        """
+        data = json.loads(event.model_dump_json(exclude_none=True, exclude=_HEADER_FIELDS))
+        keys = []
+        for part in (data.get('content') or {}).get('parts') or ():
+            response = part.get('function_response')
+            if not response or 'response' not in response:
+                continue
+            body = _dumps(response['response'])
+            if len(body) >= blob_min_bytes:
+                key = blobs.add(body)
+                keys.append(key)
+                response['response'] = {'$blob': key.hex()}
+        payload = _dumps(data)
+        compressed = len(payload) >= COMPRESS_MIN_BYTES
+        if compressed:
+            payload = zlib.compress(payload, 1)
+        return cls(
+            _intern(event.author), _intern(event.invocation_id), _intern(event.branch),
+            event.timestamp, payload, compressed, tuple(keys),
+        )
+
+    def unpack(self, blobs: BlobStore) -> Event:
+        """
+        Rebuild the ADK event.
+
+        Args:
+            blobs (BlobStore): Store the record's blobs live in
+
+        Returns:
+            Event: An independent Event equal to the one packed
+        """
+        payload = zlib.decompress(self.payload) if self.compressed else self.payload
+        for key in self.blobs:
+            payload = payload.replace(_BLOB_PREFIX + key.hex().encode() + b'"}', blobs.get(key), 1)
+        header = {'author': self.author, 'invocation_id': self.invocation_id, 'timestamp': self.timestamp}
+        if self.branch is not None:
+            header['branch'] = self.branch
+        header = _dumps(header)
+        body = header[:-1] + (b',' + payload[1:] if payload != b'{}' else b'}')
+        metrics.SESSION_STORE_REHYDRATIONS.inc()
+        return Event.model_validate_json(body)
+
+    def size(self) -> int:
+        """Bytes held by the record and its payload (shared blobs excluded)."""
+        return sys.getsizeof(self) + sys.getsizeof(self.payload) + sys.getsizeof(self.blobs)
+
+
+class LazyEvents(list):
+    """
+    Event list of a session handed to a run: holds StoredEvent records and
+    rebuilds each one into an Event the first time it is read.
+    """
+    __slots__ = ('_blobs',)
+
+    def __init__(self, records=(), blobs: Optional[BlobStore] = None):
+        super().__init__(records)
+        self._blobs = blobs
+
+    def _event(self, index: int) -> Event:
+        item = list.__getitem__(self, index)
+        if isinstance(item, StoredEvent):
+            item = item.unpack(self._blobs)
+            list.__setitem__(self, index, item)
+        return item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._event(position) for position in range(*index.indices(len(self)))]
+        return self._event(index)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self._event(position)
+
+    def __reversed__(self):
+        for position in range(len(self) - 1, -1, -1):
+            yield self._event(position)
+
+    def __reduce_ex__(self, protocol):
+        # Copies hold rebuilt events only
+        return list, (list(iter(self)),)
+
+
+# Sessions
+# ========
+
+class StoredSession:
+    """
+    A session as kept by the store.
+
+    Attributes:
+        app_name (str): Interned app name
+        user_id (str): Interned user id
+        id (str): Session id
+        state (dict): Session state (app:/user: keys included, as in ADK)
+        events (list[StoredEvent]): Compact event records
+        last_update_time (float): Time of the last event
+        bytes (int): Bytes held by the event records
+    """
+    __slots__ = ('app_name', 'user_id', 'id', 'state', 'events', 'last_update_time', 'bytes')
+
+    def __init__(self, app_name: str, user_id: str, session_id: str, state: dict):
+        self.app_name = sys.intern(app_name)
+        self.user_id = sys.intern(user_id)
+        self.id = session_id
+        self.state = state
+        self.events: list[StoredEvent] = []
+        self.last_update_time = time.time()
+        self.bytes = 0
+
+
+class CompactSessionService(BaseSessionService):
+    """
+    Drop-in replacement for InMemorySessionService with compact event storage.
+    """
+
+    def __init__(self, blob_min_bytes: Optional[int] = None):
+        """
+        Args:
+            blob_min_bytes (int, optional): Function responses at least this
+                large are deduplicated; defaults to AITUTOR_SESSION_BLOB_MIN
+        """
+        self.blob_min_bytes = blob_min_bytes if blob_min_bytes is not None else int(os.getenv('AITUTOR_SESSION_BLOB_MIN', '256'))
+        self.blobs = BlobStore()
+        # (app name, user id, session id) -> session
+        self.sessions: dict[tuple[str, str, str], StoredSession] = {}
+        self.user_state: dict[tuple[str, str], dict[str, Any]] = {}
+        self.app_state: dict[str, dict[str, Any]] = {}
+        self.event_bytes = 0
+        self.event_count = 0
+        self.largest_bytes = 0
+
+    def _update_metrics(self) -> None:
+        metrics.SESSION_STORE_SESSIONS.set(len(self.sessions))
+        metrics.SESSION_STORE_LARGEST.set(self.largest_bytes)
+        metrics.SESSION_STORE_BYTES.set(self.event_bytes, kind='events')
+        metrics.SESSION_STORE_BYTES.set(self.blobs.bytes, kind='blobs')
+
+    def _view(self, stored: StoredSession, records: list[StoredEvent]) -> Session:
+        """Session handed to callers: own state copy, lazily rebuilt events."""
+        state = copy.deepcopy(stored.state)
+        for key, value in self.app_state.get(stored.app_name, {}).items():
+            state[State.APP_PREFIX + key] = value
+        for key, value in self.user_state.get((stored.app_name, stored.user_id), {}).items():
+            state[State.USER_PREFIX + key] = value
+        # model_construct: the events list must stay lazy (validation would rebuild it)
+        return Session.model_construct(
+            id=stored.id, app_name=stored.app_name, user_id=stored.user_id, state=state,
+            events=LazyEvents(records, self.blobs), last_update_time=stored.last_update_time,
+        )
+
+    def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                       session_id: Optional[str] = None) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        if (app_name, user_id, session_id) in self.sessions:
+            # Recreated under the same id: release the old one's accounting and blobs
+            self.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        stored = StoredSession(app_name, user_id, session_id, copy.deepcopy(state or {}))
+        self.sessions[(app_name, user_id, session_id)] = stored
+        self._update_metrics()
+        return self._view(stored, [])
+
+    def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                    config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        stored = self.sessions.get((app_name, user_id, session_id))
+        if stored is None:
+            return None
+        records = stored.events
+        if config:
+            if config.num_recent_events:
+                records = records[-config.num_recent_events:]
+            elif config.after_timestamp:
+                # Same selection as InMemorySessionService: from the last event before the timestamp
+                index = len(records) - 1
+                while index >= 0 and records[index].timestamp >= config.after_timestamp:
+                    index -= 1
+                if index >= 0:
+                    records = records[index:]
+        return self._view(stored, list(records))
+
+    def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        return ListSessionsResponse(sessions=[
+            Session(id=stored.id, app_name=stored.app_name, user_id=stored.user_id,
+                    last_update_time=stored.last_update_time)
+            for (app, user, _), stored in self.sessions.items()
+            if app == app_name and user == user_id
+        ])
+
+    def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        stored = self.sessions.pop((app_name, user_id, session_id), None)
+        if stored is None:
+            return
+        for record in stored.events:
+            for key in record.blobs:
+                self.blobs.release(key)
+        self.event_bytes -= stored.bytes
+        self.event_count -= len(stored.events)
+        if stored.bytes >= self.largest_bytes:
+            self.largest_bytes = max((other.bytes for other in self.sessions.values()), default=0)
+        self._update_metrics()
+
+    def list_events(self, *, app_name: str, user_id: str, session_id: str) -> ListEventsResponse:
+        stored = self.sessions.get((app_name, user_id, session_id))
+        if stored is None:
+            return ListEventsResponse()
+        return ListEventsResponse(events=[record.unpack(self.blobs) for record in stored.events])
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        # Update the caller's session object (state delta, event list)
+        super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        if event.partial:
+            return event
+
+        stored = self.sessions.get((session.app_name, session.user_id, session.id))
+        if stored is None:
+            return event
+
+        state_delta = event.actions.state_delta if event.actions else None
+        for key, value in (state_delta or {}).items():
+            if key.startswith(State.APP_PREFIX):
+                self.app_state.setdefault(stored.app_name, {})[key.removeprefix(State.APP_PREFIX)] = value
+            if key.startswith(State.USER_PREFIX):
+                self.user_state.setdefault((stored.app_name, stored.user_id), {})[key.removeprefix(State.USER_PREFIX)] = value
+            if not key.startswith(State.TEMP_PREFIX):
+                stored.state[key] = copy.deepcopy(value)
+
+        record = StoredEvent.pack(event, self.blobs, self.blob_min_bytes)
+        stored.events.append(record)
+        stored.bytes += record.size()
+        self.event_bytes += record.size()
+        self.event_count += 1
+        stored.last_update_time = event.timestamp
+        self.largest_bytes = max(self.largest_bytes, stored.bytes)
+        self._update_metrics()
+        return event
+
+    def stats(self, largest: int = 5) -> dict:
+        """
+        Memory accounting for /health.
+
+        Args:
+            largest (int): Number of largest sessions listed
+
+        Returns:
+            dict: Session and event counts, bytes held by event records and
+                shared blobs, and the sizes of the largest sessions (never
+                their ids: session ids are chosen by clients and /health is public)
+        """
+        biggest = heapq.nlargest(largest, self.sessions.values(), key=lambda stored: stored.bytes)
+        return {
+            'store': 'compact',
+            'sessions': len(self.sessions),
+            'events': self.event_count,
+            'event_bytes': self.event_bytes,
+            'blobs': len(self.blobs),
+            'blob_bytes': self.blobs.bytes,
+            'largest': [{'events': len(stored.events), 'bytes': stored.bytes} for stored in biggest],
+        }
+
+
+def create_session_service() -> BaseSessionService:
+    """
+    Build the session service selected by AITUTOR_SESSION_STORE.
+
+    Returns:
+        BaseSessionService: CompactSessionService, or ADK's InMemorySessionService for 'memory'
+    """
+    if os.getenv('AITUTOR_SESSION_STORE', 'compact').lower() == 'memory':
+        return InMemorySessionService()
+    return CompactSessionService()
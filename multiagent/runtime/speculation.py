@@ -0,0 +1,489 @@
+"""
+AI Tutor - Speculative Specialist Execution
+===========================================
+
+Overlaps the orchestrator's routing call with the specialist's first model
+call. The orchestrator stays the authoritative router, but its decision is
+predictable: when a local classifier is confident which specialist a new
+question goes to, that specialist's first call is started alongside the
+orchestrator's. If the orchestrator transfers to the predicted specialist
+the speculative response is used as the specialist's first call, so the
+routing hop costs almost nothing; otherwise it is cancelled and discarded.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Prediction:
+RoutePredictor is a small naive Bayes classifier over the words of the
+question, seeded with a vocabulary per specialist and trained online on the
+orchestrator's actual decisions, so it adapts to the questions students ask.
+Questions the orchestrator answers itself (or sends to the news analyst)
+are a class of their own, so they do not trigger speculation.
+
+Commit rule:
+The speculative call is built by the specialist's own ADK flow, from the
+session as it stood before routing plus the orchestrator's expected
+transfer_to_agent call and response, which the specialist sees as "For
+context" content. It is committed only if the orchestrator's response is
+nothing but a transfer to that specialist and the specialist's real request
+carries the same contents; anything else changes what the specialist would
+see, so the speculation is discarded.
+
+Spend cap:
+Speculative calls draw their estimated tokens from a per-minute budget and
+at most AITUTOR_SPECULATION_MAX_INFLIGHT run at once. Committed calls are
+refunded (they were needed anyway), so the budget bounds wasted spend.
+
+Metrics: aitutor_speculations_total (outcome committed / discarded / failed /
+over_budget / low_confidence), aitutor_speculation_wasted_tokens_total and
+aitutor_speculation_saved_seconds_total (see metrics.py). Hit rate is
+committed / (committed + discarded).
+
+Configuration (speculation is opt-in):
+    AITUTOR_SPECULATION: Set to 'on' to speculate specialist calls (default 'off')
+    AITUTOR_SPECULATION_CONFIDENCE: Prediction probability needed to speculate (0.75)
+    AITUTOR_SPECULATION_TOKENS_PER_MINUTE: Token budget of speculative calls (20000)
+    AITUTOR_SPECULATION_MAX_INFLIGHT: Speculative calls running at once (8)
+"""
+
+# Standard library imports
+import asyncio
+import copy
+import math
+import os
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Google ADK imports
+from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.events import Event
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+# Runtime imports
+from . import hooks, metrics
+from .context import content_tokens, split_turns
+from .model import ModelCall
+from ..prompts import count_tokens
+
+# Label of questions no specialist should take
+NO_SPECIALIST = ''
+
+# Seed vocabulary per specialist; each word counts as SEED_COUNT observations
+SEED_TERMS = {
+    'maths_agent': (
+        'solve equation calculate compute algebra calculus derivative integral integrate '
+        'differentiate sum product percent percentage fraction square root sqrt multiply '
+        'divide plus minus times factor factorise polynomial quadratic matrix vector '
+        'probability statistic mean median average geometry triangle circle area angle '
+        'perimeter logarithm log sin cos tan trigonometry prime <num> <op>'
+    ),
+    'physics_agent': (
+        'physic force mass acceleration velocity speed light gravity gravitational energy '
+        'kinetic potential momentum newton joule watt power electric electricity magnetic '
+        'field charge current voltage resistance circuit wave frequency wavelength '
+        'thermodynamic heat temperature pressure quantum relativity photon planck constant '
+        'friction motion orbit'
+    ),
+    'chemistry_agent': (
+        'chemistry chemical element atom atomic molecule compound reaction react bond ionic '
+        'covalent periodic table electron proton neutron mole molar stoichiometry acid base '
+        'oxidation reduction carbon oxygen hydrogen nitrogen sodium chlorine iron gold '
+        'valence isotope formula balance concentration'
+    ),
+    NO_SPECIALIST: (
+        'news latest ai artificial intelligence openai gemini research announced release '
+        'week today trend development hello hi thank'
+    ),
+}
+SEED_COUNT = 6.0
+
+# Additive smoothing of word counts
+SMOOTHING = 0.5
+
+# Words learned per process before the vocabulary stops growing
+MAX_VOCABULARY = 20000
+
+# Output tokens assumed for a speculative call when charging the budget
+OUTPUT_ESTIMATE = 256
+
+# Speculations never claimed by their specialist are dropped after this long
+SPECULATION_TTL = 120.0
+
+_WORD = re.compile(r'[a-z]+|\d+(?:\.\d+)?|[=+*/^]')
+
+
+def features(text: str) -> list[str]:
+    """
+    Words of a question as classifier features.
+
+    Numbers and arithmetic operators collapse to '<num>' and '<op>'; a
+    trailing plural 's' is dropped so 'forces' and 'force' match.
+
+    Args:
+        text (str): The question
+
+    Returns:
+        list[str]: Features in order of appearance
+    """
+    found = []
+    for token in _WORD.findall(text.lower()):
+        if token[0].isdigit():
+            found.append('<num>')
+        elif not token[0].isalpha():
+            found.append('<op>')
+        elif len(token) > 1:
+            found.append(token[:-1] if len(token) > 3 and token.endswith('s') and not token.endswith('ss') else token)
+    return found
+
+
+class RoutePredictor:
+    """
+    Naive Bayes guess of which specialist the orchestrator will pick.
+    """
+
+    def __init__(self, labels: list[str]):
+        """
+        Args:
+            labels (list[str]): Specialist names the orchestrator can transfer to
+        """
+        self.labels = list(labels) + [NO_SPECIALIST]
+        self.words: dict[str, Counter] = {label: Counter() for label in self.labels}
+        self.totals: Counter = Counter()
+        self.decisions: Counter = Counter({label: 1.0 for label in self.labels})
+        for label in self.labels:
+            for word in SEED_TERMS.get(label, '').split():
+                self.words[label][word] += SEED_COUNT
+                self.totals[label] += SEED_COUNT
+        self.vocabulary = set().union(*self.words.values())
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """
+        Most likely destination of a question.
+
+        Words never seen for any label carry no evidence and are ignored.
+
+        Args:
+            text (str): The question
+
+        Returns:
+            tuple[str, float]: Label ('' for no specialist) and its probability
+        """
+        words = [word for word in features(text) if word in self.vocabulary]
+        size = len(self.vocabulary)
+        decided = sum(self.decisions.values())
+        scores = {}
+        for label in self.labels:
+            denominator = self.totals[label] + SMOOTHING * size
+            scores[label] = math.log(self.decisions[label] / decided) + sum(
+                math.log((self.words[label][word] + SMOOTHING) / denominator) for word in words
+            )
+        best = max(scores, key=scores.get)
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / total
+
+    def observe(self, text: str, label: str) -> None:
+        """
+        Learn from one routing decision of the orchestrator.
+
+        Args:
+            text (str): The question
+            label (str): Specialist it went to ('' for none)
+        """
+        if label not in self.words:
+            return
+        self.decisions[label] += 1
+        for word in features(text):
+            if word in self.vocabulary or len(self.vocabulary) < MAX_VOCABULARY:
+                self.vocabulary.add(word)
+                self.words[label][word] += 1
+                self.totals[label] += 1
+
+
+@dataclass
+class SpeculationConfig:
+    """
+    Settings of the speculation middleware.
+
+    Attributes:
+        enabled (bool): Whether specialist calls are speculated at all
+        confidence (float): Prediction probability needed to speculate
+        tokens_per_minute (float): Token budget of speculative calls
+        max_inflight (int): Speculative calls running at once
+    """
+    enabled: bool = False
+    confidence: float = 0.75
+    tokens_per_minute: float = 20000.0
+    max_inflight: int = 8
+
+    @classmethod
+    def from_env(cls) -> 'SpeculationConfig':
+        """
+        Build the settings from the AITUTOR_SPECULATION* environment variables.
+
+        Returns:
+            SpeculationConfig: Defaults overridden by the environment
+        """
+        return cls(
+            enabled=os.getenv('AITUTOR_SPECULATION', 'off').lower() in ('on', '1', 'true'),
+            confidence=float(os.getenv('AITUTOR_SPECULATION_CONFIDENCE', '0.75')),
+            tokens_per_minute=float(os.getenv('AITUTOR_SPECULATION_TOKENS_PER_MINUTE', '20000')),
+            max_inflight=int(os.getenv('AITUTOR_SPECULATION_MAX_INFLIGHT', '8')),
+        )
+
+
+@dataclass
+class Speculation:
+    """
+    A specialist call started ahead of the orchestrator's decision.
+
+    Attributes:
+        agent (str): Specialist the call was made for
+        task (asyncio.Task): The call; resolves to (LlmResponse, ModelCall | None)
+        tokens (int): Estimated tokens charged to the budget
+        contents (list | None): Contents of the speculative request as the
+            specialist built it, before the model-call chain rewrote them
+        started (float): time.monotonic() when the call started
+        finished (float | None): time.monotonic() when the call returned
+        confirmed (bool): Whether the orchestrator transferred to the agent
+    """
+    agent: str
+    task: asyncio.Task
+    tokens: int
+    contents: Optional[list] = None
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+    confirmed: bool = False
+
+
+def _question(turn: list) -> str:
+    """Text of the student message that opened the turn."""
+    return ' '.join(part.text or '' for part in turn[0].parts or []) if turn else ''
+
+
+def _transfer_events(invocation_context, author: str, agent_name: str) -> list[Event]:
+    """The events ADK records when the orchestrator transfers to an agent."""
+    common = {'invocation_id': invocation_context.invocation_id, 'author': author, 'branch': invocation_context.branch}
+    call = types.FunctionCall(name='transfer_to_agent', args={'agent_name': agent_name})
+    # transfer_to_agent returns None, which ADK records as an empty response
+    response = types.FunctionResponse(name='transfer_to_agent', response={})
+    return [
+        Event(content=types.Content(role='model', parts=[types.Part(function_call=call)]), **common),
+        Event(content=types.Content(role='user', parts=[types.Part(function_response=response)]), **common),
+    ]
+
+
+def _transfer_target(response: LlmResponse) -> tuple[Optional[str], bool]:
+    """Agent the orchestrator transferred to, and whether that is all it did."""
+    parts = (response.content.parts or []) if response.content else []
+    for part in parts:
+        if part.function_call and part.function_call.name == 'transfer_to_agent':
+            return (part.function_call.args or {}).get('agent_name'), len(parts) == 1
+    return None, False
+
+
+class SpeculationMiddleware:
+    """
+    Model-call middleware that runs the predicted specialist's first call
+    alongside the orchestrator's routing call.
+    """
+
+    def __init__(self, root_agent: LlmAgent, config: Optional[SpeculationConfig] = None):
+        """
+        Args:
+            root_agent (LlmAgent): The orchestrator; its LLM sub-agents are the specialists
+            config (SpeculationConfig, optional): Settings; defaults to the environment
+        """
+        self.config = config or SpeculationConfig.from_env()
+        self.root = root_agent.name
+        self.specialists = {agent.name: agent for agent in root_agent.sub_agents if isinstance(agent, LlmAgent)}
+        self.predictor = RoutePredictor(list(self.specialists))
+        self.pending: dict[str, Speculation] = {}
+        self.budget = self.config.tokens_per_minute
+        self.refilled = time.monotonic()
+
+    async def __call__(self, call: ModelCall, call_next):
+        callback_context = hooks.current_context()
+        if callback_context is None or call.metadata.get('purpose'):
+            # Outside an agent, or a helper call made during an agent's step (e.g. a context summary)
+            return await call_next(call)
+        turns = split_turns(call.request.contents)
+        turn = turns[-1] if turns else []
+        if any(content.role == 'model' for content in turn):
+            # Only an agent's first step of a turn is routed or speculated
+            return await call_next(call)
+
+        invocation_id = callback_context.invocation_id
+        agent = callback_context.agent_name
+        if agent == self.root:
+            return await self._route(call, call_next, callback_context, _question(turn))
+        speculation = self.pending.get(invocation_id)
+        if speculation is not None and speculation.agent == agent and speculation.confirmed:
+            del self.pending[invocation_id]
+            return await self._commit(call, call_next, speculation)
+        return await call_next(call)
+
+    async def _route(self, call, call_next, callback_context, question):
+        """Run the orchestrator's call, speculating on its decision."""
+        invocation_id = callback_context.invocation_id
+        self._expire()
+        predicted, confidence = self.predictor.predict(question)
+        speculation = None
+        if predicted in self.specialists and invocation_id not in self.pending:
+            if confidence < self.config.confidence:
+                metrics.SPECULATIONS.inc(agent=predicted, outcome='low_confidence')
+            else:
+                speculation = await self._start(callback_context, self.specialists[predicted])
+                if speculation is not None:
+                    self.pending[invocation_id] = speculation
+
+        try:
+            response = await call_next(call)
+        except BaseException:
+            if speculation is not None:
+                self._discard(invocation_id, speculation)
+            raise
+
+        target, transfer_only = _transfer_target(response)
+        self.predictor.observe(question, target if target in self.specialists else NO_SPECIALIST)
+        if speculation is not None:
+            if target == speculation.agent and transfer_only:
+                speculation.confirmed = True
+            else:
+                self._discard(invocation_id, speculation)
+        return response
+
+    async def _start(self, callback_context, agent: LlmAgent) -> Optional[Speculation]:
+        """Build the specialist's request and start its call, within the budget."""
+        if len(self.pending) >= self.config.max_inflight:
+            metrics.SPECULATIONS.inc(agent=agent.name, outcome='over_budget')
+            return None
+
+        # The specialist's own flow builds the request it would send right
+        # after a transfer: the session as it stands before routing, plus the
+        # orchestrator's transfer call and response. The state is copied so a
+        # discarded speculation leaves no writes (e.g. context summaries) behind
+        invocation_context = callback_context._invocation_context
+        live = invocation_context.session
+        session = live.model_copy(update={
+            'events': [*live.events, *_transfer_events(invocation_context, self.root, agent.name)],
+            'state': copy.deepcopy(live.state),
+        })
+        invocation_context = invocation_context.model_copy(update={'agent': agent, 'session': session})
+        request = LlmRequest()
+        async for _ in agent._llm_flow._preprocess_async(invocation_context, request):
+            pass
+
+        tokens = OUTPUT_ESTIMATE + sum(content_tokens(content) for content in request.contents)
+        if request.config and isinstance(request.config.system_instruction, str):
+            tokens += count_tokens(request.config.system_instruction)
+        now = time.monotonic()
+        self.budget = min(
+            self.config.tokens_per_minute,
+            self.budget + (now - self.refilled) * self.config.tokens_per_minute / 60,
+        )
+        self.refilled = now
+        if tokens > self.budget:
+            metrics.SPECULATIONS.inc(agent=agent.name, outcome='over_budget')
+            return None
+        self.budget -= tokens
+
+        speculation = Speculation(agent=agent.name, task=None, tokens=tokens, contents=copy.deepcopy(request.contents))
+        speculation.task = asyncio.ensure_future(self._call(invocation_context, agent, request, speculation))
+        return speculation
+
+    @staticmethod
+    async def _call(invocation_context, agent: LlmAgent, request: LlmRequest, speculation: Speculation):
+        """Make the speculative call as the specialist (its callbacks, then the full chain)."""
+        from . import model, tracing
+
+        callback_context = CallbackContext(invocation_context)
+        response = None
+        if agent.before_model_callback:
+            response = agent.before_model_callback(callback_context=callback_context, llm_request=request)
+        if response is not None:
+            speculation.finished = time.monotonic()
+            return response, None
+        # What the real call is compared with: after the agent's callbacks,
+        # before the chain (context window, caching) rewrites the request
+        speculation.contents = copy.deepcopy(request.contents)
+        llm = agent.canonical_model
+        call = ModelCall(request=request, model=request.model or llm.model, llm=llm, metadata={'speculative': True})
+        with tracing.tracer.start_as_current_span('speculative_call_llm'):
+            response = await model.call_model(call)
+        speculation.finished = time.monotonic()
+        return response, call
+
+    async def _commit(self, call, call_next, speculation: Speculation):
+        """Answer the specialist's first call with the speculative response."""
+        if speculation.contents is not None and speculation.contents != call.request.contents:
+            # The orchestrator's transfer left the specialist a different prompt
+            self._discard(None, speculation)
+            return await call_next(call)
+
+        now = time.monotonic()
+        self.budget = min(self.config.tokens_per_minute, self.budget + speculation.tokens)
+        try:
+            response, speculative_call = await speculation.task
+        except asyncio.CancelledError:
+            speculation.task.cancel()
+            raise
+        except Exception:
+            metrics.SPECULATIONS.inc(agent=speculation.agent, outcome='failed')
+            return await call_next(call)
+
+        metrics.SPECULATIONS.inc(agent=speculation.agent, outcome='committed')
+        metrics.SPECULATION_SAVED.inc(min(now, speculation.finished or now) - speculation.started, agent=speculation.agent)
+        if speculative_call is not None:
+            call.usage = speculative_call.usage
+            call.metadata.update(speculative_call.metadata)
+        return response
+
+    def _discard(self, invocation_id: Optional[str], speculation: Speculation) -> None:
+        """Cancel a speculation the orchestrator did not confirm (or whose request went stale)."""
+        if invocation_id is not None:
+            self.pending.pop(invocation_id, None)
+        speculation.task.cancel()
+        wasted = speculation.tokens
+        if speculation.task.done() and not speculation.task.cancelled() and speculation.task.exception() is None:
+            usage = getattr(speculation.task.result()[1], 'usage', None)
+            wasted = getattr(usage, 'total_token_count', None) or wasted
+        metrics.SPECULATIONS.inc(agent=speculation.agent, outcome='discarded')
+        metrics.SPECULATION_WASTED_TOKENS.inc(wasted, agent=speculation.agent)
+
+    def _expire(self) -> None:
+        """Drop confirmed speculations whose specialist never ran (cancelled requests)."""
+        cutoff = time.monotonic() - SPECULATION_TTL
+        for invocation_id, speculation in list(self.pending.items()):
+            if speculation.started < cutoff:
+                self._discard(invocation_id, speculation)
+
+
+def enable(root_agent: LlmAgent, config: Optional[SpeculationConfig] = None) -> Optional[SpeculationMiddleware]:
+    """
+    Install the speculation middleware if speculation is switched on.
+
+    It sits inside the deadline layer, so waiting for a speculative call is
+    bounded by the request deadline, while the speculative call itself runs
+    the whole chain (context, caching, hedging, resilience) like any other.
+
+    Args:
+        root_agent (LlmAgent): The orchestrator routing to the specialists
+        config (SpeculationConfig, optional): Settings; defaults to the environment
+
+    Returns:
+        SpeculationMiddleware | None: The installed middleware, or None if disabled
+    """
+    from . import model
+
+    config = config or SpeculationConfig.from_env()
+    if not config.enabled:
+        model.remove('speculation')
+        return None
+    middleware = SpeculationMiddleware(root_agent, config)
+    model.use('speculation', middleware, order=30)
+    return middleware
@@ -0,0 +1,351 @@
+"""
+AI Tutor - Request Tracing
+==========================
+
+ADK already opens OpenTelemetry spans for each invocation, agent run
+('agent_run [maths_agent]'), model call ('call_llm') and tool call
+('tool_call [calculator]'), but without an SDK tracer provider they are
+discarded. This module installs one so the spans are recorded, nests them
+under an HTTP server span per request, and adds what ADK leaves out: the
+agent, model and token counts of each model call.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Outputs:
+- Prometheus metrics derived from every finished span (see metrics.py)
+- Optional OpenTelemetry-compatible JSON export: one OTLP/JSON
+  ExportTraceServiceRequest document per line, written off the request path
+  by a batch processor, loadable by any OTLP/JSON-aware tool
+
+Configuration:
+    AITUTOR_TRACE_FILE: Path of the JSON-lines span export (unset = no export)
+"""
+
+# Standard library imports
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Sequence
+
+# OpenTelemetry imports
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+# Runtime imports
+# (ADK-dependent modules are imported lazily so the HTTP layer can open
+# spans and serve /metrics without loading the agent stack)
+from . import log, metrics
+
+if TYPE_CHECKING:
+    from .model import ModelCall
+
+SERVICE_NAME = 'aitutor'
+
+tracer = trace.get_tracer('aitutor')
+
+logger = log.get_logger('tracing')
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+# OTLP/JSON Encoding
+# ==================
+
+def _otlp_value(value: Any) -> dict:
+    """Encode an attribute value as an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    if isinstance(value, (list, tuple)):
+        return {'arrayValue': {'values': [_otlp_value(item) for item in value]}}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes) -> list[dict]:
+    """Encode an attribute mapping as a list of OTLP KeyValues."""
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in (attributes or {}).items()]
+
+
+def span_to_otlp(span: ReadableSpan) -> dict:
+    """
+    Encode a finished span in the OTLP/JSON span format.
+
+    Args:
+        span (ReadableSpan): A finished SDK span
+
+    Returns:
+        dict: The OTLP/JSON representation of the span
+    """
+    context = span.get_span_context()
+    encoded = {
+        'traceId': format(context.trace_id, '032x'),
+        'spanId': format(context.span_id, '016x'),
+        'name': span.name,
+        # OTLP numbers span kinds from 1 (INTERNAL); the SDK enum starts at 0
+        'kind': span.kind.value + 1,
+        'startTimeUnixNano': str(span.start_time),
+        'endTimeUnixNano': str(span.end_time),
+        'attributes': _otlp_attributes(span.attributes),
+        'events': [
+            {'timeUnixNano': str(event.timestamp), 'name': event.name, 'attributes': _otlp_attributes(event.attributes)}
+            for event in span.events
+        ],
+        'status': {'code': span.status.status_code.value},
+    }
+    if span.parent is not None:
+        encoded['parentSpanId'] = format(span.parent.span_id, '016x')
+    if span.status.description:
+        encoded['status']['message'] = span.status.description
+    return encoded
+
+
+class OTLPJsonFileExporter(SpanExporter):
+    """
+    Span exporter that appends OTLP/JSON export requests to a file, one per line.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): File to append to (parent directories are created)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        groups: dict[tuple, dict] = {}
+        for span in spans:
+            resource = span.resource.attributes if span.resource else {}
+            scope = span.instrumentation_scope.name if span.instrumentation_scope else ''
+            key = (tuple(sorted(resource.items())), scope)
+            group = groups.setdefault(key, {'resource': resource, 'scope': scope, 'spans': []})
+            group['spans'].append(span_to_otlp(span))
+
+        document = {'resourceSpans': [
+            {
+                'resource': {'attributes': _otlp_attributes(group['resource'])},
+                'scopeSpans': [{'scope': {'name': group['scope']}, 'spans': group['spans']}],
+            }
+            for group in groups.values()
+        ]}
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(document, separators=(',', ':')) + '\n')
+        except OSError as e:
+            logger.warning('span export failed', extra={'path': self.path, 'reason': str(e)})
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+# Span Metrics
+# ============
+
+def classify_span(name: str) -> tuple[Optional[str], str]:
+    """
+    Map a span name to the kind of work it measures and its subject.
+
+    Args:
+        name (str): Span name ('agent_run [maths_agent]', 'call_llm', ...)
+
+    Returns:
+        tuple[str | None, str]: ('http' | 'agent' | 'model' | 'tool' | None, subject)
+    """
+    if name.startswith('agent_run ['):
+        return 'agent', name[len('agent_run ['):-1]
+    if name.startswith('tool_call ['):
+        return 'tool', name[len('tool_call ['):-1]
+    if name == 'call_llm':
+        return 'model', ''
+    if name.startswith('HTTP '):
+        return 'http', name[len('HTTP '):]
+    return None, name
+
+
+class SpanMetricsProcessor(SpanProcessor):
+    """
+    Span processor that turns finished spans into latency, token and
+    in-flight metrics. Attribute names follow the OpenTelemetry GenAI and
+    HTTP semantic conventions.
+    """
+
+    def on_start(self, span, parent_context=None) -> None:
+        kind, _ = classify_span(span.name)
+        if kind:
+            metrics.IN_FLIGHT.inc(kind=kind)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        kind, subject = classify_span(span.name)
+        if not kind:
+            return
+        metrics.IN_FLIGHT.dec(kind=kind)
+        attributes = span.attributes or {}
+        seconds = (span.end_time - span.start_time) / 1e9
+
+        if kind == 'http':
+            metrics.HTTP_DURATION.observe(
+                seconds,
+                method=attributes.get('http.request.method', ''),
+                route=attributes.get('http.route', subject),
+                status=attributes.get('http.response.status_code', ''),
+            )
+        elif kind == 'agent':
+            metrics.AGENT_DURATION.observe(seconds, agent=subject)
+        elif kind == 'tool':
+            metrics.TOOL_DURATION.observe(seconds, tool=subject)
+        elif kind == 'model':
+            agent = attributes.get('aitutor.agent', '')
+            model = attributes.get('gen_ai.request.model', '')
+            metrics.MODEL_DURATION.observe(seconds, agent=agent, model=model)
+            for token_kind, attribute in (
+                ('input', 'gen_ai.usage.input_tokens'),
+                ('output', 'gen_ai.usage.output_tokens'),
+                ('cached', 'aitutor.usage.cached_tokens'),
+            ):
+                if attributes.get(attribute):
+                    metrics.MODEL_TOKENS.inc(attributes[attribute], agent=agent, model=model, kind=token_kind)
+
+        if span.status.status_code == StatusCode.ERROR:
+            metrics.ERRORS.inc(kind=kind, name=subject)
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+# Model Call Instrumentation
+# ==========================
+
+class TracingMiddleware:
+    """
+    Model-call middleware that annotates ADK's 'call_llm' span with the agent,
+    model, token usage and context-window details of the call.
+    """
+
+    async def __call__(self, call: 'ModelCall', call_next):
+        from . import hooks
+
+        span = trace.get_current_span()
+        callback_context = hooks.current_context()
+        span.set_attribute('aitutor.agent', callback_context.agent_name if callback_context else '')
+        span.set_attribute('gen_ai.request.model', call.model)
+        try:
+            response = await call_next(call)
+        except Exception as e:
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, type(e).__name__))
+            raise
+
+        usage = call.usage
+        if usage is not None:
+            for attribute, value in (
+                ('gen_ai.usage.input_tokens', getattr(usage, 'prompt_token_count', None)),
+                ('gen_ai.usage.output_tokens', getattr(usage, 'candidates_token_count', None)),
+                ('aitutor.usage.cached_tokens', getattr(usage, 'cached_content_token_count', None)),
+            ):
+                if value:
+                    span.set_attribute(attribute, value)
+        if 'context' in call.metadata:
+            span.set_attribute('aitutor.context.turns', call.metadata['context']['turns'])
+            span.set_attribute('aitutor.context.tokens', call.metadata['context']['tokens_after'])
+        if 'cached_content' in call.metadata:
+            span.set_attribute('aitutor.cached_content', call.metadata['cached_content'])
+        if response.error_code:
+            span.set_status(Status(StatusCode.ERROR, str(response.error_code)))
+        return response
+
+
+@contextmanager
+def server_span(method: str, path: str) -> Iterator[trace.Span]:
+    """
+    Open the root span of one HTTP request.
+
+    Args:
+        method (str): HTTP method
+        path (str): Request path
+
+    Yields:
+        Span: The server span; set 'http.route' and the status code on it
+    """
+    with tracer.start_as_current_span(
+        f'HTTP {method}',
+        kind=SpanKind.SERVER,
+        attributes={'http.request.method': method, 'url.path': path},
+    ) as span:
+        yield span
+
+
+def current_trace_id() -> Optional[str]:
+    """Return the hex trace id of the active span, if any."""
+    context = trace.get_current_span().get_span_context()
+    return format(context.trace_id, '032x') if context.is_valid else None
+
+
+def _drop_cross_context_detach(record: logging.LogRecord) -> bool:
+    """
+    Filter out OpenTelemetry's "Failed to detach context" errors.
+
+    When a query is cancelled (deadline or client disconnect) while a
+    sub-agent runs, ADK leaves the parent's suspended model-call generator to
+    the event loop's async-generator finalizer, which closes it from another
+    task; the span still ends, only resetting the context variable fails.
+    """
+    return record.getMessage() != 'Failed to detach context'
+
+
+def configure(trace_file: Optional[str] = None) -> None:
+    """
+    Install the tracer provider, span metrics and optional JSON export.
+
+    Cheap enough for application startup: it does not load the agent stack.
+    Idempotent. If another SDK tracer provider is already installed, the
+    processors are added to it instead of replacing it.
+
+    Args:
+        trace_file (str, optional): Export path; defaults to AITUTOR_TRACE_FILE
+    """
+    global _configured
+
+    with _configure_lock:
+        if _configured:
+            return
+        provider = trace.get_tracer_provider()
+        if not isinstance(provider, TracerProvider):
+            provider = TracerProvider(resource=Resource.create({'service.name': SERVICE_NAME}))
+            trace.set_tracer_provider(provider)
+
+        provider.add_span_processor(SpanMetricsProcessor())
+        logging.getLogger('opentelemetry.context').addFilter(_drop_cross_context_detach)
+        trace_file = trace_file or os.getenv('AITUTOR_TRACE_FILE')
+        if trace_file:
+            provider.add_span_processor(BatchSpanProcessor(OTLPJsonFileExporter(trace_file)))
+            logger.info('exporting trace spans', extra={'path': trace_file})
+        _configured = True
+
+
+def instrument_models() -> None:
+    """
+    Add the tracing middleware to the model call pipeline.
+
+    Loads the agent runtime, so it is called when the agent services are
+    initialized rather than at application startup.
+    """
+    from . import model
+
+    model.use('tracing', TracingMiddleware(), order=10)
@@ -30,21 +30,13 @@ Usage:
 from google.adk.agents import Agent
 from google.adk.tools import google_search
 
-# AI News Analyst Agent
-# =====================
-# This agent specializes in searching and analyzing current AI news and developments.
-# It provides the AI Tutor system with access to the latest information in the field
-# of artificial intelligence, machine learning, and related technologies.
+# Import the instruction pipeline
+from ...prompts import select_instruction
 
-news_analyst = Agent(
-    # Core Agent Configuration
-    model='gemini-2.0-flash-001',  # Latest Gemini model for optimal analysis
-    name='news_analyst',
-    description='A specialized AI news analyst for current developments and research in artificial intelligence.',
-    
-    # Agent Instructions and Behavior
-    # These instructions define how the agent searches and presents AI news
-    instruction="""
+# Agent Instructions
+# ==================
+
+FULL_INSTRUCTION = """
     You are a specialized AI News Analyst with expertise in artificial intelligence, machine learning, and technology trends. Your primary role is to search for, analyze, and present current information about AI developments, research breakthroughs, and industry news.
 
     **🎯 CORE RESPONSIBILITIES:**
@@ -114,7 +106,33 @@ news_analyst = Agent(
     - Maintain focus on educational value and learning opportunities
     
     Remember: Your goal is to bridge the gap between cutting-edge AI developments and educational understanding, making complex research accessible to learners.
-    """,
+    """
+
+COMPACT_INSTRUCTION = """
+    You are an AI news analyst. Use google_search to find recent, credible information on AI, machine learning and related technology (research, industry, policy, ethics, education).
+    - Prefer reputable sources and recent developments; cite sources and dates when available.
+    - For each development give what happened, why it matters and the educational context, in plain language.
+    - Present a balanced view and note uncertainty in fast-moving topics.
+    - Only cover AI-related topics; politely redirect other requests.
+    """
+
+# AI News Analyst Agent
+# =====================
+# This agent specializes in searching and analyzing current AI news and developments.
+# It provides the AI Tutor system with access to the latest information in the field
+# of artificial intelligence, machine learning, and related technologies.
+
+news_analyst = Agent(
+    # Core Agent Configuration
+    model='gemini-2.0-flash-001',  # Latest Gemini model for optimal analysis
+    name='news_analyst',
+    description='A specialized AI news analyst for current developments and research in artificial intelligence.',
+    
+    # Agent Instructions and Behavior
+    # These instructions define how the agent searches and presents AI news
+    instruction=select_instruction(
+        'news_analyst', full=FULL_INSTRUCTION, compact=COMPACT_INSTRUCTION
+    ),
     
     # Tools Configuration
     # Web search capabilities for real-time information retrieval
@@ -27,24 +27,23 @@ from google.adk.agents import LlmAgent
 # Import chemistry tools
 from .tools import elements_lookup
 
+# Import the instruction pipeline
+from ...prompts import select_instruction, select_tool
+
+# Import the course-notes retrieval tool (see multiagent/retrieval/)
+from ...retrieval import COMPACT_TOOL_DESCRIPTION as NOTES_TOOL_DESCRIPTION, notes_tool
+
+# Import the tool executor (where each tool runs, see multiagent/runtime/executor.py)
+from ...runtime import executor
+
 # Model Configuration
 # Use the latest Gemini model for optimal chemistry reasoning
 GEMINI_MODEL = 'gemini-2.0-flash-001'
 
-# Chemistry Specialist Agent
-# ==========================
-# This agent specializes in chemistry education and problem solving,
-# providing comprehensive explanations of chemical concepts and reactions.
+# Agent Instructions
+# ==================
 
-chemistry_agent = LlmAgent(
-    # Core Agent Configuration
-    model=GEMINI_MODEL,
-    name='chemistry_agent',
-    description='A specialized chemistry tutor for elements, compounds, reactions, and chemical concepts.',
-    
-    # Agent Instructions and Behavior
-    # These instructions define how the agent approaches chemistry problems
-    instruction="""
+FULL_INSTRUCTION = """
     You are a specialized Chemistry Agent and educational tutor. Your primary role is to help students understand chemistry concepts, solve chemistry problems, and develop a deep understanding of chemical principles across all areas of chemistry.
 
     **🎯 CORE RESPONSIBILITIES:**
@@ -122,9 +121,48 @@ chemistry_agent = LlmAgent(
     - Warn about dangerous reactions or toxic substances when relevant
     
     Remember: Chemistry is the science of matter and its transformations. Always strive to help students understand the 'why' behind chemical behavior, not just the 'what'.
-    """,
+    """
+
+COMPACT_INSTRUCTION = """
+    You are a chemistry tutor covering general, inorganic, organic, physical, analytical and biochemistry.
+    - Use elements_lookup for element data (atomic number, mass, group, period); never guess values.
+    - Solve step by step: identify the concept, look up data, classify the reaction, set up, calculate with units and significant figures, interpret, verify.
+    - Use correct formulas and nomenclature and show balanced equations, e.g. 2Na + Cl₂ → 2NaCl.
+    - Explain the molecular-level "why", link to everyday chemistry, and mention safety for hazardous reactions.
+    - State limitations clearly when unsure.
+    """
+
+COMPACT_TOOL_DESCRIPTION = """
+    Look up a chemical element by English name, e.g. carbon, sodium, gold. Returns status,
+    symbol, atomic_number, atomic_mass (u), group, period and a description; on error
+    lists the available elements.
+    """
+
+# Course notes for this subject; None until a notes index has been built
+retrieve_notes = notes_tool('chemistry')
+
+# Chemistry Specialist Agent
+# ==========================
+# This agent specializes in chemistry education and problem solving,
+# providing comprehensive explanations of chemical concepts and reactions.
+
+chemistry_agent = LlmAgent(
+    # Core Agent Configuration
+    model=GEMINI_MODEL,
+    name='chemistry_agent',
+    description='A specialized chemistry tutor for elements, compounds, reactions, and chemical concepts.',
+    
+    # Agent Instructions and Behavior
+    # These instructions define how the agent approaches chemistry problems
+    instruction=select_instruction(
+        'chemistry_agent', full=FULL_INSTRUCTION, compact=COMPACT_INSTRUCTION
+    ),
     
     # Tools Configuration
+    # Lookups take microseconds and run inline; the notes search runs on a pool thread
     # Chemistry-specific tools available to this agent
-    tools=[elements_lookup],  # Comprehensive periodic table database
+    tools=[
+        select_tool(executor.tool(elements_lookup, executor.INLINE), compact=COMPACT_TOOL_DESCRIPTION),  # Comprehensive periodic table database
+        *([select_tool(executor.tool(retrieve_notes, executor.THREAD), compact=NOTES_TOOL_DESCRIPTION)] if retrieve_notes else []),  # Course notes, once indexed
+    ],
 )
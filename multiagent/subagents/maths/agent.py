@@ -27,24 +27,23 @@ from google.adk.agents import LlmAgent
 # Import mathematical tools
 from .tools import calculator
 
+# Import the instruction pipeline
+from ...prompts import select_instruction, select_tool
+
+# Import the course-notes retrieval tool (see multiagent/retrieval/)
+from ...retrieval import COMPACT_TOOL_DESCRIPTION as NOTES_TOOL_DESCRIPTION, notes_tool
+
+# Import the tool executor (where each tool runs, see multiagent/runtime/executor.py)
+from ...runtime import executor
+
 # Model Configuration
 # Use the latest Gemini model for optimal mathematical reasoning
 GEMINI_MODEL = 'gemini-2.0-flash-001'
 
-# Mathematics Specialist Agent
-# ===========================
-# This agent specializes in mathematical problem solving and provides
-# educational explanations for mathematical concepts and calculations.
+# Agent Instructions
+# ==================
 
-maths_agent = LlmAgent(
-    # Core Agent Configuration
-    model=GEMINI_MODEL,
-    name='maths_agent',
-    description='A specialized mathematics tutor for solving equations, calculations, and mathematical concepts.',
-    
-    # Agent Instructions and Behavior
-    # These instructions define how the agent approaches mathematical problems
-    instruction="""
+FULL_INSTRUCTION = """
     You are a specialized Mathematics Agent and tutor. Your primary role is to help students understand and solve mathematical problems across various domains including arithmetic, algebra, geometry, calculus, and statistics.
 
     **🎯 CORE RESPONSIBILITIES:**
@@ -102,9 +101,47 @@ maths_agent = LlmAgent(
     Therefore, x = 5"
     
     Remember: Your goal is to not just provide answers, but to help students understand the mathematical thinking process.
-    """,
+    """
+
+COMPACT_INSTRUCTION = """
+    You are a mathematics tutor covering arithmetic, algebra, geometry, calculus and statistics.
+    - Use the calculator tool for every numeric operation (add, subtract, multiply, divide).
+    - Solve step by step: understand the problem, plan, compute, verify, explain.
+    - Show each step of working and check the answer, e.g. by substituting it back.
+    - Mention alternative methods or the underlying concept when useful; ask if the problem is unclear.
+    Goal: help the student understand the reasoning, not just get the answer.
+    """
+
+COMPACT_TOOL_DESCRIPTION = """
+    Exact arithmetic on two numbers. operation is one of add, subtract, multiply, divide.
+    Returns status ('success' or 'error') and result.
+    """
+
+# Course notes for this subject; None until a notes index has been built
+retrieve_notes = notes_tool('maths')
+
+# Mathematics Specialist Agent
+# ===========================
+# This agent specializes in mathematical problem solving and provides
+# educational explanations for mathematical concepts and calculations.
+
+maths_agent = LlmAgent(
+    # Core Agent Configuration
+    model=GEMINI_MODEL,
+    name='maths_agent',
+    description='A specialized mathematics tutor for solving equations, calculations, and mathematical concepts.',
+    
+    # Agent Instructions and Behavior
+    # These instructions define how the agent approaches mathematical problems
+    instruction=select_instruction(
+        'maths_agent', full=FULL_INSTRUCTION, compact=COMPACT_INSTRUCTION
+    ),
     
     # Tools Configuration
+    # Lookups take microseconds and run inline; the notes search runs on a pool thread
     # Mathematical tools available to this agent
-    tools=[calculator],  # Basic arithmetic calculator for precise computations
+    tools=[
+        select_tool(executor.tool(calculator, executor.INLINE), compact=COMPACT_TOOL_DESCRIPTION),  # Basic arithmetic calculator for precise computations
+        *([select_tool(executor.tool(retrieve_notes, executor.THREAD), compact=NOTES_TOOL_DESCRIPTION)] if retrieve_notes else []),  # Course notes, once indexed
+    ],
 )
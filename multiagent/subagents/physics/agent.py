@@ -27,24 +27,23 @@ from google.adk.agents import LlmAgent
 # Import physics tools
 from .tools import lookup_physics_constant
 
+# Import the instruction pipeline
+from ...prompts import select_instruction, select_tool
+
+# Import the course-notes retrieval tool (see multiagent/retrieval/)
+from ...retrieval import COMPACT_TOOL_DESCRIPTION as NOTES_TOOL_DESCRIPTION, notes_tool
+
+# Import the tool executor (where each tool runs, see multiagent/runtime/executor.py)
+from ...runtime import executor
+
 # Model Configuration
 # Use the latest Gemini model for optimal physics reasoning
 GEMINI_MODEL = 'gemini-2.0-flash-001'
 
-# Physics Specialist Agent
-# ========================
-# This agent specializes in physics education and problem solving,
-# providing comprehensive explanations of physical phenomena and concepts.
+# Agent Instructions
+# ==================
 
-physics_agent = LlmAgent(
-    # Core Agent Configuration
-    model=GEMINI_MODEL,
-    name='physics_agent',
-    description='A specialized physics tutor for concepts, problems, and physical constants.',
-    
-    # Agent Instructions and Behavior
-    # These instructions define how the agent approaches physics problems
-    instruction="""
+FULL_INSTRUCTION = """
     You are a specialized Physics Agent and educational tutor. Your primary role is to help students understand physics concepts, solve physics problems, and develop intuitive understanding of physical phenomena across all domains of physics.
 
     **🎯 CORE RESPONSIBILITIES:**
@@ -114,9 +113,48 @@ physics_agent = LlmAgent(
     - Emphasize the beauty and elegance of physical laws
     
     Remember: Physics is about understanding how the universe works. Always strive to make that understanding accessible and inspiring.
-    """,
+    """
+
+COMPACT_INSTRUCTION = """
+    You are a physics tutor covering mechanics, thermodynamics, electromagnetism, optics, quantum physics, relativity and atomic physics.
+    - Use lookup_physics_constant for any fundamental constant; never guess values.
+    - Solve step by step: principles involved, known values, formula, constants, calculation with units, physical meaning, sanity check.
+    - Always carry units, give real-world context and build physical intuition.
+    - State limitations clearly when unsure.
+    """
+
+COMPACT_TOOL_DESCRIPTION = """
+    Look up a CODATA 2018 physical constant by snake_case name, e.g. speed_of_light,
+    planck_constant, gravitational_constant, elementary_charge, avogadro_number,
+    boltzmann_constant, electron_mass, gas_constant. Returns status, value (SI units)
+    and info; on error lists the available constants.
+    """
+
+# Course notes for this subject; None until a notes index has been built
+retrieve_notes = notes_tool('physics')
+
+# Physics Specialist Agent
+# ========================
+# This agent specializes in physics education and problem solving,
+# providing comprehensive explanations of physical phenomena and concepts.
+
+physics_agent = LlmAgent(
+    # Core Agent Configuration
+    model=GEMINI_MODEL,
+    name='physics_agent',
+    description='A specialized physics tutor for concepts, problems, and physical constants.',
+    
+    # Agent Instructions and Behavior
+    # These instructions define how the agent approaches physics problems
+    instruction=select_instruction(
+        'physics_agent', full=FULL_INSTRUCTION, compact=COMPACT_INSTRUCTION
+    ),
     
     # Tools Configuration
+    # Lookups take microseconds and run inline; the notes search runs on a pool thread
     # Physics-specific tools available to this agent
-    tools=[lookup_physics_constant],  # Database of fundamental physical constants
+    tools=[
+        select_tool(executor.tool(lookup_physics_constant, executor.INLINE), compact=COMPACT_TOOL_DESCRIPTION),  # Database of fundamental physical constants
+        *([select_tool(executor.tool(retrieve_notes, executor.THREAD), compact=NOTES_TOOL_DESCRIPTION)] if retrieve_notes else []),  # Course notes, once indexed
+    ],
 )
@@ -0,0 +1,15 @@
+"""
+AI Tutor - Server
+=================
+
+Production serving for the FastAPI application defined in main.py.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Modules:
+- prefork: Pre-fork multi-worker server (python -m server)
+- static_assets: In-memory, precompressed, fingerprinted static files
+- cache_warming: Replays frequent questions into the response cache at startup
+- profiling: On-demand request profiles, window sampling and memory snapshots
+"""
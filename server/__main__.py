@@ -0,0 +1,17 @@
+"""
+AI Tutor - Production Server Entry Point
+========================================
+
+Usage:
+    python -m server                      # one worker per usable CPU on :8000
+    python -m server --workers 4 --port 8080
+    python -m server --max-requests 5000 --max-memory-mb 600
+
+Author: AI Tutor Team
+Version: 1.0.0
+"""
+
+from .prefork import main
+
+if __name__ == '__main__':
+    raise SystemExit(main())
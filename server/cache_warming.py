@@ -0,0 +1,246 @@
+"""
+AI Tutor - Cache Warming
+========================
+
+Replays the most frequent questions from a query log after a deploy or
+restart, so the response cache (multiagent/runtime/response_cache.py) already
+holds the answers the first wave of classroom traffic asks for. The instance
+reports itself ready in /health only once warming has finished.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Query log format:
+JSON lines; each line's question is read from the first present field of
+'text' (the /api/query body), 'query', 'question', 'body' or 'title', so
+request dumps, access logs and backlog files such as requests.jsonl all
+work. Lines that are not JSON objects are skipped. Questions are ranked by
+how often they occur (after normalization) and the top N are replayed.
+
+Budget:
+- At most AITUTOR_WARM_CONCURRENCY questions run at once
+- Questions start at no more than AITUTOR_WARM_RPM per minute, on top of the
+  upstream rate limits every model call already obeys
+- Warming stops after AITUTOR_WARM_MAX_SECONDS, or as soon as the model API
+  pushes back (throttled or circuit open), leaving the quota to real users
+
+Configuration:
+    AITUTOR_WARM_FILE: Query log to warm from (unset = no warming)
+    AITUTOR_WARM_TOP: Number of most frequent questions replayed (50)
+    AITUTOR_WARM_CONCURRENCY: Questions replayed at once (2)
+    AITUTOR_WARM_RPM: Questions started per minute (30)
+    AITUTOR_WARM_MAX_SECONDS: Time budget for warming (300)
+
+Under the pre-fork server the master warms the cache once before forking
+(see server/prefork.py); the workers inherit the warmed cache and do not
+replay the log themselves, so the budget applies per server, not per worker.
+"""
+
+# Standard library imports
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+# Runtime imports
+from multiagent.runtime import log, resilience
+from multiagent.runtime.response_cache import normalize
+
+# Fields a query log line may hold the question in, by preference
+QUERY_FIELDS = ('text', 'query', 'question', 'body', 'title')
+
+logger = log.get_logger('cache_warming')
+
+
+@dataclass
+class WarmConfig:
+    """
+    Settings of the cache warmer.
+
+    Attributes:
+        path (str | None): Query log to warm from (None = no warming)
+        top (int): Number of most frequent questions replayed
+        concurrency (int): Questions replayed at once
+        rpm (float): Questions started per minute (0 = no limit)
+        max_seconds (float): Time budget for warming
+    """
+    path: Optional[str] = None
+    top: int = 50
+    concurrency: int = 2
+    rpm: float = 30.0
+    max_seconds: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> 'WarmConfig':
+        """
+        Build the settings from the AITUTOR_WARM_* environment variables.
+
+        Returns:
+            WarmConfig: Defaults overridden by the environment
+        """
+        return cls(
+            path=os.getenv('AITUTOR_WARM_FILE') or None,
+            top=int(os.getenv('AITUTOR_WARM_TOP', '50')),
+            concurrency=max(1, int(os.getenv('AITUTOR_WARM_CONCURRENCY', '2'))),
+            rpm=float(os.getenv('AITUTOR_WARM_RPM', '30')),
+            max_seconds=float(os.getenv('AITUTOR_WARM_MAX_SECONDS', '300')),
+        )
+
+
+def load_queries(path: str, top: int) -> list[tuple[str, int]]:
+    """
+    Rank the questions of a JSONL query log by frequency.
+
+    Args:
+        path (str): The query log
+        top (int): Number of questions to return
+
+    Returns:
+        list[tuple[str, int]]: (question, occurrences), most frequent first;
+            each question is the first spelling seen
+    """
+    counts: Counter[str] = Counter()
+    spelling: dict[str, str] = {}
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict):
+                continue
+            text = next((entry[name] for name in QUERY_FIELDS if isinstance(entry.get(name), str) and entry[name].strip()), None)
+            if text is None:
+                continue
+            key = normalize(text)
+            counts[key] += 1
+            spelling.setdefault(key, text.strip())
+    return [(spelling[key], count) for key, count in counts.most_common(top)]
+
+
+class CacheWarmer:
+    """
+    Replays frequent questions in the background under a concurrency and
+    rate budget.
+
+    States: 'off' (no query log), 'pending', 'warming', 'done', 'failed'.
+    """
+
+    def __init__(self, config: Optional[WarmConfig] = None):
+        """
+        Args:
+            config (WarmConfig, optional): Settings; defaults to the environment
+        """
+        self.config = config or WarmConfig.from_env()
+        self.state = 'pending' if self.config.path else 'off'
+        self.total = 0
+        self.warmed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.stop_reason = ''
+        self.started = 0.0
+        self.finished = 0.0
+
+    @property
+    def ready(self) -> bool:
+        """Whether warming is over (or was never configured)."""
+        return self.state in ('off', 'done', 'failed')
+
+    def status(self) -> dict:
+        """
+        Describe warming progress for /health.
+
+        Returns:
+            dict: state, counts, stop reason and duration
+        """
+        status = {'state': self.state}
+        if self.state != 'off':
+            status.update(total=self.total, warmed=self.warmed, skipped=self.skipped, failed=self.failed)
+            if self.stop_reason:
+                status['stopped'] = self.stop_reason
+            if self.started:
+                status['seconds'] = round((self.finished or time.monotonic()) - self.started, 1)
+        return status
+
+    async def run(self, answer: Callable[[str], Awaitable[bool]],
+                  is_cached: Callable[[str], bool] = lambda query: False) -> None:
+        """
+        Replay the most frequent questions of the query log.
+
+        Args:
+            answer (Callable): Coroutine function answering one question
+                through the agents and caching it; returns False if the
+                answer could not be cached
+            is_cached (Callable): Whether a question is already cached (skipped)
+        """
+        if self.state != 'pending':
+            return
+        config = self.config
+        self.state = 'warming'
+        self.started = time.monotonic()
+        try:
+            queries = await asyncio.to_thread(load_queries, config.path, config.top)
+        except OSError as e:
+            logger.warning('cache warming skipped: query log unreadable', extra={'path': config.path, 'reason': str(e)})
+            self.state, self.stop_reason, self.finished = 'failed', 'unreadable', time.monotonic()
+            return
+
+        self.total = len(queries)
+        logger.info('cache warming started', extra={'path': config.path, 'questions': self.total})
+        semaphore = asyncio.Semaphore(config.concurrency)
+        interval = 60.0 / config.rpm if config.rpm > 0 else 0.0
+        stop = asyncio.Event()
+
+        async def warm(query: str) -> None:
+            try:
+                if await answer(query):
+                    self.warmed += 1
+                else:
+                    self.skipped += 1
+            except resilience.UpstreamUnavailable as e:
+                # The model API is saturated: leave the quota to real users
+                self.failed += 1
+                self.stop_reason = 'upstream_unavailable'
+                logger.warning('cache warming stopped: upstream unavailable', extra={'reason': str(e)})
+                stop.set()
+            except Exception:
+                self.failed += 1
+                logger.exception('cache warming question failed')
+            finally:
+                semaphore.release()
+
+        tasks = []
+        deadline = self.started + config.max_seconds
+        try:
+            for query, _ in queries:
+                if is_cached(query):
+                    self.skipped += 1
+                    continue
+                await semaphore.acquire()
+                if stop.is_set() or time.monotonic() >= deadline:
+                    semaphore.release()
+                    self.stop_reason = self.stop_reason or 'time_budget'
+                    break
+                tasks.append(asyncio.create_task(warm(query)))
+                if interval:
+                    await asyncio.sleep(interval)
+            # Questions still running get what is left of the time budget
+            if tasks:
+                _, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    self.stop_reason = self.stop_reason or 'time_budget'
+                    await asyncio.gather(*pending, return_exceptions=True)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            self.finished = time.monotonic()
+            if self.state == 'warming':
+                self.state = 'done'
+            logger.info('cache warming finished', extra=self.status())
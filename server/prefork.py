@@ -0,0 +1,705 @@
+"""
+AI Tutor - Pre-fork Multi-Worker Server
+=======================================
+
+Production entry point that uses every core: a master process imports the
+application, builds the agent tree, its tools and the ADK runner once, and
+then forks worker processes that each run a uvicorn event loop on a shared
+listening socket. The preloaded objects are shared with the workers
+copy-on-write instead of being rebuilt (and stored) once per process.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Master:
+- Autotunes the worker count from the CPUs the process may use (affinity and
+  cgroup CPU quota) and, when a per-worker memory cap is set, the cgroup
+  memory limit
+- Warms the response cache from the query log (AITUTOR_WARM_FILE) once,
+  before forking, so every worker starts with the warmed cache and the
+  warm-up budget is spent once rather than once per worker
+- Freezes the preloaded heap (gc.freeze) before forking so the garbage
+  collector does not touch, and therefore copy, the shared pages
+- Replaces workers that exit, retire or stop sending heartbeats; SIGHUP
+  recycles all workers gracefully, SIGUSR1 prints the worker table,
+  SIGTERM/SIGINT shut down gracefully
+
+Workers:
+- Retire after a number of requests (with jitter, so they do not all
+  restart together) or when their private memory (pages no longer shared
+  with the master) crosses a threshold;
+  a replacement is forked as soon as a worker starts retiring, and the
+  retiring worker finishes its in-flight requests before exiting
+- Publish pid, state, request counts, in-flight requests, memory and a
+  heartbeat from their event loop to a shared-memory scoreboard that
+  /health reports for all workers
+
+Sessions are kept in memory by each worker, so a conversation continued on a
+different worker starts a new session.
+
+Configuration (command-line flags override these):
+    AITUTOR_WORKERS: Worker count (0 or unset = autotune)
+    AITUTOR_MAX_REQUESTS: Requests before a worker is recycled (0 = never)
+    AITUTOR_MAX_WORKER_MEMORY_MB: Private memory that recycles a worker (0 = no cap)
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import gc
+import math
+import mmap
+import os
+import random
+import signal
+import socket
+import struct
+import sys
+import time
+from dataclasses import dataclass, fields
+from typing import Optional
+
+# Worker states published in the scoreboard
+EMPTY, BOOTING, SERVING, RETIRING = 0, 1, 2, 3
+STATE_NAMES = {EMPTY: 'empty', BOOTING: 'booting', SERVING: 'serving', RETIRING: 'retiring'}
+
+# Why a worker retired
+RETIRE_REASONS = ['', 'max_requests', 'max_memory', 'reload', 'shutdown']
+
+# Scoreboard slot layout; fields are written individually so the master and
+# a worker updating different fields of one slot never overwrite each other
+_SLOT_FIELDS = [('pid', 'q'), ('started', 'd'), ('heartbeat', 'd'), ('requests', 'q'),
+                ('in_flight', 'q'), ('rss_kb', 'q'), ('private_kb', 'q'), ('state', 'B'), ('reason', 'B')]
+_SLOT = struct.Struct('<' + ''.join(kind for _, kind in _SLOT_FIELDS) + '6x')
+_FIELD_OFFSETS = {
+    name: (struct.Struct('<' + kind), struct.calcsize('<' + ''.join(k for _, k in _SLOT_FIELDS[:position])))
+    for position, (name, kind) in enumerate(_SLOT_FIELDS)
+}
+
+_MB = 1024 * 1024
+
+
+@dataclass
+class PreforkConfig:
+    """
+    Settings of the pre-fork server.
+
+    Attributes:
+        host (str): Interface to bind
+        port (int): Port to bind
+        workers (int): Worker processes (0 = autotune)
+        max_requests (int): Requests served before a worker is recycled (0 = never)
+        max_requests_jitter (int): Random extra requests added per worker
+        max_memory_mb (int): Private (unshared) memory that recycles a worker (0 = no cap)
+        graceful_timeout (float): Seconds a stopping worker may spend on in-flight requests
+        heartbeat_interval (float): Seconds between worker heartbeats
+        heartbeat_timeout (float): Seconds without a heartbeat before a worker is killed
+        backlog (int): Listen backlog of the shared socket
+        log_level (str): uvicorn log level of the workers
+    """
+    host: str = '0.0.0.0'
+    port: int = 8000
+    workers: int = 0
+    max_requests: int = 0
+    max_requests_jitter: int = 0
+    max_memory_mb: int = 0
+    graceful_timeout: float = 30.0
+    heartbeat_interval: float = 1.0
+    heartbeat_timeout: float = 30.0
+    backlog: int = 2048
+    log_level: str = 'info'
+
+    @classmethod
+    def from_env(cls) -> 'PreforkConfig':
+        """
+        Build the settings from the environment.
+
+        Returns:
+            PreforkConfig: Defaults overridden by the AITUTOR_* variables
+        """
+        max_requests = int(os.getenv('AITUTOR_MAX_REQUESTS', '0'))
+        return cls(
+            workers=int(os.getenv('AITUTOR_WORKERS', '0')),
+            max_requests=max_requests,
+            max_requests_jitter=max_requests // 10,
+            max_memory_mb=int(os.getenv('AITUTOR_MAX_WORKER_MEMORY_MB', '0')),
+        )
+
+
+# Worker Count Autotuning
+# =======================
+
+def _read_first_line(path: str) -> Optional[str]:
+    """First line of a small system file, or None if it cannot be read."""
+    try:
+        with open(path, encoding='ascii') as file:
+            return file.readline().strip()
+    except OSError:
+        return None
+
+
+def usable_cpus() -> int:
+    """
+    Number of CPUs this process can actually use.
+
+    Takes the smaller of the CPU affinity mask and the cgroup CPU quota
+    (v2 cpu.max or v1 cfs quota), so containers with a CPU limit do not
+    start a worker per host core.
+
+    Returns:
+        int: At least 1
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = period = None
+    cpu_max = _read_first_line('/sys/fs/cgroup/cpu.max')
+    if cpu_max:
+        limit, _, cgroup_period = cpu_max.partition(' ')
+        if limit != 'max':
+            quota, period = int(limit), int(cgroup_period or 100000)
+    else:
+        cfs_quota = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+        cfs_period = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if cfs_quota and cfs_period and int(cfs_quota) > 0:
+            quota, period = int(cfs_quota), int(cfs_period)
+    if quota and period:
+        cpus = min(cpus, math.ceil(quota / period))
+    return max(1, cpus)
+
+
+def memory_limit_bytes() -> Optional[int]:
+    """
+    Memory limit of the process's cgroup, if one is set.
+
+    Returns:
+        int | None: Limit in bytes (cgroup v2 memory.max or v1 limit_in_bytes)
+    """
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        value = _read_first_line(path)
+        if value and value.isdigit():
+            limit = int(value)
+            # cgroup v1 reports "no limit" as a huge page-aligned number
+            return limit if limit < 1 << 60 else None
+    return None
+
+
+def autotune_workers(max_memory_mb: int = 0) -> int:
+    """
+    Pick a worker count for this host.
+
+    Workers spend most of a request waiting on Gemini, and one event loop
+    keeps one core busy, so the count is one worker per usable CPU, capped
+    by how many memory-capped workers fit in the cgroup memory limit.
+
+    Args:
+        max_memory_mb (int): Per-worker memory cap (0 = no memory-based cap)
+
+    Returns:
+        int: At least 1
+    """
+    workers = usable_cpus()
+    limit = memory_limit_bytes()
+    if limit and max_memory_mb:
+        workers = min(workers, limit // (max_memory_mb * _MB))
+    return max(1, workers)
+
+
+def _memory_kb() -> tuple[int, int]:
+    """
+    Memory of this process in KiB.
+
+    Returns:
+        tuple[int, int]: (resident, private) where private excludes pages
+            still shared copy-on-write with the master; falls back to the
+            resident size where /proc/self/smaps_rollup is unavailable
+    """
+    rss_kb = _rss_kb()
+    try:
+        private_kb = 0
+        with open('/proc/self/smaps_rollup', encoding='ascii') as file:
+            for line in file:
+                if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                    private_kb += int(line.split()[1])
+        return rss_kb, private_kb
+    except (OSError, ValueError, IndexError):
+        return rss_kb, rss_kb
+
+
+def _rss_kb() -> int:
+    """Current resident set size of this process in KiB."""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Peak rather than current RSS, but the best portable approximation
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Shared Scoreboard
+# =================
+
+class Scoreboard:
+    """
+    Fixed-size table of worker slots in anonymous shared memory.
+
+    Created by the master before forking, so every worker maps the same
+    pages. Each slot is written by its worker (and by the master when the
+    slot is assigned or freed) and can be read by anyone without locking.
+    """
+
+    def __init__(self, slots: int):
+        """
+        Args:
+            slots (int): Number of worker slots
+        """
+        self.slots = slots
+        self._memory = mmap.mmap(-1, slots * _SLOT.size)
+
+    def read(self, index: int) -> dict:
+        """
+        Return one slot.
+
+        Args:
+            index (int): Slot number
+
+        Returns:
+            dict: The slot's fields
+        """
+        values = _SLOT.unpack_from(self._memory, index * _SLOT.size)
+        return {'index': index, **{name: value for (name, _), value in zip(_SLOT_FIELDS, values)}}
+
+    def write(self, index: int, **values) -> None:
+        """
+        Update fields of one slot.
+
+        Args:
+            index (int): Slot number
+            **values: Fields to change
+        """
+        for name, value in values.items():
+            field_struct, offset = _FIELD_OFFSETS[name]
+            field_struct.pack_into(self._memory, index * _SLOT.size + offset, value)
+
+    def clear(self, index: int) -> None:
+        """Free a slot."""
+        _SLOT.pack_into(self._memory, index * _SLOT.size, 0, 0.0, 0.0, 0, 0, 0, 0, EMPTY, 0)
+
+    def claim(self) -> int:
+        """
+        Find a free slot.
+
+        Returns:
+            int: Slot number
+
+        Raises:
+            RuntimeError: If every slot is in use
+        """
+        for index in range(self.slots):
+            if self.read(index)['state'] == EMPTY:
+                return index
+        raise RuntimeError('No free worker slot')
+
+    def snapshot(self) -> list[dict]:
+        """
+        Describe every live worker for health reporting.
+
+        Returns:
+            list[dict]: One entry per occupied slot
+        """
+        now = time.time()
+        workers = []
+        for index in range(self.slots):
+            slot = self.read(index)
+            if slot['state'] == EMPTY:
+                continue
+            workers.append({
+                'index': index,
+                'pid': slot['pid'],
+                'state': STATE_NAMES[slot['state']],
+                'retire_reason': RETIRE_REASONS[slot['reason']] or None,
+                'uptime_s': round(now - slot['started'], 1),
+                'heartbeat_age_s': round(now - slot['heartbeat'], 1),
+                'requests': slot['requests'],
+                'in_flight': slot['in_flight'],
+                'rss_mb': round(slot['rss_kb'] / 1024, 1),
+                'private_mb': round(slot['private_kb'] / 1024, 1),
+            })
+        return workers
+
+
+# Worker Process
+# ==============
+
+class _Worker:
+    """
+    State of the worker running in this process: counts requests, sends
+    heartbeats and decides when to retire.
+    """
+
+    def __init__(self, index: int, scoreboard: Scoreboard, config: PreforkConfig):
+        self.index = index
+        self.scoreboard = scoreboard
+        self.config = config
+        self.requests = 0
+        self.in_flight = 0
+        self.server = None
+        self.max_requests = 0
+        if config.max_requests:
+            self.max_requests = config.max_requests + random.randint(0, config.max_requests_jitter)
+
+    def wrap(self, app):
+        """Wrap the ASGI app so every HTTP request is counted."""
+        async def counted(scope, receive, send):
+            if scope['type'] != 'http':
+                return await app(scope, receive, send)
+            self.in_flight += 1
+            try:
+                await app(scope, receive, send)
+            finally:
+                self.in_flight -= 1
+                self.requests += 1
+                if self.max_requests and self.requests >= self.max_requests:
+                    self.retire('max_requests')
+        return counted
+
+    def retire(self, reason: str) -> None:
+        """Stop accepting requests and exit once in-flight requests finish."""
+        if self.scoreboard.read(self.index)['state'] == RETIRING:
+            return
+        self.scoreboard.write(self.index, state=RETIRING, reason=RETIRE_REASONS.index(reason))
+        if self.server is not None:
+            self.server.should_exit = True
+
+    async def heartbeat(self) -> None:
+        """
+        Publish this worker's status periodically.
+
+        Runs on the event loop, so a blocked loop stops the heartbeat and
+        the master replaces the worker.
+        """
+        limit_kb = self.config.max_memory_mb * 1024
+        while True:
+            rss_kb, private_kb = _memory_kb()
+            slot = {'heartbeat': time.time(), 'requests': self.requests,
+                    'in_flight': self.in_flight, 'rss_kb': rss_kb, 'private_kb': private_kb}
+            if self.server is not None and self.server.started and \
+                    self.scoreboard.read(self.index)['state'] == BOOTING:
+                slot['state'] = SERVING
+            self.scoreboard.write(self.index, **slot)
+            # Only memory grown by serving counts: a cap below a fresh
+            # worker's footprint would otherwise recycle it in a loop
+            if limit_kb and private_kb > limit_kb and self.requests:
+                self.retire('max_memory')
+            await asyncio.sleep(self.config.heartbeat_interval)
+
+    async def serve(self, app, sock: socket.socket) -> None:
+        """Run uvicorn on the shared socket until it is asked to exit."""
+        import uvicorn
+
+        uvicorn_config = uvicorn.Config(
+            self.wrap(app),
+            lifespan='on',
+            log_level=self.config.log_level,
+            timeout_graceful_shutdown=self.config.graceful_timeout,
+        )
+        self.server = uvicorn.Server(uvicorn_config)
+        heartbeat = asyncio.create_task(self.heartbeat())
+        try:
+            await self.server.serve(sockets=[sock])
+        finally:
+            heartbeat.cancel()
+
+
+# The worker of this process (None in the master and outside pre-fork mode)
+_worker: Optional[_Worker] = None
+
+
+def worker_health() -> Optional[dict]:
+    """
+    Per-worker health for /health.
+
+    Returns:
+        dict | None: This worker's identity and the status of all workers,
+            or None when the app is not served by the pre-fork server
+    """
+    if _worker is None:
+        return None
+    return {
+        'worker': {'index': _worker.index, 'pid': os.getpid()},
+        'workers': _worker.scoreboard.snapshot(),
+    }
+
+
+def _run_worker(index: int, scoreboard: Scoreboard, config: PreforkConfig, app, sock: socket.socket) -> None:
+    """Body of a forked worker process."""
+    global _worker
+
+    # Undo the master's signal handling; uvicorn installs its own for
+    # SIGTERM/SIGINT, and signals meant for the master are ignored
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+    for signum in (signal.SIGHUP, signal.SIGUSR1):
+        signal.signal(signum, signal.SIG_IGN)
+    # Forked children inherit the master's random state
+    random.seed()
+
+    now = time.time()
+    scoreboard.write(index, pid=os.getpid(), started=now, heartbeat=now, state=BOOTING)
+    _worker = _Worker(index, scoreboard, config)
+    asyncio.run(_worker.serve(app, sock))
+
+
+# Master Process
+# ==============
+
+class PreforkServer:
+    """
+    Master process: preloads the application, forks workers and keeps the
+    configured number of them serving.
+    """
+
+    def __init__(self, config: Optional[PreforkConfig] = None):
+        """
+        Args:
+            config (PreforkConfig, optional): Settings; defaults to PreforkConfig()
+        """
+        self.config = config or PreforkConfig()
+        self.target = self.config.workers or autotune_workers(self.config.max_memory_mb)
+        # Room for a replacement next to every retiring worker
+        self.scoreboard = Scoreboard(self.target * 2 + 1)
+        self.workers: dict[int, int] = {}  # pid -> slot
+        self.app = None
+        self.socket: Optional[socket.socket] = None
+        self._stopping = False
+        self._reload = False
+        self._report = False
+        self._failures = 0
+        self._spawn_after = 0.0
+
+    def preload(self):
+        """
+        Import the application and build everything workers can share.
+
+        Returns:
+            The ASGI application
+        """
+        import main
+
+        print(f"🚀 Preloading AI Tutor in master process {os.getpid()}...")
+        if not main.initialize_services():
+            print("⚠️  Agent services unavailable; workers will report a degraded status")
+        elif not main.cache_warmer.ready:
+            print("🔥 Warming the response cache before forking workers...")
+            main.warm_cache_before_fork()
+
+        # Move the preloaded objects out of the collector's reach so that
+        # collections in the workers do not write to (and copy) shared pages
+        gc.collect()
+        gc.freeze()
+        return main.app
+
+    def bind(self) -> socket.socket:
+        """Open the listening socket shared by all workers."""
+        sock = socket.socket(socket.AF_INET6 if ':' in self.config.host else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.config.host, self.config.port))
+        sock.listen(self.config.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def spawn(self) -> int:
+        """
+        Fork one worker.
+
+        Returns:
+            int: The worker's pid
+        """
+        index = self.scoreboard.claim()
+        now = time.time()
+        self.scoreboard.write(index, pid=0, started=now, heartbeat=now, requests=0,
+                              in_flight=0, rss_kb=0, private_kb=0, state=BOOTING, reason=0)
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                _run_worker(index, self.scoreboard, self.config, self.app, self.socket)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                # os._exit skips atexit: write out the queued log records first
+                from multiagent.runtime import log
+                log.shutdown()
+                os._exit(exit_code)
+
+        self.scoreboard.write(index, pid=pid)
+        self.workers[pid] = index
+        return pid
+
+    def _serving_count(self) -> int:
+        """Workers that are not retiring."""
+        return sum(1 for index in self.workers.values() if self.scoreboard.read(index)['state'] != RETIRING)
+
+    def _reap(self) -> None:
+        """Collect exited workers and free their slots."""
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self.workers.pop(pid, None)
+            if index is None:
+                continue
+            slot = self.scoreboard.read(index)
+            self.scoreboard.clear(index)
+            code = os.waitstatus_to_exitcode(status)
+            # uvicorn re-raises the SIGTERM it handled once it has shut down
+            if slot['state'] == RETIRING and code in (0, -signal.SIGTERM):
+                print(f"♻️  Worker {pid} retired ({RETIRE_REASONS[slot['reason']]}) after {slot['requests']} requests")
+                self._failures = 0
+                continue
+            print(f"❌ Worker {pid} exited unexpectedly (code {code}) after {slot['requests']} requests")
+            # Back off if workers keep dying right after starting
+            if time.time() - slot['started'] < 5:
+                self._failures += 1
+                self._spawn_after = time.time() + min(30.0, 0.5 * 2 ** self._failures)
+
+    def _kill_stalled(self) -> None:
+        """Kill workers whose event loop stopped sending heartbeats."""
+        now = time.time()
+        for pid, index in list(self.workers.items()):
+            slot = self.scoreboard.read(index)
+            if slot['state'] == RETIRING:
+                limit = self.config.graceful_timeout + self.config.heartbeat_timeout
+            else:
+                limit = self.config.heartbeat_timeout
+            if now - slot['heartbeat'] > limit:
+                print(f"⚠️  Worker {pid} missed heartbeats for {now - slot['heartbeat']:.0f}s; killing it")
+                self._signal(pid, signal.SIGKILL)
+
+    def _retire_all(self, reason: str) -> None:
+        """Ask every worker to exit gracefully (replacements are forked as they retire)."""
+        for pid, index in list(self.workers.items()):
+            if self.scoreboard.read(index)['state'] != RETIRING:
+                self.scoreboard.write(index, state=RETIRING, reason=RETIRE_REASONS.index(reason))
+                self._signal(pid, signal.SIGTERM)
+
+    @staticmethod
+    def _signal(pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _print_workers(self) -> None:
+        """Print the scoreboard (SIGUSR1)."""
+        print(f"👷 {len(self.workers)} workers (target {self.target}):")
+        for worker in self.scoreboard.snapshot():
+            print(f"   #{worker['index']} pid {worker['pid']} {worker['state']:<8} "
+                  f"requests {worker['requests']} in-flight {worker['in_flight']} "
+                  f"rss {worker['rss_mb']} MiB (private {worker['private_mb']}) "
+                  f"heartbeat {worker['heartbeat_age_s']}s ago")
+
+    def _install_signals(self) -> None:
+        def stop(signum, frame):
+            self._stopping = True
+
+        def reload(signum, frame):
+            self._reload = True
+
+        def report(signum, frame):
+            self._report = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGHUP, reload)
+        signal.signal(signal.SIGUSR1, report)
+
+    def run(self) -> int:
+        """
+        Preload, fork the workers and supervise them until asked to stop.
+
+        Returns:
+            int: Process exit code
+        """
+        self.app = self.preload()
+        self.socket = self.bind()
+        self._install_signals()
+        print(f"✅ Serving on http://{self.config.host}:{self.config.port} with {self.target} workers "
+              f"({usable_cpus()} usable CPUs)")
+
+        while not self._stopping:
+            self._reap()
+            if self._reload:
+                self._reload = False
+                print("🔄 Recycling all workers")
+                self._retire_all('reload')
+            if self._report:
+                self._report = False
+                self._print_workers()
+            self._kill_stalled()
+            while self._serving_count() < self.target and time.time() >= self._spawn_after:
+                self.spawn()
+            time.sleep(0.2)
+
+        return self.shutdown()
+
+    def shutdown(self) -> int:
+        """
+        Stop all workers gracefully, killing those that outlive the timeout.
+
+        Returns:
+            int: Process exit code
+        """
+        print(f"🛑 Stopping {len(self.workers)} workers...")
+        self._retire_all('shutdown')
+        deadline = time.time() + self.config.graceful_timeout + 5
+        while self.workers and time.time() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            self._signal(pid, signal.SIGKILL)
+        while self.workers:
+            try:
+                pid, _ = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            self.workers.pop(pid, None)
+        if self.socket is not None:
+            self.socket.close()
+        print("👋 AI Tutor server stopped")
+        return 0
+
+
+# Command Line Interface
+# ======================
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Command-line entry point for the pre-fork server.
+
+    Returns:
+        int: Process exit code
+    """
+    if not hasattr(os, 'fork'):
+        print("❌ The pre-fork server needs os.fork(); use 'python main.py' on this platform")
+        return 1
+
+    defaults = PreforkConfig.from_env()
+    parser = argparse.ArgumentParser(description='Pre-fork multi-worker server for the AI Tutor API.')
+    for config_field in fields(PreforkConfig):
+        default = getattr(defaults, config_field.name)
+        parser.add_argument(f"--{config_field.name.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args(argv)
+
+    # The app serves ./static relative to the project root
+    sys.path.insert(0, os.getcwd())
+    config = PreforkConfig(**{f.name: getattr(args, f.name) for f in fields(PreforkConfig)})
+    return PreforkServer(config).run()
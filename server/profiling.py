@@ -0,0 +1,438 @@
+"""
+AI Tutor - On-Demand Profiling
+==============================
+
+Diagnosis of slow requests and memory growth on a running instance, without
+redeploying. Everything here is off until an admin token is configured and
+an admin asks for it; when nothing is being profiled the request path pays
+for one header lookup.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Per-request profiles:
+A request carrying `X-Admin-Token` and `X-Profile: cprofile` or
+`X-Profile: sample` is profiled from the HTTP middleware and the profile is
+saved under AITUTOR_PROFILE_DIR; the file name comes back in the
+`X-Profile-File` response header.
+- cprofile: deterministic cProfile of the event-loop thread, saved as a
+  pstats file (`python -m pstats`, snakeviz). Exact call counts, but slows
+  the request several-fold
+- sample: the event-loop thread's stack every AITUTOR_PROFILE_INTERVAL_MS,
+  saved as collapsed stacks (flamegraph.pl, speedscope). Low overhead
+
+Both see everything the event loop runs while the request is in flight,
+including other requests handled concurrently; profile on a quiet worker
+for a clean picture. Only one profile runs at a time per process; a request
+asking for a second gets `X-Profile: busy`.
+
+Window sampling and memory snapshots are driven by the /admin endpoints in
+main.py: start and stop the sampler over a time window, and take
+`tracemalloc` snapshots whose differences point at what keeps growing.
+Under the pre-fork server each worker profiles itself; the response says
+which worker (pid) answered.
+
+Configuration:
+    AITUTOR_ADMIN_TOKEN: Token admin requests must send in X-Admin-Token (unset = profiling disabled)
+    AITUTOR_PROFILE_DIR: Directory profiles are written to (profiles)
+    AITUTOR_PROFILE_INTERVAL_MS: Sampling interval (5)
+    AITUTOR_PROFILE_MAX_SECONDS: Longest sampling window (300)
+    AITUTOR_TRACEMALLOC_FRAMES: Stack depth recorded per allocation (10)
+"""
+
+# Standard library imports
+import cProfile
+import contextlib
+import datetime
+import hmac
+import linecache
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Iterator, Optional
+
+# Runtime imports
+from multiagent.runtime import log, metrics
+
+# Request headers
+ADMIN_HEADER = 'x-admin-token'
+PROFILE_HEADER = 'x-profile'
+PROFILE_KINDS = ('cprofile', 'sample')
+
+# Snapshots kept for diffing
+MAX_SNAPSHOTS = 8
+
+logger = log.get_logger('profiling')
+
+ADMIN_TOKEN = os.getenv('AITUTOR_ADMIN_TOKEN') or None
+PROFILE_DIR = os.getenv('AITUTOR_PROFILE_DIR', 'profiles')
+INTERVAL = float(os.getenv('AITUTOR_PROFILE_INTERVAL_MS', '5')) / 1000.0
+MAX_SECONDS = float(os.getenv('AITUTOR_PROFILE_MAX_SECONDS', '300'))
+
+# One profiler at a time: cProfile installs a global hook and concurrent
+# samplers of the same thread would double count
+_busy = threading.Lock()
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """
+    Whether a request's X-Admin-Token grants access to profiling.
+
+    Args:
+        token (str | None): The header value
+
+    Returns:
+        bool: False when no admin token is configured
+    """
+    if ADMIN_TOKEN is None or token is None:
+        return False
+    # Compare bytes: compare_digest rejects str holding non-ASCII characters
+    return hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+
+def _output_path(label: str, extension: str) -> str:
+    """Timestamped file name under the profile directory."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    safe = ''.join(character if character.isalnum() or character in '-_' else '_' for character in label)[:40]
+    return os.path.join(PROFILE_DIR, f'{stamp}-{os.getpid()}-{safe}.{extension}')
+
+
+def list_profiles() -> list[dict]:
+    """
+    Profiles saved in the profile directory, newest first.
+
+    Returns:
+        list[dict]: name, bytes and modification time of each file
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    entries = [entry for entry in os.scandir(PROFILE_DIR) if entry.is_file()]
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    return [
+        {'name': entry.name, 'bytes': entry.stat().st_size,
+         'modified': datetime.datetime.fromtimestamp(entry.stat().st_mtime).isoformat(timespec='seconds')}
+        for entry in entries
+    ]
+
+
+def profile_file(name: str) -> Optional[str]:
+    """
+    Path of a saved profile, if the name refers to one.
+
+    Args:
+        name (str): File name as listed by list_profiles
+
+    Returns:
+        str | None: The path, or None for unknown names (and any path tricks)
+    """
+    if os.path.basename(name) != name or name.startswith('.'):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+# Stack Sampling
+# ==============
+
+class StackSampler:
+    """
+    Samples one thread's Python stack from a background thread and counts
+    identical stacks (collapsed-stack format).
+    """
+
+    def __init__(self, thread_id: int, interval: float = INTERVAL):
+        """
+        Args:
+            thread_id (int): Thread to sample (the event loop's)
+            interval (float): Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.stopped = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, max_seconds: float = MAX_SECONDS) -> None:
+        """Start sampling; sampling stops by itself after max_seconds."""
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, args=(max_seconds,), name='aitutor-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.stopped = self.stopped or time.monotonic()
+
+    def _run(self, max_seconds: float) -> None:
+        deadline = self.started + max_seconds
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+            if time.monotonic() >= deadline:
+                break
+        self.stopped = time.monotonic()
+
+    def collapsed(self) -> str:
+        """The samples as collapsed stacks, one 'frame;frame;frame count' line each."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 20) -> list[dict]:
+        """
+        Functions by share of samples in which they were running (self) and
+        on the stack (total). Time the loop spends idle shows up as its
+        selector's select().
+
+        Args:
+            limit (int): Number of functions returned
+
+        Returns:
+            list[dict]: function, self and total percentages, hottest (self) first
+        """
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        samples = max(self.samples, 1)
+        return [
+            {'function': frame, 'self_pct': round(100 * own[frame] / samples, 1), 'total_pct': round(100 * count / samples, 1)}
+            for frame, count in sorted(total.items(), key=lambda item: (own[item[0]], item[1]), reverse=True)[:limit]
+        ]
+
+    def save(self, label: str) -> str:
+        """Write the collapsed stacks; returns the file path."""
+        path = _output_path(label, 'collapsed')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(self.collapsed())
+        return path
+
+
+# Per-Request Profiles
+# ====================
+
+@contextlib.contextmanager
+def profile_request(kind: str, label: str) -> Iterator[dict]:
+    """
+    Profile the event-loop thread while a request is handled.
+
+    Must be entered on the event-loop thread. The yielded dict receives
+    'file' (the saved profile) or 'busy' when another profile is running.
+
+    Args:
+        kind (str): 'cprofile' or 'sample'
+        label (str): Used in the file name (e.g. the request id)
+    """
+    result: dict = {}
+    if not _busy.acquire(blocking=False):
+        result['busy'] = True
+        yield result
+        return
+    try:
+        if kind == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield result
+            finally:
+                profiler.disable()
+                path = _output_path(label, 'prof')
+                profiler.dump_stats(path)
+        else:
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+            try:
+                yield result
+            finally:
+                sampler.stop()
+                path = sampler.save(label)
+        result['file'] = os.path.basename(path)
+        metrics.PROFILES.inc(kind=kind)
+        logger.info('request profiled', extra={'kind': kind, 'file': result['file']})
+    finally:
+        _busy.release()
+
+
+# Window Sampling
+# ===============
+
+_window: Optional[StackSampler] = None
+
+
+def start_window(thread_id: int, interval: Optional[float] = None, max_seconds: Optional[float] = None) -> dict:
+    """
+    Start sampling a thread until stop_window (or max_seconds).
+
+    Args:
+        thread_id (int): Thread to sample (the event loop's)
+        interval (float, optional): Seconds between samples
+        max_seconds (float, optional): Longest window (capped by AITUTOR_PROFILE_MAX_SECONDS)
+
+    Returns:
+        dict: state 'started', or 'busy' if a profile is already running
+    """
+    global _window
+    if not _busy.acquire(blocking=False):
+        return {'state': 'busy'}
+    _window = StackSampler(thread_id, interval or INTERVAL)
+    seconds = min(max_seconds or MAX_SECONDS, MAX_SECONDS)
+    _window.start(seconds)
+    logger.info('window sampling started', extra={'interval_ms': _window.interval * 1000, 'max_seconds': seconds})
+    return {'state': 'started', 'interval_ms': _window.interval * 1000, 'max_seconds': seconds, 'pid': os.getpid()}
+
+
+def stop_window(limit: int = 20) -> dict:
+    """
+    Stop window sampling, save the collapsed stacks and summarize them.
+
+    Args:
+        limit (int): Number of functions in the summary
+
+    Returns:
+        dict: file, seconds, samples and top functions, or state 'idle'
+    """
+    global _window
+    sampler, _window = _window, None
+    if sampler is None:
+        return {'state': 'idle'}
+    try:
+        sampler.stop()
+        path = sampler.save('window')
+    finally:
+        _busy.release()
+    metrics.PROFILES.inc(kind='window')
+    return {
+        'state': 'stopped',
+        'file': os.path.basename(path),
+        'seconds': round(sampler.stopped - sampler.started, 1),
+        'samples': sampler.samples,
+        'pid': os.getpid(),
+        'top': sampler.top(limit),
+    }
+
+
+def window_status() -> dict:
+    """State of window sampling."""
+    if _window is None:
+        return {'state': 'idle'}
+    return {
+        'state': 'running' if _window.running else 'finished',
+        'seconds': round((_window.stopped or time.monotonic()) - _window.started, 1),
+        'samples': _window.samples,
+    }
+
+
+# Memory Snapshots
+# ================
+
+_snapshots: list[tuple[int, float, tracemalloc.Snapshot]] = []
+_snapshot_ids = 0
+
+
+def _statistic(stat) -> dict:
+    frame = stat.traceback[0]
+    entry = {
+        'where': f'{frame.filename}:{frame.lineno}',
+        'line': linecache.getline(frame.filename, frame.lineno).strip(),
+        'kib': round(getattr(stat, 'size_diff', stat.size) / 1024, 1),
+        'count': getattr(stat, 'count_diff', stat.count),
+    }
+    if hasattr(stat, 'size_diff'):
+        entry['total_kib'] = round(stat.size / 1024, 1)
+    return entry
+
+
+def take_snapshot(compare_to: Optional[int] = None, group_by: str = 'lineno', limit: int = 20) -> dict:
+    """
+    Take a tracemalloc snapshot and compare it with an earlier one.
+
+    The first call starts tracemalloc, so only allocations made after it are
+    traced: take a baseline snapshot, let traffic run, then take another.
+
+    Args:
+        compare_to (int, optional): Snapshot id to diff against; defaults to
+            the previous snapshot
+        group_by (str): 'lineno', 'filename' or 'traceback'
+        limit (int): Number of entries returned
+
+    Returns:
+        dict: Snapshot id, traced memory and the top allocations (or, with
+            an earlier snapshot, the top growth since it)
+
+    Raises:
+        KeyError: If compare_to names an unknown snapshot
+    """
+    global _snapshot_ids
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(int(os.getenv('AITUTOR_TRACEMALLOC_FRAMES', '10')))
+        logger.info('tracemalloc started')
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, linecache.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+    base = None
+    if compare_to is not None:
+        base = next((entry for entry in _snapshots if entry[0] == compare_to), None)
+        if base is None:
+            raise KeyError(compare_to)
+    elif _snapshots:
+        base = _snapshots[-1]
+
+    _snapshot_ids += 1
+    _snapshots.append((_snapshot_ids, time.time(), snapshot))
+    del _snapshots[:-MAX_SNAPSHOTS]
+    metrics.PROFILES.inc(kind='memory')
+
+    current, peak = tracemalloc.get_traced_memory()
+    result = {
+        'snapshot': _snapshot_ids,
+        'pid': os.getpid(),
+        'traced_mib': round(current / 2 ** 20, 2),
+        'peak_mib': round(peak / 2 ** 20, 2),
+    }
+    if base is None:
+        result['top'] = [_statistic(stat) for stat in snapshot.statistics(group_by)[:limit]]
+    else:
+        result['compared_to'] = base[0]
+        result['seconds_since'] = round(time.time() - base[1], 1)
+        result['growth'] = [_statistic(stat) for stat in snapshot.compare_to(base[2], group_by)[:limit]]
+    return result
+
+
+def stop_tracing() -> dict:
+    """Stop tracemalloc (it slows allocations while on) and drop the snapshots."""
+    was_tracing = tracemalloc.is_tracing()
+    tracemalloc.stop()
+    _snapshots.clear()
+    return {'tracemalloc': 'stopped' if was_tracing else 'off'}
+
+
+def memory_status() -> dict:
+    """tracemalloc state and the snapshots kept."""
+    status = {'tracemalloc': 'on' if tracemalloc.is_tracing() else 'off', 'snapshots': [entry[0] for entry in _snapshots]}
+    if tracemalloc.is_tracing():
+        status['traced_mib'] = round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 2)
+    return status
@@ -0,0 +1,323 @@
+"""
+AI Tutor - Static Asset Serving
+===============================
+
+Serves the frontend from memory. Every file under static/ is read once at
+startup, compressed ahead of time and served as a prebuilt bytes object, so
+a page load costs no disk access and no compression work.
+
+Author: AI Tutor Team
+Version: 1.0.0
+
+Caching:
+- Each asset gets a content-hash fingerprinted URL (/static/script.3fa1c29b0e.js);
+  index.html is rewritten to reference those URLs
+- Fingerprinted URLs are cached by browsers for a year ('immutable'), so
+  repeat visits do not even revalidate them
+- index.html and unfingerprinted URLs are revalidated ('no-cache') with
+  strong ETags; an unchanged file answers 304 Not Modified with no body
+
+Compression:
+Assets are stored gzip- and (when the optional 'brotli' package is
+installed) brotli-compressed at maximum level, and the smallest variant
+the client accepts is served with 'Vary: Accept-Encoding'.
+
+Configuration:
+    AITUTOR_STATIC_RELOAD: Set to 1 to reload changed files on request (development)
+"""
+
+# Standard library imports
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Third-party imports
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# Optional brotli support (gzip is always available)
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Page whose references to other assets are rewritten with fingerprinted URLs
+HTML_ENTRY = 'index.html'
+
+# Responses below this size are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+@dataclass
+class Asset:
+    """
+    One static file held in memory with its precompressed variants.
+
+    Attributes:
+        path (str): Path relative to the static directory ('script.js')
+        content_type (str): MIME type with charset for text
+        digest (str): Hex content hash (also the strong ETag)
+        bodies (dict[str, bytes]): Body per content coding ('identity', 'gzip', 'br')
+        mtime (float): Modification time of the source file
+    """
+    path: str
+    content_type: str
+    digest: str
+    bodies: dict[str, bytes] = field(default_factory=dict)
+    mtime: float = 0.0
+
+    @property
+    def fingerprinted_path(self) -> str:
+        """Path with the content hash inserted before the extension."""
+        stem, extension = os.path.splitext(self.path)
+        return f'{stem}.{self.digest[:10]}{extension}'
+
+    def etag(self, coding: str) -> str:
+        """Strong ETag of one representation (each content coding has its own)."""
+        return f'"{self.digest[:20]}"' if coding == 'identity' else f'"{self.digest[:20]}-{coding}"'
+
+
+def _compress(body: bytes) -> dict[str, bytes]:
+    """Build the compressed variants that are smaller than the original."""
+    bodies = {'identity': body}
+    if len(body) < MIN_COMPRESS_BYTES:
+        return bodies
+    # mtime=0 keeps the gzip bytes (and so the ETag-checked body) reproducible
+    variants = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    for coding, compressed in variants.items():
+        if len(compressed) < len(body):
+            bodies[coding] = compressed
+    return bodies
+
+
+def _accepted_codings(header: str) -> dict[str, float]:
+    """Parse Accept-Encoding into {coding: quality}."""
+    codings = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        if not name:
+            continue
+        quality = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        codings[name.strip().lower()] = quality
+    return codings
+
+
+class StaticAssets:
+    """
+    ASGI app serving a directory of static files from memory.
+
+    Mount it at the URL prefix the frontend uses ('/static') and serve the
+    HTML entry page through `index_response`.
+    """
+
+    def __init__(self, directory: str, prefix: str = '/static', reload: Optional[bool] = None):
+        """
+        Args:
+            directory (str): Directory holding the frontend files
+            prefix (str): URL prefix the assets are mounted under
+            reload (bool, optional): Reload files whose modification time
+                changed; defaults to AITUTOR_STATIC_RELOAD
+        """
+        self.directory = directory
+        self.prefix = prefix.rstrip('/')
+        self.reload = reload if reload is not None else os.getenv('AITUTOR_STATIC_RELOAD') == '1'
+        self.assets: dict[str, Asset] = {}
+        self.routes: dict[str, tuple[Asset, bool]] = {}
+        self.load()
+
+    # Loading
+    # =======
+
+    def load(self) -> None:
+        """Read, fingerprint and compress every file in the directory."""
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, self.directory).replace(os.sep, '/')
+                with open(full_path, 'rb') as file:
+                    body = file.read()
+                assets[path] = self._build(path, body, os.path.getmtime(full_path))
+
+        # Rewrite the HTML entry after the other assets have their fingerprints
+        if HTML_ENTRY in assets:
+            entry = assets[HTML_ENTRY]
+            assets[HTML_ENTRY] = self._build(HTML_ENTRY, self._rewrite(entry.bodies['identity'], assets), entry.mtime)
+
+        routes = {}
+        for asset in assets.values():
+            routes[asset.path] = (asset, False)
+            routes[asset.fingerprinted_path] = (asset, True)
+        self.assets, self.routes = assets, routes
+
+    @staticmethod
+    def _build(path: str, body: bytes, mtime: float) -> Asset:
+        """Create the in-memory asset for one file."""
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        return Asset(
+            path=path,
+            content_type=content_type,
+            digest=hashlib.sha256(body).hexdigest(),
+            bodies=_compress(body),
+            mtime=mtime,
+        )
+
+    def _rewrite(self, html: bytes, assets: dict[str, Asset]) -> bytes:
+        """Point the HTML's references to local assets at their fingerprinted URLs."""
+        text = html.decode('utf-8')
+        for asset in assets.values():
+            if asset.path == HTML_ENTRY:
+                continue
+            text = re.sub(
+                rf'(["\']){re.escape(self.prefix)}/{re.escape(asset.path)}(["\'?#])',
+                rf'\g<1>{self.prefix}/{asset.fingerprinted_path}\g<2>',
+                text,
+            )
+        return text.encode('utf-8')
+
+    def _reload_if_changed(self) -> None:
+        """Reload everything if any file was added, removed or modified."""
+        try:
+            current = {}
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    full_path = os.path.join(root, name)
+                    current[os.path.relpath(full_path, self.directory).replace(os.sep, '/')] = os.path.getmtime(full_path)
+        except OSError:
+            return
+        if current != {path: asset.mtime for path, asset in self.assets.items()}:
+            self.load()
+
+    # Serving
+    # =======
+
+    def lookup(self, path: str) -> Optional[tuple[Asset, bool]]:
+        """
+        Find the asset for a path relative to the prefix.
+
+        Args:
+            path (str): 'script.js' or 'script.3fa1c29b0e.js'
+
+        Returns:
+            tuple[Asset, bool] | None: The asset and whether the path was fingerprinted
+        """
+        if self.reload:
+            self._reload_if_changed()
+        return self.routes.get(path.lstrip('/'))
+
+    @staticmethod
+    def negotiate(asset: Asset, accept_encoding: str) -> str:
+        """
+        Pick the smallest representation the client accepts.
+
+        Args:
+            asset (Asset): The asset to serve
+            accept_encoding (str): The request's Accept-Encoding header
+
+        Returns:
+            str: 'br', 'gzip' or 'identity'
+        """
+        accepted = _accepted_codings(accept_encoding)
+        wildcard = accepted.get('*', 0.0)
+        candidates = [
+            coding for coding in asset.bodies
+            if coding != 'identity' and accepted.get(coding, wildcard) > 0
+        ]
+        if not candidates:
+            return 'identity'
+        return min(candidates, key=lambda coding: len(asset.bodies[coding]))
+
+    def build_response(self, asset: Asset, immutable: bool, headers: dict[str, str],
+                       head: bool = False) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+        """
+        Build the status, headers and body for one request.
+
+        Args:
+            asset (Asset): The asset to serve
+            immutable (bool): Whether the request used the fingerprinted URL
+            headers (dict[str, str]): Lower-cased request headers
+            head (bool): Whether this is a HEAD request (no body)
+
+        Returns:
+            tuple: (status, raw headers, body)
+        """
+        coding = self.negotiate(asset, headers.get('accept-encoding', ''))
+        etag = asset.etag(coding)
+        response_headers = [
+            (b'etag', etag.encode()),
+            (b'cache-control', (IMMUTABLE if immutable else REVALIDATE).encode()),
+            (b'vary', b'Accept-Encoding'),
+        ]
+
+        if_none_match = headers.get('if-none-match', '')
+        if if_none_match and (if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]):
+            return 304, response_headers, b''
+
+        body = asset.bodies[coding]
+        response_headers += [
+            (b'content-type', asset.content_type.encode()),
+            (b'content-length', str(len(body)).encode()),
+        ]
+        if coding != 'identity':
+            response_headers.append((b'content-encoding', coding.encode()))
+        return 200, response_headers, b'' if head else body
+
+    def index_response(self, request: Request) -> Optional[Response]:
+        """
+        Serve the HTML entry page (with fingerprinted asset URLs).
+
+        Args:
+            request (Request): The request for '/'
+
+        Returns:
+            Response | None: The page or a 304, or None if there is no index.html
+        """
+        found = self.lookup(HTML_ENTRY)
+        if found is None:
+            return None
+        request_headers = {key.lower(): value for key, value in request.headers.items()}
+        status, headers, body = self.build_response(found[0], False, request_headers, head=request.method == 'HEAD')
+        return Response(
+            content=body,
+            status_code=status,
+            headers={key.decode('latin-1'): value.decode('latin-1') for key, value in headers},
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Serve a request for an asset under the mount prefix."""
+        if scope['type'] != 'http':
+            return
+        method = scope['method']
+        # Mounted apps see the full path with the mount prefix in root_path
+        path = scope['path']
+        root_path = scope.get('root_path', '')
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        found = self.lookup(path)
+        if method not in ('GET', 'HEAD'):
+            status, headers, body = 405, [(b'allow', b'GET, HEAD'), (b'content-length', b'0')], b''
+        elif found is None:
+            status, headers, body = 404, [(b'content-type', b'text/plain; charset=utf-8'), (b'content-length', b'9')], b'Not Found'
+        else:
+            request_headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope['headers']}
+            status, headers, body = self.build_response(*found, request_headers, head=method == 'HEAD')
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
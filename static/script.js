@@ -14,6 +14,8 @@
  * - Real-time chat interface
  * - Agent workflow visualization
  * - Markdown formatting support
+ * - Incremental answer rendering within a per-frame time budget
+ * - Virtualized message list (off-screen messages are detached)
  * - Responsive UI interactions
  * - Multi-agent system coordination display
  * 
@@ -42,6 +44,36 @@ document.addEventListener('DOMContentLoaded', () => {
     const thinkingContent = document.getElementById('thinking-content');
     const thinkingCollapseBtn = document.getElementById('thinking-collapse');
 
+    // ==========================================
+    // CONVERSATION STATE
+    // ==========================================
+
+    // Session id returned by the backend; sent with every follow-up question
+    // so the agents see the earlier turns of the conversation
+    let sessionId = null;
+
+    // Conversation state token returned instead when the server runs
+    // stateless (AITUTOR_CLIENT_STATE=on); sent back the same way
+    let conversationState = null;
+
+    // ==========================================
+    // RENDERING LIMITS
+    // ==========================================
+
+    // Time per animation frame spent rendering answer text; the rest of the
+    // ~16 ms frame is left to the browser for style, layout and paint
+    const FRAME_BUDGET_MS = 6;
+
+    // Messages further than this from the visible part of the chat are
+    // detached from the DOM and replaced by a spacer of the same height
+    const VIRTUALIZE_MARGIN_PX = 1500;
+
+    // Maximum number of steps kept in the agent workflow panel
+    const MAX_THINKING_STEPS = 40;
+
+    // Distance from the bottom within which new content keeps the chat scrolled down
+    const STICKY_SCROLL_PX = 80;
+
     // ==========================================
     // AGENT CONFIGURATION
     // ==========================================
@@ -54,30 +86,54 @@ document.addEventListener('DOMContentLoaded', () => {
         'root': { 
             name: 'Root Orchestrator', 
             icon: 'fas fa-crown', 
-            color: '#e67e22' 
+            color: '#e67e22',
+            card: 'root'
         },
         'maths_agent': { 
             name: 'Mathematics Agent', 
             icon: 'fas fa-calculator', 
-            color: '#3498db' 
+            color: '#3498db',
+            card: 'maths'
         },
         'physics_agent': { 
             name: 'Physics Agent', 
             icon: 'fas fa-atom', 
-            color: '#e74c3c' 
+            color: '#e74c3c',
+            card: 'physics'
         },
         'chemistry_agent': { 
             name: 'Chemistry Agent', 
             icon: 'fas fa-flask', 
-            color: '#27ae60' 
+            color: '#27ae60',
+            card: 'chemistry'
         },
         'news_analyst': { 
             name: 'News Analyst', 
             icon: 'fas fa-newspaper', 
-            color: '#9b59b6' 
+            color: '#9b59b6',
+            card: 'news'
         }
     };
 
+    /**
+     * Maps backend agent names to the keys of the agents table
+     * (the orchestrator is called 'multiagent' on the server)
+     */
+    const agentAliases = {
+        'multiagent': 'root'
+    };
+
+    /**
+     * Resolves a backend agent name to its agents-table key
+     * 
+     * @param {string} name - Agent name as reported by the server
+     * @returns {string} Key into the agents table
+     */
+    function agentKey(name) {
+        const key = agentAliases[name] || name;
+        return agents[key] ? key : 'root';
+    }
+
     // ==========================================
     // INITIALIZATION
     // ==========================================
@@ -176,12 +232,19 @@ document.addEventListener('DOMContentLoaded', () => {
 
     /**
      * Adds a new message to the chat log
+     * Each message lives in a slot that stays in the DOM; the message itself
+     * is detached while the slot is far off-screen (see virtualization below)
      * 
      * @param {string} text - Message content
      * @param {string} sender - 'user' or 'bot'
      * @param {Object} agentInfo - Optional agent metadata for bot messages
+     * @returns {HTMLElement} The message element
      */
     function appendMessage(text, sender, agentInfo = null) {
+        const stick = isNearBottom();
+        const slot = document.createElement('div');
+        slot.className = 'message-slot';
+
         const messageDiv = document.createElement('div');
         messageDiv.classList.add('message', `${sender}-message`);
         
@@ -194,17 +257,205 @@ document.addEventListener('DOMContentLoaded', () => {
         }
         
         const textDiv = document.createElement('div');
+        messageDiv.appendChild(textDiv);
+        slot.appendChild(messageDiv);
+        chatLog.appendChild(slot);
+        observeSlot(slot);
         
-        // Apply markdown formatting for bot messages
+        // Bot messages are markdown, rendered block by block across frames
         if (sender === 'bot') {
-            textDiv.innerHTML = formatMarkdown(text);
+            const renderer = createMessageRenderer(textDiv, slot);
+            renderer.push(text);
+            renderer.finish();
         } else {
             textDiv.textContent = text;
         }
         
-        messageDiv.appendChild(textDiv);
-        chatLog.appendChild(messageDiv);
-        scrollToBottom();
+        if (stick) {
+            scrollToBottom();
+        }
+        return messageDiv;
+    }
+
+    /**
+     * Creates an incremental markdown renderer for one bot message
+     * 
+     * Text is pushed in chunks as it arrives. Completed blocks (paragraphs
+     * separated by a blank line) are formatted exactly once and appended;
+     * only the unfinished last block is re-rendered when more text arrives,
+     * so a long answer is never re-parsed as a whole. Formatting runs in
+     * animation frames and stops each frame when FRAME_BUDGET_MS is used up.
+     * 
+     * @param {HTMLElement} container - Element receiving the rendered blocks
+     * @param {HTMLElement} slot - The message's slot (kept attached while rendering)
+     * @returns {{push: function(string), finish: function()}} The renderer
+     */
+    function createMessageRenderer(container, slot) {
+        const pendingBlocks = [];
+        let buffer = '';
+        let tail = null;
+        let finished = false;
+        let frameRequested = false;
+
+        // A message being rendered must stay in the DOM
+        slot.dataset.live = 'true';
+
+        function requestFrame() {
+            if (!frameRequested) {
+                frameRequested = true;
+                requestAnimationFrame(renderFrame);
+            }
+        }
+
+        function createBlock(markdown) {
+            const block = document.createElement('div');
+            block.className = 'message-block';
+            block.innerHTML = formatMarkdown(markdown);
+            return block;
+        }
+
+        function renderFrame() {
+            frameRequested = false;
+            const stick = isNearBottom();
+            const started = performance.now();
+            const fragment = document.createDocumentFragment();
+
+            while (pendingBlocks.length > 0 && performance.now() - started < FRAME_BUDGET_MS) {
+                fragment.appendChild(createBlock(pendingBlocks.shift()));
+            }
+            container.insertBefore(fragment, tail);
+
+            if (pendingBlocks.length > 0) {
+                requestFrame();
+            } else {
+                renderTail();
+                if (finished) {
+                    // Let the slot be detached if it scrolled away while rendering
+                    delete slot.dataset.live;
+                    observeSlot(slot);
+                }
+            }
+            if (stick) {
+                scrollToBottom();
+            }
+        }
+
+        function renderTail() {
+            if (!buffer.trim()) {
+                if (tail) {
+                    tail.remove();
+                    tail = null;
+                }
+                return;
+            }
+            const block = createBlock(buffer);
+            if (tail) {
+                tail.replaceWith(block);
+            } else {
+                container.appendChild(block);
+            }
+            tail = block;
+        }
+
+        return {
+            push(chunk) {
+                buffer += chunk;
+                const blocks = buffer.split(/\n{2,}/);
+                buffer = blocks.pop();
+                blocks.forEach(block => {
+                    if (block.trim()) {
+                        pendingBlocks.push(block);
+                    }
+                });
+                requestFrame();
+            },
+            finish() {
+                finished = true;
+                // The last block is complete now: format it like the others
+                if (buffer.trim()) {
+                    pendingBlocks.push(buffer);
+                }
+                buffer = '';
+                requestFrame();
+            }
+        };
+    }
+
+    // ==========================================
+    // MESSAGE LIST VIRTUALIZATION
+    // ==========================================
+
+    /**
+     * Watches message slots entering and leaving the area around the
+     * visible part of the chat (not available in very old browsers, which
+     * simply keep every message attached)
+     */
+    const slotObserver = 'IntersectionObserver' in window
+        ? new IntersectionObserver(onSlotVisibilityChange, {
+            root: chatWindow,
+            rootMargin: `${VIRTUALIZE_MARGIN_PX}px 0px`
+        })
+        : null;
+
+    /**
+     * Starts (or restarts) virtualizing a message slot; the observer then
+     * reports the slot's current visibility once
+     * 
+     * @param {HTMLElement} slot - The slot to observe
+     */
+    function observeSlot(slot) {
+        if (slotObserver) {
+            slotObserver.unobserve(slot);
+            slotObserver.observe(slot);
+        }
+    }
+
+    /**
+     * Detaches messages that moved far off-screen and restores those coming back
+     * 
+     * @param {IntersectionObserverEntry[]} entries - Slots whose visibility changed
+     */
+    function onSlotVisibilityChange(entries) {
+        entries.forEach(entry => {
+            const slot = entry.target;
+            if (entry.isIntersecting) {
+                attachMessage(slot);
+            } else if (!slot.dataset.live) {
+                detachMessage(slot, entry.boundingClientRect.height);
+            }
+        });
+    }
+
+    /**
+     * Replaces a slot's message by a spacer of the same height
+     * 
+     * @param {HTMLElement} slot - Slot to empty
+     * @param {number} height - Current rendered height of the slot
+     */
+    function detachMessage(slot, height) {
+        const message = slot.firstElementChild;
+        // Nothing to keep the place of while the chat is not laid out (height 0)
+        if (!message || height === 0) {
+            return;
+        }
+        slot.style.height = `${height}px`;
+        // Do not replay the entrance animation when the message comes back
+        message.style.animation = 'none';
+        slot.detachedMessage = message;
+        message.remove();
+    }
+
+    /**
+     * Puts a detached message back into its slot
+     * 
+     * @param {HTMLElement} slot - Slot to restore
+     */
+    function attachMessage(slot) {
+        if (slot.detachedMessage) {
+            slot.appendChild(slot.detachedMessage);
+            slot.detachedMessage = null;
+            slot.style.height = '';
+        }
     }
 
     /**
@@ -255,6 +506,20 @@ document.addEventListener('DOMContentLoaded', () => {
             placeholder.remove();
         }
 
+        thinkingContent.appendChild(createThinkingStep(agent, action, description));
+        trimThinkingSteps();
+        thinkingContent.scrollTop = thinkingContent.scrollHeight;
+    }
+
+    /**
+     * Builds the element for one workflow step
+     * 
+     * @param {string} agent - Agent identifier
+     * @param {string} action - Action being performed
+     * @param {string} description - Detailed description of the action
+     * @returns {HTMLElement} The step element
+     */
+    function createThinkingStep(agent, action, description) {
         const stepDiv = document.createElement('div');
         stepDiv.className = 'workflow-step-item';
         
@@ -269,9 +534,16 @@ document.addEventListener('DOMContentLoaded', () => {
                 <div class="step-description">${description}</div>
             </div>
         `;
-        
-        thinkingContent.appendChild(stepDiv);
-        thinkingContent.scrollTop = thinkingContent.scrollHeight;
+        return stepDiv;
+    }
+
+    /**
+     * Keeps only the most recent MAX_THINKING_STEPS steps in the workflow panel
+     */
+    function trimThinkingSteps() {
+        while (thinkingContent.childElementCount > MAX_THINKING_STEPS) {
+            thinkingContent.firstElementChild.remove();
+        }
     }
 
     /**
@@ -311,6 +583,16 @@ document.addEventListener('DOMContentLoaded', () => {
         chatWindow.scrollTop = chatWindow.scrollHeight;
     }
 
+    /**
+     * Tells whether the chat is scrolled to (or near) the latest message,
+     * so new content only scrolls the view of a reader who is following along
+     * 
+     * @returns {boolean} True if the view is at the bottom of the chat
+     */
+    function isNearBottom() {
+        return chatWindow.scrollHeight - chatWindow.scrollTop - chatWindow.clientHeight <= STICKY_SCROLL_PX;
+    }
+
     // ==========================================
     // API COMMUNICATION
     // ==========================================
@@ -349,7 +631,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ text: query }),
+                body: JSON.stringify({ text: query, session_id: sessionId, state: conversationState }),
             });
 
             // Remove typing indicator
@@ -367,9 +649,11 @@ document.addEventListener('DOMContentLoaded', () => {
             }
 
             const data = await response.json();
+            sessionId = data.session_id || sessionId;
+            conversationState = data.state || conversationState;
             
-            // Simulate agent workflow based on response content
-            simulateAgentWorkflow(query, data.response);
+            // Show the real agent activity reported by the server
+            renderAgentTrace(data.trace);
             
             // Show final response
             appendMessage(data.response, 'bot');
@@ -389,37 +673,96 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    function simulateAgentWorkflow(query, response) {
-        const lowerQuery = query.toLowerCase();
-        
-        // Determine which agents might be involved based on keywords
-        if (lowerQuery.includes('math') || lowerQuery.includes('calculate') || lowerQuery.includes('solve') || /\d+/.test(query)) {
-            showThinkingStep('maths_agent', 'Mathematics Processing', 'Performing calculations and mathematical analysis...');
-            highlightActiveAgent('maths');
-        }
-        
-        if (lowerQuery.includes('physics') || lowerQuery.includes('speed') || lowerQuery.includes('light') || lowerQuery.includes('force') || lowerQuery.includes('energy')) {
-            showThinkingStep('physics_agent', 'Physics Analysis', 'Looking up physical constants and applying physics principles...');
-            highlightActiveAgent('physics');
-        }
-        
-        if (lowerQuery.includes('chemistry') || lowerQuery.includes('element') || lowerQuery.includes('carbon') || lowerQuery.includes('reaction')) {
-            showThinkingStep('chemistry_agent', 'Chemistry Processing', 'Analyzing chemical properties and reactions...');
-            highlightActiveAgent('chemistry');
-        }
-        
-        if (lowerQuery.includes('news') || lowerQuery.includes('ai') || lowerQuery.includes('artificial intelligence') || 
-            lowerQuery.includes('latest') || lowerQuery.includes('current') || lowerQuery.includes('recent') || 
-            lowerQuery.includes('development') || lowerQuery.includes('update')) {
-            showThinkingStep('news_analyst', 'News Analysis', 'Searching for latest AI news and developments...');
-            highlightActiveAgent('news');
+    /**
+     * Escapes text for safe insertion into HTML
+     * 
+     * @param {string} text - Untrusted text (e.g. tool or agent names)
+     * @returns {string} HTML-escaped text
+     */
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = String(text);
+        return div.innerHTML;
+    }
+
+    /**
+     * Formats a duration for the workflow panel
+     * 
+     * @param {number} ms - Duration in milliseconds
+     * @returns {string} Human-readable duration
+     */
+    function formatDuration(ms) {
+        return ms >= 1000 ? `${(ms / 1000).toFixed(2)} s` : `${Math.round(ms)} ms`;
+    }
+
+    /**
+     * Renders the activity trace returned by the backend in the workflow panel
+     * Each step shows the agent that produced it, what happened and how long it took
+     * 
+     * @param {Object} trace - Activity trace ({ total_ms, hops, steps })
+     */
+    function renderAgentTrace(trace) {
+        if (!trace || !trace.steps || trace.steps.length === 0) {
+            showThinkingStep('root', 'Response Ready', 'No agent activity was reported for this answer.');
+            return;
         }
-        
-        // Final synthesis step
-        setTimeout(() => {
-            showThinkingStep('root', 'Synthesizing Response', 'Combining results from specialist agents into final answer...');
-            highlightActiveAgent('root');
-        }, 1000);
+
+        // Steps are built off-document and inserted in one go (one layout);
+        // very long traces keep only their latest steps
+        const fragment = document.createDocumentFragment();
+        trace.steps.slice(-(MAX_THINKING_STEPS - 1)).forEach(step => {
+            const key = agentKey(step.agent);
+            const name = escapeHtml(step.name || '');
+            const duration = formatDuration(step.ms);
+            let title;
+            let description;
+
+            switch (step.kind) {
+                case 'transfer': {
+                    // Unknown targets fall back to the raw agent name
+                    const target = agents[agentAliases[step.name] || step.name];
+                    title = `Transfer → ${target ? target.name : name}`;
+                    description = `Routed after ${duration} of model time`;
+                    break;
+                }
+                case 'tool_call':
+                    title = `Calling <code>${name}</code>`;
+                    description = `Requested after ${duration} of model time`;
+                    break;
+                case 'tool_result':
+                    title = `<code>${name}</code> returned${step.status ? ` (${escapeHtml(step.status)})` : ''}`;
+                    description = `Tool ran for ${duration}`;
+                    break;
+                case 'answer':
+                    title = 'Final Answer';
+                    description = `Generated in ${duration}`;
+                    break;
+                case 'cached':
+                    title = 'Answered from Cache';
+                    description = 'Same opening question answered earlier';
+                    break;
+                case 'degraded':
+                    // The tutor is in reduced mode (model slow or unavailable)
+                    title = 'Reduced Mode Answer';
+                    description = `Served from ${name || 'a fallback'} without the model`;
+                    break;
+                default:
+                    title = 'Intermediate Reply';
+                    description = `Generated in ${duration}`;
+            }
+            fragment.appendChild(createThinkingStep(key, title, `${description} · at ${formatDuration(step.at_ms)}`));
+        });
+
+        const hops = (trace.hops || []).map(hop => escapeHtml(agents[agentKey(hop)].name)).join(' → ');
+        fragment.appendChild(createThinkingStep('root', `Completed in ${formatDuration(trace.total_ms)}`, hops));
+
+        // Replace the provisional "Analyzing Query" step
+        thinkingContent.replaceChildren(fragment);
+        thinkingContent.scrollTop = thinkingContent.scrollHeight;
+
+        // Highlight the agent that produced the final answer
+        const last = trace.steps[trace.steps.length - 1];
+        highlightActiveAgent(agents[agentKey(last.agent)].card);
     }
 
     // Event listeners
@@ -437,4 +780,29 @@ document.addEventListener('DOMContentLoaded', () => {
         userInput.focus();
         autoResizeTextarea();
     };
+
+    // ==========================================
+    // PERFORMANCE DIAGNOSTICS
+    // ==========================================
+
+    // Open the page with ?debug=frames to log main-thread tasks that overrun
+    // a frame, and fill the chat with fillConversation(200) from the console
+    // to check scrolling and rendering cost of a long session
+    if (new URLSearchParams(window.location.search).get('debug') === 'frames') {
+        if ('PerformanceObserver' in window) {
+            new PerformanceObserver(list => {
+                list.getEntries().forEach(entry => {
+                    console.warn(`Long task: ${entry.duration.toFixed(1)} ms`);
+                });
+            }).observe({ type: 'longtask', buffered: true });
+        }
+
+        window.fillConversation = function(turns = 200) {
+            const paragraph = 'The **answer** uses `F = ma` and *Newton\'s* second law. ';
+            for (let turn = 0; turn < turns; turn++) {
+                appendMessage(`Question ${turn + 1}`, 'user');
+                appendMessage(`### Answer ${turn + 1}\n\n` + Array(8).fill(paragraph.repeat(6)).join('\n\n'), 'bot');
+            }
+        };
+    }
 });
\ No newline at end of file
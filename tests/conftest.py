@@ -0,0 +1,13 @@
+"""
+AI Tutor - Test Configuration
+=============================
+
+Makes the repository root importable so the tests can import `multiagent`,
+`server` and `batch` the way the application does.
+"""
+
+# Standard library imports
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,84 @@
+"""
+Tests for the batch runner's input parsing and checkpoint resume (batch/runner.py).
+
+The output file is the checkpoint, so each test writes one by hand and
+checks what a rerun would skip, retry and keep.
+"""
+
+# Standard library imports
+import io
+import json
+
+# Module under test
+from batch.runner import load_checkpoint, parse_item, read_items
+
+
+def write_lines(path, *records, tail: str = '') -> None:
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records) + tail)
+
+
+def test_parse_item_id_and_text_fallbacks():
+    assert parse_item('{"request_id": "q-1", "text": " Solve x "}', 1).text == 'Solve x'
+    assert parse_item('{"id": "q-2", "question": "Why?"}', 2).id == 'q-2'
+    titled = parse_item('{"title": "Forces", "body": "Explain"}', 3)
+    assert (titled.id, titled.text) == ('line-3', 'Forces\n\nExplain')
+
+
+def test_parse_item_reports_unusable_lines():
+    assert parse_item('not json', 4).error.startswith('invalid input line')
+    assert parse_item('[1, 2]', 5).error.startswith('invalid input line')
+    assert parse_item('{"id": "q-6"}', 6).error == 'no question text'
+
+
+def test_missing_checkpoint_is_empty(tmp_path):
+    assert load_checkpoint(str(tmp_path / 'answers.jsonl')) == set()
+
+
+def test_torn_last_line_is_cut_off(tmp_path):
+    path = tmp_path / 'answers.jsonl'
+    write_lines(path, {'request_id': 'a', 'line': 1, 'status': 'ok'}, tail='{"request_id": "b", "li')
+
+    assert load_checkpoint(str(path)) == {('a', 1)}
+    assert path.read_text().count('\n') == 1
+    assert path.read_text().endswith('\n')
+
+
+def test_reused_id_on_another_line_is_still_answered(tmp_path):
+    path = tmp_path / 'answers.jsonl'
+    write_lines(path, {'request_id': 'a', 'line': 1, 'status': 'ok'})
+    questions = io.StringIO('{"id": "a", "text": "first"}\n{"id": "b", "text": "second"}\n{"id": "a", "text": "third"}\n')
+
+    remaining = read_items(questions, load_checkpoint(str(path)))
+
+    assert [(item.id, item.line) for item in remaining] == [('b', 2), ('a', 3)]
+
+
+def test_failed_questions_are_retried_and_their_errors_removed(tmp_path):
+    path = tmp_path / 'answers.jsonl'
+    write_lines(
+        path,
+        {'request_id': 'a', 'line': 1, 'status': 'ok'},
+        {'request_id': 'b', 'line': 2, 'status': 'error', 'error': 'timeout'},
+        {'request_id': 'c', 'line': 3, 'status': 'ok'},
+        tail='{"request_id"',
+    )
+
+    done = load_checkpoint(str(path))
+
+    assert done == {('a', 1), ('c', 3)}
+    kept = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['request_id'] for record in kept] == ['a', 'c']
+    assert not (tmp_path / 'answers.jsonl.tmp').exists()
+
+
+def test_keep_failed_counts_errors_as_done(tmp_path):
+    path = tmp_path / 'answers.jsonl'
+    write_lines(
+        path,
+        {'request_id': 'a', 'line': 1, 'status': 'ok'},
+        {'request_id': 'b', 'line': 2, 'status': 'error', 'error': 'timeout'},
+    )
+    before = path.read_text()
+
+    assert load_checkpoint(str(path), keep_failed=True) == {('a', 1), ('b', 2)}
+    assert path.read_text() == before
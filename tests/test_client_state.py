@@ -0,0 +1,117 @@
+"""
+Tests for the signed client-held conversation state (multiagent/runtime/client_state.py).
+
+Each test installs its own ClientStateConfig, so tokens are signed with a
+known secret regardless of the environment the suite runs in.
+"""
+
+# Standard library imports
+import os
+
+# Third-party imports
+import pytest
+
+# Module under test
+from multiagent.runtime import client_state
+from multiagent.runtime.client_state import ClientStateConfig, ConversationState, InvalidState, Turn
+
+
+@pytest.fixture
+def config(monkeypatch):
+    config = ClientStateConfig(enabled=True, secrets=[b'test-secret'])
+    monkeypatch.setattr(client_state, 'CONFIG', config)
+    return config
+
+
+def make_state() -> ConversationState:
+    return ConversationState(turns=[
+        Turn('What is 2x + 5 = 15?', 'maths_agent', 'x = 5'),
+        Turn('And the speed of light?', 'physics_agent', 'About 299 792 km/s'),
+    ])
+
+
+def test_token_round_trips(config):
+    token = client_state.encode(make_state())
+
+    state = client_state.decode(token)
+
+    assert token.startswith('v1.')
+    assert [turn.question for turn in state.turns] == ['What is 2x + 5 = 15?', 'And the speed of light?']
+    assert state.agent == 'physics_agent'
+
+
+def test_tampered_token_is_rejected(config):
+    version, payload, signature = client_state.encode(make_state()).split('.')
+    forged = client_state.encode(ConversationState(turns=[Turn('forged')])).split('.')[1]
+
+    with pytest.raises(InvalidState) as error:
+        client_state.decode(f'{version}.{forged}.{signature}')
+    assert error.value.reason == 'signature'
+
+
+def test_token_signed_with_another_secret_is_rejected(config, monkeypatch):
+    token = client_state.encode(make_state())
+    monkeypatch.setattr(client_state, 'CONFIG', ClientStateConfig(enabled=True, secrets=[b'other-secret']))
+
+    with pytest.raises(InvalidState) as error:
+        client_state.decode(token)
+    assert error.value.reason == 'signature'
+
+
+def test_rotated_secret_still_verifies(config, monkeypatch):
+    token = client_state.encode(make_state())
+    monkeypatch.setattr(client_state, 'CONFIG', ClientStateConfig(enabled=True, secrets=[b'new-secret', b'test-secret']))
+
+    assert client_state.decode(token).turns[0].answer == 'x = 5'
+
+
+def test_expired_token_is_rejected(config, monkeypatch):
+    token = client_state.encode(make_state())
+    issued = client_state.time.time()
+    monkeypatch.setattr(client_state.time, 'time', lambda: issued + config.ttl + 1)
+
+    with pytest.raises(InvalidState) as error:
+        client_state.decode(token)
+    assert error.value.reason == 'expired'
+
+
+@pytest.mark.parametrize('token, reason', [
+    ('not-a-token', 'malformed'),
+    ('v2.payload.signature', 'version'),
+    ('v1.payload.signature.extra', 'malformed'),
+])
+def test_malformed_tokens_are_rejected(config, token, reason):
+    with pytest.raises(InvalidState) as error:
+        client_state.decode(token)
+    assert error.value.reason == reason
+
+
+def test_oversized_token_is_rejected(config):
+    with pytest.raises(InvalidState) as error:
+        client_state.decode('v1.' + 'a' * config.max_bytes + '.sig')
+    assert error.value.reason == 'too_large'
+
+
+def test_encode_folds_turns_to_fit(config):
+    config.max_bytes = 1200
+    # Random answers, so compression cannot make them fit
+    state = ConversationState(turns=[Turn(f'question {n}', 'maths_agent', os.urandom(150).hex()) for n in range(6)])
+
+    token = client_state.encode(state)
+
+    assert len(token) <= config.max_bytes
+    decoded = client_state.decode(token)
+    assert decoded.turns[-1].question.startswith('question 5')
+    assert len(decoded.turns) < 6
+
+
+def test_enabled_without_secret_refuses_to_start(monkeypatch):
+    monkeypatch.setenv('AITUTOR_CLIENT_STATE', 'on')
+    monkeypatch.delenv('AITUTOR_CLIENT_STATE_SECRET', raising=False)
+    monkeypatch.setattr(client_state, 'CONFIG', ClientStateConfig.from_env())
+
+    assert client_state.requested()
+    assert not client_state.enabled()
+    assert 'error' in client_state.status()
+    with pytest.raises(RuntimeError):
+        client_state.validate()
@@ -0,0 +1,100 @@
+"""
+Tests for the prompt prefix context cache (multiagent/prompts/context_cache.py).
+
+LocalContextCache stands in for the Gemini caches API, so the middleware's
+request rewriting and the store's handle lifecycle run without a network.
+"""
+
+# Standard library imports
+import asyncio
+from types import SimpleNamespace
+
+# Third-party imports
+import pytest
+from google.adk.models import LlmRequest
+from google.genai import types
+
+# Module under test
+from multiagent.prompts.context_cache import (
+    CacheHandle, ContextCacheMiddleware, ContextCacheStore, LocalContextCache, PromptPrefix,
+)
+
+INSTRUCTION = 'You are a physics tutor. ' * 50
+
+
+def make_call(instruction: str = INSTRUCTION) -> SimpleNamespace:
+    config = types.GenerateContentConfig(system_instruction=instruction)
+    request = LlmRequest(model='gemini-2.0-flash-001', contents=[], config=config)
+    return SimpleNamespace(request=request, model='gemini-2.0-flash-001', metadata={})
+
+
+async def echo(call):
+    return call
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        ContextCacheStore()
+
+
+def test_prefix_key_depends_on_model_and_instruction():
+    config = types.GenerateContentConfig(system_instruction=INSTRUCTION)
+    first = PromptPrefix.from_config('model-a', config)
+    assert first.key == PromptPrefix.from_config('model-a', config).key
+    assert first.key != PromptPrefix.from_config('model-b', config).key
+    assert PromptPrefix.from_config('model-a', types.GenerateContentConfig()) is None
+
+
+def test_middleware_swaps_prefix_for_handle():
+    store = LocalContextCache()
+    middleware = ContextCacheMiddleware(store, min_tokens=10)
+
+    sent = asyncio.run(middleware(make_call(), echo))
+
+    name = sent.request.config.cached_content
+    assert name.startswith('cachedContents/local-')
+    assert sent.request.config.system_instruction is None
+    assert store.resolve(name).system_instruction == INSTRUCTION
+    assert sent.metadata['cached_content'] == name
+
+
+def test_handle_is_created_once_and_reused():
+    store = LocalContextCache()
+    middleware = ContextCacheMiddleware(store, min_tokens=10)
+
+    async def run():
+        return await asyncio.gather(*(middleware(make_call(), echo) for _ in range(5)))
+
+    calls = asyncio.run(run())
+    assert len({call.request.config.cached_content for call in calls}) == 1
+    assert store.stats()['created'] == 1
+    assert store.stats()['hits'] == 5
+
+
+def test_small_prefix_is_sent_uncached():
+    store = LocalContextCache()
+    middleware = ContextCacheMiddleware(store, min_tokens=100_000)
+
+    sent = asyncio.run(middleware(make_call(), echo))
+
+    assert sent.request.config.cached_content is None
+    assert sent.request.config.system_instruction == INSTRUCTION
+    assert store.stats()['created'] == 0
+
+
+class FailingCache(ContextCacheStore):
+    async def _create(self, prefix, call) -> CacheHandle:
+        raise RuntimeError('quota exceeded')
+
+
+def test_creation_failure_falls_back_and_backs_off():
+    store = FailingCache(retry_after=300)
+    middleware = ContextCacheMiddleware(store, min_tokens=10)
+
+    first = asyncio.run(middleware(make_call(), echo))
+    second = asyncio.run(middleware(make_call(), echo))
+
+    assert first.request.config.system_instruction == INSTRUCTION
+    assert second.request.config.cached_content is None
+    # The second call is inside the back-off window: no new attempt
+    assert store.failures == 1
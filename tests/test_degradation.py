@@ -0,0 +1,186 @@
+"""
+Tests for degraded-mode serving (multiagent/runtime/degradation.py).
+
+Covers the classifier that decides which questions the specialists' tools
+can answer without a model call, which turns may be answered from the
+response cache, and the controller's level changes under a fake clock.
+"""
+
+# Standard library imports
+from types import SimpleNamespace
+
+# Third-party imports
+import pytest
+
+# Module under test
+from multiagent.runtime import degradation
+from multiagent.runtime.degradation import (
+    CACHE, LOCAL, NO_NEWS, NORMAL, DegradationConfig, DegradationController, answer_locally, degraded_answer,
+)
+from multiagent.runtime.response_cache import ResponseCache
+
+
+# Local Answers
+# =============
+
+@pytest.mark.parametrize('question, first_line', [
+    ('What is 12 * 7?', '**12 × 7 = 84**'),
+    ('calculate 2.5 plus 4', '**2.5 + 4 = 6.5**'),
+    ('subtract 3 from 10', '**10 − 3 = 7**'),
+    ('divide 1 by 0', '**1 ÷ 0**: Cannot divide by zero.'),
+])
+def test_two_number_arithmetic_uses_the_calculator(question, first_line):
+    answer = answer_locally(question)
+
+    assert (answer.source, answer.agent) == ('calculator', 'maths_agent')
+    assert answer.text.splitlines()[0] == first_line
+
+
+@pytest.mark.parametrize('question, constant', [
+    ('speed of light', 'Speed of light'),
+    ("What is Planck's constant?", 'Planck constant'),
+    ('value of c', 'Speed of light'),
+    ('constant h', 'Planck constant'),
+])
+def test_physical_constants_use_the_table(question, constant):
+    answer = answer_locally(question)
+
+    assert (answer.source, answer.agent) == ('physics_constants', 'physics_agent')
+    assert answer.text.startswith(f'**{constant}**')
+
+
+@pytest.mark.parametrize('question', ['what is helium', 'atomic mass of He', 'element b', 'symbol of Na'])
+def test_elements_use_the_periodic_table(question):
+    answer = answer_locally(question)
+
+    assert (answer.source, answer.agent) == ('elements', 'chemistry_agent')
+
+
+@pytest.mark.parametrize('question', ['what is c', 'he', 'What is I?', 'what is g', 'b', 'tell me about us'])
+def test_short_symbols_need_a_keyword(question):
+    assert answer_locally(question) is None
+
+
+@pytest.mark.parametrize('question', [
+    'explain gravity', 'solve 2x + 5 = 15', 'what is 1 + 2 + 3', 'why is the speed of light constant', '',
+])
+def test_other_questions_need_the_agents(question):
+    assert answer_locally(question) is None
+
+
+def test_answers_are_labeled():
+    assert 'Reduced mode' in answer_locally('what is 2 + 2').text
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr('multiagent.runtime.response_cache.CACHE', cache)
+    return cache
+
+
+def test_cached_answers_only_open_a_conversation(cache):
+    cache.put('Explain it more simply', 'An answer from another conversation', {'hops': ['multiagent', 'physics_agent']})
+
+    opening = degraded_answer('Explain it more simply', NO_NEWS, first_turn=True)
+    follow_up = degraded_answer('Explain it more simply', NO_NEWS, first_turn=False)
+
+    assert opening.source == 'cache' and 'another conversation' in opening.text
+    assert follow_up is None
+
+
+def test_local_answers_serve_follow_ups(cache):
+    answer = degraded_answer('what is 6 * 7', LOCAL, first_turn=False)
+
+    assert answer.source == 'calculator'
+    assert degraded_answer('what is 6 * 7', CACHE, first_turn=False) is None
+
+
+# Controller
+# ==========
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(degradation, 'time', SimpleNamespace(monotonic=clock))
+    monkeypatch.setattr(degradation.resilience, 'status', lambda: {})
+    return clock
+
+
+def make_controller(**overrides) -> DegradationController:
+    settings = dict(latency=(10.0, 20.0, 30.0), errors=(0.2, 0.5, 0.8), recovery=30.0)
+    settings.update(overrides)
+    return DegradationController(DegradationConfig(**settings))
+
+
+def test_no_calls_means_normal(clock):
+    assert make_controller().level() == NORMAL
+
+
+def test_latency_raises_the_level_at_once(clock):
+    controller = make_controller()
+
+    controller.observe(25.0, ok=True)
+
+    assert controller.level() == LOCAL
+    assert controller.reason == 'model latency 25.0s'
+
+
+def test_failure_rate_raises_the_level(clock):
+    controller = make_controller()
+
+    controller.observe(1.0, ok=False)
+
+    assert controller.level() == NO_NEWS
+    assert 'failure rate' in controller.reason
+
+
+def test_open_circuit_means_the_highest_level(clock, monkeypatch):
+    monkeypatch.setattr(degradation.resilience, 'status', lambda: {'gemini': {'state': 'open'}})
+
+    controller = make_controller()
+
+    assert controller.level() == NO_NEWS
+    assert controller.reason == 'circuit open'
+
+
+def test_recovery_steps_down_one_level_per_window(clock):
+    controller = make_controller()
+    controller.observe(25.0, ok=True)
+    assert controller.level() == LOCAL
+
+    # Healthy calls bring the average below every threshold
+    for _ in range(20):
+        controller.observe(1.0, ok=True)
+    assert controller.level() == LOCAL
+
+    clock.now += 30
+    controller.observe(1.0, ok=True)
+    assert controller.level() == CACHE
+    clock.now += 10
+    assert controller.level() == CACHE
+    clock.now += 20
+    assert controller.level() == NORMAL
+
+
+def test_forced_and_disabled_modes(clock):
+    assert make_controller(mode='cache').level() == CACHE
+    disabled = make_controller(mode='off')
+    disabled.observe(60.0, ok=False)
+    assert disabled.level() == NORMAL
+    assert not disabled.enabled
+
+
+def test_timeout_is_capped_only_while_degraded(clock):
+    controller = make_controller(timeout=20.0)
+
+    assert controller.timeout(120.0, NORMAL) == 120.0
+    assert controller.timeout(120.0, CACHE) == 20.0
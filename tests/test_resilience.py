@@ -0,0 +1,305 @@
+"""
+Tests for rate limiting and circuit breaking (multiagent/runtime/resilience.py).
+
+Time is a fake monotonic clock, so bucket refills and breaker cool-downs are
+stepped explicitly instead of slept through.
+"""
+
+# Standard library imports
+import asyncio
+from types import SimpleNamespace
+
+# Third-party imports
+import pytest
+from google.adk.models import LlmRequest
+from google.genai import types
+
+# Module under test
+from multiagent.runtime import resilience
+from multiagent.runtime.model import ModelCall
+from multiagent.runtime.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ResilienceConfig, ResilienceMiddleware, TokenBucket,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the module's clock: the event loop keeps real time
+    monkeypatch.setattr(resilience, 'time', SimpleNamespace(monotonic=clock))
+    return clock
+
+
+# Token Buckets
+# =============
+
+def test_bucket_serves_within_capacity_without_waiting(clock):
+    bucket = TokenBucket(per_minute=60)
+
+    assert bucket.reserve(60, max_wait=0) == 0
+    assert bucket.level == 0
+
+
+def test_bucket_reserves_from_the_future(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.reserve(60, max_wait=0)
+
+    assert bucket.reserve(5, max_wait=10) == pytest.approx(5.0)
+    assert bucket.level == -5
+
+
+def test_bucket_refuses_past_max_wait_and_takes_nothing(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.reserve(60, max_wait=0)
+
+    assert bucket.reserve(30, max_wait=10) is None
+    assert bucket.level == 0
+    assert bucket.seconds_until(30) == pytest.approx(30.0)
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.reserve(60, max_wait=0)
+
+    clock.advance(30)
+    assert bucket.seconds_until(30) == 0
+    clock.advance(600)
+    bucket.settle(0)
+    assert bucket.level == 60
+
+
+def test_settle_corrects_and_refunds(clock):
+    bucket = TokenBucket(per_minute=1000)
+    bucket.reserve(300, max_wait=0)
+
+    bucket.settle(100)
+    assert bucket.level == 600
+    bucket.settle(-1000)
+    assert bucket.level == 1000
+
+
+def test_reservation_is_capped_at_capacity(clock):
+    bucket = TokenBucket(per_minute=100)
+
+    assert bucket.reserve(500, max_wait=0) == 0
+    assert bucket.level == 0
+
+
+# Circuit Breaker
+# ===============
+
+def make_breaker() -> CircuitBreaker:
+    return CircuitBreaker('gemini-test', failures=3, reset=30, reset_cap=100)
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = make_breaker()
+
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.advance(30)
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes_the_circuit(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(30)
+    breaker.allow()
+
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_doubles_the_cool_down_up_to_the_cap(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+
+    for expected in (60, 100, 100):
+        clock.advance(breaker.retry_after())
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.reset == expected
+
+    clock.advance(breaker.retry_after())
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.reset == 30
+
+
+def test_neutral_probe_outcome_frees_the_probe(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(30)
+    breaker.allow()
+
+    breaker.record_neutral()
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+# Middleware
+# ==========
+
+def make_call() -> ModelCall:
+    request = LlmRequest(model='gemini-test', contents=[types.Content(role='user', parts=[types.Part(text='What is 2 + 2?')])])
+    return ModelCall(request=request, model='gemini-test')
+
+
+def make_middleware(**overrides) -> ResilienceMiddleware:
+    settings = dict(tokens_per_minute=10000, attempts=3, backoff_base=0, backoff_cap=0, breaker_failures=2)
+    settings.update(overrides)
+    return ResilienceMiddleware(ResilienceConfig(**settings))
+
+
+def test_retries_upstream_errors_then_succeeds(clock):
+    middleware = make_middleware()
+    attempts = []
+
+    async def flaky(call):
+        attempts.append(call)
+        if len(attempts) == 1:
+            raise ConnectionError('reset by peer')
+        call.usage = types.GenerateContentResponseUsageMetadata(total_token_count=100)
+        return 'ok'
+
+    call = make_call()
+    assert asyncio.run(middleware(call, flaky)) == 'ok'
+    assert len(attempts) == 2
+    assert call.metadata['retries'] == 1
+    # The failed attempt's estimate was given back; the success settled to its usage
+    assert middleware._token_buckets['gemini-test'].level == 10000 - 100
+
+
+def test_non_retryable_error_refunds_and_is_not_retried(clock):
+    middleware = make_middleware()
+
+    async def broken(call):
+        raise ValueError('bad request')
+
+    with pytest.raises(ValueError):
+        asyncio.run(middleware(make_call(), broken))
+    assert middleware._token_buckets['gemini-test'].level == 10000
+    assert middleware.breaker('gemini-test').state == CLOSED
+
+
+def test_open_circuit_short_circuits(clock):
+    middleware = make_middleware(attempts=2)
+
+    async def down(call):
+        raise ConnectionError('unreachable')
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(middleware(make_call(), down))
+    with pytest.raises(resilience.CircuitOpen) as error:
+        asyncio.run(middleware(make_call(), down))
+    assert error.value.retry_after == 30
+
+
+def test_cancelled_call_refunds_its_reservation(clock):
+    middleware = make_middleware()
+
+    async def slow(call):
+        await asyncio.sleep(10)
+
+    async def cancel():
+        task = asyncio.ensure_future(middleware(make_call(), slow))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert middleware._token_buckets['gemini-test'].level == 10000
+    assert middleware.breaker('gemini-test').state == CLOSED
+
+
+def test_throttled_half_open_probe_frees_the_probe(clock):
+    middleware = make_middleware(tokens_per_minute=0, requests_per_minute=1, max_wait=0, attempts=1)
+    breaker = middleware.breaker('gemini-test')
+    for _ in range(2):
+        breaker.record_failure()
+    clock.advance(30)
+    # Spend the only request slot, so the probe is throttled before it is sent
+    middleware._request_buckets['gemini-test'] = TokenBucket(1)
+    middleware._request_buckets['gemini-test'].reserve(1, max_wait=0)
+
+    async def ok(call):
+        return 'ok'
+
+    with pytest.raises(resilience.Throttled):
+        asyncio.run(middleware(make_call(), ok))
+    assert breaker.state == HALF_OPEN and not breaker.probing
+
+    clock.advance(60)
+    assert asyncio.run(middleware(make_call(), ok)) == 'ok'
+    assert breaker.state == CLOSED
+
+
+def test_probe_cancelled_while_waiting_for_capacity_frees_the_probe(clock):
+    middleware = make_middleware(tokens_per_minute=0, requests_per_minute=1, max_wait=60)
+    breaker = middleware.breaker('gemini-test')
+    for _ in range(2):
+        breaker.record_failure()
+    clock.advance(30)
+    middleware._request_buckets['gemini-test'] = TokenBucket(1)
+    middleware._request_buckets['gemini-test'].reserve(1, max_wait=0)
+
+    async def ok(call):
+        return 'ok'
+
+    async def cancel():
+        task = asyncio.ensure_future(middleware(make_call(), ok))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert breaker.state == HALF_OPEN and not breaker.probing
+    assert breaker.allow()
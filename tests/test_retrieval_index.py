@@ -0,0 +1,102 @@
+"""
+Tests for BM25 scoring and search in the notes index (multiagent/retrieval/index.py).
+
+Indexes are built from a handful of passages in a temporary directory, and
+the memory-mapped scores are checked against BM25 computed directly.
+"""
+
+# Standard library imports
+import math
+from collections import Counter
+
+# Third-party imports
+import pytest
+
+# Module under test
+from multiagent.retrieval.index import B, K1, NotesIndex, Passage, build_index, tokenize
+
+PASSAGES = [
+    Passage("Newton's second law: force equals mass times acceleration.", 'physics', 'forces.md'),
+    Passage('Friction is a force opposing motion between surfaces.', 'physics', 'forces.md'),
+    Passage('The speed of light in vacuum is about 300000 km per second.', 'physics', 'light.md'),
+    Passage('A covalent bond shares electron pairs between atoms.', 'chemistry', 'bonds.md'),
+    Passage('An ionic bond forms when an electron moves from one atom to another. '
+            'Ionic compounds conduct electricity when molten.', 'chemistry', 'bonds.md'),
+]
+
+
+def reference_bm25(query: str, passages: list[Passage]) -> list[float]:
+    documents = [Counter(tokenize(passage.text)) for passage in passages]
+    average = sum(sum(terms.values()) for terms in documents) / len(documents)
+    scores = []
+    for terms in documents:
+        length = sum(terms.values())
+        score = 0.0
+        for term in set(tokenize(query)):
+            frequency = sum(term in document for document in documents)
+            if not terms[term]:
+                continue
+            idf = math.log(1 + (len(documents) - frequency + 0.5) / (frequency + 0.5))
+            score += idf * terms[term] * (K1 + 1) / (terms[term] + K1 * (1 - B + B * length / average))
+        scores.append(score)
+    return scores
+
+
+@pytest.fixture
+def index(tmp_path):
+    build_index(PASSAGES, str(tmp_path), dense=False)
+    return NotesIndex(str(tmp_path))
+
+
+def test_tokenize_drops_stopwords_and_plurals():
+    assert tokenize("What are Newton's forces?") == ['newton', 'force']
+    assert tokenize('the mass of a gas') == ['mass', 'gas']
+
+
+@pytest.mark.parametrize('query', ['force', 'ionic bond electron', 'speed of light', 'friction forces motion'])
+def test_bm25_matches_the_formula(index, query):
+    assert list(index.bm25(query)) == pytest.approx(reference_bm25(query, PASSAGES), rel=1e-5)
+
+
+def test_rare_terms_outweigh_common_ones(index):
+    scores = index.bm25('electron covalent')
+
+    # Both bond passages mention 'electron'; only one is 'covalent'
+    assert scores[3] > scores[4] > 0
+
+
+def test_unknown_terms_score_nothing(index):
+    assert not index.bm25('photosynthesis chlorophyll').any()
+    assert index.search('photosynthesis chlorophyll') == []
+
+
+def test_search_ranks_best_first(index):
+    hits = index.search('force', k=2)
+
+    assert [hit.source for hit in hits] == ['forces.md', 'forces.md']
+    assert hits[0].score >= hits[1].score
+
+
+def test_search_filters_by_subject(index):
+    hits = index.search('electron force', k=5, subject='chemistry')
+
+    assert hits and {hit.subject for hit in hits} == {'chemistry'}
+    assert index.search('force', subject='biology') == []
+
+
+def test_passages_round_trip_through_the_store(index):
+    assert [index.passage(doc_id) for doc_id in range(len(index))] == [passage.text for passage in PASSAGES]
+
+
+def test_empty_index_finds_nothing(tmp_path):
+    build_index([], str(tmp_path), dense=False)
+
+    assert NotesIndex(str(tmp_path)).search('force') == []
+
+
+def test_hybrid_search_keeps_lexical_matches(tmp_path):
+    build_index(PASSAGES, str(tmp_path), dense=True, dimensions=64)
+
+    hits = NotesIndex(str(tmp_path)).search('speed of light', k=1)
+
+    assert hits[0].source == 'light.md'
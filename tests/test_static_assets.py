@@ -0,0 +1,90 @@
+"""
+Tests for in-memory static asset serving (server/static_assets.py).
+
+A small frontend is written to a temporary directory and served through a
+bare Starlette app, so fingerprinting, ETags and 304s are checked over HTTP.
+"""
+
+# Third-party imports
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount, Route
+from starlette.testclient import TestClient
+
+# Module under test
+from server.static_assets import IMMUTABLE, REVALIDATE, StaticAssets
+
+SCRIPT = 'console.log("AI Tutor");\n' * 100
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / 'index.html').write_text('<script src="/static/script.js"></script>')
+    (tmp_path / 'script.js').write_text(SCRIPT)
+    return StaticAssets(str(tmp_path), reload=False)
+
+
+@pytest.fixture
+def client(assets):
+    async def index(request):
+        return assets.index_response(request)
+
+    app = Starlette(routes=[Route('/', index), Mount('/static', app=assets)])
+    return TestClient(app)
+
+
+def test_index_references_fingerprinted_urls(assets, client):
+    fingerprinted = assets.assets['script.js'].fingerprinted_path
+
+    response = client.get('/')
+
+    assert f'/static/{fingerprinted}' in response.text
+    assert response.headers['cache-control'] == REVALIDATE
+
+
+def test_fingerprinted_url_is_immutable(assets, client):
+    response = client.get(f"/static/{assets.assets['script.js'].fingerprinted_path}")
+
+    assert response.status_code == 200
+    assert response.text == SCRIPT
+    assert response.headers['cache-control'] == IMMUTABLE
+
+
+def test_matching_etag_answers_304(client):
+    first = client.get('/static/script.js', headers={'accept-encoding': 'identity'})
+
+    second = client.get('/static/script.js', headers={'accept-encoding': 'identity', 'if-none-match': first.headers['etag']})
+
+    assert second.status_code == 304
+    assert second.content == b''
+    assert second.headers['etag'] == first.headers['etag']
+
+
+def test_stale_etag_gets_the_body(client):
+    response = client.get('/static/script.js', headers={'accept-encoding': 'identity', 'if-none-match': '"stale"'})
+
+    assert response.status_code == 200
+    assert response.text == SCRIPT
+
+
+def test_each_coding_has_its_own_etag(client):
+    plain = client.get('/static/script.js', headers={'accept-encoding': 'identity'})
+    gzipped = client.get('/static/script.js', headers={'accept-encoding': 'gzip'})
+
+    assert gzipped.headers['content-encoding'] == 'gzip'
+    assert gzipped.headers['etag'] != plain.headers['etag']
+    assert gzipped.headers['vary'] == 'Accept-Encoding'
+    # The identity ETag must not validate the gzip representation
+    revalidated = client.get('/static/script.js', headers={'accept-encoding': 'gzip', 'if-none-match': plain.headers['etag']})
+    assert revalidated.status_code == 200
+
+
+def test_index_answers_304(client):
+    etag = client.get('/').headers['etag']
+
+    assert client.get('/', headers={'if-none-match': etag}).status_code == 304
+
+
+def test_unknown_asset_and_method(client):
+    assert client.get('/static/missing.js').status_code == 404
+    assert client.post('/static/script.js').status_code == 405